@@ -1,8 +1,12 @@
+import json
+import argparse
+from src.load_data import metadata_participants, experiment_statistics_file
 from src.data_visualization import load_and_split_data_by_class, compare_all_metrics
 from src.data_visualization import plot_individual_boxplots, plot_significant_subplots
 from src.data_visualization import plot_distribution_kde_by_group
+from src.utils import to_json_compatible
 
-def main():
+def plot_results():
     df, df_asd, df_td = load_and_split_data_by_class()
     comparison_results = compare_all_metrics(df_asd, df_td)
     
@@ -16,5 +20,126 @@ def main():
     plot_distribution_kde_by_group(df, "Avg_Gaze_Deviation", "Distribution of Gaze Deviation by Group")
     plot_distribution_kde_by_group(df, "Saccade_Frequency", "Distribution of Saccade Frequency by Group")
 
+def print_statistics(metadata_participants=metadata_participants, model="ttest",
+                     experiment_statistics_file=experiment_statistics_file):
+    """
+    Prints the group comparison as JSON, without loading the plotting libraries.
+    'ttest' compares the participant averages (compare_all_metrics()), 'mixed' fits a
+    mixed model to every trial of 'experiment_statistics_file' (see src/mixed_effects.py).
+    """
+    if model == "mixed":
+        from src.mixed_effects import compare_metrics_mixed
+        results = compare_metrics_mixed(experiment_statistics_file, metadata_participants)
+    else:
+        _, df_asd, df_td = load_and_split_data_by_class(metadata_participants)
+        results = compare_all_metrics(df_asd, df_td)
+    print(json.dumps(to_json_compatible(results), indent=2))
+
+def print_classification(metadata_participants=metadata_participants, n_folds=5, l2=1.0, seed=0, workers=1):
+    """
+    Prints the cross-validated ASD/TD classification results (see src/classification.py) as JSON.
+    """
+    from src.classification import run_classification
+    result = run_classification(metadata_participants=metadata_participants, n_folds=n_folds, l2=l2,
+                                seed=seed, workers=workers)
+    print(json.dumps(to_json_compatible(result), indent=2))
+
+def print_correlations(metadata_participants=metadata_participants, n_permutations=1000, seed=0, plot=False):
+    """
+    Correlates the metrics with the covariates (see src/correlation_analysis.py), saves the
+    table and prints the participant-level correlations as JSON. With 'plot', the heatmaps
+    of both levels are shown as well.
+    """
+    from src.correlation_analysis import run_correlation_analysis
+    correlations = run_correlation_analysis(metadata_participants=metadata_participants,
+                                            n_permutations=n_permutations, seed=seed)
+    if correlations.empty:
+        return
+    participant_level = correlations[correlations["Level"] == "participant"].drop(columns=["Level", "Stimulus"])
+    print(json.dumps(to_json_compatible(participant_level), indent=2))
+    if plot:
+        from src.data_visualization import plot_correlation_heatmap
+        plot_correlation_heatmap(correlations, level="participant")
+        plot_correlation_heatmap(correlations, level="stimulus")
+
+def print_time_resolved(metadata_participants=metadata_participants, n_permutations=1000, alpha=0.05, seed=0,
+                        workers=1, plots_folder=None):
+    """
+    Finds the time windows where the ASD and TD deviation curves of each stimulus differ
+    (see src/time_resolved_analysis.py), saves the summary table and prints the stimuli with
+    significant windows as JSON. With 'plots_folder', every time course is saved as a figure.
+    """
+    from src.time_resolved_analysis import run_time_resolved_analysis
+    summary, time_courses = run_time_resolved_analysis(metadata_participants=metadata_participants,
+                                                       n_permutations=n_permutations, alpha=alpha, seed=seed,
+                                                       workers=workers)
+    print(json.dumps(to_json_compatible(summary[summary["Significant_Clusters"] > 0]), indent=2))
+    if plots_folder:
+        from src.data_visualization import save_time_resolved_plots
+        save_time_resolved_plots(time_courses, plots_folder, alpha)
+
+def save_animations(output_format="mp4", stimuli=None, frame_step=1, workers=1):
+    """
+    Renders the gaze animation of every stimulus (see src/gaze_animation.py).
+    """
+    from src.gaze_animation import create_gaze_animations
+    create_gaze_animations(output_format=output_format, stimuli=stimuli, frame_step=frame_step, workers=workers)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the ASD and TD metrics and plot the results.")
+    subcommands = parser.add_subparsers(dest="command")
+    subcommands.add_parser("plots", help="Show the comparison plots (default)")
+    stats = subcommands.add_parser("stats", help="Print the group comparison as JSON")
+    stats.add_argument("--metadata", default=metadata_participants,
+                       help=f"Participant metadata file (default: {metadata_participants})")
+    stats.add_argument("--model", choices=["ttest", "mixed"], default="ttest",
+                       help="t-tests of the participant averages (default) or a trial-level mixed model")
+    stats.add_argument("--statistics", default=experiment_statistics_file,
+                       help=f"Trial-level metrics for --model mixed (default: {experiment_statistics_file})")
+    classify = subcommands.add_parser("classify", help="Cross-validate an ASD/TD classifier and print its AUC as JSON")
+    classify.add_argument("--metadata", default=metadata_participants,
+                          help=f"Participant metadata file (default: {metadata_participants})")
+    classify.add_argument("--folds", type=int, default=5, help="Number of cross-validation folds (default: 5)")
+    classify.add_argument("--l2", type=float, default=1.0, help="L2 regularization strength (default: 1.0)")
+    classify.add_argument("--seed", type=int, default=0, help="Seed of the folds and the bootstrap (default: 0)")
+    classify.add_argument("--workers", type=int, default=1, help="Processes running folds in parallel (default: 1)")
+    correlate = subcommands.add_parser("correlate", help="Correlate the metrics with CARS Score, Age and Gender")
+    correlate.add_argument("--metadata", default=metadata_participants,
+                           help=f"Participant metadata file (default: {metadata_participants})")
+    correlate.add_argument("--permutations", type=int, default=1000,
+                           help="Permutations for the p-values (default: 1000)")
+    correlate.add_argument("--seed", type=int, default=0, help="Seed of the permutations (default: 0)")
+    correlate.add_argument("--plot", action="store_true", help="Also show the correlation heatmaps")
+    timecourse = subcommands.add_parser("timecourse", help="Find the time windows where the groups' gaze deviation differs")
+    timecourse.add_argument("--metadata", default=metadata_participants,
+                            help=f"Participant metadata file (default: {metadata_participants})")
+    timecourse.add_argument("--permutations", type=int, default=1000,
+                            help="Permutations of the class labels per stimulus (default: 1000)")
+    timecourse.add_argument("--alpha", type=float, default=0.05,
+                            help="Threshold of the bin-wise tests and the clusters (default: 0.05)")
+    timecourse.add_argument("--seed", type=int, default=0, help="Seed of the permutations (default: 0)")
+    timecourse.add_argument("--workers", type=int, default=1, help="Processes analyzing stimuli in parallel (default: 1)")
+    timecourse.add_argument("--plots", metavar="FOLDER", help="Save the time course of every stimulus in this folder")
+    animate = subcommands.add_parser("animate", help="Render the average path and the participants' gaze as animations")
+    animate.add_argument("--format", choices=["mp4", "gif", "png"], default="mp4",
+                         help="MP4 (needs ffmpeg), GIF or a PNG image sequence (default: mp4)")
+    animate.add_argument("--stimulus", action="append", help="Render only this stimulus (repeatable)")
+    animate.add_argument("--frame-step", type=int, default=1, help="Time bins per frame (default: 1)")
+    animate.add_argument("--workers", type=int, default=1, help="Processes rendering stimuli in parallel (default: 1)")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        print_statistics(args.metadata, args.model, args.statistics)
+    elif args.command == "classify":
+        print_classification(args.metadata, args.folds, args.l2, args.seed, args.workers)
+    elif args.command == "correlate":
+        print_correlations(args.metadata, args.permutations, args.seed, args.plot)
+    elif args.command == "timecourse":
+        print_time_resolved(args.metadata, args.permutations, args.alpha, args.seed, args.workers, args.plots)
+    elif args.command == "animate":
+        save_animations(args.format, args.stimulus, args.frame_step, args.workers)
+    else:
+        plot_results()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
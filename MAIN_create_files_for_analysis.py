@@ -1,18 +1,51 @@
-from src.dataset_file_cleanup import create_participant_files
-from src.data_cleanup import clean_all_participant_files
-from src.data_analysis import create_experiment_statistics_file, analyze_saccades
-from src.calculate_gaze_paths import create_average_paths_files, calculate_gaze_deviation
-from src.data_analysis import calculate_experiment_deviation, calculate_participant_averages
+import json
+import argparse
+from src.pipeline import load_config, merge_config, read_config_file, run_pipeline, pipeline_stages
+from src.parameter_sweep import run_sweep
 
-def main():
-    create_participant_files()
-    clean_all_participant_files()
-    create_experiment_statistics_file()
-    analyze_saccades()
-    create_average_paths_files()
-    calculate_gaze_deviation()
-    calculate_experiment_deviation()
-    calculate_participant_averages()
+def parse_setting(setting):
+    """
+    Turns 'section.name=value' into {"section": {"name": value}}; the value is read as
+    JSON if possible (numbers, null, true/false, lists, objects), otherwise as a string.
+    """
+    name, separator, value = setting.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected section.name=value, got '{setting}'")
+    try:
+        value = json.loads(value)
+    except json.JSONDecodeError:
+        pass
+
+    override = value
+    for key in reversed(name.split(".")):
+        override = {key: override}
+    return override
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create the analysis files from the raw eye-tracking data.")
+    parser.add_argument("--config", help="JSON, TOML or YAML configuration file")
+    parser.add_argument("--stages", nargs="+", choices=list(pipeline_stages),
+                        help="Stages to run (default: all stages of the configuration)")
+    parser.add_argument("--set", dest="settings", action="append", default=[], type=parse_setting,
+                        metavar="SECTION.NAME=VALUE",
+                        help="Override a configuration entry, e.g. parameters.workers=4 or paths.participant_dataset=run1")
+    parser.add_argument("--sweep", metavar="GRID_FILE",
+                        help="Run every combination of the parameter values in a JSON, TOML or YAML file, "
+                             "e.g. {\"snap_interval\": [10, 20], \"bin_width\": [null, 10]}")
+    parser.add_argument("--sweep-folder", default="parameter_sweep",
+                        help="Workspaces and results table of the sweep (default: parameter_sweep)")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.config)
+    for override in args.settings:
+        config = merge_config(config, override)
+    if args.stages:
+        config = merge_config(config, {"stages": args.stages})
+
+    if args.sweep:
+        run_sweep(config, read_config_file(args.sweep), args.sweep_folder)
+    else:
+        run_pipeline(config)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,13 @@
+import argparse
+from src.metrics_service import serve_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the pipeline results as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    serve_metrics(args.host, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Measures the start-up time of the entry points: each command is run in a fresh
+interpreter several times and the median wall-clock time is reported.
+The plotting libraries alone are listed for comparison.
+
+Run from the project root: python benchmarks/benchmark_startup.py [--repeats 5]
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+startup_commands = {
+    "import MAIN_analyze_data": [sys.executable, "-c", "import MAIN_analyze_data"],
+    "MAIN_analyze_data.py stats": [sys.executable, "MAIN_analyze_data.py", "stats"],
+    "import MAIN_create_files_for_analysis": [sys.executable, "-c", "import MAIN_create_files_for_analysis"],
+    "import MAIN_serve_metrics": [sys.executable, "-c", "import MAIN_serve_metrics"],
+    "plotting libraries (reference)": [sys.executable, "-c", "import matplotlib.pyplot, seaborn, scipy.stats"]
+}
+
+def time_command(command, repeats=5):
+    """
+    Returns the wall-clock times [s] of 'repeats' runs of a command from the project root.
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        subprocess.run(command, cwd=project_root, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return times
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the start-up time of the entry points.")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    print(f"{'Command':<40} {'Median [s]':>10} {'Min [s]':>10}")
+    for name, command in startup_commands.items():
+        times = time_command(command, args.repeats)
+        print(f"{name:<40} {statistics.median(times):>10.3f} {min(times):>10.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Area-of-interest (AOI) analysis.
+AOIs are defined per stimulus in a JSON file ('aoi_definitions.json') as rectangles
+or polygons in screen pixel coordinates, for example:
+
+    {
+      "01 coucou g.jpg": [
+        {"name": "Eyes", "rectangle": [500, 300, 780, 380]},
+        {"name": "Mouth", "polygon": [[560, 450], [720, 450], [700, 520], [580, 520]]}
+      ]
+    }
+
+Every sample is labelled with the first AOI (in file order) that contains its gaze point,
+and dwell time, first-fixation latency and revisits per AOI are added to
+'experiment_statistics.csv' as 'AOI_<name>_Dwell_Time', 'AOI_<name>_First_Fixation_Latency'
+and 'AOI_<name>_Revisits'.
+"""
+
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.event_extraction import label_samples, calculate_gaze_point
+
+group_columns = ["Participant", "Experiment", "Stimulus"]
+
+aoi_metric_names = ["Dwell_Time", "First_Fixation_Latency", "Revisits"]
+
+def load_aoi_definitions(aoi_definitions_file=aoi_definitions_file):
+    """
+    Loads the AOI definitions and turns every AOI into a polygon.
+
+    Parameters:
+      aoi_definitions_file (str): Path of the JSON definitions file.
+
+    Returns:
+      dict: stimulus -> list of (AOI name, polygon) where polygon is an (n, 2) array.
+
+    Raises:
+      ValueError: If an AOI has neither a 'rectangle' nor a 'polygon'.
+    """
+    with open(aoi_definitions_file) as f:
+        definitions = json.load(f)
+
+    aoi_definitions = {}
+    for stimulus, aois in definitions.items():
+        aoi_definitions[stimulus] = []
+        for aoi in aois:
+            if "rectangle" in aoi:
+                x_min, y_min, x_max, y_max = aoi["rectangle"]
+                polygon = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            elif "polygon" in aoi:
+                polygon = aoi["polygon"]
+            else:
+                raise ValueError(f"AOI '{aoi.get('name')}' of stimulus '{stimulus}' has no rectangle or polygon")
+            aoi_definitions[stimulus].append((aoi["name"], np.asarray(polygon, dtype=float)))
+
+    return aoi_definitions
+
+def points_in_polygon(x, y, polygon):
+    """
+    Vectorized ray-casting test of many points against one polygon.
+    Every edge is checked against every point at once; a point is inside if a
+    horizontal ray from it crosses the edges an odd number of times.
+
+    Parameters:
+      x (np.ndarray): X coordinates of the points.
+      y (np.ndarray): Y coordinates of the points.
+      polygon (np.ndarray): (n, 2) array of the polygon vertices.
+
+    Returns:
+      np.ndarray: Boolean array, True for points inside. NaN points are outside.
+    """
+    x = np.asarray(x, dtype=float)[:, None]
+    y = np.asarray(y, dtype=float)[:, None]
+    x_start, y_start = polygon[:, 0], polygon[:, 1]
+    x_end, y_end = np.roll(x_start, 1), np.roll(y_start, 1)
+
+    # Edges that span the point's height, and where they cross that height
+    spans = (y_start > y) != (y_end > y)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_cross = x_start + (y - y_start) * (x_end - x_start) / (y_end - y_start)
+    crossings = spans & (x < x_cross)
+
+    return np.logical_xor.reduce(crossings, axis=1)
+
+def label_samples_with_aoi(df, aoi_definitions):
+    """
+    Labels every sample with the AOI its gaze point falls in.
+
+    Parameters:
+      df (pd.DataFrame): A cleaned participant file.
+      aoi_definitions (dict): Output of load_aoi_definitions().
+
+    Returns:
+      np.ndarray: The AOI name of each row, '' for samples outside every AOI
+                  (or on stimuli without AOIs).
+    """
+    labels = np.full(len(df), "", dtype=object)
+    gaze_x, gaze_y = calculate_gaze_point(df)
+
+    for stimulus, rows in df.groupby("Stimulus", sort=False).indices.items():
+        for name, polygon in aoi_definitions.get(stimulus, []):
+            # Earlier AOIs win where AOIs overlap
+            unlabelled = rows[labels[rows] == ""]
+            inside = points_in_polygon(gaze_x[unlabelled], gaze_y[unlabelled], polygon)
+            labels[unlabelled[inside]] = name
+
+    return labels
+
+def compute_aoi_metrics(df, aoi_definitions):
+    """
+    Computes the AOI metrics of every (Participant, Experiment, Stimulus) combination
+    of a participant file that has AOIs defined.
+
+    Metrics per AOI:
+      - Dwell_Time: Total 'Duration' of the samples inside the AOI [ms]
+      - First_Fixation_Latency: 'RecordingTime Stimulus [ms]' of the first fixation
+        sample inside the AOI (NaN if it was never fixated)
+      - Revisits: Number of times the gaze came back to the AOI after leaving it.
+        Samples without a valid gaze point (e.g. blinks) don't count as leaving.
+
+    Parameters:
+      df (pd.DataFrame): A cleaned participant file.
+      aoi_definitions (dict): Output of load_aoi_definitions().
+
+    Returns:
+      pd.DataFrame: One row per combination and AOI, with the group columns, 'AOI'
+                    and the three metrics.
+    """
+    labels = label_samples_with_aoi(df, aoi_definitions)
+    gaze_x, _ = calculate_gaze_point(df)
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+
+    samples = pd.DataFrame({
+        "Key": keys,
+        "AOI": labels,
+        "Duration": pd.to_numeric(df["Duration"], errors="coerce").fillna(0).to_numpy(dtype=float),
+        "Time": pd.to_numeric(df["RecordingTime Stimulus [ms]"], errors="coerce").to_numpy(dtype=float),
+        "Fixation": label_samples(df) == "Fixation"
+    })[~np.isnan(gaze_x)]
+
+    # A visit starts wherever the AOI changes within a combination
+    key = samples["Key"].to_numpy()
+    aoi = samples["AOI"].to_numpy()
+    samples["Entry"] = np.r_[True, (key[1:] != key[:-1]) | (aoi[1:] != aoi[:-1])]
+
+    in_aoi = samples[samples["AOI"] != ""]
+    grouped = in_aoi.groupby(["Key", "AOI"])
+    metrics = pd.DataFrame({
+        "Dwell_Time": grouped["Duration"].sum(),
+        "First_Fixation_Latency": in_aoi[in_aoi["Fixation"]].groupby(["Key", "AOI"])["Time"].min(),
+        "Revisits": (grouped["Entry"].sum() - 1).clip(lower=0)
+    })
+
+    # Every defined AOI gets a row, also the ones that were never looked at
+    combinations = df[group_columns].assign(Key=keys).drop_duplicates("Key")
+    full_index = [
+        (row.Key, name)
+        for row in combinations.itertuples(index=False)
+        for name, _ in aoi_definitions.get(row.Stimulus, [])
+    ]
+    if not full_index:
+        return pd.DataFrame(columns=group_columns + ["AOI"] + aoi_metric_names)
+
+    metrics = metrics.reindex(pd.MultiIndex.from_tuples(full_index, names=["Key", "AOI"]))
+    metrics[["Dwell_Time", "Revisits"]] = metrics[["Dwell_Time", "Revisits"]].fillna(0)
+    metrics = metrics.reset_index().merge(combinations, on="Key")
+
+    return metrics[group_columns + ["AOI"] + aoi_metric_names]
+
+def analyze_aois(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                 aoi_definitions_file=aoi_definitions_file):
+    """
+    Reads every participant file once, computes the AOI metrics and adds them to
+    'experiment_statistics.csv' (one column per AOI name and metric).
+    Columns from a previous run are replaced.
+
+    Notes:
+      - If the AOI definitions file doesn't exist, a warning is printed and nothing changes.
+    """
+    if not os.path.exists(aoi_definitions_file):
+        print(f"Warning: AOI definitions file '{aoi_definitions_file}' not found. Skipping AOI analysis.")
+        return
+
+    aoi_definitions = load_aoi_definitions(aoi_definitions_file)
+    all_metrics = []
+
+    for file in glob.glob(os.path.join(participant_dataset, "Participant_*.csv")):
+        try:
+            df = pd.read_csv(file, low_memory=False)
+        except pd.errors.EmptyDataError:
+            continue
+
+        if "Duration" not in df.columns or "RecordingTime Stimulus [ms]" not in df.columns:
+            print(f"Warning: {os.path.basename(file)} is not cleaned. Skipping.")
+            continue
+
+        all_metrics.append(compute_aoi_metrics(df, aoi_definitions))
+
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    experiment_stats = experiment_stats.loc[:, ~experiment_stats.columns.str.startswith("AOI_")]
+
+    if all_metrics:
+        metrics = pd.concat(all_metrics)
+        wide = metrics.set_index(group_columns + ["AOI"])[aoi_metric_names].unstack("AOI")
+        wide.columns = [f"AOI_{name}_{metric}" for metric, name in wide.columns]
+        experiment_stats = experiment_stats.merge(wide.reset_index(), on=group_columns, how="left")
+
+    experiment_stats.to_csv(experiment_statistics_file, index=False)
+    print(f"AOI metrics calculated and saved to {experiment_statistics_file}")
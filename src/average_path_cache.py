@@ -0,0 +1,116 @@
+"""
+A shared, size-bounded cache of parsed average path files.
+Every 'AveragePath_<stimulus>.csv' is parsed once into sorted NumPy arrays and reused by
+every participant and every pipeline stage that needs it. A cached file is parsed again
+when it changes on disk or when create_average_paths_files() invalidates it.
+"""
+
+import os
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from src.load_data import *
+
+average_value_columns = ["Avg Right X", "Avg Right Y", "Avg Left X", "Avg Left Y"]
+
+class AveragePathCache:
+    """
+    Least-recently-used cache of average paths, keyed by file path.
+    Each entry holds the sorted SnappedTime values and an (n, 4) array of
+    'Avg Right X', 'Avg Right Y', 'Avg Left X', 'Avg Left Y'.
+    """
+
+    def __init__(self, maxsize=256):
+        """
+        Parameters:
+          maxsize (int): Maximum number of average paths kept in memory.
+        """
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, stimulus, average_paths_folder=average_paths_folder):
+        """
+        Returns the parsed average path of a stimulus.
+
+        Parameters:
+          stimulus (str): The stimulus name.
+          average_paths_folder (str): Folder with the average path files.
+
+        Returns:
+          tuple (times, values) or None if the file doesn't exist.
+        """
+        file_path = os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv")
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            self.entries.pop(file_path, None)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+
+        entry = self.entries.get(file_path)
+        if entry is not None and entry[0] == stamp:
+            self.hits += 1
+            self.entries.move_to_end(file_path)
+            return entry[1], entry[2]
+
+        self.misses += 1
+        avg_df = pd.read_csv(file_path)
+        times = pd.to_numeric(avg_df["SnappedTime"], errors="coerce").to_numpy(dtype=float)
+        values = avg_df[average_value_columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float)
+
+        order = np.argsort(times, kind="stable")
+        self.entries[file_path] = (stamp, times[order], values[order])
+        self.entries.move_to_end(file_path)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+        return times[order], values[order]
+
+    def lookup(self, stimulus, snapped_times, average_paths_folder=average_paths_folder):
+        """
+        Finds the average path values at the given SnappedTime values with a binary search.
+
+        Parameters:
+          stimulus (str): The stimulus name.
+          snapped_times (np.ndarray): SnappedTime values (NaN is never found).
+          average_paths_folder (str): Folder with the average path files.
+
+        Returns:
+          tuple (found, values) or None if there is no average path:
+            found (np.ndarray): True where the SnappedTime exists in the average path.
+            values (np.ndarray): (n, 4) average values, NaN where not found.
+        """
+        average_path = self.get(stimulus, average_paths_folder)
+        if average_path is None:
+            return None
+
+        times, path_values = average_path
+        snapped_times = np.asarray(snapped_times, dtype=float)
+        if len(times) == 0:
+            return np.zeros(len(snapped_times), dtype=bool), np.full((len(snapped_times), 4), np.nan)
+
+        positions = np.clip(np.searchsorted(times, snapped_times), 0, len(times) - 1)
+        found = times[positions] == snapped_times
+        values = np.where(found[:, None], path_values[positions], np.nan)
+
+        return found, values
+
+    def invalidate(self, stimulus=None, average_paths_folder=average_paths_folder):
+        """
+        Drops one stimulus from the cache, or everything if 'stimulus' is None.
+        """
+        if stimulus is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv"), None)
+
+    def info(self):
+        """
+        Returns the hit/miss counters and the current size.
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries), "maxsize": self.maxsize}
+
+# The cache shared by all pipeline stages
+average_path_cache = AveragePathCache()
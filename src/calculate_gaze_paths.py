@@ -2,11 +2,42 @@ import os
 import pandas as pd
 import numpy as np
 import math
+from functools import partial
 from src.load_data import *
+from src.average_path_cache import average_path_cache
+from src.data_quality import quality_thresholds, load_excluded_sessions
+from src.resampling import time_bins, gaze_columns
+from src.cohort_tensor import get_cohort_tensors, masked_mean
+from src.parallel import map_in_processes
+from src.stimulus_catalog import load_stimulus_ids, stimulus_codes
+from src.utils import write_atomically
 
-def create_average_paths_files():
+def create_average_paths_files(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                               metadata_participants=metadata_participants, average_paths_folder=average_paths_folder,
+                               cohort_tensors_folder=cohort_tensors_folder, quality_thresholds=quality_thresholds,
+                               data_quality_file=data_quality_file, bin_width=None, resampling_method="mean",
+                               stimulus_catalog_file=stimulus_catalog_file):
     """
     Generate an average gaze path file (CSV) for each unique stimulus.
+    The recordings of each stimulus come from its cohort tensor (see src/cohort_tensor.py),
+    so every participant file is read once and each average path is a single masked mean.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      experiment_statistics_file (str): Lists the recordings of every stimulus.
+      metadata_participants (str): Provides the participants' classes for the cohort tensors.
+      average_paths_folder (str): Output folder of the average path files.
+      cohort_tensors_folder (str): Cache folder of the cohort tensors.
+      quality_thresholds (dict): Sessions failing these thresholds in the data quality
+                                 report are left out (see src/data_quality.py).
+                                 By default every threshold is disabled.
+      data_quality_file (str): Path of the data quality report.
+      bin_width (float or None): If set, every participant's gaze is first resampled onto
+                                 a regular grid of this width [ms] (see src/resampling.py)
+                                 instead of using only the snapped samples.
+      resampling_method (str): 'mean' or 'interpolate', used with 'bin_width'.
+      stimulus_catalog_file (str): The stimulus catalog, if it exists; the samples are
+                                   matched to the recordings on its IDs.
 
     Returns:
       None. CSV files are written to 'calculated_average_paths'.
@@ -15,49 +46,33 @@ def create_average_paths_files():
       - If no data is found for a given stimulus, that stimulus is skipped.
       - The function relies on 'SnappedTime' existing in participant files (i.e., 
         after cleaning).    
+      - Samples categorized as blinks are excluded from the calculations.
     """
     os.makedirs(average_paths_folder, exist_ok=True)
-    experiment_stats = pd.read_csv(experiment_statistics_file)
+    excluded_sessions = load_excluded_sessions(quality_thresholds, data_quality_file)
+    if excluded_sessions:
+        print(f"Excluding {len(excluded_sessions)} low-quality sessions from the average paths.")
     
-    grouped = experiment_stats.groupby('Stimulus')
+    tensors = get_cohort_tensors(participant_dataset, experiment_statistics_file, metadata_participants,
+                                 cohort_tensors_folder, bin_width, resampling_method,
+                                 stimulus_catalog_file=stimulus_catalog_file)
     
-    for stimulus, group in grouped:
-        all_data = []
-        
-        for _, row in group.iterrows():
-            participant = row['Participant']
-            experiment = row['Experiment']
-            file_path = os.path.join(participant_dataset, f"Participant_{participant}.csv")
-            
-            if not os.path.exists(file_path):
-                continue
-            
-            df = pd.read_csv(file_path)
-            df_filtered = df[(df['Experiment'] == experiment) & (df['Stimulus'] == stimulus)]
-            
-            # Excludes from the calculations lines which are categorized as blinks or are all 0
-            df_filtered = df_filtered[(df_filtered['Category Left'] != 'Blink') & (df_filtered['Category Right'] != 'Blink')]
-            df_filtered = df_filtered.loc[(df_filtered.iloc[:, 2:] != 0).any(axis=1)]
-            
-            # Convert gaze coordinates to numeric to prevent errors
-            gaze_columns = ['Point of Regard Right X [px]', 'Point of Regard Right Y [px]',
-                            'Point of Regard Left X [px]', 'Point of Regard Left Y [px]']
-            df_filtered[gaze_columns] = df_filtered[gaze_columns].apply(pd.to_numeric, errors='coerce')
-            
-            all_data.append(df_filtered)
-        
-        if not all_data:
+    for stimulus, tensor in tensors.items():
+        include = np.array([(participant, experiment, stimulus) not in excluded_sessions
+                            for participant, experiment in zip(tensor["participants"], tensor["experiments"])], dtype=bool)
+        if not include.any():
             continue
         
         # Averages all the gaze coordinates which has the same snapped time per stimulus 
-        combined_df = pd.concat(all_data)
-        avg_df = combined_df.groupby('SnappedTime')[gaze_columns].mean()
+        bin_times, avg_values = masked_mean(tensor, include)
+        avg_df = pd.DataFrame(avg_values, index=pd.Index(bin_times, name='SnappedTime'), columns=gaze_columns)
 
         rename_average_gaze_columns(avg_df)
         force_columns_to_numeric(avg_df)
                 
         output_file = os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv")
         avg_df.to_csv(output_file)
+        average_path_cache.invalidate(stimulus, average_paths_folder)
     
     print("Average path calculations complete. Results saved.") 
 
@@ -90,10 +105,24 @@ def force_columns_to_numeric(avg_df):
     avg_df['Avg Left X'] = pd.to_numeric(avg_df['Avg Left X'], errors='coerce')
     avg_df['Avg Left Y'] = pd.to_numeric(avg_df['Avg Left Y'], errors='coerce')
 
-def calculate_gaze_deviation():
+def calculate_gaze_deviation(participant_dataset=participant_dataset, average_paths_folder=average_paths_folder,
+                             bin_width=None, workers=1, stimulus_catalog_file=stimulus_catalog_file):
     """
     Calculates how far each participant's gaze is from the average path for each stimulus.
     It calculates for the right eye, left eye and overall.
+    The average paths come from the shared average_path_cache, so every file is parsed
+    once for all participants. The rows are grouped by their stimulus' catalog ID, and
+    the rows of a stimulus are matched to its path with a single binary search.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      average_paths_folder (str): Folder with the average path files.
+      bin_width (float or None): By default only the rows with a 'SnappedTime' are compared.
+                                 If set, every row is compared with the average path at
+                                 its time bin; use the same 'bin_width' as for
+                                 create_average_paths_files().
+      workers (int): Number of processes handling participant files in parallel.
+      stimulus_catalog_file (str): The stimulus catalog, if it exists.
 
     Notes:
       - If 'AvgPath' file for a given stimulus doesn't exist, 
@@ -104,108 +133,118 @@ def calculate_gaze_deviation():
     participant_files = [os.path.join(participant_dataset, f) for f in os.listdir(participant_dataset) 
                         if f.startswith("Participant_") and f.endswith(".csv")]
     
-    for participant_file in participant_files:
-        try:
-            # Load participant data with mixed type handling
-            participant_df = pd.read_csv(participant_file, low_memory=False)
-            
-            # Ensure numeric columns are properly converted
-            for col in ["Point of Regard Right X [px]", "Point of Regard Right Y [px]", 
-                       "Point of Regard Left X [px]", "Point of Regard Left Y [px]"]:
-                participant_df[col] = pd.to_numeric(participant_df[col], errors='coerce')
-            
-            # Initialize new columns for deviations
-            participant_df["Gaze Deviation Right"] = 0.0
-            participant_df["Gaze Deviation Left"] = 0.0
-            participant_df["Overall Gaze Deviation"] = 0.0
-            
-            # Process each stimulus separately
-            for stimulus in participant_df["Stimulus"].unique():
-                if pd.isna(stimulus):
-                    print(f"Warning: Found NaN stimulus value. Skipping.")
-                    continue
-                
-                # Load average path data for this stimulus
-                avg_path_file = os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv")
-                
-                if not os.path.exists(avg_path_file):
-                    print(f"Warning: Average path file for stimulus '{stimulus}' not found. Skipping.")
-                    continue
-                    
-                avg_df = pd.read_csv(avg_path_file)
-                
-                # Ensure numeric columns in average data
-                for col in ["Avg Right X", "Avg Right Y", "Avg Left X", "Avg Left Y"]:
-                    avg_df[col] = pd.to_numeric(avg_df[col], errors='coerce')
-                
-                # Create a dictionary for faster lookup of average values by snapped time
-                avg_lookup = {}
-                for _, row in avg_df.iterrows():
-                    time = row["SnappedTime"]
-                    avg_lookup[time] = {
-                        "right_x": row["Avg Right X"],
-                        "right_y": row["Avg Right Y"],
-                        "left_x": row["Avg Left X"],
-                        "left_y": row["Avg Left Y"]
-                    }
-                
-                # Filter participant data for current stimulus
-                stimulus_mask = participant_df["Stimulus"] == stimulus
-                
-                # Loop through rows for this stimulus and calculate deviations
-                for idx in participant_df[stimulus_mask].index:
-                    row = participant_df.loc[idx]
-                    snapped_time = row["SnappedTime"]
-                    
-                    # Skip if this snapped time doesn't exist in average data
-                    if snapped_time not in avg_lookup:
-                        continue
-                    
-                    # Skip if category is "blink"
-                    if (row.get("Category Left") == "blink" or row.get("Category Right") == "blink"):
-                        continue
-                    
-                    avg_data = avg_lookup[snapped_time]
-                    
-                    # Calculate Euclidean distance for each eye
-                    right_dist = calculate_distance_per_eye(
-                        row,
-                        "Point of Regard Right X [px]", 
-                        "Point of Regard Right Y [px]",
-                        "right_x","right_y",
-                        avg_data
-                    )
-                    left_dist = calculate_distance_per_eye(
-                        row, 
-                        "Point of Regard Left X [px]", 
-                        "Point of Regard Left Y [px]",
-                        "left_x","left_y",
-                        avg_data
-                    )
-
-                    # Assign calculated values to the dataframe
-                    participant_df.at[idx, "Gaze Deviation Right"] = right_dist
-                    participant_df.at[idx, "Gaze Deviation Left"] = left_dist
-                    
-                    # Calculate overall deviation
-                    if right_dist > 0 and left_dist > 0:
-                        overall_dist = (right_dist + left_dist) / 2
-                    elif right_dist > 0:
-                        overall_dist = right_dist
-                    elif left_dist > 0:
-                        overall_dist = left_dist
-                    else:
-                        overall_dist = 0
-                    
-                    participant_df.at[idx, "Overall Gaze Deviation"] = overall_dist
-            
-            # Save the updated dataframe back to the original file
-            participant_df.to_csv(participant_file, index=False)
-            print(f"Completed calculating gaze deviations for: {os.path.basename(participant_file)}")
-        
-        except Exception as e:
-            print(f"Error calculating gaze deviations for: {os.path.basename(participant_file)}: {str(e)}")
-            continue
+    map_in_processes(partial(calculate_participant_gaze_deviation, average_paths_folder=average_paths_folder,
+                             bin_width=bin_width, stimulus_catalog_file=stimulus_catalog_file),
+                     participant_files, workers)
+
+def calculate_participant_gaze_deviation(participant_file, average_paths_folder=average_paths_folder, bin_width=None,
+                                         stimulus_catalog_file=stimulus_catalog_file):
+    """
+    Calculates the gaze deviation columns of one participant file and saves it
+    (see calculate_gaze_deviation()).
+    """
+    try:
+        # Load participant data with mixed type handling
+        participant_df = pd.read_csv(participant_file, low_memory=False)
+
+        # Ensure numeric columns are properly converted
+        for col in ["Point of Regard Right X [px]", "Point of Regard Right Y [px]", 
+                   "Point of Regard Left X [px]", "Point of Regard Left Y [px]"]:
+            participant_df[col] = pd.to_numeric(participant_df[col], errors='coerce')
+
+        right_x = participant_df["Point of Regard Right X [px]"].to_numpy(dtype=float)
+        right_y = participant_df["Point of Regard Right Y [px]"].to_numpy(dtype=float)
+        left_x = participant_df["Point of Regard Left X [px]"].to_numpy(dtype=float)
+        left_y = participant_df["Point of Regard Left Y [px]"].to_numpy(dtype=float)
+        if bin_width is None:
+            snapped_times = pd.to_numeric(participant_df["SnappedTime"], errors='coerce').to_numpy(dtype=float)
+        else:
+            snapped_times = time_bins(pd.to_numeric(participant_df["RecordingTime Stimulus [ms]"], errors='coerce'), bin_width)
+
+        # Rows categorized as "blink" are skipped
+        not_blink = np.ones(len(participant_df), dtype=bool)
+        for col in ["Category Left", "Category Right"]:
+            if col in participant_df.columns:
+                not_blink &= (participant_df[col] != "blink").to_numpy()
+
+        # Initialize new columns for deviations
+        deviation_right = np.zeros(len(participant_df))
+        deviation_left = np.zeros(len(participant_df))
+        overall_deviation = np.zeros(len(participant_df))
+
+        stimulus_ids = load_stimulus_ids(participant_df["Stimulus"], stimulus_catalog_file)
+        stimulus_rows = participant_df.groupby(stimulus_codes(participant_df["Stimulus"], stimulus_ids),
+                                               sort=False).indices
+
+        # Process each stimulus separately
+        for code, rows in stimulus_rows.items():
+            if code < 0:
+                print(f"Warning: Found NaN stimulus value. Skipping.")
+                continue
+
+            stimulus = stimulus_ids[code]
+
+            # Look up the average path values of every row at once
+            lookup = average_path_cache.lookup(stimulus, snapped_times[rows], average_paths_folder)
+            if lookup is None:
+                print(f"Warning: Average path file for stimulus '{stimulus}' not found. Skipping.")
+                continue
+
+            # Skip rows whose snapped time doesn't exist in average data
+            found, avg_values = lookup
+            matched = found & not_blink[rows]
+            rows, avg_values = rows[matched], avg_values[matched]
+
+            # Calculate Euclidean distance for each eye
+            right_dist = calculate_distance_per_eye_vectorized(
+                right_x[rows], right_y[rows], right_y[rows], avg_values[:, 0], avg_values[:, 1]
+            )
+            left_dist = calculate_distance_per_eye_vectorized(
+                left_x[rows], left_y[rows], right_y[rows], avg_values[:, 2], avg_values[:, 3]
+            )
+
+            deviation_right[rows] = right_dist
+            deviation_left[rows] = left_dist
+
+            # Calculate overall deviation
+            overall_deviation[rows] = np.where(
+                (right_dist > 0) & (left_dist > 0), (right_dist + left_dist) / 2,
+                np.where(right_dist > 0, right_dist, np.where(left_dist > 0, left_dist, 0))
+            )
+
+        # Assign calculated values to the dataframe
+        participant_df["Gaze Deviation Right"] = deviation_right
+        participant_df["Gaze Deviation Left"] = deviation_left
+        participant_df["Overall Gaze Deviation"] = overall_deviation
+
+        # Save the updated dataframe back to the original file
+        write_atomically(participant_file, lambda f: participant_df.to_csv(f, index=False))
+        print(f"Completed calculating gaze deviations for: {os.path.basename(participant_file)}")
+
+    except Exception as e:
+        print(f"Error calculating gaze deviations for: {os.path.basename(participant_file)}: {str(e)}")
+
+def calculate_distance_per_eye_vectorized(x, y, right_y, avg_x, avg_y):
+    """
+    Vectorized calculate_distance_per_eye() for all rows of a stimulus.
+    Like calculate_distance_per_eye(), the Y difference always uses the right eye's
+    'Point of Regard Right Y [px]' ('right_y'), while 'x' and 'y' decide whether the
+    eye's coordinates are usable.
+
+    Parameters:
+      x (np.ndarray): The eye's X coordinates.
+      y (np.ndarray): The eye's Y coordinates.
+      right_y (np.ndarray): 'Point of Regard Right Y [px]' of the same rows.
+      avg_x (np.ndarray): The average path's X coordinates at the rows' snapped times.
+      avg_y (np.ndarray): The average path's Y coordinates at the rows' snapped times.
+
+    Returns:
+      np.ndarray: The Euclidean distances, 0 where coordinates are NaN or both are zero.
+    """
+    usable = ~(np.isnan(x) | np.isnan(y)) & ~((x == 0) & (y == 0))
+    with np.errstate(invalid='ignore'):
+        distance = np.sqrt((x - avg_x) ** 2 + (right_y - avg_y) ** 2)
+    return np.where(usable, distance, 0.0)
 
 def calculate_distance_per_eye(row, x_coordinate_column, y_coordinate_column,avg_x,avg_y,avg_data):
     """
@@ -0,0 +1,231 @@
+"""
+Predicts the class (ASD / TD) of the participants from their gaze metrics.
+The metrics of 'experiment_statistics.csv' are pivoted wide into one row per participant
+and one column per metric and stimulus (averaged over experiments), and an L2-regularized
+logistic regression is evaluated with stratified cross-validation. The folds run in
+worker processes, and the out-of-fold predictions give the AUC with a bootstrap
+confidence interval.
+
+The feature matrix is cached in 'classification' until the statistics or the metadata
+file changes, so repeated model runs don't pivot again.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from functools import partial
+from src.load_data import *
+from src.parallel import map_in_processes
+from src.utils import file_stamps
+
+index_columns = ["Participant", "Experiment", "Stimulus"]
+
+# Changes when build_feature_matrix() does, so matrices cached by an older version are rebuilt
+feature_matrix_version = 2
+
+def build_feature_matrix(experiment_statistics_file=experiment_statistics_file,
+                         metadata_participants=metadata_participants):
+    """
+    Pivots the per-stimulus metrics into one row per participant with a known class.
+    0.0 is the placeholder of a metric without data and counts as missing (as in
+    calculate_participant_averages()), and participants without any observed metric are left out.
+
+    Returns:
+      dict:
+        participants (np.ndarray): The ParticipantID of each row.
+        features (np.ndarray): The column names, '<metric> | <stimulus>'.
+        X (np.ndarray): (participants, features) values, NaN where a participant didn't see a stimulus.
+        y (np.ndarray): 1 for ASD, 0 for TD.
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    metadata = pd.read_csv(metadata_participants)
+    metadata = metadata[metadata["Class"].isin(["ASD", "TD"])]
+
+    metrics = [col for col in experiment_stats.columns
+               if col not in index_columns and pd.api.types.is_numeric_dtype(experiment_stats[col])]
+    experiment_stats[metrics] = experiment_stats[metrics].mask(experiment_stats[metrics] == 0)
+    wide = experiment_stats.pivot_table(index="Participant", columns="Stimulus", values=metrics, aggfunc="mean")
+    wide = wide.reindex(metadata["ParticipantID"].to_numpy())
+
+    observed = wide.notna().any(axis=1).to_numpy()
+    wide = wide[observed].dropna(axis=1, how="all")
+
+    return {
+        "participants": wide.index.to_numpy(),
+        "features": np.array([f"{metric} | {stimulus}" for metric, stimulus in wide.columns], dtype=str),
+        "X": wide.to_numpy(dtype=float),
+        "y": (metadata["Class"].to_numpy()[observed] == "ASD").astype(int)
+    }
+
+def get_feature_matrix(experiment_statistics_file=experiment_statistics_file,
+                       metadata_participants=metadata_participants,
+                       classification_folder=classification_folder, overwrite=False):
+    """
+    Returns the feature matrix (see build_feature_matrix()), from the cache if both input
+    files are unchanged, otherwise it's built and cached.
+    """
+    cache_file = os.path.join(classification_folder, "feature_matrix.npz")
+    manifest_file = os.path.join(classification_folder, "feature_matrix.json")
+    stamp = {"version": feature_matrix_version, "files": file_stamps(experiment_statistics_file, metadata_participants)}
+
+    if not overwrite and os.path.exists(cache_file) and os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            if json.load(f) == stamp:
+                with np.load(cache_file) as cached:
+                    return {key: cached[key] for key in cached.files}
+
+    matrix = build_feature_matrix(experiment_statistics_file, metadata_participants)
+    os.makedirs(classification_folder, exist_ok=True)
+    np.savez_compressed(cache_file, **matrix)
+    with open(manifest_file, "w") as f:
+        json.dump(stamp, f)
+
+    return matrix
+
+def fit_logistic_regression(X, y, l2=1.0, max_iter=1000, tol=1e-8):
+    """
+    Fits an L2-regularized logistic regression by minimizing the penalized negative
+    log-likelihood with L-BFGS (analytic gradient). The intercept is not penalized.
+    With many more features than participants this is much faster than Newton's method,
+    whose Hessian grows with the square of the number of features.
+
+    Parameters:
+      X (np.ndarray): (samples, features), without missing values.
+      y (np.ndarray): 0/1 labels.
+      l2 (float): Strength of the penalty 0.5 * l2 * |w|^2.
+
+    Returns:
+      np.ndarray: The coefficients, intercept first.
+    """
+    from scipy.optimize import minimize
+
+    design = np.c_[np.ones(len(X)), X]
+    penalty = np.full(design.shape[1], float(l2))
+    penalty[0] = 0.0
+
+    def loss_and_gradient(coefficients):
+        margin = design @ coefficients
+        # log(1 + exp(m)) - y * m, written to avoid overflow
+        loss = np.logaddexp(0, margin).sum() - y @ margin + 0.5 * penalty @ coefficients ** 2
+        probability = 1 / (1 + np.exp(-margin))
+        return loss, design.T @ (probability - y) + penalty * coefficients
+
+    result = minimize(loss_and_gradient, np.zeros(design.shape[1]), jac=True, method="L-BFGS-B",
+                      options={"maxiter": max_iter, "gtol": tol})
+    return result.x
+
+def predict_probability(coefficients, X):
+    """
+    Returns the predicted probability of class 1 for every row of 'X'.
+    """
+    return 1 / (1 + np.exp(-(coefficients[0] + X @ coefficients[1:])))
+
+def standardize(train, test):
+    """
+    Scales both sets with the mean and standard deviation of the training set and fills
+    missing values with the training mean (0 after scaling), so nothing leaks from the test set.
+    """
+    valid = ~np.isnan(train)
+    count = np.maximum(valid.sum(axis=0), 1)
+    mean = np.where(valid, train, 0.0).sum(axis=0) / count
+    std = np.sqrt((np.where(valid, train - mean, 0.0) ** 2).sum(axis=0) / count)
+    std = np.where(std > 0, std, 1.0)
+    return np.nan_to_num((train - mean) / std), np.nan_to_num((test - mean) / std)
+
+def stratified_folds(y, n_folds=5, seed=0):
+    """
+    Splits the samples into folds with the same class balance.
+
+    Returns:
+      list: The test indices of each fold.
+    """
+    rng = np.random.default_rng(seed)
+    folds = [[] for _ in range(n_folds)]
+    for label in np.unique(y):
+        members = rng.permutation(np.flatnonzero(y == label))
+        for position, index in enumerate(members):
+            folds[position % n_folds].append(index)
+    return [np.sort(np.array(fold, dtype=int)) for fold in folds if fold]
+
+def run_fold(test_index, X, y, l2=1.0):
+    """
+    Trains on every sample outside 'test_index' and returns the probabilities of the test samples.
+    """
+    train = np.ones(len(y), dtype=bool)
+    train[test_index] = False
+    X_train, X_test = standardize(X[train], X[test_index])
+    return predict_probability(fit_logistic_regression(X_train, y[train], l2), X_test)
+
+def roc_auc(y, scores):
+    """
+    Returns the area under the ROC curve (the Mann-Whitney statistic), NaN if only one class is present.
+    Each row of a 2-D 'scores' / 'y' pair is evaluated separately.
+    """
+    y = np.atleast_2d(y)
+    ranks = pd.DataFrame(np.atleast_2d(scores)).rank(axis=1).to_numpy()
+    positives = y.sum(axis=1)
+    negatives = y.shape[1] - positives
+    with np.errstate(invalid="ignore", divide="ignore"):
+        auc = ((ranks * y).sum(axis=1) - positives * (positives + 1) / 2) / (positives * negatives)
+    auc = np.where((positives > 0) & (negatives > 0), auc, np.nan)
+    return auc if np.ndim(scores) > 1 else auc[0]
+
+def bootstrap_auc_interval(y, scores, n_bootstrap=2000, confidence=0.95, seed=0):
+    """
+    Returns the percentile bootstrap confidence interval of the AUC, resampling participants.
+    """
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, len(y), size=(n_bootstrap, len(y)))
+    aucs = roc_auc(y[samples], scores[samples])
+    alpha = (1 - confidence) / 2
+    return tuple(np.nanquantile(aucs, [alpha, 1 - alpha]))
+
+def cross_validate(X, y, n_folds=5, l2=1.0, seed=0, workers=1):
+    """
+    Returns the out-of-fold probability of every sample, with the folds run in 'workers' processes.
+    """
+    folds = stratified_folds(y, n_folds, seed)
+    fold_probabilities = map_in_processes(partial(run_fold, X=X, y=y, l2=l2), folds, workers)
+
+    probabilities = np.empty(len(y))
+    for test_index, fold_probability in zip(folds, fold_probabilities):
+        probabilities[test_index] = fold_probability
+    return probabilities
+
+def run_classification(experiment_statistics_file=experiment_statistics_file,
+                       metadata_participants=metadata_participants, classification_folder=classification_folder,
+                       n_folds=5, l2=1.0, n_bootstrap=2000, seed=0, workers=1):
+    """
+    Cross-validates the classifier and saves the out-of-fold predictions
+    as 'predictions.csv' in 'classification_folder'.
+
+    Parameters:
+      n_folds (int): Number of stratified folds.
+      l2 (float): Regularization strength.
+      n_bootstrap (int): Bootstrap samples of the AUC confidence interval.
+      seed (int): Seed of the folds and the bootstrap.
+      workers (int): Number of processes running folds in parallel.
+
+    Returns:
+      dict: AUC, its 95% confidence interval and the size of the data.
+    """
+    matrix = get_feature_matrix(experiment_statistics_file, metadata_participants, classification_folder)
+    X, y = matrix["X"], matrix["y"]
+
+    probabilities = cross_validate(X, y, n_folds, l2, seed, workers)
+    ci_low, ci_high = bootstrap_auc_interval(y, probabilities, n_bootstrap, seed=seed)
+
+    pd.DataFrame({"ParticipantID": matrix["participants"], "Class": np.where(y == 1, "ASD", "TD"),
+                  "ASD_Probability": probabilities}).to_csv(os.path.join(classification_folder, "predictions.csv"),
+                                                            index=False)
+
+    return {
+        "AUC": roc_auc(y, probabilities),
+        "AUC_CI_low": ci_low,
+        "AUC_CI_high": ci_high,
+        "participants": len(y),
+        "features": X.shape[1],
+        "folds": n_folds,
+        "l2": l2
+    }
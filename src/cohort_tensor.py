@@ -0,0 +1,253 @@
+"""
+Cohort-level tensors: all recordings of a stimulus side by side.
+For every stimulus, the gaze of every recording (participant and experiment from
+'experiment_statistics.csv') is aligned on the stimulus' time bins in one padded, masked
+array of shape (recordings, bins, 4) with the right X/Y and left X/Y coordinates.
+The participant files are read once for all stimuli, and the tensors are cached in
+'cohort_tensors' until a participant file or the statistics file changes.
+
+By default the bins are the SnappedTime values of the cleaned files; with a 'bin_width'
+the recordings are resampled first (see src/resampling.py).
+"""
+
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.resampling import resample_gaze, gaze_columns, interpolation_max_gap
+from src.stimulus_catalog import load_stimulus_ids, stimulus_codes
+from src.utils import file_stamps
+
+def collect_recordings(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                       bin_width=None, resampling_method="mean", stimulus_catalog_file=stimulus_catalog_file):
+    """
+    Reads every participant file once and extracts the aligned samples of each recording.
+    'Blink' samples are left out, as in the average paths.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      experiment_statistics_file (str): Lists the recordings (Participant, Experiment, Stimulus).
+      bin_width (float or None): Resample onto bins of this width [ms] instead of using SnappedTime.
+      resampling_method (str): 'mean' or 'interpolate', used with 'bin_width'.
+      stimulus_catalog_file (str): The stimulus catalog, if it exists; the samples are
+                                   matched to the recordings on its IDs.
+
+    Returns:
+      dict: stimulus -> list of (participant, experiment, bin times, (n, 4) values).
+            Recordings without samples are included with empty arrays, recordings whose
+            participant file doesn't exist or isn't cleaned are not.
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    stimulus_ids = load_stimulus_ids(experiment_stats["Stimulus"], stimulus_catalog_file)
+    recordings = {}
+
+    for participant, sessions in experiment_stats.groupby("Participant", sort=False):
+        file_path = os.path.join(participant_dataset, f"Participant_{participant}.csv")
+        participant_recordings = read_participant_recordings(file_path, participant, sessions, bin_width,
+                                                             resampling_method, stimulus_ids)
+        for stimulus, recording in participant_recordings or []:
+            recordings.setdefault(stimulus, []).append(recording)
+
+    return recordings
+
+def read_participant_recordings(file_path, participant, sessions, bin_width=None, resampling_method="mean",
+                                stimulus_ids=None):
+    """
+    Extracts the aligned samples of the given sessions from one participant file
+    (see collect_recordings()).
+
+    Parameters:
+      file_path (str): The participant file.
+      participant: The ParticipantID.
+      sessions (pd.DataFrame): The 'Experiment' and 'Stimulus' of the recordings to extract.
+      stimulus_ids (pd.Index or None): From load_stimulus_ids(); by default that of the sessions.
+
+    Returns:
+      list or None: (stimulus, (participant, experiment, bin times, (n, 4) values)) per session,
+                    None if the file doesn't exist or isn't cleaned.
+    """
+    if not os.path.exists(file_path):
+        return None
+
+    df = pd.read_csv(file_path, low_memory=False)
+    if ("SnappedTime" if bin_width is None else "RecordingTime Stimulus [ms]") not in df.columns:
+        print(f"Warning: Participant_{participant}.csv is not cleaned. Skipping.")
+        return None
+
+    if stimulus_ids is None:
+        stimulus_ids = load_stimulus_ids(sessions["Stimulus"])
+    session_codes = stimulus_codes(sessions["Stimulus"], stimulus_ids)
+    df = df[np.isin(stimulus_codes(df["Stimulus"], stimulus_ids), session_codes[session_codes >= 0])]
+    if bin_width is None:
+        df = df[df["SnappedTime"].notna() & (df["Category Left"] != "Blink") & (df["Category Right"] != "Blink")]
+        df = df.assign(SnappedTime=pd.to_numeric(df["SnappedTime"], errors="coerce"))
+        df[gaze_columns] = df[gaze_columns].apply(pd.to_numeric, errors="coerce")
+    else:
+        df = resample_gaze(df, bin_width, resampling_method)
+
+    samples = df.groupby([df["Experiment"], stimulus_codes(df["Stimulus"], stimulus_ids)], sort=False).indices
+    times = df["SnappedTime"].to_numpy(dtype=float)
+    values = df[gaze_columns].to_numpy(dtype=float)
+
+    recordings = []
+    for (experiment, stimulus), code in zip(sessions[["Experiment", "Stimulus"]].itertuples(index=False), session_codes):
+        rows = samples.get((experiment, code), np.array([], dtype=int))
+        recordings.append((stimulus, (participant, experiment, times[rows], values[rows])))
+    return recordings
+
+def assemble_cohort_tensor(recordings, classes):
+    """
+    Aligns the recordings of one stimulus into a padded, masked tensor.
+
+    Parameters:
+      recordings (list): (participant, experiment, bin times, values) from collect_recordings().
+      classes (dict): ParticipantID -> class ('ASD' / 'TD').
+
+    Returns:
+      dict:
+        participants, experiments (np.ndarray): The recording of each tensor row.
+        classes (np.ndarray): The class of each row ('' if unknown).
+        bin_times (np.ndarray): The time of each bin [ms], sorted.
+        values (np.ndarray): (recordings, bins, 4) coordinates, NaN where there is no sample.
+        mask (np.ndarray): (recordings, bins) True where the recording has a sample in the bin.
+    """
+    all_times = [times for _, _, times, _ in recordings]
+    bin_times = np.unique(np.concatenate(all_times)) if all_times else np.array([])
+
+    values = np.full((len(recordings), len(bin_times), len(gaze_columns)), np.nan)
+    mask = np.zeros((len(recordings), len(bin_times)), dtype=bool)
+    for row, (_, _, times, recording_values) in enumerate(recordings):
+        positions = np.searchsorted(bin_times, times)
+        values[row, positions] = recording_values
+        mask[row, positions] = True
+
+    participants = np.array([participant for participant, _, _, _ in recordings])
+    return {
+        "participants": participants,
+        "experiments": np.array([experiment for _, experiment, _, _ in recordings]),
+        "classes": np.array([classes.get(participant, "") for participant in participants], dtype=str),
+        "bin_times": bin_times,
+        "values": values,
+        "mask": mask
+    }
+
+def build_cohort_tensors(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                         metadata_participants=metadata_participants, bin_width=None, resampling_method="mean",
+                         stimulus_catalog_file=stimulus_catalog_file):
+    """
+    Builds the cohort tensor of every stimulus in one pass over the participant files.
+
+    Returns:
+      dict: stimulus -> tensor (see assemble_cohort_tensor()).
+    """
+    metadata = pd.read_csv(metadata_participants)
+    classes = dict(zip(metadata["ParticipantID"], metadata["Class"].fillna("")))
+    recordings = collect_recordings(participant_dataset, experiment_statistics_file, bin_width, resampling_method,
+                                    stimulus_catalog_file)
+
+    return {stimulus: assemble_cohort_tensor(stimulus_recordings, classes)
+            for stimulus, stimulus_recordings in recordings.items()}
+
+def cohort_tensor_file(stimulus, cohort_tensors_folder=cohort_tensors_folder):
+    """
+    Returns the cache file path of a stimulus' tensor.
+    """
+    return os.path.join(cohort_tensors_folder, f"CohortTensor_{stimulus}.npz")
+
+def source_stamp(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                 metadata_participants=metadata_participants):
+    """
+    Identifies the version of the tensors' input files: the name, modification time and size
+    of each, so a replaced, added or removed file is noticed even if it is older than the others.
+    """
+    files = sorted(glob.glob(os.path.join(participant_dataset, "Participant_*.csv")))
+    files += [path for path in [experiment_statistics_file, metadata_participants] if os.path.exists(path)]
+    return [[os.path.basename(path), *stamp] for path, stamp in zip(files, file_stamps(*files))]
+
+def load_cohort_tensor(stimulus, cohort_tensors_folder=cohort_tensors_folder):
+    """
+    Loads a cached tensor, or returns None if it isn't cached.
+    """
+    cache_file = cohort_tensor_file(stimulus, cohort_tensors_folder)
+    if not os.path.exists(cache_file):
+        return None
+
+    with np.load(cache_file) as cached:
+        return {key: cached[key] for key in cached.files}
+
+def get_cohort_tensors(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                       metadata_participants=metadata_participants, cohort_tensors_folder=cohort_tensors_folder,
+                       bin_width=None, resampling_method="mean", overwrite=False,
+                       stimulus_catalog_file=stimulus_catalog_file):
+    """
+    Returns the cohort tensors of all stimuli, from the cache if it was built with the same
+    parameters from the same input files, otherwise they are built and cached.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      experiment_statistics_file (str): Lists the recordings.
+      metadata_participants (str): Provides the class of every participant.
+      cohort_tensors_folder (str): Cache folder.
+      bin_width (float or None): Resample onto bins of this width [ms] instead of using SnappedTime.
+      resampling_method (str): 'mean' or 'interpolate', used with 'bin_width'.
+      overwrite (bool): Rebuild even if the cache is up to date.
+      stimulus_catalog_file (str): The stimulus catalog, if it exists (see collect_recordings()).
+
+    Returns:
+      dict: stimulus -> tensor (see assemble_cohort_tensor()).
+    """
+    manifest_file = os.path.join(cohort_tensors_folder, "cohort_tensors.json")
+    manifest = {
+        "bin_width": bin_width,
+        "resampling_method": resampling_method if bin_width is not None else None,
+        "interpolation_max_gap": (interpolation_max_gap if bin_width is not None and resampling_method == "interpolate"
+                                  else None),
+        "source": source_stamp(participant_dataset, experiment_statistics_file, metadata_participants)
+    }
+
+    if not overwrite and os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            cached_manifest = json.load(f)
+        stimuli = cached_manifest.pop("stimuli")
+        if cached_manifest == manifest:
+            tensors = {stimulus: load_cohort_tensor(stimulus, cohort_tensors_folder) for stimulus in stimuli}
+            if all(tensor is not None for tensor in tensors.values()):
+                return tensors
+
+    tensors = build_cohort_tensors(participant_dataset, experiment_statistics_file, metadata_participants,
+                                   bin_width, resampling_method, stimulus_catalog_file)
+
+    os.makedirs(cohort_tensors_folder, exist_ok=True)
+    for stimulus, tensor in tensors.items():
+        np.savez_compressed(cohort_tensor_file(stimulus, cohort_tensors_folder), **tensor)
+    with open(manifest_file, "w") as f:
+        json.dump({**manifest, "stimuli": list(tensors)}, f)
+
+    return tensors
+
+def masked_mean(tensor, include=None):
+    """
+    Averages the recordings of a tensor per bin, ignoring padding and NaN coordinates.
+
+    Parameters:
+      tensor (dict): A cohort tensor.
+      include (np.ndarray, optional): Boolean per recording, False to leave it out.
+
+    Returns:
+      tuple (bin_times, mean):
+        bin_times (np.ndarray): The bins where at least one included recording has a sample.
+        mean (np.ndarray): (bins, 4) mean coordinates, NaN if all were NaN.
+    """
+    mask = tensor["mask"] if include is None else tensor["mask"] & np.asarray(include)[:, None]
+    values = tensor["values"]
+
+    counted = mask[:, :, None] & ~np.isnan(values)
+    sums = np.where(counted, values, 0.0).sum(axis=0)
+    counts = counted.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(counts > 0, sums / counts, np.nan)
+
+    present = mask.any(axis=0)
+    return tensor["bin_times"][present], mean[present]
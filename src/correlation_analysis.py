@@ -0,0 +1,202 @@
+"""
+Correlates the gaze metrics with the participant covariates of 'Metadata_Participants.csv'
+('CARS Score', 'Age' and 'Gender', coded M = 1, F = 0), at two levels:
+  - participant: the participant averages of the metadata file.
+  - stimulus:    every metric per stimulus (the feature matrix of src/classification.py,
+                 one column per metric and stimulus).
+Pearson and Spearman coefficients use the pairwise-complete participants of each pair,
+and the p-values come from permuting the covariate across participants. All features are
+handled at once per covariate: the data is a (participants, features) array with a mask
+of the available values, the coefficients are masked column sums, and the permutations are
+handled in batches: for Pearson as matrix products of the permuted covariates with the
+data, for Spearman through (permutations, participants, features) arrays of ranks.
+"""
+
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.classification import get_feature_matrix
+
+covariate_columns = ["CARS Score", "Age", "Gender"]
+
+correlation_methods = ["pearson", "spearman"]
+
+gender_codes = {"M": 1.0, "F": 0.0}
+
+def encode_covariates(metadata):
+    """
+    Returns the covariates of the metadata as numbers (NaN where missing or unknown).
+    """
+    covariates = pd.DataFrame(index=metadata.index)
+    for col in covariate_columns:
+        if col not in metadata.columns:
+            continue
+        if col == "Gender":
+            covariates[col] = metadata[col].astype(str).str.strip().str.upper().map(gender_codes)
+        else:
+            covariates[col] = pd.to_numeric(metadata[col], errors="coerce")
+    return covariates
+
+def rank_comparisons(values):
+    """
+    Returns C[..., l, i] = [v_l < v_i] + 0.5 [v_l == v_i] for the last axis of 'values', so the
+    average rank of v_i among the values selected by a mask m is (m @ C)[i] + 0.5.
+    """
+    values = np.asarray(values, dtype=float)
+    return (values[..., :, None] < values[..., None, :]) + 0.5 * (values[..., :, None] == values[..., None, :])
+
+def correlate_covariate(X, covariate, method="pearson", n_permutations=1000, seed=0, batch_size=100):
+    """
+    Correlates every column of 'X' with one covariate.
+
+    Parameters:
+      X (np.ndarray): (participants, features), NaN where missing.
+      covariate (np.ndarray): The covariate per participant, NaN where missing.
+      method (str): 'pearson' or 'spearman'.
+      n_permutations (int): Permutations of the covariate for the p-values (0 for none).
+      seed (int): Seed of the permutations.
+      batch_size (int): Permutations handled in one array.
+
+    Returns:
+      tuple (r, n, p_value): Arrays over the features. r is NaN for fewer than 3 participants
+      or constant values. The p-value is two-sided, (1 + #|r_permuted| >= |r|) / (1 + permutations).
+    """
+    if method not in correlation_methods:
+        raise ValueError(f"Unknown correlation method '{method}', expected one of {correlation_methods}")
+
+    # Participants without the covariate don't take part, so the mask is the same for every permutation
+    rows = ~np.isnan(covariate)
+    X, covariate = X[rows], covariate[rows]
+    mask = ~np.isnan(X)
+    weights = mask.astype(float)
+    count = weights.sum(axis=0)
+    if method == "spearman":
+        comparisons = rank_comparisons(covariate)
+        X = pd.DataFrame(X).rank(axis=0).to_numpy()
+        # Features with the same participants (e.g. the metrics of a stimulus) share the covariate ranks
+        patterns, pattern_of = np.unique(mask, axis=1, return_inverse=True)
+        pattern_of = pattern_of.ravel()
+        pattern_weights = patterns.astype(float)
+
+    # Centered over each feature's participants, 0 elsewhere
+    with np.errstate(invalid="ignore", divide="ignore"):
+        X_centered = np.where(mask, X - np.where(mask, X, 0.0).sum(axis=0) / count, 0.0)
+    X_squares = (X_centered ** 2).sum(axis=0)
+
+    def correlation(order):
+        # Sums of the (permuted) covariate over each feature's participants: of the values,
+        # their squares and their products with the centered feature
+        if method == "pearson":
+            values = covariate[order]
+            cross, total, squares = values @ X_centered, values @ weights, values ** 2 @ weights
+        else:
+            permuted = comparisons[order[..., :, None], order[..., None, :]]
+            ranks = (np.swapaxes(permuted, -1, -2) @ pattern_weights + 0.5) * pattern_weights
+            cross = np.empty(order.shape[:-1] + (X.shape[1],))
+            for pattern in range(patterns.shape[1]):
+                columns = pattern_of == pattern
+                cross[..., columns] = ranks[..., pattern] @ X_centered[:, columns]
+            total, squares = ranks.sum(axis=-2)[..., pattern_of], (ranks ** 2).sum(axis=-2)[..., pattern_of]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            spread = squares - total ** 2 / count
+            r = cross / np.sqrt(X_squares * np.where(spread > 1e-12 * squares, spread, np.nan))
+        return np.where(count >= 3, np.clip(r, -1, 1), np.nan)
+
+    r = correlation(np.arange(len(covariate)))
+
+    p_value = np.full(r.shape, np.nan)
+    if n_permutations > 0:
+        rng = np.random.default_rng(seed)
+        exceed = np.zeros(r.shape)
+        for start in range(0, n_permutations, batch_size):
+            orders = np.array([rng.permutation(len(covariate)) for _ in range(min(batch_size, n_permutations - start))])
+            exceed += (np.abs(correlation(orders)) >= np.abs(r) - 1e-12).sum(axis=0)
+        p_value = np.where(np.isnan(r), np.nan, (1 + exceed) / (1 + n_permutations))
+
+    return r, count.astype(int), p_value
+
+def fdr_adjust(p_values):
+    """
+    Benjamini-Hochberg adjusted p-values (q-values), ignoring NaN.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full(p_values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    if len(valid) == 0:
+        return q_values
+    order = valid[np.argsort(p_values[valid])]
+    adjusted = p_values[order] * len(valid) / np.arange(1, len(valid) + 1)
+    q_values[order] = np.minimum(np.minimum.accumulate(adjusted[::-1])[::-1], 1.0)
+    return q_values
+
+def correlation_table(features, X, covariates, level, methods=correlation_methods, n_permutations=1000, seed=0):
+    """
+    Correlates all features with all covariates.
+
+    Parameters:
+      features (list): The name of every column of 'X' ('<metric>' or '<metric> | <stimulus>').
+      X (np.ndarray): (participants, features).
+      covariates (pd.DataFrame): The encoded covariates of the same participants.
+      level (str): 'participant' or 'stimulus', copied to the table.
+
+    Returns:
+      pd.DataFrame: One row per feature, covariate and method with 'r', 'n', 'p_value' and
+                    'q_value' (Benjamini-Hochberg over the rows of the same method and level).
+    """
+    metrics, stimuli = zip(*[(feature.split(" | ") + [None])[:2] for feature in features]) if features else ((), ())
+    tables = []
+    for method in methods:
+        method_tables = []
+        for covariate in covariates.columns:
+            r, n, p_value = correlate_covariate(X, covariates[covariate].to_numpy(dtype=float), method,
+                                                n_permutations, seed)
+            method_tables.append(pd.DataFrame({"Level": level, "Metric": metrics, "Stimulus": stimuli,
+                                               "Covariate": covariate, "Method": method,
+                                               "r": r, "n": n, "p_value": p_value}))
+        method_table = pd.concat(method_tables, ignore_index=True)
+        method_table["q_value"] = fdr_adjust(method_table["p_value"])
+        tables.append(method_table)
+    return pd.concat(tables, ignore_index=True)
+
+def run_correlation_analysis(metadata_participants=metadata_participants,
+                             experiment_statistics_file=experiment_statistics_file,
+                             classification_folder=classification_folder, correlations_file=correlations_file,
+                             levels=("participant", "stimulus"), n_permutations=1000, seed=0):
+    """
+    Correlates the participant-level and per-stimulus metrics with the covariates and
+    saves the table to 'correlations_file'.
+
+    Parameters:
+      metadata_participants (str): Participant averages and covariates.
+      experiment_statistics_file (str): The per-stimulus metrics.
+      classification_folder (str): Cache folder of the per-stimulus feature matrix.
+      correlations_file (str): Output CSV path.
+      levels (tuple): 'participant' and/or 'stimulus'.
+      n_permutations (int): Permutations for the p-values.
+      seed (int): Seed of the permutations.
+
+    Returns:
+      pd.DataFrame: See correlation_table().
+    """
+    metadata = pd.read_csv(metadata_participants)
+    covariates = encode_covariates(metadata).set_index(metadata["ParticipantID"])
+    if covariates.empty:
+        print(f"Warning: None of the covariates {covariate_columns} found in {metadata_participants}.")
+        return pd.DataFrame()
+
+    tables = []
+    if "participant" in levels:
+        metrics = [col for col in metadata.columns if col not in ["ParticipantID"] + covariate_columns
+                   and pd.api.types.is_numeric_dtype(metadata[col])]
+        tables.append(correlation_table(metrics, metadata[metrics].to_numpy(dtype=float),
+                                        covariates.reset_index(drop=True), "participant",
+                                        n_permutations=n_permutations, seed=seed))
+    if "stimulus" in levels:
+        matrix = get_feature_matrix(experiment_statistics_file, metadata_participants, classification_folder)
+        tables.append(correlation_table(list(matrix["features"]), matrix["X"], covariates.loc[matrix["participants"]],
+                                        "stimulus", n_permutations=n_permutations, seed=seed))
+
+    table = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+    table.to_csv(correlations_file, index=False)
+    print(f"Correlations saved to {correlations_file}")
+    return table
@@ -2,10 +2,28 @@ import pandas as pd
 import os
 import numpy as np
 from src.load_data import *
+from src.event_extraction import extract_events, label_runs, load_participant_events
+from src.event_extraction import required_columns as event_columns
+from src.event_classification import with_classified_categories
+from src.stimulus_catalog import load_stimulus_ids, stimulus_codes
 
-def create_experiment_statistics_file():
+# NaN where a combination has no usable saccades; the slope can be negative or 0,
+# so unlike the other metrics 0 is a value, not the placeholder for missing data
+saccade_kinematics_columns = [
+    "Avg_Saccade_Amplitude",
+    "Avg_Saccade_Peak_Velocity",
+    "Avg_Saccade_Mean_Velocity",
+    "Saccade_Main_Sequence_Slope"
+]
+
+def create_experiment_statistics_file(participant_dataset=participant_dataset,
+                                     experiment_statistics_file=experiment_statistics_file):
     """
     Creates 'experiment_statistics.csv', listing unique (Participant, Experiment, Stimulus) combos.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      experiment_statistics_file (str): Output CSV path.
     """
     # Set to store unique combinations
     unique_combinations = set()
@@ -14,7 +32,11 @@ def create_experiment_statistics_file():
     for file in os.listdir(participant_dataset):
         if file.startswith("Participant_") and "unidentified" not in file.lower() and file.endswith(".csv"):
             file_path = os.path.join(participant_dataset, file)
-            df = pd.read_csv(file_path, usecols=["Participant", "Experiment", "Stimulus"])
+            try:
+                df = pd.read_csv(file_path, usecols=["Participant", "Experiment", "Stimulus"])
+            except pd.errors.EmptyDataError:
+                print(f"Warning: {file} is empty. Skipping.")
+                continue
 
         # Ensure column ordering is consistent
         for row in df.itertuples(index=False):
@@ -29,17 +51,20 @@ def create_experiment_statistics_file():
 
     print("Done. Created file:", experiment_statistics_file)
 
-def compute_saccade_frequency(df_filtered):
+def compute_saccade_frequency(df_filtered, label_source="vendor"):
     """
     Compute the fraction of rows classified as 'Saccade' out of the total 
     of rows classified as 'Saccade' or 'Fixation'.
 
     Parameters:
       df_filtered (pd.DataFrame): Data filtered to a single participant-experiment-stimulus.
+      label_source (str): 'vendor' uses the exported categories, 'ivt' or 'idt' the labels
+                          of src/event_classification.py (needs 'RecordingTime [ms]').
 
     Returns:
       float: Ratio of saccade rows to (saccade + fixation) rows, or 0 if none found.
     """
+    df_filtered = with_classified_categories(df_filtered, label_source)
     is_saccade = (df_filtered['Category Left'] == 'Saccade') | (df_filtered['Category Right'] == 'Saccade')
     is_fixation = (df_filtered['Category Left'] == 'Fixation') | (df_filtered['Category Right'] == 'Fixation')
     
@@ -49,92 +74,218 @@ def compute_saccade_frequency(df_filtered):
     
     return num_saccades / total_relevant if total_relevant > 0 else 0
 
-def compute_avg_saccade_duration(df_filtered):
+def compute_avg_saccade_duration(df_filtered, label_source="vendor"):
     """
     Computes the average total duration of each contiguous 'saccade episode'.
 
     Parameters:
       df_filtered (pd.DataFrame): A subset DataFrame for a single participant-experiment-stimulus, 
                                   containing 'Duration' and category columns.
+      label_source (str): 'vendor', 'ivt' or 'idt' (see compute_saccade_frequency()).
 
     Returns:
       float: Mean total saccade duration across all saccade episodes.
              0 if no saccades are found.
     """
-    is_saccade = (
-        (df_filtered['Category Left'] == 'Saccade') | 
-        (df_filtered['Category Right'] == 'Saccade')
-    )
-    
-    df = df_filtered.copy()
-    df['IsSaccade'] = is_saccade.astype(int)
-    
-    # Determine where each new saccade block starts:
-    # A new block starts when IsSaccade == 1 but the previous row is 0 (or doesn't exist).
-    df['SaccadeStart'] = (
-        (df['IsSaccade'] == 1) & 
-        (df['IsSaccade'].shift(fill_value=0) == 0)
-    )
-    
-    # Assign a group ID to each contiguous block of saccade rows
-    # by cumulatively summing saccade starts. Non-saccade rows get NaN.
-    df['SaccadeGroup'] = df['SaccadeStart'].cumsum()
-    df.loc[df['IsSaccade'] == 0, 'SaccadeGroup'] = np.nan
-    
-    # Sum durations within each saccade group
-    saccade_sums = df.groupby('SaccadeGroup', dropna=True)['Duration'].sum()
-    
+    df_filtered = with_classified_categories(df_filtered, label_source)
+
+    # The saccade episodes are the saccade runs of the event tables (see extract_events())
+    labels, _, run_start = label_runs(df_filtered)
+    is_saccade = labels == 'Saccade'
+    duration = pd.to_numeric(df_filtered['Duration'], errors='coerce').fillna(0).to_numpy(dtype=float)
+    saccade_sums = pd.Series(duration[is_saccade]).groupby(np.cumsum(run_start)[is_saccade]).sum()
+
     # Return the mean of these sums, or 0 if no saccade episodes
     return saccade_sums.mean() if not saccade_sums.empty else 0
 
-def analyze_saccades():
+def compute_saccade_kinematics(events):
     """
-    Reads 'experiment_statistics.csv' and computes saccade frequency and duration 
-    for each row's (Participant, Experiment, Stimulus) combination, storing results 
-    in the 'Saccade_Frequency' and 'Avg_Saccade_Duration' columns.
+    Computes the saccade amplitude and velocity metrics of every 
+    (Participant, Experiment, Stimulus) combination from an event table.
+
+    Metrics:
+      - Avg_Saccade_Amplitude: Mean saccade amplitude [px]
+      - Avg_Saccade_Peak_Velocity: Mean saccade peak velocity [px/s]
+      - Avg_Saccade_Mean_Velocity: Mean of amplitude / duration per saccade [px/s]
+      - Saccade_Main_Sequence_Slope: Least-squares slope of peak velocity over amplitude
+        (the 'main sequence'), NaN if there are fewer than two usable saccades
+
+    Parameters:
+      events (pd.DataFrame): Event table from extract_events().
+
+    Returns:
+      pd.DataFrame: One row per combination (indexed by Participant, Experiment, Stimulus).
+    """
+    saccades = events[events["Event"] == "Saccade"].copy()
+    amplitude = saccades["Amplitude [px]"]
+    peak_velocity = saccades["Peak Velocity [px/s]"]
+
+    duration = saccades["Duration [ms]"].where(saccades["Duration [ms]"] > 0)
+    saccades["Mean Velocity"] = amplitude / duration * 1000
+
+    # Sums for the least-squares slope, only over saccades with both values
+    usable = amplitude.notna() & peak_velocity.notna()
+    saccades["n"] = usable.astype(float)
+    saccades["x"] = amplitude.where(usable, 0.0)
+    saccades["y"] = peak_velocity.where(usable, 0.0)
+    saccades["xy"] = saccades["x"] * saccades["y"]
+    saccades["xx"] = saccades["x"] ** 2
+
+    grouped = saccades.groupby(["Participant", "Experiment", "Stimulus"])
+    kinematics = grouped.agg(
+        Avg_Saccade_Amplitude=("Amplitude [px]", "mean"),
+        Avg_Saccade_Peak_Velocity=("Peak Velocity [px/s]", "mean"),
+        Avg_Saccade_Mean_Velocity=("Mean Velocity", "mean")
+    )
+
+    sums = grouped[["n", "x", "y", "xy", "xx"]].sum()
+    denominator = sums["n"] * sums["xx"] - sums["x"] ** 2
+    slope = (sums["n"] * sums["xy"] - sums["x"] * sums["y"]) / denominator.where(denominator > 0)
+    kinematics["Saccade_Main_Sequence_Slope"] = slope.where(sums["n"] >= 2)
+
+    return kinematics
+
+def compute_saccade_metrics(events):
+    """
+    Computes all saccade metrics of every (Participant, Experiment, Stimulus) combination
+    from an event table: 'Saccade_Frequency' and 'Avg_Saccade_Duration' (the values of
+    compute_saccade_frequency() and compute_avg_saccade_duration() on the samples) and
+    the columns of compute_saccade_kinematics().
+
+    Parameters:
+      events (pd.DataFrame): Event table from extract_events() or load_participant_events().
+
+    Returns:
+      pd.DataFrame: One row per combination with events (indexed by Participant, Experiment, Stimulus).
+    """
+    is_saccade = events["Event"] == "Saccade"
+    grouped = events.assign(
+        Saccade_Samples=events["Samples"].where(is_saccade, 0),
+        Saccade_Duration=events["Duration [ms]"].where(is_saccade)
+    ).groupby(["Participant", "Experiment", "Stimulus"])
+
+    saccade_samples = grouped["Saccade_Samples"].sum()
+    relevant = saccade_samples + grouped["Fixation Samples"].sum()
+    metrics = pd.DataFrame({
+        "Saccade_Frequency": (saccade_samples / relevant.where(relevant > 0)).fillna(0),
+        "Avg_Saccade_Duration": grouped["Saccade_Duration"].mean().fillna(0)
+    })
+
+    return metrics.join(compute_saccade_kinematics(events))
+
+def analyze_saccades(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                     label_source="vendor", stimulus_catalog_file=stimulus_catalog_file, events_dataset=events_dataset):
+    """
+    Reads 'experiment_statistics.csv' and computes saccade frequency, duration, 
+    amplitude and velocity for each row's (Participant, Experiment, Stimulus) combination, 
+    storing results in the 'Saccade_Frequency', 'Avg_Saccade_Duration' columns and
+    the columns of compute_saccade_kinematics().
+
+    All metrics come from the participant's event table (see compute_saccade_metrics()):
+    the one stored in 'events_dataset' by create_event_files() if it is up to date,
+    otherwise the participant file is read and its events are extracted.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      experiment_statistics_file (str): The statistics file to update.
+      label_source (str): 'vendor' uses the exported categories, 'ivt' or 'idt' classify
+                          every file once with src/event_classification.py.
+      stimulus_catalog_file (str): The stimulus catalog, if it exists; the events are
+                                   matched with the rows on its stimulus IDs.
+      events_dataset (str): Folder with the stored event tables (only used with 'vendor' labels).
     """
     # Load the experiment statistics file
-    experiment_stats = pd.read_csv(experiment_statistics_file)
+    try:
+        experiment_stats = pd.read_csv(experiment_statistics_file)
+    except pd.errors.EmptyDataError:
+        print(f"Warning: {experiment_statistics_file} is empty. Skipping saccade analysis.")
+        return
     
     # Initialize new columns to store results
     experiment_stats['Saccade_Frequency'] = 0.0
     experiment_stats['Avg_Saccade_Duration'] = 0.0
+    for col in saccade_kinematics_columns:
+        experiment_stats[col] = np.nan
     
-    # Iterate over each row in experiment statistics
-    for index, row in experiment_stats.iterrows():
-        participant = row['Participant']
-        experiment = row['Experiment']
-        stimulus = row['Stimulus']
-        
-        # Construct the file path for the participant data
-        file_path = os.path.join(participant_dataset, f"Participant_{participant}.csv")
-        
-        # Skip if the participant file does not exist
-        if not os.path.exists(file_path):
-            continue  
-        
-        # Load the participant's data file
-        df = pd.read_csv(file_path)
-        
-        # Filter data for the specific experiment and stimulus
-        df_filtered = df[(df['Experiment'] == experiment) & (df['Stimulus'] == stimulus)]
-        
-        # Skip if no relevant data is found
-        if df_filtered.empty:
-            continue
-        
-        # Compute saccade frequency and average saccade duration
-        saccade_freq = compute_saccade_frequency(df_filtered)
-        avg_saccade_duration = compute_avg_saccade_duration(df_filtered)
-        
-        # Store the computed values in the experiment statistics DataFrame
-        experiment_stats.at[index, 'Saccade_Frequency'] = saccade_freq
-        experiment_stats.at[index, 'Avg_Saccade_Duration'] = avg_saccade_duration
+    # Go over the rows of one participant at a time
+    for participant, participant_rows in experiment_stats.groupby('Participant'):
+        participant_results = analyze_participant_saccades(participant, participant_rows, participant_dataset,
+                                                           label_source, stimulus_catalog_file, events_dataset)
+        if participant_results is not None:
+            experiment_stats.loc[participant_results.index] = participant_results
     
     # Save the updated experiment statistics back to CSV
     experiment_stats.to_csv(experiment_statistics_file, index=False)
     print("Saccade analysis complete. Results saved.")
 
+def analyze_participant_saccades(participant, participant_rows, participant_dataset=participant_dataset,
+                                 label_source="vendor", stimulus_catalog_file=stimulus_catalog_file,
+                                 events_dataset=events_dataset):
+    """
+    Computes the saccade metrics of analyze_saccades() for the statistics rows of one participant.
+    Without an up-to-date event table, only the stimuli of 'participant_rows' are read from the file.
+
+    Parameters:
+      participant: The ParticipantID.
+      participant_rows (pd.DataFrame): The participant's rows of the statistics file,
+                                       with the metric columns already present.
+      participant_dataset (str): Folder with the cleaned participant files.
+      label_source (str): 'vendor', 'ivt' or 'idt' (see analyze_saccades()).
+      stimulus_catalog_file (str): The stimulus catalog, if it exists.
+      events_dataset (str): Folder with the stored event tables.
+
+    Returns:
+      pd.DataFrame or None: A copy of 'participant_rows' with the metrics filled in,
+                            None if the participant file doesn't exist or isn't cleaned.
+    """
+    # Construct the file path for the participant data
+    file_path = os.path.join(participant_dataset, f"Participant_{participant}.csv")
+    
+    # Skip if the participant file does not exist
+    if not os.path.exists(file_path):
+        return None
+
+    stimulus_ids = load_stimulus_ids(participant_rows['Stimulus'], stimulus_catalog_file)
+    row_codes = stimulus_codes(participant_rows['Stimulus'], stimulus_ids)
+
+    # The stored event table holds the exported labels and must be newer than the file
+    events = None
+    if label_source == "vendor":
+        events = load_participant_events(participant, events_dataset, file_path)
+
+    if events is None:
+        df = pd.read_csv(file_path)
+        if "Duration" not in df.columns:
+            print(f"Warning: Participant_{participant}.csv is not cleaned. Skipping.")
+            return None
+        missing_cols = [col for col in event_columns if col not in df.columns]
+        if missing_cols:
+            print(f"Warning: Missing columns {missing_cols} for Participant {participant}. Skipping.")
+            return None
+        df = df[np.isin(stimulus_codes(df['Stimulus'], stimulus_ids), row_codes[row_codes >= 0])]
+        events = extract_events(with_classified_categories(df, label_source))
+
+    # Match the rows and the metrics on the stimulus IDs
+    metrics = compute_saccade_metrics(events).reset_index()
+    metric_codes = stimulus_codes(metrics['Stimulus'], stimulus_ids)
+    positions = {(experiment, code): position for position, (experiment, code)
+                 in enumerate(zip(metrics['Experiment'], metric_codes)) if code >= 0}
+    metric_columns = ['Saccade_Frequency', 'Avg_Saccade_Duration'] + saccade_kinematics_columns
+
+    results = participant_rows.copy()
+    for (index, row), code in zip(participant_rows.iterrows(), row_codes):
+        # Skip rows without events
+        position = positions.get((row['Experiment'], code))
+        if position is None:
+            continue
+
+        for col in metric_columns:
+            value = metrics.at[position, col]
+            if pd.notna(value):
+                results.at[index, col] = value
+
+    return results
+
 def calculate_gaze_path_average(idx,filtered_data,experiment_stats):
     """
     Calculate the overall average gaze deviation for each row in experiment_stats,
@@ -193,14 +344,25 @@ def calculate_seccade_path_average(idx,filtered_data,experiment_stats):
     if not saccade_deviations.empty:
         experiment_stats.at[idx, "Avg_Saccade_Deviation"] = saccade_deviations.mean()
 
-def calculate_experiment_deviation():
+def calculate_experiment_deviation(participant_dataset=participant_dataset,
+                                   experiment_statistics_file=experiment_statistics_file,
+                                   stimulus_catalog_file=stimulus_catalog_file):
     """
     Reads 'experiment_statistics.csv', updates each row's 
     'Avg_Gaze_Deviation', 'Avg_Fixation_Deviation', and 'Avg_Saccade_Deviation' 
     by examining participant data in 'clean_dataset'.
+    The rows of every participant file are grouped once by experiment and stimulus ID
+    (see src/stimulus_catalog.py), so each statistics row is a dictionary lookup.
+
+    Parameters:
+      participant_dataset (str): Folder with the participant files (after calculate_gaze_deviation).
+      experiment_statistics_file (str): The statistics file to update.
+      stimulus_catalog_file (str): The stimulus catalog, if it exists.
     """
     # Load experiment statistics file
     experiment_stats = pd.read_csv(experiment_statistics_file)
+    stimulus_ids = load_stimulus_ids(experiment_stats["Stimulus"], stimulus_catalog_file)
+    experiment_stats_codes = stimulus_codes(experiment_stats["Stimulus"], stimulus_ids)
     
     # Initialize new columns for averages
     experiment_stats["Avg_Gaze_Deviation"] = 0.0
@@ -218,13 +380,18 @@ def calculate_experiment_deviation():
     for participant_file in participant_files:
         try:
             participant_df = pd.read_csv(participant_file, low_memory=False)
+            if "Overall Gaze Deviation" not in participant_df.columns:
+                print(f"Warning: {os.path.basename(participant_file)} has no gaze deviations. Skipping.")
+                continue
             participant_num = int(os.path.basename(participant_file).split("_")[1].split(".")[0])
-            all_data[participant_num] = participant_df
+            codes = stimulus_codes(participant_df["Stimulus"], stimulus_ids)
+            all_data[participant_num] = (participant_df,
+                                         participant_df.groupby([participant_df["Experiment"], codes]).indices)
         except Exception as e:
             print(f"Error loading {os.path.basename(participant_file)}: {str(e)}")
     
     # Process each row in experiment statistics
-    for idx, row in experiment_stats.iterrows():
+    for (idx, row), code in zip(experiment_stats.iterrows(), experiment_stats_codes):
         participant = row["Participant"]
         experiment = row["Experiment"]
         stimulus = row["Stimulus"]
@@ -233,16 +400,9 @@ def calculate_experiment_deviation():
             print(f"Warning: Gaze coordinate data for Participant {participant} not found. Skipping.")
             continue
         
-        # Get participant data
-        participant_df = all_data[participant]
-        
-        # Filter for current experiment and stimulus
-        mask = (
-            (participant_df["Experiment"] == experiment) & 
-            (participant_df["Stimulus"] == stimulus)
-        )
-        
-        filtered_data = participant_df[mask]
+        # Get participant data and its rows of the current experiment and stimulus
+        participant_df, rows = all_data[participant]
+        filtered_data = participant_df.iloc[rows.get((experiment, code), []) if code >= 0 else []]
         
         if filtered_data.empty:
             print(f"No data found for Participant {participant}, Experiment {experiment}, Stimulus '{stimulus}'")
@@ -257,10 +417,17 @@ def calculate_experiment_deviation():
     experiment_stats.to_csv(experiment_statistics_file, index=False)
     print(f"Averages calculated and saved to {experiment_statistics_file}")
 
-def calculate_participant_averages():
+def calculate_participant_averages(experiment_statistics_file=experiment_statistics_file,
+                                   metadata_participants=metadata_participants):
     """
     Aggregates columns from experiment_stats into participant-level averages 
     and writes them to 'Metadata_Participants.csv'.
+    Zeros are left out of the averages (they mark missing values), except for the
+    saccade kinematics, where missing values are NaN and every other value counts.
+
+    Parameters:
+      experiment_statistics_file (str): The experiment statistics.
+      metadata_participants (str): The metadata file to update.
     """
     # Load data
     experiment_stats = pd.read_csv(experiment_statistics_file)
@@ -273,11 +440,11 @@ def calculate_participant_averages():
         "Avg_Saccade_Deviation",
         "Saccade_Frequency",
         "Avg_Saccade_Duration"
-    ]
+    ] + saccade_kinematics_columns
     
     # Create output columns in metadata
     for col in columns_to_average:
-        metadata[col] = 0.0
+        metadata[col] = np.nan if col in saccade_kinematics_columns else 0.0
     
     # Process each participant
     for participant_id in metadata["ParticipantID"].unique():
@@ -295,8 +462,11 @@ def calculate_participant_averages():
                 print(f"Column {col} not found in experiment stats. Skipping.")
                 continue
                 
-            # Calculate average (excluding zeros)
-            non_zero_values = participant_data[participant_data[col] > 0][col]
+            # Calculate average (excluding zeros, or missing kinematics)
+            if col in saccade_kinematics_columns:
+                non_zero_values = participant_data[participant_data[col].notna()][col]
+            else:
+                non_zero_values = participant_data[participant_data[col] > 0][col]
             
             if not non_zero_values.empty:
                 avg_value = non_zero_values.mean()
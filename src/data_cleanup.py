@@ -1,6 +1,12 @@
 import pandas as pd
 import glob
+from functools import partial
 from src.load_data import *
+from src.data_quality import compute_quality_profile, write_quality_report
+from src.signal_filters import condition_gaze_signals
+from src.event_extraction import eye_columns
+from src.parallel import map_in_processes
+from src.utils import write_atomically
 
 def check_for_missing_columns(df,file_name):
     """
@@ -119,13 +125,14 @@ def calculate_duration(df):
 
     return df
 
-def calculate_snapped_time(df):
+def calculate_snapped_time(df, snap_interval=20):
     """
     Creates a 'SnappedTime' column, rounding each row's 
-    'RecordingTime Stimulus [ms]' to the closest multiple of 20 ms.
+    'RecordingTime Stimulus [ms]' to the closest multiple of 'snap_interval' (20 ms by default).
 
     Parameters:
       df (pd.DataFrame): The DataFrame with 'RecordingTime Stimulus [ms]'.
+      snap_interval (int): The interval to snap to [ms].
 
     Returns:
       pd.DataFrame: Same DataFrame, now containing 'SnappedTime'.
@@ -140,7 +147,7 @@ def calculate_snapped_time(df):
         
         # Find closest interval for each time
         for idx, t in enumerate(times):
-            interval = round(t / 20) * 20
+            interval = round(t / snap_interval) * snap_interval
             distance = abs(t - interval)
             
             if interval not in intervals or distance < intervals[interval][1]:
@@ -152,7 +159,8 @@ def calculate_snapped_time(df):
 
     return df
 
-def clean_and_extract_eyetracking_data(df, file_name):
+def clean_and_extract_eyetracking_data(df, file_name, max_gap=None, smoothing=None, smoothing_window=5,
+                                       snap_interval=20):
     """ 
     Cleans and and extracts relevent data from the raw eye-tracking dataset.
 
@@ -166,26 +174,72 @@ def clean_and_extract_eyetracking_data(df, file_name):
         to the closest 20 increment integer (i.e. 20, 40, 80, etc.). This allows comparing between 
         different participants and stimulus.  
     
+    Optionally, the gaze coordinates are conditioned before snapping (see src/signal_filters.py):
+    gaps up to 'max_gap' ms are interpolated and the signal is smoothed.
+    
     Parameters:
       df (pd.DataFrame): The raw DataFrame for a single participant's data.
       file_name (str): The CSV filename (used for warnings).
+      max_gap (float or None): Longest tracking gap to interpolate [ms], None to disable.
+      smoothing (str or None): 'savgol', 'median' or None to disable.
+      smoothing_window (int): Odd number of samples in the smoothing window.
+      snap_interval (int): SnappedTime interval [ms].
 
     Returns:
       pd.DataFrame: The fully cleaned DataFrame (or None if missing columns).
     """
 
+    if check_for_missing_columns(df, file_name) is None:
+        return None
+
     clean_data(df, file_name)
     normalize_recording_time(df)
     normalize_recording_time_per_stimulus(df)
     calculate_duration(df)
-    calculate_snapped_time(df)
+    condition_gaze_signals(df, max_gap, smoothing, smoothing_window)
+    calculate_snapped_time(df, snap_interval)
     
     return df
 
-def clean_all_participant_files():
+def clean_participant_file(file, max_gap=None, smoothing=None, smoothing_window=5, snap_interval=20):
+    """
+    Cleans one participant file in place and profiles its data quality. The file is
+    replaced in one step, so a concurrent reader or writer never sees a partial file.
+
+    Returns:
+      pd.DataFrame or None: The quality profile (see compute_quality_profile()).
+    """
+    try:
+        df = pd.read_csv(file)
+    except pd.errors.EmptyDataError:
+        print(f"Warning: {file} is empty. Skipping.")
+        return None
+
+    recorded_gaze = df[[col for eye in eye_columns for col in eye if col in df.columns]].copy()
+    df_cleaned = clean_and_extract_eyetracking_data(df, file, max_gap, smoothing, smoothing_window, snap_interval)
+
+    if df_cleaned is None:
+        return None
+
+    write_atomically(file, lambda f: df_cleaned.to_csv(f, index=False))
+    return compute_quality_profile(df_cleaned.assign(**recorded_gaze))
+
+def clean_all_participant_files(participant_dataset=participant_dataset, data_quality_file=data_quality_file,
+                                max_gap=None, smoothing=None, smoothing_window=5, snap_interval=20, workers=1):
     """
     Iterates over every CSV in 'participant_dataset' and applies 
     clean_and_extract_eyetracking_data() to each.
+    In the same pass, the data quality of every participant-experiment-stimulus
+    is profiled (see src/data_quality.py) and saved to 'data_quality_file'.
+    The profile uses the recorded coordinates, before any gap interpolation or smoothing.
+
+    Parameters:
+      participant_dataset (str): Folder with the participant files.
+      data_quality_file (str): Output path of the data quality report.
+      max_gap, smoothing, smoothing_window: Signal filters passed to
+        clean_and_extract_eyetracking_data() (disabled by default).
+      snap_interval (int): SnappedTime interval [ms].
+      workers (int): Number of processes cleaning files in parallel.
 
     Notes:
       - If any file is missing required columns, a warning is printed, 
@@ -195,11 +249,9 @@ def clean_all_participant_files():
     files = glob.glob(f"{participant_dataset}/*.csv")
 
     # Process each participant file
-    for file in files:
-        df = pd.read_csv(file)
-        df_cleaned = clean_and_extract_eyetracking_data(df, file)
-
-        if df_cleaned is not None:
-            df_cleaned.to_csv(file, index=False)
+    clean_file = partial(clean_participant_file, max_gap=max_gap, smoothing=smoothing,
+                         smoothing_window=smoothing_window, snap_interval=snap_interval)
+    quality_profiles = [profile for profile in map_in_processes(clean_file, files, workers) if profile is not None]
 
+    write_quality_report(quality_profiles, data_quality_file)
     print("Data cleaning and extraction complete!")
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Data-quality profiling of the cleaned participant files.
+For every (Participant, Experiment, Stimulus) it reports how much of the recording is
+actually usable: the tracking ratio, blink rate, off-screen samples, sampling-rate jitter
+and usable duration. The profile is computed by clean_all_participant_files() in the same
+pass as the cleanup and saved to 'data_quality_report.csv'. Sessions that fail the
+configured thresholds can be left out of the average paths.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.event_extraction import label_samples, calculate_gaze_point
+from src.gaze_heatmaps import screen_size
+
+group_columns = ["Participant", "Experiment", "Stimulus"]
+
+quality_columns = [
+    "Samples",
+    "Tracking_Ratio",
+    "Blink_Rate [1/min]",
+    "Off_Screen_Ratio",
+    "Sampling_Rate [Hz]",
+    "Sampling_Jitter [ms]",
+    "Total_Duration [ms]",
+    "Usable_Duration [ms]"
+]
+
+# Thresholds that exclude a session from the average paths (None disables a threshold)
+quality_thresholds = {
+    "min_tracking_ratio": None,
+    "max_blink_rate": None,
+    "max_off_screen_ratio": None,
+    "max_sampling_jitter": None,
+    "min_usable_duration": None
+}
+
+threshold_columns = {
+    "min_tracking_ratio": "Tracking_Ratio",
+    "max_blink_rate": "Blink_Rate [1/min]",
+    "max_off_screen_ratio": "Off_Screen_Ratio",
+    "max_sampling_jitter": "Sampling_Jitter [ms]",
+    "min_usable_duration": "Usable_Duration [ms]"
+}
+
+def compute_quality_profile(df, screen_size=screen_size):
+    """
+    Computes the quality metrics of every (Participant, Experiment, Stimulus) in a cleaned
+    participant file. 'Separator' rows are not samples and are ignored.
+
+    Metrics:
+      - Samples: Number of samples
+      - Tracking_Ratio: Share of samples where at least one eye has valid coordinates
+        (not NaN and not both zero)
+      - Blink_Rate [1/min]: Blink episodes per minute of recording
+      - Off_Screen_Ratio: Share of the tracked samples whose gaze point is outside the screen
+      - Sampling_Rate [Hz]: 1000 / median time between consecutive samples
+      - Sampling_Jitter [ms]: Standard deviation of the time between consecutive samples
+      - Total_Duration [ms]: Sum of 'Duration' (negative durations, where the recording
+        time restarted, count as 0)
+      - Usable_Duration [ms]: Sum of 'Duration' of the tracked, on-screen samples
+
+    Parameters:
+      df (pd.DataFrame): A cleaned participant file.
+      screen_size (tuple): Screen width and height in pixels.
+
+    Returns:
+      pd.DataFrame: One row per combination with the group columns and quality_columns.
+    """
+    df = df[~((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator"))]
+    if df.empty:
+        return pd.DataFrame(columns=group_columns + quality_columns)
+
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    gaze_x, gaze_y = calculate_gaze_point(df)
+    tracked = ~np.isnan(gaze_x)
+    with np.errstate(invalid="ignore"):
+        on_screen = tracked & (gaze_x >= 0) & (gaze_x <= screen_size[0]) & (gaze_y >= 0) & (gaze_y <= screen_size[1])
+
+    # Rows continue their combination only if the previous row belongs to it
+    continues = np.r_[False, keys[1:] == keys[:-1]]
+    blink = label_samples(df) == "Blink"
+    blink_start = blink & ~(continues & np.r_[False, blink[:-1]])
+
+    # Time going backwards (a recording that restarted) is not a sampling interval
+    times = pd.to_numeric(df["RecordingTime [ms]"], errors="coerce").to_numpy(dtype=float)
+    intervals = np.diff(times, prepend=np.nan)
+    intervals = np.where(continues & (intervals >= 0), intervals, np.nan)
+    duration = pd.to_numeric(df["Duration"], errors="coerce").fillna(0).clip(lower=0).to_numpy(dtype=float)
+
+    samples = pd.DataFrame({
+        "Key": keys,
+        "Tracked": tracked,
+        "Off_Screen": tracked & ~on_screen,
+        "Blink_Start": blink_start,
+        "Interval": intervals,
+        "Duration": duration,
+        "Usable_Duration": np.where(on_screen, duration, 0.0)
+    })
+    grouped = samples.groupby("Key")
+
+    total_duration = grouped["Duration"].sum()
+    tracked_count = grouped["Tracked"].sum()
+    profile = pd.DataFrame({
+        "Samples": grouped.size(),
+        "Tracking_Ratio": tracked_count / grouped.size(),
+        "Blink_Rate [1/min]": (grouped["Blink_Start"].sum() / (total_duration / 60000)).where(total_duration > 0),
+        "Off_Screen_Ratio": (grouped["Off_Screen"].sum() / tracked_count).where(tracked_count > 0),
+        "Sampling_Rate [Hz]": 1000 / grouped["Interval"].median(),
+        "Sampling_Jitter [ms]": grouped["Interval"].std(),
+        "Total_Duration [ms]": total_duration,
+        "Usable_Duration [ms]": grouped["Usable_Duration"].sum()
+    })
+
+    combinations = df[group_columns].assign(Key=keys).drop_duplicates("Key").set_index("Key")
+    profile = combinations.join(profile).reset_index(drop=True)
+
+    return profile[group_columns + quality_columns]
+
+def failing_sessions(profile, thresholds=quality_thresholds):
+    """
+    Checks the quality profile against the thresholds.
+    A missing metric (e.g. the jitter of a single sample) never fails a threshold.
+
+    Parameters:
+      profile (pd.DataFrame): Output of compute_quality_profile() or the saved report.
+      thresholds (dict): Threshold values keyed like quality_thresholds, None to disable.
+
+    Returns:
+      pd.Series: True for the rows that fail at least one threshold.
+    """
+    fails = pd.Series(False, index=profile.index)
+    for name, value in thresholds.items():
+        if value is None:
+            continue
+        column = profile[threshold_columns[name]]
+        fails |= (column < value) if name.startswith("min_") else (column > value)
+
+    return fails
+
+def write_quality_report(profiles, data_quality_file=data_quality_file):
+    """
+    Saves the quality profiles of all participant files to one CSV.
+
+    Parameters:
+      profiles (list): DataFrames returned by compute_quality_profile().
+      data_quality_file (str): Output CSV path.
+    """
+    profiles = [profile for profile in profiles if not profile.empty]
+    report = pd.concat(profiles, ignore_index=True) if profiles else pd.DataFrame(columns=group_columns + quality_columns)
+    report.sort_values(group_columns).to_csv(data_quality_file, index=False)
+    print(f"Data quality report saved to {data_quality_file}")
+
+def load_excluded_sessions(thresholds=quality_thresholds, data_quality_file=data_quality_file):
+    """
+    Returns the sessions that fail the thresholds according to the saved quality report.
+
+    Parameters:
+      thresholds (dict): Threshold values keyed like quality_thresholds, None to disable.
+      data_quality_file (str): Path of the quality report.
+
+    Returns:
+      set: (Participant, Experiment, Stimulus) tuples to exclude. Empty if no threshold
+           is set or if the report doesn't exist (a warning is printed).
+    """
+    if all(value is None for value in thresholds.values()):
+        return set()
+
+    if not os.path.exists(data_quality_file):
+        print(f"Warning: Data quality report '{data_quality_file}' not found. No sessions excluded.")
+        return set()
+
+    report = pd.read_csv(data_quality_file)
+    excluded = report[failing_sessions(report, thresholds)]
+
+    return set(excluded[group_columns].itertuples(index=False, name=None))
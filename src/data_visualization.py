@@ -1,10 +1,17 @@
+"""
+Loads the participant metrics, compares the ASD and TD groups and plots the results.
+matplotlib, seaborn and scipy are imported inside the functions that use them, so
+the metrics can be loaded and compared (e.g. 'python MAIN_analyze_data.py stats')
+without the start-up cost of the plotting libraries.
+"""
+
+import os
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from scipy.stats import ttest_ind
-import seaborn as sns 
 from src.load_data import *
+from src.gaze_heatmaps import heatmap_difference, screen_size
 
-def load_and_split_data_by_class():
+def load_and_split_data_by_class(metadata_participants=metadata_participants):
     """
     Loads participant data from 'Metadata_Participants.csv' 
     and separates rows by 'Class' ("ASD" vs. "TD").
@@ -22,7 +29,7 @@ def load_and_split_data_by_class():
 
 def compare_all_metrics(df_asd, df_td):
     """
-    Performs Welch's t-tests on five metrics, returning p-values and means.
+    Performs Welch's t-tests on the gaze and saccade metrics, returning p-values and means.
     
     Metrics tested:
       - Avg_Gaze_Deviation
@@ -30,6 +37,12 @@ def compare_all_metrics(df_asd, df_td):
       - Avg_Saccade_Deviation
       - Saccade_Frequency
       - Avg_Saccade_Duration
+      - Avg_Saccade_Amplitude
+      - Avg_Saccade_Peak_Velocity
+      - Avg_Saccade_Mean_Velocity
+      - Saccade_Main_Sequence_Slope
+
+    Metrics that are missing from the data (e.g. older metadata files) are skipped.
 
     Parameters:
       df_asd (pd.DataFrame): Rows from metadata where Class == "ASD"
@@ -48,11 +61,20 @@ def compare_all_metrics(df_asd, df_td):
         "Avg_Fixation_Deviation",
         "Avg_Saccade_Deviation",
         "Saccade_Frequency",
-        "Avg_Saccade_Duration"
+        "Avg_Saccade_Duration",
+        "Avg_Saccade_Amplitude",
+        "Avg_Saccade_Peak_Velocity",
+        "Avg_Saccade_Mean_Velocity",
+        "Saccade_Main_Sequence_Slope"
     ]
 
+    from scipy.stats import ttest_ind
+
     results = {}
     for metric in metrics:
+        if metric not in df_asd.columns or metric not in df_td.columns:
+            continue
+
         asd_vals = df_asd[metric].dropna()
         td_vals = df_td[metric].dropna()
 
@@ -101,6 +123,8 @@ def plot_individual_boxplots(df_asd, df_td, results):
       df_td (pd.DataFrame): TD subset.
       results (dict): Output from 'compare_all_metrics'.
     """
+    import matplotlib.pyplot as plt
+
     for metric, stats in results.items():
         asd_vals = df_asd[metric].dropna()
         td_vals = df_td[metric].dropna()
@@ -148,6 +172,8 @@ def plot_significant_subplots(df_asd, df_td, results):
       df_td (pd.DataFrame): TD subset.
       results (dict): The result of compare_all_metrics.
     """
+    import matplotlib.pyplot as plt
+
     # Identify which metrics are significant at p<0.05
     sig_metrics = [m for m, st in results.items() if st["p_value"] < 0.05]
     if not sig_metrics:
@@ -202,6 +228,9 @@ def plot_distribution_kde_by_group(df, metric, title=None):
     metric (str): The name of the numeric column to plot.
     title (str, optional): Custom plot title.
     """
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(10, 6))
     custom_palette = {"ASD": "lightskyblue", "TD": "palegreen"}
     sns.kdeplot(
@@ -218,4 +247,165 @@ def plot_distribution_kde_by_group(df, metric, title=None):
     plt.ylabel("Density")
     plt.grid(True, linestyle=":", alpha=0.7)
     plt.legend(labels=["TD", "ASD"])
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+def plot_heatmap_difference(heatmaps, stimulus, output_file=None):
+    """
+    Plots the ASD - TD gaze heatmap difference of a stimulus. 
+    Red areas were looked at more by ASD participants, blue areas more by TD participants.
+
+    Parameters:
+      heatmaps (dict): Output of accumulate_heatmaps() or load_heatmaps().
+      stimulus (str): The stimulus to plot.
+      output_file (str, optional): If given, the figure is saved there instead of shown.
+    """
+    import matplotlib.pyplot as plt
+
+    difference = heatmap_difference(heatmaps, stimulus)
+    if difference is None:
+        print(f"Warning: No ASD and TD heatmaps found for stimulus '{stimulus}'. Skipping.")
+        return
+
+    index = list(heatmaps["stimuli"]).index(stimulus)
+    asd_count, td_count = heatmaps["participants"][index]
+    limit = np.abs(difference).max() or 1.0
+    # Heatmap files from before the screen size was saved cover the default screen
+    width, height = heatmaps.get("screen_size", screen_size)
+
+    plt.figure(figsize=(8, 6))
+    plt.imshow(
+        difference,
+        cmap="RdBu_r",
+        vmin=-limit,
+        vmax=limit,
+        extent=(0, width, height, 0)
+    )
+    plt.colorbar(label="Dwell time share (ASD - TD)")
+    plt.title(f"{stimulus} (ASD n={asd_count}, TD n={td_count})")
+    plt.xlabel("X [px]")
+    plt.ylabel("Y [px]")
+
+    if output_file:
+        plt.savefig(output_file)
+        plt.close()
+    else:
+        plt.show()
+
+def save_heatmap_difference_plots(heatmaps, output_folder="output/heatmaps"):
+    """
+    Saves the ASD - TD heatmap difference of every stimulus as 
+    'HeatmapDifference_<stimulus>.png' in 'output_folder'.
+
+    Parameters:
+      heatmaps (dict): Output of accumulate_heatmaps() or load_heatmaps().
+      output_folder (str): Folder for the figures.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    for stimulus in heatmaps["stimuli"]:
+        output_file = os.path.join(output_folder, f"HeatmapDifference_{stimulus}.png")
+        plot_heatmap_difference(heatmaps, stimulus, output_file)
+
+def plot_correlation_heatmap(correlations, level="participant", method="spearman", covariate="CARS Score",
+                             output_file=None):
+    """
+    Plots the correlations of src/correlation_analysis.py as a heatmap (red positive, blue negative).
+    At the participant level the rows are the metrics and the columns the covariates, with
+    the significance stars of the permutation p-values; at the stimulus level the rows are
+    the metrics and the columns the stimuli, for one covariate.
+
+    Parameters:
+      correlations (pd.DataFrame): Output of run_correlation_analysis().
+      level (str): 'participant' or 'stimulus'.
+      method (str): 'pearson' or 'spearman'.
+      covariate (str): The covariate shown at the stimulus level.
+      output_file (str, optional): If given, the figure is saved there instead of shown.
+    """
+    import matplotlib.pyplot as plt
+
+    selected = correlations[(correlations["Level"] == level) & (correlations["Method"] == method)]
+    if level == "stimulus":
+        selected = selected[selected["Covariate"] == covariate]
+    if selected.empty:
+        print(f"Warning: No {method} correlations at the {level} level. Skipping.")
+        return
+
+    columns = "Covariate" if level == "participant" else "Stimulus"
+    matrix = selected.pivot_table(index="Metric", columns=columns, values="r", aggfunc="first", dropna=False)
+    p_values = selected.pivot_table(index="Metric", columns=columns, values="p_value", aggfunc="first", dropna=False)
+
+    plt.figure(figsize=(max(6, 0.25 * matrix.shape[1] + 4), max(4, 0.5 * matrix.shape[0] + 2)))
+    plt.imshow(matrix.to_numpy(dtype=float), cmap="RdBu_r", vmin=-1, vmax=1, aspect="auto")
+    plt.colorbar(label=f"{method.capitalize()} r")
+    plt.yticks(range(matrix.shape[0]), matrix.index)
+    plt.xticks(range(matrix.shape[1]), matrix.columns, rotation=90 if level == "stimulus" else 0,
+               fontsize=6 if level == "stimulus" else None)
+
+    if level == "participant":
+        for row in range(matrix.shape[0]):
+            for col in range(matrix.shape[1]):
+                r, p_val = matrix.iat[row, col], p_values.iat[row, col]
+                if pd.notna(r):
+                    label = f"{r:.2f}{get_significance_stars(p_val) if pd.notna(p_val) else ''}"
+                    plt.text(col, row, label, ha="center", va="center", fontsize=9)
+
+    plt.title(f"{method.capitalize()} correlation with {covariate}" if level == "stimulus"
+              else f"{method.capitalize()} correlation of the participant metrics")
+    plt.tight_layout()
+
+    if output_file:
+        plt.savefig(output_file)
+        plt.close()
+    else:
+        plt.show()
+
+def plot_time_resolved_difference(time_courses, stimulus, output_file=None, alpha=0.05):
+    """
+    Plots the mean deviation from the average path of the ASD and TD groups over the time
+    of a stimulus, with the significant clusters (see src/time_resolved_analysis.py) shaded.
+
+    Parameters:
+      time_courses (dict): Second output of run_time_resolved_analysis().
+      stimulus (str): The stimulus to plot.
+      output_file (str, optional): If given, the figure is saved there instead of shown.
+      alpha (float): Clusters with a smaller p-value are shaded; use the 'alpha' of the analysis.
+    """
+    import matplotlib.pyplot as plt
+
+    if stimulus not in time_courses:
+        print(f"Warning: No time course found for stimulus '{stimulus}'. Skipping.")
+        return
+
+    result = time_courses[stimulus]
+    plt.figure(figsize=(10, 4))
+    plt.plot(result["bin_times"], result["ASD_mean"], label=f"ASD (n={result['ASD_participants']})")
+    plt.plot(result["bin_times"], result["TD_mean"], label=f"TD (n={result['TD_participants']})")
+    for cluster in result["clusters"]:
+        if cluster["p_value"] < alpha:
+            plt.axvspan(cluster["start_time"], cluster["end_time"], color="grey", alpha=0.3)
+            label = get_significance_stars(cluster["p_value"]) or f"p={cluster['p_value']:.2g}"
+            plt.text(cluster["start_time"], plt.ylim()[1], label, va="top")
+    plt.title(stimulus)
+    plt.xlabel("SnappedTime [ms]")
+    plt.ylabel("Gaze deviation [px]")
+    plt.legend()
+    plt.tight_layout()
+
+    if output_file:
+        plt.savefig(output_file)
+        plt.close()
+    else:
+        plt.show()
+
+def save_time_resolved_plots(time_courses, output_folder="output/time_resolved", alpha=0.05):
+    """
+    Saves the time course of every stimulus as 'TimeCourse_<stimulus>.png' in 'output_folder'.
+
+    Parameters:
+      time_courses (dict): Second output of run_time_resolved_analysis().
+      output_folder (str): Folder for the figures.
+      alpha (float): Significance level of the shaded clusters (see plot_time_resolved_difference()).
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    for stimulus in time_courses:
+        output_file = os.path.join(output_folder, f"TimeCourse_{stimulus}.png")
+        plot_time_resolved_difference(time_courses, stimulus, output_file, alpha)
@@ -3,14 +3,132 @@ This file is mostly for my own convinence so I can use files that are smaller
 and only contain the relevent data.
 What the code here does is take the original files (which are sorted by experiment number rather than
 participant number), takes only the relevant columns and creates new files which are sorted by participant. 
-"""
 
+The experiment files can be read from a folder of CSVs, compressed CSVs ('1.csv.gz',
+'1.csv.xz', '1.csv.bz2') and/or ZIP archives of CSVs, or directly from one such archive
+(e.g. the Kaggle download), without extracting them: every file is streamed in chunks of
+the relevant columns, so the exports never have to be unpacked and their other columns are
+never held in memory.
+"""
 
+import zipfile
 import pandas as pd
+from contextlib import nullcontext
+from functools import partial
 from pathlib import Path
 from src.load_data import *
+from src.parallel import map_in_processes
+from src.utils import write_atomically
+
+# The columns to extract from each experiment file
+columns_to_keep = [
+    "RecordingTime [ms]", "Participant", "Stimulus", "Category Right", "Category Left",
+    "Point of Regard Right X [px]", "Point of Regard Right Y [px]",
+    "Point of Regard Left X [px]", "Point of Regard Left Y [px]"
+]
 
-def create_participant_files():
+compressed_extensions = (".gz", ".xz", ".bz2")
+
+def experiment_id_of(name):
+    """
+    Returns the experiment number of an experiment file name ('12.csv', '12.csv.gz',
+    'Eye-tracking Output/12.csv'), or None if the name isn't a (compressed) CSV.
+    """
+    name = Path(name).name
+    for extension in compressed_extensions:
+        if name.lower().endswith(extension):
+            name = name[:-len(extension)]
+            break
+    return name[:-len(".csv")] if name.lower().endswith(".csv") else None
+
+def experiment_sort_key(experiment_id):
+    """
+    Sorts experiment numbers numerically, and other names after them.
+    """
+    return (0, int(experiment_id), "") if experiment_id.isdigit() else (1, 0, experiment_id)
+
+def experiment_sources(original_dataset=original_dataset):
+    """
+    Lists the experiment files of a folder or an archive.
+
+    Parameters:
+      original_dataset (str): A folder with (compressed) CSVs and/or ZIP archives, a ZIP
+                              archive, or a single (compressed) CSV.
+
+    Returns:
+      list: (experiment_id, path, member) per experiment file, sorted by experiment number.
+            'member' is the name inside the ZIP archive 'path', or None for a file.
+    """
+    path = Path(original_dataset)
+    if path.is_dir():
+        files = sorted(file for file in path.iterdir() if file.is_file())
+    elif path.is_file():
+        files = [path]
+    else:
+        print(f"Warning: {original_dataset} not found.")
+        return []
+
+    sources = {}
+    for file in files:
+        if file.suffix.lower() == ".zip":
+            try:
+                with zipfile.ZipFile(file) as archive:
+                    members = [(experiment_id_of(member), str(file), member) for member in archive.namelist()
+                               if not member.endswith("/") and not Path(member).name.startswith(".")]
+            except zipfile.BadZipFile:
+                print(f"Warning: {file} is not a valid ZIP archive. Skipping.")
+                continue
+        else:
+            members = [(experiment_id_of(file.name), str(file), None)]
+
+        for experiment_id, source_path, member in members:
+            if experiment_id is None:
+                continue
+            if experiment_id in sources:
+                print(f"Warning: Experiment {experiment_id} found more than once, using "
+                      f"{sources[experiment_id][2] or sources[experiment_id][1]}. Skipping {member or source_path}.")
+                continue
+            sources[experiment_id] = (experiment_id, source_path, member)
+
+    return [sources[experiment_id] for experiment_id in sorted(sources, key=experiment_sort_key)]
+
+def read_experiment_file(source, chunksize=100_000):
+    """
+    Reads the relevant columns of one experiment file in chunks and splits them by participant.
+    The values are kept as text, so they are written out exactly as exported.
+
+    Parameters:
+      source (tuple): (experiment_id, path, member) from experiment_sources().
+      chunksize (int): Rows parsed at a time.
+
+    Returns:
+      dict: participant -> pd.DataFrame with the available columns of 'columns_to_keep'
+            and 'Experiment'; empty if the file can't be read.
+    """
+    experiment_id, path, member = source
+    name = f"{path}:{member}" if member else path
+    participant_chunks = {}
+    try:
+        # Archive members are streamed from the archive, files are decompressed by pandas (from the extension)
+        with zipfile.ZipFile(path) if member else nullcontext() as archive, \
+             archive.open(member) if member else nullcontext(path) as handle, \
+             pd.read_csv(handle, usecols=lambda col: col in columns_to_keep, dtype=str, chunksize=chunksize) as reader:
+            for chunk in reader:
+                # Same column order for every file
+                chunk = chunk[[col for col in columns_to_keep if col in chunk.columns]]
+                chunk.insert(len(chunk.columns), "Experiment", experiment_id)
+                if "Participant" not in chunk.columns:
+                    continue
+                for participant, pdata in chunk.groupby("Participant", sort=False):
+                    participant_chunks.setdefault(participant, []).append(pdata)
+    except (OSError, EOFError, ValueError, zipfile.BadZipFile, pd.errors.ParserError) as error:
+        print(f"Warning: Could not read {name} ({error}). Skipping.")
+        return {}
+
+    return {participant: pd.concat(chunks) for participant, chunks in participant_chunks.items()}
+
+def create_participant_files(original_dataset=original_dataset, participant_dataset=participant_dataset, workers=1,
+                             chunksize=100_000):
     """
     Goes over the experiment files (in CSV format) from 'original_dataset', 
     filters down to the relevant columns, and creates participant-level CSVs in 'participant_dataset'.
@@ -20,42 +138,28 @@ def create_participant_files():
         "RecordingTime [ms]", "Participant", "Stimulus", "Category Right", "Category Left",
         "Point of Regard Right X [px]", "Point of Regard Right Y [px]",
         "Point of Regard Left X [px]", "Point of Regard Left Y [px]"
-    2. The number of the experiment is extracted from the input filename (file.stem).
+    2. The number of the experiment is extracted from the input filename (e.g. '12' from '12.csv.gz').
            This value is added as a column named "Experiment" in each row.
     3. Skips participants with missing columns
     4. Saves the new participant files in a folder called "clean_dataset"
-    """
 
-    # Define the columns to extract from each experiment file
-    columns_to_keep = [
-        "RecordingTime [ms]", "Participant", "Stimulus", "Category Right", "Category Left",
-        "Point of Regard Right X [px]", "Point of Regard Right Y [px]",
-        "Point of Regard Left X [px]", "Point of Regard Left Y [px]"
-    ]
+    The rows of a participant are written in the order of the experiment numbers.
 
-    # Define input and output folders
-    input_folder = Path(original_dataset)
+    Parameters:
+      original_dataset (str): Folder with the experiment files, or an archive of them (see experiment_sources()).
+      participant_dataset (str): Folder where the participant files are written.
+      workers (int): Processes reading experiment files (or archive members) in parallel.
+      chunksize (int): Rows parsed at a time from each experiment file.
+    """
     output_folder = Path(participant_dataset)
     output_folder.mkdir(parents=True, exist_ok=True)
 
     # Dictionary to store participant data across experiments
     participant_data = {}
-
-    # Process each file
-    for file in input_folder.glob("*.csv"):
-        experiment_id = file.stem  # Extract experiment number from filename
-
-        df = pd.read_csv(file)
-
-        # Ensure column names match
-        df = df[[col for col in columns_to_keep if col in df.columns]]
-        df["Experiment"] = experiment_id  # Add experiment identifier
-
-        # Group data by participant
-        for participant, pdata in df.groupby("Participant"):
-            if participant not in participant_data:
-                participant_data[participant] = []
-            participant_data[participant].append(pdata)
+    sources = experiment_sources(original_dataset)
+    for experiment in map_in_processes(partial(read_experiment_file, chunksize=chunksize), sources, workers):
+        for participant, pdata in experiment.items():
+            participant_data.setdefault(participant, []).append(pdata)
 
     # Save data for each participant
     for participant, dataframes in participant_data.items():
@@ -67,6 +171,7 @@ def create_participant_files():
             print(f"Skipping Participant_{participant}.csv: Missing columns {missing_cols}")
             continue  # Skip saving this participant's file
 
-        participant_df.to_csv(output_folder / f"Participant_{participant}.csv", index=False)
+        write_atomically(output_folder / f"Participant_{participant}.csv",
+                         lambda f: participant_df.to_csv(f, index=False))
 
-    print("Participant files created.")
\ No newline at end of file
+    print("Participant files created.")
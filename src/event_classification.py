@@ -0,0 +1,165 @@
+"""
+Labels samples as 'Fixation', 'Saccade' or 'Blink' from the gaze coordinates and
+'RecordingTime [ms]', independent of the 'Category Left/Right' columns exported by the
+tracker (which differ between firmware versions and are missing from some recordings).
+
+Two classic algorithms are available, both working on all samples of a file at once:
+  - 'ivt' (velocity threshold): a sample whose gaze moved faster than the threshold
+    since the previous sample is a saccade, otherwise a fixation.
+  - 'idt' (dispersion threshold): a sample is a fixation if it lies in a window of at
+    least the minimum fixation duration whose dispersion ((max X - min X) + (max Y - min Y))
+    is below the threshold, otherwise a saccade.
+Samples where neither eye has valid coordinates are blinks (tracking loss). Velocities and
+windows never cross a participant-experiment-stimulus boundary.
+
+The thresholds are in screen pixels; at the recording distance of the dataset one degree
+of visual angle is roughly 35 px, so the I-VT default corresponds to about 30 deg/s.
+"""
+
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.event_extraction import group_columns, calculate_gaze_point
+
+label_sources = ["vendor", "ivt", "idt"]
+
+sample_labels = np.array(["Fixation", "Saccade", "Blink", ""], dtype=object)
+
+# Velocity threshold of I-VT [px/s]
+velocity_threshold = 1000
+
+# Dispersion threshold [px] and minimum fixation duration [ms] of I-DT
+dispersion_threshold = 50
+min_fixation_duration = 100
+
+def sample_groups(df):
+    """
+    Returns a run number per sample that changes whenever the participant-experiment-stimulus
+    changes, so consecutive samples of the same group share it.
+    """
+    columns = [column for column in group_columns if column in df.columns]
+    if not columns:
+        return np.zeros(len(df), dtype=int)
+    keys = df.groupby(columns, sort=False, dropna=False).ngroup().to_numpy()
+    return np.cumsum(np.r_[True, keys[1:] != keys[:-1]]) - 1
+
+def separator_rows(df):
+    """
+    Returns True for the rows where both eyes are 'Separator'.
+    """
+    if "Category Right" not in df.columns or "Category Left" not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return ((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator")).to_numpy()
+
+def gaze_velocity(gaze_x, gaze_y, times, groups):
+    """
+    Returns the velocity [px/s] of every sample: the distance to the previous sample of
+    the same group over the time between them. NaN for the first sample of a group,
+    samples next to invalid ones and non-increasing times.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        intervals = np.diff(times)
+        velocity = np.r_[np.nan, np.hypot(np.diff(gaze_x), np.diff(gaze_y)) / intervals * 1000]
+    velocity[np.r_[True, (groups[1:] != groups[:-1]) | ~(intervals > 0)]] = np.nan
+    return velocity
+
+def classify_ivt(gaze_x, gaze_y, times, groups, threshold=velocity_threshold):
+    """
+    I-VT: True for the samples whose velocity exceeds 'threshold' [px/s] (saccades).
+    """
+    with np.errstate(invalid="ignore"):
+        return gaze_velocity(gaze_x, gaze_y, times, groups) > threshold
+
+def rolling_range(values, window):
+    """
+    Returns max - min of every window of 'window' consecutive values (NaN if the window
+    contains NaN), by folding shifted copies of the array instead of reducing each window.
+    """
+    count = len(values) - window + 1
+    high = values[:count].copy()
+    low = values[:count].copy()
+    for offset in range(1, window):
+        np.maximum(high, values[offset:offset + count], out=high)
+        np.minimum(low, values[offset:offset + count], out=low)
+    return high - low
+
+def classify_idt(gaze_x, gaze_y, times, groups, threshold=dispersion_threshold,
+                 min_duration=min_fixation_duration):
+    """
+    I-DT: True for the samples that don't lie in any low-dispersion window (saccades).
+    The window length in samples is 'min_duration' over the median sampling interval.
+    """
+    with np.errstate(invalid="ignore"):
+        intervals = np.diff(times)
+        median_interval = np.nanmedian(intervals[intervals > 0]) if (intervals > 0).any() else np.nan
+    window = max(2, int(np.ceil(min_duration / median_interval))) if median_interval > 0 else 2
+    if len(times) < window:
+        return np.ones(len(times), dtype=bool)
+
+    # Dispersion of every window of 'window' samples; NaN coordinates make it NaN
+    dispersion = rolling_range(gaze_x, window) + rolling_range(gaze_y, window)
+    with np.errstate(invalid="ignore"):
+        fixation_window = (dispersion <= threshold) & (groups[:len(dispersion)] == groups[window - 1:])
+
+    # A sample is covered if a fixation window starts at most 'window' - 1 samples before it
+    starts = np.r_[0, np.cumsum(fixation_window)]
+    index = np.arange(len(times))
+    covered = starts[np.minimum(index + 1, len(dispersion))] - starts[np.maximum(index - window + 1, 0)] > 0
+
+    return ~covered
+
+def classify_samples(df, method="ivt", velocity_threshold=velocity_threshold,
+                     dispersion_threshold=dispersion_threshold, min_duration=min_fixation_duration):
+    """
+    Labels every sample of a participant file with one of the algorithms.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'RecordingTime [ms]' and the 'Point of Regard' columns.
+      method (str): 'ivt' or 'idt'.
+      velocity_threshold (float): I-VT saccade velocity [px/s].
+      dispersion_threshold (float): I-DT fixation dispersion [px].
+      min_duration (float): I-DT minimum fixation duration [ms].
+
+    Returns:
+      np.ndarray: 'Fixation', 'Saccade' or 'Blink' per row ('' for 'Separator' rows).
+
+    Raises:
+      ValueError: For an unknown method.
+    """
+    if method not in ("ivt", "idt"):
+        raise ValueError(f"Unknown classification method '{method}', expected 'ivt' or 'idt'")
+
+    gaze_x, gaze_y = calculate_gaze_point(df)
+    times = pd.to_numeric(df["RecordingTime [ms]"], errors="coerce").to_numpy(dtype=float)
+    groups = sample_groups(df)
+
+    if method == "ivt":
+        saccade = classify_ivt(gaze_x, gaze_y, times, groups, velocity_threshold)
+    else:
+        saccade = classify_idt(gaze_x, gaze_y, times, groups, dispersion_threshold, min_duration)
+
+    codes = np.where(np.isnan(gaze_x), 2, saccade.astype(int))
+    codes[separator_rows(df)] = 3
+    return sample_labels[codes]
+
+def with_classified_categories(df, label_source="vendor"):
+    """
+    Returns the participant data with 'Category Left' and 'Category Right' replaced by the
+    labels of a classifier, so every metric that reads the categories uses them.
+
+    Parameters:
+      df (pd.DataFrame): Participant data.
+      label_source (str): 'vendor' (the exported categories, unchanged), 'ivt' or 'idt'.
+
+    Returns:
+      pd.DataFrame: 'df' itself for 'vendor', otherwise a relabelled copy ('Separator' rows are kept).
+    """
+    if label_source not in label_sources:
+        raise ValueError(f"Unknown label source '{label_source}', expected one of {label_sources}")
+    if label_source == "vendor":
+        return df
+
+    labels = classify_samples(df, label_source)
+    separator = separator_rows(df)
+    categories = np.where(separator, "Separator", labels)
+    return df.assign(**{"Category Left": categories, "Category Right": categories})
@@ -0,0 +1,262 @@
+"""
+Turns the cleaned participant files into compact event tables.
+Every row of an event table is one fixation, saccade or blink episode (a run of
+consecutive samples with the same label inside one participant-experiment-stimulus),
+so metrics that work on episodes don't need to go over every sample again: the saccade
+metrics of analyze_saccades() are computed from the stored tables.
+"""
+
+import os
+import glob
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.utils import write_atomically
+
+group_columns = ["Participant", "Experiment", "Stimulus"]
+
+eye_columns = [
+    ("Point of Regard Right X [px]", "Point of Regard Right Y [px]"),
+    ("Point of Regard Left X [px]", "Point of Regard Left Y [px]")
+]
+
+required_columns = group_columns + [
+    "Category Right", "Category Left", "RecordingTime Stimulus [ms]", "Duration",
+    "Point of Regard Right X [px]", "Point of Regard Right Y [px]",
+    "Point of Regard Left X [px]", "Point of Regard Left Y [px]"
+]
+
+# Columns of an event table; tables without all of them are from an older version
+event_columns = group_columns + [
+    "Event", "Onset [ms]", "Duration [ms]", "Samples", "Fixation Samples", "Centroid X [px]",
+    "Centroid Y [px]", "Amplitude [px]", "Peak Velocity [px/s]"
+]
+
+def label_samples(df):
+    """
+    Gives every sample a single event label based on the categories of both eyes.
+
+    A sample is a 'Saccade' if either eye is in a saccade (the same rule used by
+    compute_avg_saccade_duration), otherwise a 'Fixation' if either eye is fixating,
+    otherwise a 'Blink' if either eye is blinking. Anything else ('Separator', '-')
+    gets an empty label and doesn't belong to any event.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'Category Left' and 'Category Right'.
+
+    Returns:
+      np.ndarray: The label of each row.
+    """
+    left = df["Category Left"].to_numpy()
+    right = df["Category Right"].to_numpy()
+
+    return np.select(
+        [
+            (left == "Saccade") | (right == "Saccade"),
+            (left == "Fixation") | (right == "Fixation"),
+            (left == "Blink") | (right == "Blink")
+        ],
+        ["Saccade", "Fixation", "Blink"],
+        default=""
+    )
+
+def calculate_gaze_point(df):
+    """
+    Calculates one gaze point per sample by averaging the eyes that have valid coordinates.
+    An eye is valid if its coordinates are not NaN and not both zero.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with the 'Point of Regard' columns.
+
+    Returns:
+      tuple (gaze_x, gaze_y): Two float arrays, NaN where neither eye is valid.
+    """
+    sum_x = np.zeros(len(df))
+    sum_y = np.zeros(len(df))
+    valid_eyes = np.zeros(len(df))
+
+    for x_column, y_column in eye_columns:
+        x = pd.to_numeric(df[x_column], errors="coerce").to_numpy(dtype=float)
+        y = pd.to_numeric(df[y_column], errors="coerce").to_numpy(dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y)) & ~((x == 0) & (y == 0))
+
+        sum_x += np.where(valid, x, 0.0)
+        sum_y += np.where(valid, y, 0.0)
+        valid_eyes += valid
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gaze_x = np.where(valid_eyes > 0, sum_x / valid_eyes, np.nan)
+        gaze_y = np.where(valid_eyes > 0, sum_y / valid_eyes, np.nan)
+
+    return gaze_x, gaze_y
+
+def label_runs(df):
+    """
+    Splits the samples into runs: a new run starts whenever the label (see label_samples())
+    or the (Participant, Experiment, Stimulus) combination changes.
+
+    Returns:
+      tuple (labels, new_group, run_start): The label of each sample, and boolean arrays
+                                            marking the first sample of each combination and run.
+    """
+    labels = label_samples(df)
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    new_group = np.r_[True, keys[1:] != keys[:-1]]
+    run_start = new_group | np.r_[True, labels[1:] != labels[:-1]]
+    return labels, new_group, run_start
+
+def extract_events(df):
+    """
+    Builds the event table of a participant's cleaned data with a single run-length pass.
+
+    The runs are those of label_runs(). Each labelled run becomes one row with:
+        "Event" - 'Fixation', 'Saccade' or 'Blink'
+        "Onset [ms]" - 'RecordingTime Stimulus [ms]' of the first sample
+        "Duration [ms]" - Sum of 'Duration' over the run (as in compute_avg_saccade_duration)
+        "Samples" - Number of samples in the run
+        "Fixation Samples" - Number of samples in which either eye is fixating (in a saccade
+        the other eye can still be fixating; compute_saccade_frequency() counts those too)
+        "Centroid X [px]", "Centroid Y [px]" - Mean gaze point of the run
+        "Amplitude [px]" - Distance between the start and end gaze points. A saccade starts
+        at the last sample before it, the other events start at their first valid sample.
+        "Peak Velocity [px/s]" - Highest sample-to-sample gaze velocity in the run
+        (for saccades this includes the step into the first saccade sample)
+
+    Parameters:
+      df (pd.DataFrame): Cleaned participant data (see required_columns).
+
+    Returns:
+      pd.DataFrame: The event table, in recording order.
+    """
+    labels, new_group, run_start = label_runs(df)
+    time = pd.to_numeric(df["RecordingTime Stimulus [ms]"], errors="coerce").to_numpy(dtype=float)
+    duration = pd.to_numeric(df["Duration"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    gaze_x, gaze_y = calculate_gaze_point(df)
+
+    run_id = np.cumsum(run_start) - 1
+
+    # Velocity of the step from the previous sample, only inside the same group
+    with np.errstate(invalid="ignore", divide="ignore"):
+        step = np.hypot(np.diff(gaze_x), np.diff(gaze_y))
+        velocity = np.r_[np.nan, step / np.diff(time) * 1000]
+    velocity[new_group | ~(np.r_[np.nan, np.diff(time)] > 0)] = np.nan
+
+    # Only saccades count the step into their first sample
+    is_saccade = labels == "Saccade"
+    velocity[run_start & ~is_saccade] = np.nan
+
+    # A saccade starts from the gaze point of the sample before it
+    entry_x = np.r_[np.nan, gaze_x[:-1]]
+    entry_y = np.r_[np.nan, gaze_y[:-1]]
+    entry_x[new_group | ~is_saccade] = np.nan
+    entry_y[new_group | ~is_saccade] = np.nan
+
+    samples = pd.DataFrame({
+        "Run": run_id,
+        "Event": labels,
+        "Onset [ms]": time,
+        "Duration [ms]": duration,
+        "Fixating": ((df["Category Left"] == "Fixation") | (df["Category Right"] == "Fixation")).to_numpy(dtype=int),
+        "X": gaze_x,
+        "Y": gaze_y,
+        "Velocity": velocity
+    })
+    for col in group_columns:
+        samples[col] = df[col].to_numpy()
+
+    events = samples.groupby("Run", sort=True).agg(
+        Participant=("Participant", "first"),
+        Experiment=("Experiment", "first"),
+        Stimulus=("Stimulus", "first"),
+        Event=("Event", "first"),
+        Onset=("Onset [ms]", "first"),
+        Duration=("Duration [ms]", "sum"),
+        Samples=("Event", "size"),
+        Fixation_Samples=("Fixating", "sum"),
+        Centroid_X=("X", "mean"),
+        Centroid_Y=("Y", "mean"),
+        First_X=("X", "first"),
+        First_Y=("Y", "first"),
+        Last_X=("X", "last"),
+        Last_Y=("Y", "last"),
+        Peak_Velocity=("Velocity", "max")
+    )
+
+    # Runs are numbered in order, so the run starts line up with the event rows
+    start_x = np.where(np.isnan(entry_x[run_start]), events["First_X"], entry_x[run_start])
+    start_y = np.where(np.isnan(entry_y[run_start]), events["First_Y"], entry_y[run_start])
+    events["Amplitude"] = np.hypot(events["Last_X"] - start_x, events["Last_Y"] - start_y)
+
+    events = events[events["Event"] != ""]
+    events = events.rename(columns={
+        "Onset": "Onset [ms]",
+        "Duration": "Duration [ms]",
+        "Fixation_Samples": "Fixation Samples",
+        "Centroid_X": "Centroid X [px]",
+        "Centroid_Y": "Centroid Y [px]",
+        "Amplitude": "Amplitude [px]",
+        "Peak_Velocity": "Peak Velocity [px/s]"
+    })
+
+    return events[event_columns].reset_index(drop=True)
+
+def create_event_files(participant_dataset=participant_dataset, events_dataset=events_dataset):
+    """
+    Extracts the event table of every participant file in 'participant_dataset' and saves it
+    as 'Events_<participant>.csv' in 'events_dataset'.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      events_dataset (str): Folder where the event tables are written.
+
+    Notes:
+      - The participant files must already be cleaned (they need 'Duration' and
+        'RecordingTime Stimulus [ms]').
+      - Files that are empty or missing columns are skipped with a warning.
+    """
+    os.makedirs(events_dataset, exist_ok=True)
+
+    for file in glob.glob(os.path.join(participant_dataset, "Participant_*.csv")):
+        file_name = os.path.basename(file)
+        try:
+            df = pd.read_csv(file, low_memory=False)
+        except pd.errors.EmptyDataError:
+            print(f"Warning: {file_name} is empty. Skipping.")
+            continue
+
+        missing_cols = [col for col in required_columns if col not in df.columns]
+        if missing_cols:
+            print(f"Warning: Missing columns {missing_cols} in {file_name}. Skipping.")
+            continue
+
+        events = extract_events(df)
+        participant = file_name[len("Participant_"):-len(".csv")]
+        write_atomically(os.path.join(events_dataset, f"Events_{participant}.csv"),
+                         lambda f: events.to_csv(f, index=False))
+
+    print("Event extraction complete. Results saved.")
+
+def load_participant_events(participant, events_dataset=events_dataset, source_file=None):
+    """
+    Loads the event table of a single participant.
+
+    Parameters:
+      participant (int or str): The participant number.
+      events_dataset (str): Folder with the event tables.
+      source_file (str, optional): The participant file the table was extracted from;
+                                   a table older than it is out of date.
+
+    Returns:
+      pd.DataFrame or None: The event table, or None if it wasn't created, is out of date
+                            or lacks columns of the current format.
+    """
+    file_path = os.path.join(events_dataset, f"Events_{participant}.csv")
+    if not os.path.exists(file_path):
+        return None
+    if source_file is not None and os.stat(file_path).st_mtime_ns < os.stat(source_file).st_mtime_ns:
+        return None
+
+    events = pd.read_csv(file_path)
+    if any(col not in events.columns for col in event_columns):
+        return None
+    return events
@@ -0,0 +1,293 @@
+"""
+Animations of the gaze on each stimulus for reviewing: the average path of
+'calculated_average_paths' with its recent trail, and the current gaze point of every
+ASD and TD recording, bin by bin over the stimulus' SnappedTime.
+
+Redrawing a whole matplotlib figure per frame is what makes naive animations slow, so
+the frames are rendered with blitting: the static parts (axes, labels, legend) are drawn
+once, and every frame restores that background and redraws only the moving artists,
+which are created once and updated in place. All positions are computed up front as
+arrays from the cohort tensor (see src/cohort_tensor.py), and the stimuli are rendered
+in parallel worker processes.
+
+The frames are written to MP4 or GIF by a local ffmpeg if one is found, to GIF with
+Pillow otherwise, or as a PNG image sequence.
+"""
+
+import os
+import shutil
+import subprocess
+import numpy as np
+import pandas as pd
+from functools import partial
+from src.load_data import *
+from src.cohort_tensor import get_cohort_tensors
+from src.gaze_heatmaps import screen_size
+from src.parallel import map_in_processes
+
+animation_formats = ["mp4", "gif", "png"]
+
+group_colors = {"ASD": "tab:red", "TD": "tab:blue"}
+
+def gaze_points(values):
+    """
+    Averages the valid eyes of (..., 4) right X/Y and left X/Y coordinates into (..., 2)
+    gaze points, like calculate_gaze_point(). NaN where neither eye is valid.
+    """
+    eyes = np.stack([values[..., :2], values[..., 2:]])
+    valid = ~np.isnan(eyes).any(axis=-1) & ~(eyes == 0).all(axis=-1)
+    counts = valid.sum(axis=0)[..., None]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, np.where(valid[..., None], eyes, 0.0).sum(axis=0) / counts, np.nan)
+
+def load_average_gaze(stimulus, bin_times, average_paths_folder=average_paths_folder):
+    """
+    Returns the average path's gaze point at every bin, NaN where it has none,
+    or None if the stimulus has no average path file.
+    """
+    path = os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv")
+    if not os.path.exists(path):
+        return None
+
+    average = pd.read_csv(path).drop_duplicates("SnappedTime").set_index("SnappedTime")
+    columns = ["Avg Right X", "Avg Right Y", "Avg Left X", "Avg Left Y"]
+    values = average[columns].apply(pd.to_numeric, errors="coerce").reindex(bin_times).to_numpy(dtype=float)
+    return gaze_points(values)
+
+def animation_frames(tensor, average_gaze, frame_step=1):
+    """
+    Precomputes the positions of every frame.
+
+    Parameters:
+      tensor (dict): The cohort tensor of the stimulus.
+      average_gaze (np.ndarray): (bins, 2) gaze point of the average path.
+      frame_step (int): Bins per frame; every 'frame_step'th bin is shown.
+
+    Returns:
+      dict:
+        times (np.ndarray): The bin time of each frame [ms].
+        average (np.ndarray): (frames, 2) gaze point of the average path.
+        groups (dict): 'ASD' / 'TD' -> (frames, recordings, 2) gaze points of the group's recordings.
+    """
+    frames = np.arange(0, len(tensor["bin_times"]), frame_step)
+    points = np.where(tensor["mask"][..., None], gaze_points(tensor["values"]), np.nan)[:, frames]
+    return {
+        "times": tensor["bin_times"][frames],
+        "average": average_gaze[frames],
+        "groups": {group: points[tensor["classes"] == group].transpose(1, 0, 2) for group in group_colors}
+    }
+
+def frame_extent(frames, screen_size=screen_size):
+    """
+    Returns the axes limits (x_min, x_max, y_min, y_max) of an animation: the screen,
+    widened to the gaze points that were recorded beyond it.
+    """
+    points = np.vstack([[0, 0], screen_size, frames["average"].reshape(-1, 2)] +
+                       [group.reshape(-1, 2) for group in frames["groups"].values()])
+    (x_min, y_min), (x_max, y_max) = np.nanmin(points, axis=0), np.nanmax(points, axis=0)
+    return x_min, x_max, y_min, y_max
+
+def render_frames(frames, title, trail=25, figsize=(6.4, 5.12), dpi=100):
+    """
+    Renders the frames with blitting.
+
+    Parameters:
+      frames (dict): From animation_frames().
+      title (str): Title of the animation.
+      trail (int): Number of frames of the average path shown behind its current position.
+      figsize (tuple): Size of the figure [inch]; with 'dpi' it gives the frame size in pixels.
+      dpi (int): Resolution of the frames.
+
+    Yields:
+      np.ndarray: (height, width, 3) uint8 RGB image of every frame.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    x_min, x_max, y_min, y_max = frame_extent(frames)
+    axes.set_xlim(x_min, x_max)
+    axes.set_ylim(y_max, y_min)
+    axes.set_title(title, fontsize=9)
+    axes.set_xlabel("X [px]")
+    axes.set_ylabel("Y [px]")
+
+    # The moving artists, updated in place in every frame
+    average_trail, = axes.plot([], [], color="black", alpha=0.5, animated=True)
+    average_point, = axes.plot([], [], "o", color="black", markersize=8, label="Average path", animated=True)
+    group_points = {group: axes.scatter([], [], s=12, color=color, label=group, animated=True)
+                    for group, color in group_colors.items()}
+    time_label = axes.text(0.02, 0.97, "", transform=axes.transAxes, va="top", animated=True)
+    axes.legend(loc="upper right", fontsize=8)
+    artists = [average_trail, average_point, *group_points.values(), time_label]
+
+    canvas.draw()
+    background = canvas.copy_from_bbox(figure.bbox)
+
+    for frame, time in enumerate(frames["times"]):
+        canvas.restore_region(background)
+        recent = frames["average"][max(0, frame - trail):frame + 1]
+        average_trail.set_data(recent[:, 0], recent[:, 1])
+        average_point.set_data(recent[-1:, 0], recent[-1:, 1])
+        for group, points in frames["groups"].items():
+            group_points[group].set_offsets(points[frame][~np.isnan(points[frame]).any(axis=1)].reshape(-1, 2))
+        time_label.set_text(f"{time:.0f} ms")
+        for artist in artists:
+            axes.draw_artist(artist)
+        canvas.blit(figure.bbox)
+        yield np.asarray(canvas.buffer_rgba())[..., :3].copy()
+
+def gif_palette(frame, colors=64):
+    """
+    Returns a palette of 'colors' colors for a GIF: white, black and the group colors, and
+    the rest from quantizing a frame. Also returns a lookup table of the nearest palette color
+    of every RGB color at 5 bits per channel; mapping all frames through one table is much
+    faster than quantizing every frame.
+    """
+    from PIL import Image
+    from matplotlib.colors import to_rgb
+    fixed = np.array([(1, 1, 1), (0, 0, 0)] + [to_rgb(color) for color in group_colors.values()]) * 255
+    quantized = Image.fromarray(frame).quantize(colors - len(fixed)).getpalette()[:3 * (colors - len(fixed))]
+    palette = np.vstack([fixed, np.reshape(quantized, (-1, 3))])
+    levels = np.linspace(0, 255, 32)
+    grid = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1)
+    lookup = ((grid[..., None, :] - palette) ** 2).sum(axis=-1).argmin(axis=-1).astype(np.uint8)
+    return np.round(palette).astype(np.uint8), lookup
+
+def palette_image(frame, palette, lookup):
+    """
+    Returns an RGB frame as a palette image (see gif_palette()).
+    """
+    from PIL import Image
+    bins = frame >> 3
+    image = Image.fromarray(lookup[bins[..., 0], bins[..., 1], bins[..., 2]])
+    image.putpalette(palette.ravel().tobytes())
+    return image
+
+def write_animation(frames, output_file, fps, output_format="mp4"):
+    """
+    Writes rendered frames: 'mp4' and 'gif' through ffmpeg if it is installed ('gif' with
+    Pillow otherwise), 'png' as an image sequence in the folder 'output_file'.
+
+    Parameters:
+      frames (iterable): RGB frames from render_frames(), consumed one by one.
+      output_file (str): The video file, or the folder of the image sequence.
+      fps (float): Frames per second.
+      output_format (str): 'mp4', 'gif' or 'png'.
+
+    Returns:
+      str: The written file or folder.
+
+    Raises:
+      ValueError: For another format, or 'mp4' without ffmpeg.
+    """
+    if output_format not in animation_formats:
+        raise ValueError(f"Unknown animation format '{output_format}', expected one of {animation_formats}")
+    ffmpeg = shutil.which("ffmpeg")
+    if output_format == "mp4" and ffmpeg is None:
+        raise ValueError("Writing MP4 needs ffmpeg; use the 'gif' or 'png' format instead")
+
+    if output_format == "png":
+        os.makedirs(output_file, exist_ok=True)
+        from PIL import Image
+        for number, frame in enumerate(frames):
+            Image.fromarray(frame).save(os.path.join(output_file, f"frame_{number:05d}.png"), compress_level=1)
+    elif ffmpeg is not None:
+        frames = iter(frames)
+        first = next(frames)
+        height, width, _ = first.shape
+        encoding = ["-pix_fmt", "yuv420p", "-vcodec", "libx264"] if output_format == "mp4" else []
+        process = subprocess.Popen([ffmpeg, "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+                                    "-s", f"{width}x{height}", "-r", str(fps), "-i", "-", *encoding, output_file],
+                                   stdin=subprocess.PIPE)
+        process.stdin.write(first.tobytes())
+        for frame in frames:
+            process.stdin.write(frame.tobytes())
+        process.stdin.close()
+        if process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to write {output_file}")
+    else:
+        from PIL import Image
+        frames = iter(frames)
+        first = next(frames)
+        palette, lookup = gif_palette(first)
+        images = (palette_image(frame, palette, lookup) for frame in frames)
+        palette_image(first, palette, lookup).save(output_file, save_all=True, append_images=images,
+                                                   duration=round(1000 / fps), loop=0, optimize=False)
+
+    return output_file
+
+def render_stimulus_animation(item, average_paths_folder=average_paths_folder,
+                              gaze_animations_folder=gaze_animations_folder, output_format="mp4", frame_step=1,
+                              fps=None, trail=25):
+    """
+    Renders and writes the animation of one stimulus (see create_gaze_animations()).
+
+    Parameters:
+      item (tuple): (stimulus, cohort tensor).
+
+    Returns:
+      str or None: The written file or folder, None if the stimulus has no average path or bins.
+    """
+    stimulus, tensor = item
+    if len(tensor["bin_times"]) == 0:
+        print(f"Warning: Stimulus '{stimulus}' has no samples. Skipping.")
+        return None
+    average_gaze = load_average_gaze(stimulus, tensor["bin_times"], average_paths_folder)
+    if average_gaze is None:
+        print(f"Warning: Average path file for stimulus '{stimulus}' not found. Skipping.")
+        return None
+
+    frames = animation_frames(tensor, average_gaze, frame_step)
+    if fps is None:
+        # Real time: one frame per 'frame_step' bins
+        interval = np.median(np.diff(frames["times"])) if len(frames["times"]) > 1 else 1000
+        fps = 1000 / interval
+    extension = "" if output_format == "png" else f".{output_format}"
+    output_file = os.path.join(gaze_animations_folder, f"GazeAnimation_{stimulus}{extension}")
+    return write_animation(render_frames(frames, stimulus, trail), output_file, fps, output_format)
+
+def create_gaze_animations(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                           metadata_participants=metadata_participants, average_paths_folder=average_paths_folder,
+                           cohort_tensors_folder=cohort_tensors_folder, gaze_animations_folder=gaze_animations_folder,
+                           output_format="mp4", stimuli=None, frame_step=1, fps=None, trail=25, workers=1):
+    """
+    Renders the gaze animation of every stimulus as 'GazeAnimation_<stimulus>.<format>'.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      experiment_statistics_file (str): Lists the recordings of every stimulus.
+      metadata_participants (str): Provides the class of every participant.
+      average_paths_folder (str): Folder with the average path files.
+      cohort_tensors_folder (str): Cache folder of the cohort tensors.
+      gaze_animations_folder (str): Output folder.
+      output_format (str): 'mp4' (needs ffmpeg), 'gif' or 'png' (an image sequence per stimulus).
+      stimuli (list, optional): The stimuli to render; all by default.
+      frame_step (int): Bins per frame.
+      fps (float, optional): Frames per second; real time by default.
+      trail (int): Frames of the average path's trail.
+      workers (int): Processes rendering stimuli in parallel.
+
+    Returns:
+      list: The written files.
+    """
+    if output_format == "mp4" and shutil.which("ffmpeg") is None:
+        print("Warning: ffmpeg not found, writing PNG image sequences instead of MP4.")
+        output_format = "png"
+
+    tensors = get_cohort_tensors(participant_dataset, experiment_statistics_file, metadata_participants,
+                                 cohort_tensors_folder)
+    if stimuli is not None:
+        for stimulus in set(stimuli) - set(tensors):
+            print(f"Warning: Stimulus '{stimulus}' not found. Skipping.")
+        tensors = {stimulus: tensor for stimulus, tensor in tensors.items() if stimulus in stimuli}
+
+    os.makedirs(gaze_animations_folder, exist_ok=True)
+    outputs = map_in_processes(partial(render_stimulus_animation, average_paths_folder=average_paths_folder,
+                                       gaze_animations_folder=gaze_animations_folder, output_format=output_format,
+                                       frame_step=frame_step, fps=fps, trail=trail), tensors.items(), workers)
+    outputs = [output for output in outputs if output is not None]
+    print(f"{len(outputs)} gaze animations saved to {gaze_animations_folder}")
+    return outputs
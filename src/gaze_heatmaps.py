@@ -0,0 +1,235 @@
+"""
+Builds spatial gaze heatmaps per stimulus and group (ASD / TD).
+Every participant file is read once. Its fixation samples are binned into a 2-D histogram
+per stimulus (weighted by how long the gaze stayed there), normalized so every
+participant counts the same, and added to the running sum of the participant's class.
+Fixations outside 'screen_size' are left out of the heatmaps; how many were left out is
+reported, and the screen size is a parameter of the 'heatmaps' stage (see src/pipeline.py).
+"""
+
+import os
+import glob
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.event_extraction import label_samples, calculate_gaze_point
+
+# Default screen resolution of the recordings in pixels (width, height)
+screen_size = (1280, 1024)
+
+# Number of heatmap bins (x, y)
+heatmap_bins = (64, 51)
+
+heatmap_classes = ["ASD", "TD"]
+
+def compute_participant_heatmaps(df, bins=heatmap_bins, screen_size=screen_size):
+    """
+    Bins the fixation samples of one participant into a heatmap per stimulus.
+
+    Each fixation sample is weighted by its 'Duration', so a heatmap holds the dwell time
+    per bin. Samples outside the screen or without valid coordinates are ignored.
+    Each heatmap is normalized to sum to 1.
+
+    Parameters:
+      df (pd.DataFrame): A cleaned participant file.
+      bins (tuple): Number of bins along x and y.
+      screen_size (tuple): Screen width and height in pixels.
+
+    Returns:
+      tuple (stimuli, maps):
+        stimuli (np.ndarray): The stimulus of each heatmap.
+        maps (np.ndarray): Array of shape (len(stimuli), bins[1], bins[0]).
+    """
+    stimulus_codes, stimuli = pd.factorize(df["Stimulus"])
+    gaze_x, gaze_y = calculate_gaze_point(df)
+    weights = pd.to_numeric(df["Duration"], errors="coerce").to_numpy(dtype=float)
+
+    width, height = screen_size
+    with np.errstate(invalid="ignore"):
+        usable = (
+            (label_samples(df) == "Fixation") & (stimulus_codes >= 0) & (weights > 0) &
+            (gaze_x >= 0) & (gaze_x < width) & (gaze_y >= 0) & (gaze_y < height)
+        )
+
+    x_bin = (gaze_x[usable] / width * bins[0]).astype(int)
+    y_bin = (gaze_y[usable] / height * bins[1]).astype(int)
+
+    maps = np.zeros((len(stimuli), bins[1], bins[0]))
+    np.add.at(maps, (stimulus_codes[usable], y_bin, x_bin), weights[usable])
+
+    totals = maps.sum(axis=(1, 2))
+    maps[totals > 0] /= totals[totals > 0, None, None]
+
+    return np.asarray(stimuli), maps
+
+def screen_coverage(df, screen_size=screen_size):
+    """
+    Counts the fixation samples of a participant file that compute_participant_heatmaps()
+    can use and those of them that fall outside the screen.
+
+    Parameters:
+      df (pd.DataFrame): A cleaned participant file.
+      screen_size (tuple): Screen width and height in pixels.
+
+    Returns:
+      tuple (fixations, off_screen, max_x, max_y): The counts and the largest gaze
+                                                   coordinates of the fixations (NaN if none).
+    """
+    gaze_x, gaze_y = calculate_gaze_point(df)
+    weights = pd.to_numeric(df["Duration"], errors="coerce").to_numpy(dtype=float)
+    with np.errstate(invalid="ignore"):
+        fixations = ((label_samples(df) == "Fixation") & df["Stimulus"].notna().to_numpy() & (weights > 0) &
+                     ~np.isnan(gaze_x) & ~np.isnan(gaze_y))
+        on_screen = (gaze_x >= 0) & (gaze_x < screen_size[0]) & (gaze_y >= 0) & (gaze_y < screen_size[1])
+    if not fixations.any():
+        return 0, 0, np.nan, np.nan
+    return int(fixations.sum()), int((fixations & ~on_screen).sum()), gaze_x[fixations].max(), gaze_y[fixations].max()
+
+def accumulate_heatmaps(participant_dataset=participant_dataset, metadata_participants=metadata_participants,
+                        bins=heatmap_bins, screen_size=screen_size):
+    """
+    Goes over every participant file once and averages the participant heatmaps per
+    stimulus and class. The class of each participant is taken from the 'Class' column
+    of 'Metadata_Participants.csv'.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      metadata_participants (str): Path to 'Metadata_Participants.csv'.
+      bins (tuple): Number of bins along x and y.
+      screen_size (tuple): Screen width and height in pixels.
+
+    Returns:
+      dict:
+        "stimuli" (np.ndarray): Sorted stimulus names.
+        "classes" (np.ndarray): The class names (heatmap_classes).
+        "maps" (np.ndarray): Mean heatmaps, shape (stimuli, classes, bins[1], bins[0]).
+        "participants" (np.ndarray): Number of participants per stimulus and class.
+        "screen_size" (np.ndarray): The screen width and height of the maps.
+    """
+    metadata = pd.read_csv(metadata_participants)
+    participant_classes = dict(zip(metadata["ParticipantID"], metadata["Class"]))
+
+    sums = {}
+    counts = {}
+    fixations, off_screen, max_x, max_y = 0, 0, np.nan, np.nan
+
+    for file in glob.glob(os.path.join(participant_dataset, "Participant_*.csv")):
+        try:
+            df = pd.read_csv(file, low_memory=False)
+        except pd.errors.EmptyDataError:
+            continue
+
+        if df.empty or "Duration" not in df.columns:
+            print(f"Warning: {os.path.basename(file)} is not cleaned. Skipping.")
+            continue
+
+        participant = df["Participant"].iloc[0]
+        participant_class = participant_classes.get(participant)
+        if participant_class not in heatmap_classes:
+            print(f"Warning: No class found for Participant {participant}. Skipping.")
+            continue
+        class_index = heatmap_classes.index(participant_class)
+
+        stimuli, maps = compute_participant_heatmaps(df, bins, screen_size)
+        file_fixations, file_off_screen, file_max_x, file_max_y = screen_coverage(df, screen_size)
+        fixations, off_screen = fixations + file_fixations, off_screen + file_off_screen
+        max_x, max_y = np.fmax(max_x, file_max_x), np.fmax(max_y, file_max_y)
+        for stimulus, stimulus_map in zip(stimuli, maps):
+            if stimulus_map.sum() == 0:
+                continue
+            if stimulus not in sums:
+                sums[stimulus] = np.zeros((len(heatmap_classes), bins[1], bins[0]))
+                counts[stimulus] = np.zeros(len(heatmap_classes), dtype=int)
+            sums[stimulus][class_index] += stimulus_map
+            counts[stimulus][class_index] += 1
+
+    if off_screen:
+        print(f"Warning: {off_screen} of {fixations} fixation samples ({off_screen / fixations:.1%}) are outside "
+              f"the {screen_size[0]} x {screen_size[1]} px screen and left out of the heatmaps "
+              f"(the gaze reaches up to {max_x:.0f} x {max_y:.0f} px; see the 'screen_size' parameter).")
+
+    stimuli = sorted(sums)
+    maps = np.zeros((len(stimuli), len(heatmap_classes), bins[1], bins[0]))
+    participants = np.zeros((len(stimuli), len(heatmap_classes)), dtype=int)
+
+    for i, stimulus in enumerate(stimuli):
+        participants[i] = counts[stimulus]
+        has_data = counts[stimulus] > 0
+        maps[i, has_data] = sums[stimulus][has_data] / counts[stimulus][has_data, None, None]
+
+    return {
+        "stimuli": np.array(stimuli, dtype=str),
+        "classes": np.array(heatmap_classes, dtype=str),
+        "maps": maps,
+        "participants": participants,
+        "screen_size": np.array(screen_size)
+    }
+
+def save_heatmaps(heatmaps, heatmaps_file=heatmaps_file):
+    """
+    Saves heatmaps from accumulate_heatmaps() as a compressed .npz file (float32 maps).
+
+    Parameters:
+      heatmaps (dict): Output of accumulate_heatmaps().
+      heatmaps_file (str): Path of the .npz file.
+    """
+    folder = os.path.dirname(heatmaps_file)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+
+    np.savez_compressed(
+        heatmaps_file,
+        stimuli=heatmaps["stimuli"],
+        classes=heatmaps["classes"],
+        maps=heatmaps["maps"].astype(np.float32),
+        participants=heatmaps["participants"],
+        screen_size=heatmaps["screen_size"]
+    )
+
+def load_heatmaps(heatmaps_file=heatmaps_file):
+    """
+    Loads heatmaps saved by save_heatmaps().
+
+    Parameters:
+      heatmaps_file (str): Path of the .npz file.
+
+    Returns:
+      dict: Same keys as accumulate_heatmaps().
+    """
+    with np.load(heatmaps_file) as data:
+        return {key: data[key] for key in data.files}
+
+def heatmap_difference(heatmaps, stimulus):
+    """
+    Returns the ASD - TD difference map of a stimulus.
+
+    Parameters:
+      heatmaps (dict): Output of accumulate_heatmaps() or load_heatmaps().
+      stimulus (str): The stimulus name.
+
+    Returns:
+      np.ndarray or None: The difference map, or None if the stimulus is missing or
+                          no participant of the ASD or the TD class saw it.
+    """
+    matches = np.flatnonzero(heatmaps["stimuli"] == stimulus)
+    classes = list(heatmaps["classes"])
+    if len(matches) == 0 or "ASD" not in classes or "TD" not in classes:
+        return None
+
+    asd, td = classes.index("ASD"), classes.index("TD")
+    if "participants" in heatmaps and not heatmaps["participants"][matches[0]][[asd, td]].all():
+        return None
+
+    stimulus_maps = heatmaps["maps"][matches[0]]
+    return stimulus_maps[asd] - stimulus_maps[td]
+
+def create_heatmap_files(participant_dataset=participant_dataset, metadata_participants=metadata_participants,
+                         heatmaps_file=heatmaps_file, screen_size=screen_size):
+    """
+    Builds the heatmaps of every stimulus in a single pass over the participant files
+    and saves them to 'heatmaps_file'. 'screen_size' is the (width, height) in pixels the
+    heatmaps cover.
+    """
+    heatmaps = accumulate_heatmaps(participant_dataset, metadata_participants, screen_size=tuple(screen_size))
+    save_heatmaps(heatmaps, heatmaps_file)
+    print(f"Heatmaps for {len(heatmaps['stimuli'])} stimuli saved to {heatmaps_file}")
@@ -2,4 +2,16 @@ original_dataset = "dataset_project/Eye-tracking Output"
 participant_dataset = "clean_dataset"
 average_paths_folder = "calculated_average_paths"
 experiment_statistics_file = "experiment_statistics.csv"
-metadata_participants = "Metadata_Participants.csv"
\ No newline at end of file
+metadata_participants = "Metadata_Participants.csv"
+events_dataset = "events_dataset"
+heatmaps_file = "gaze_heatmaps/heatmaps.npz"
+aoi_definitions_file = "aoi_definitions.json"
+scanpath_similarity_folder = "scanpath_similarity"
+data_quality_file = "data_quality_report.csv"
+cohort_tensors_folder = "cohort_tensors"
+classification_folder = "classification"
+shard_queue_folder = "shard_queue"
+correlations_file = "correlations.csv"
+time_resolved_file = "time_resolved_differences.csv"
+gaze_animations_folder = "output/gaze_animations"
+stimulus_catalog_file = "stimulus_catalog.csv"
\ No newline at end of file
@@ -0,0 +1,285 @@
+"""
+A small asyncio HTTP service that serves the processed pipeline results as JSON.
+'experiment_statistics.csv', 'Metadata_Participants.csv' and the average paths are loaded
+once and kept in memory. Every request only checks the files' modification stamps, and a
+file is reloaded (and the results computed from it recalculated) only after it changed.
+The cache keeps the 'cache_size' most recently used entries. Requests are answered in
+worker threads, so a slow file read doesn't hold up the other clients.
+
+Endpoints (GET only):
+    /health
+    /participants                         - All rows of Metadata_Participants.csv
+    /participants/<id>                    - Metadata and experiment statistics of one participant
+    /stimuli                              - Stimulus names with their number of rows
+    /stimuli/<name>                       - Experiment statistics of one stimulus and the ASD/TD means
+    /comparison                           - compare_all_metrics() of ASD vs. TD
+    /average-paths/<stimulus>?start=&end= - Average path rows with start <= SnappedTime <= end
+"""
+
+import os
+import glob
+import json
+import math
+import asyncio
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from urllib.parse import urlsplit, unquote, parse_qs
+from src.load_data import *
+from src.data_visualization import compare_all_metrics
+from src.utils import to_json_compatible
+
+class HTTPError(Exception):
+    """
+    An error that is sent back to the client with the given status code.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# Largest number of cached files and results; the least recently used are dropped first
+cache_size = 256
+
+status_reasons = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+def create_service_state(experiment_statistics_file=experiment_statistics_file,
+                         metadata_participants=metadata_participants,
+                         average_paths_folder=average_paths_folder, cache_size=cache_size):
+    """
+    Creates the state shared by all requests and loads every file once.
+
+    Parameters:
+      experiment_statistics_file (str): Path to 'experiment_statistics.csv'.
+      metadata_participants (str): Path to 'Metadata_Participants.csv'.
+      average_paths_folder (str): Folder with the average path files.
+      cache_size (int): Largest number of cache entries.
+
+    Returns:
+      dict: The file paths, the cache and request/reload counters.
+    """
+    state = {
+        "experiment_statistics_file": experiment_statistics_file,
+        "metadata_participants": metadata_participants,
+        "average_paths_folder": average_paths_folder,
+        "cache": OrderedDict(),
+        "cache_size": cache_size,
+        "cache_lock": threading.Lock(),
+        "reloads": 0
+    }
+
+    cached_csv(state, experiment_statistics_file)
+    cached_csv(state, metadata_participants)
+    for avg_path_file in glob.glob(os.path.join(average_paths_folder, "AveragePath_*.csv")):
+        cached_csv(state, avg_path_file)
+
+    return state
+
+def file_stamp(file_path):
+    """
+    Returns the (modification time, size) of a file, or None if it doesn't exist.
+    """
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def cached_value(state, key, stamp, compute):
+    """
+    Returns the cached value of 'key', recomputing it only if 'stamp' changed.
+    The least recently used entries are dropped beyond the state's 'cache_size'.
+
+    Parameters:
+      state (dict): The service state.
+      key (hashable): Cache key.
+      stamp (hashable): Identifies the version of the inputs (e.g. file stamps).
+      compute (callable): Called without arguments to (re)compute the value.
+    """
+    cache = state["cache"]
+    with state["cache_lock"]:
+        entry = cache.get(key)
+        if entry is not None and entry[0] == stamp:
+            cache.move_to_end(key)
+            return entry[1]
+
+    # Computed outside the lock, so other requests aren't held up by a slow file read
+    value = compute()
+    with state["cache_lock"]:
+        cache[key] = (stamp, value)
+        cache.move_to_end(key)
+        while len(cache) > state["cache_size"]:
+            cache.popitem(last=False)
+        state["reloads"] += 1
+    return value
+
+def cached_csv(state, file_path):
+    """
+    Returns a CSV file as a DataFrame, reloading it only when it changed on disk.
+
+    Raises:
+      HTTPError: 404 if the file doesn't exist.
+    """
+    stamp = file_stamp(file_path)
+    if stamp is None:
+        raise HTTPError(404, f"File '{os.path.basename(file_path)}' not found")
+    return cached_value(state, ("csv", file_path), stamp, lambda: pd.read_csv(file_path))
+
+def get_participants(state):
+    return cached_csv(state, state["metadata_participants"])
+
+def get_participant(state, participant_id):
+    try:
+        participant_id = int(participant_id)
+    except ValueError:
+        raise HTTPError(400, f"Participant id '{participant_id}' is not a number")
+
+    metadata = cached_csv(state, state["metadata_participants"])
+    row = metadata[metadata["ParticipantID"] == participant_id]
+    if row.empty:
+        raise HTTPError(404, f"Participant {participant_id} not found")
+
+    experiment_stats = cached_csv(state, state["experiment_statistics_file"])
+    return {
+        "metadata": row.iloc[0].to_dict(),
+        "statistics": experiment_stats[experiment_stats["Participant"] == participant_id]
+    }
+
+def get_stimuli(state):
+    experiment_stats = cached_csv(state, state["experiment_statistics_file"])
+    return experiment_stats.groupby("Stimulus").size().to_dict()
+
+def get_stimulus(state, stimulus):
+    experiment_stats = cached_csv(state, state["experiment_statistics_file"])
+    rows = experiment_stats[experiment_stats["Stimulus"] == stimulus]
+    if rows.empty:
+        raise HTTPError(404, f"Stimulus '{stimulus}' not found")
+
+    metadata = cached_csv(state, state["metadata_participants"])
+    classes = rows["Participant"].map(dict(zip(metadata["ParticipantID"], metadata["Class"])))
+    metric_columns = [col for col in rows.columns if col not in ["Participant", "Experiment", "Stimulus"]]
+
+    return {
+        "statistics": rows,
+        "group_means": rows[metric_columns].groupby(classes).mean().to_dict("index")
+    }
+
+def get_comparison(state):
+    metadata_file = state["metadata_participants"]
+    metadata = cached_csv(state, metadata_file)
+
+    def compare():
+        return compare_all_metrics(metadata[metadata["Class"] == "ASD"], metadata[metadata["Class"] == "TD"])
+
+    return cached_value(state, ("comparison", metadata_file), file_stamp(metadata_file), compare)
+
+def get_average_path(state, stimulus, query):
+    avg_path = cached_csv(state, os.path.join(state["average_paths_folder"], f"AveragePath_{stimulus}.csv"))
+
+    try:
+        start = float(query["start"][0]) if "start" in query else -math.inf
+        end = float(query["end"][0]) if "end" in query else math.inf
+    except ValueError:
+        raise HTTPError(400, "'start' and 'end' must be numbers")
+
+    return avg_path[(avg_path["SnappedTime"] >= start) & (avg_path["SnappedTime"] <= end)]
+
+def route_request(state, method, target):
+    """
+    Finds the handler of a request and returns its JSON-compatible result.
+
+    Parameters:
+      state (dict): The service state.
+      method (str): The HTTP method.
+      target (str): The request target (path and query string).
+
+    Raises:
+      HTTPError: For unknown paths, bad parameters or methods other than GET.
+    """
+    if method != "GET":
+        raise HTTPError(405, f"Method {method} is not allowed")
+
+    url = urlsplit(target)
+    parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+    query = parse_qs(url.query)
+
+    if parts == ["health"]:
+        result = {"status": "ok"}
+    elif parts == ["participants"]:
+        result = get_participants(state)
+    elif len(parts) == 2 and parts[0] == "participants":
+        result = get_participant(state, parts[1])
+    elif parts == ["stimuli"]:
+        result = get_stimuli(state)
+    elif len(parts) == 2 and parts[0] == "stimuli":
+        result = get_stimulus(state, parts[1])
+    elif parts == ["comparison"]:
+        result = get_comparison(state)
+    elif len(parts) == 2 and parts[0] == "average-paths":
+        result = get_average_path(state, parts[1], query)
+    else:
+        raise HTTPError(404, f"Unknown path '{url.path}'")
+
+    return to_json_compatible(result)
+
+async def handle_connection(state, reader, writer):
+    """
+    Reads one HTTP request, answers it with JSON and closes the connection.
+    The request is routed in the event loop's default executor, as it reads files with pandas.
+    """
+    try:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        # Skip the headers, the service doesn't need them
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        try:
+            method, target, _ = request_line.split(" ", 2)
+            result = await asyncio.get_running_loop().run_in_executor(None, route_request, state, method, target)
+            status, body = 200, result
+        except HTTPError as e:
+            status, body = e.status, {"error": e.message}
+        except ValueError:
+            status, body = 400, {"error": "Malformed request line"}
+        except Exception as e:
+            status, body = 500, {"error": str(e)}
+
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {status_reasons[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def start_metrics_server(state, host="127.0.0.1", port=8080):
+    """
+    Starts the server (use port 0 for a free port).
+
+    Returns:
+      asyncio.Server: The running server.
+    """
+    return await asyncio.start_server(lambda r, w: handle_connection(state, r, w), host, port)
+
+def serve_metrics(host="127.0.0.1", port=8080, **paths):
+    """
+    Loads the result files and serves them until interrupted.
+
+    Parameters:
+      host (str): Interface to listen on.
+      port (int): Port to listen on.
+      paths: Optional file locations passed to create_service_state().
+    """
+    state = create_service_state(**paths)
+
+    async def run():
+        server = await start_metrics_server(state, host, port)
+        print(f"Serving pipeline metrics on http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
@@ -0,0 +1,234 @@
+"""
+Trial-level comparison of the ASD and TD groups with linear mixed-effects models.
+Instead of averaging every participant's trials first (calculate_participant_averages())
+and comparing the means with t-tests, each metric of 'experiment_statistics.csv' is
+modelled per trial as
+
+    metric = intercept + effect * ASD + participant intercept + stimulus intercept + residual
+
+with crossed random intercepts for the participants and the stimuli, so the stimulus
+variance no longer hides in the error and every trial contributes.
+
+The model is fitted by profiled (restricted) maximum likelihood, as in lme4: the fixed
+effects and the residual variance are solved in closed form for given relative standard
+deviations of the random intercepts, and only those two values are optimized. The
+random-effect design is a sparse indicator matrix; its cross-products are formed once per
+metric. Since every trial has one participant, the participant block of the system is
+diagonal and is eliminated directly, so every likelihood evaluation costs a Cholesky
+factorization of the size of the number of stimuli, independent of the number of trials
+and participants.
+"""
+
+import math
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.linalg import cholesky, solve_triangular, cho_solve
+from scipy.optimize import minimize
+from src.load_data import *
+
+index_columns = ["Participant", "Experiment", "Stimulus"]
+
+def indicator_matrix(codes, size):
+    """
+    Returns the sparse (rows, size) matrix with a 1 in column 'codes[row]' of every row.
+    """
+    return sparse.csr_matrix((np.ones(len(codes)), (np.arange(len(codes)), codes)), shape=(len(codes), size))
+
+def cross_products(y, X, Z, first_size):
+    """
+    Returns the cross-products of the response, the fixed-effect design 'X' and the sparse
+    random-effect design 'Z' that the profiled likelihood needs. The block of Z'Z of the
+    first grouping ('first_size' columns) is diagonal, as every trial has one level, so
+    only its diagonal and its (sparse) block with the other groupings are kept.
+    """
+    ZtZ = (Z.T @ Z).tocsr()
+    return {
+        "first_counts": ZtZ.diagonal()[:first_size],
+        "ZtZ_cross": ZtZ[:first_size, first_size:],
+        "ZtZ_cross_t": ZtZ[first_size:, :first_size],
+        "ZtZ_rest": ZtZ[first_size:, first_size:].toarray(),
+        "ZtX": np.asarray(Z.T @ X),
+        "Zty": np.asarray(Z.T @ y).ravel(),
+        "XtX": X.T @ X,
+        "Xty": X.T @ y,
+        "yty": y @ y,
+        "n": len(y)
+    }
+
+def profiled_deviance(theta, products, sizes, reml=True, details=False):
+    """
+    Returns -2 log-likelihood of the model, with the fixed effects and the residual variance profiled out.
+
+    Parameters:
+      theta (np.ndarray): Standard deviation of each random intercept relative to the residual's.
+      products (dict): From cross_products().
+      sizes (list): Number of levels of each random intercept (columns of 'Z').
+      reml (bool): Restricted instead of plain maximum likelihood.
+      details (bool): Also return the fixed effects, their covariance and the residual variance.
+    """
+    n, p = products["n"], len(products["Xty"])
+    scale = np.repeat(theta, sizes)
+    first, rest = scale[:sizes[0]], scale[sizes[0]:]
+
+    # L L' = Lambda Z'Z Lambda + I, with the diagonal first block eliminated:
+    # L = [[sqrt(D), 0], [B' / sqrt(D), L_rest]], L_rest L_rest' = C - B' D^-1 B,
+    # where B is the cross block of Z'Z scaled by Lambda on both sides
+    D = first ** 2 * products["first_counts"] + 1
+    weighted_cross = products["ZtZ_cross"].multiply((first ** 2 / D)[:, None]).toarray()
+    schur = rest[:, None] * (products["ZtZ_rest"] - products["ZtZ_cross_t"] @ weighted_cross) * rest[None, :]
+    L_rest = cholesky(schur + np.eye(len(rest)), lower=True) if len(rest) else np.zeros((0, 0))
+
+    def forward(values):
+        # L^-1 Lambda values, for the columns of Z'X and Z'y
+        values = scale[:, None] * values
+        first_values = values[:sizes[0]] / D[:, None]
+        rest_values = values[sizes[0]:] - rest[:, None] * (products["ZtZ_cross_t"] @ (first[:, None] * first_values))
+        if len(rest):
+            rest_values = solve_triangular(L_rest, rest_values, lower=True)
+        return np.vstack([first_values * np.sqrt(D)[:, None], rest_values])
+
+    cu = forward(products["Zty"][:, None]).ravel()
+    RZX = forward(products["ZtX"])
+    RX = cholesky(products["XtX"] - RZX.T @ RZX)
+
+    rhs = products["Xty"] - RZX.T @ cu
+    beta = cho_solve((RX, False), rhs)
+    penalized_rss = max(products["yty"] - cu @ cu - beta @ rhs, 1e-300)
+
+    log_det = np.log(D).sum() + 2 * np.log(np.diag(L_rest)).sum()
+    if reml:
+        dof = n - p
+        deviance = (log_det + 2 * np.log(np.abs(np.diag(RX))).sum()
+                    + dof * (1 + np.log(2 * np.pi * penalized_rss / dof)))
+    else:
+        dof = n
+        deviance = log_det + n * (1 + np.log(2 * np.pi * penalized_rss / n))
+
+    if not details:
+        return deviance
+
+    residual_variance = penalized_rss / dof
+    covariance = residual_variance * cho_solve((RX, False), np.eye(p))
+    return deviance, beta, covariance, residual_variance
+
+def fit_mixed_model(y, X, groups, reml=True):
+    """
+    Fits a linear mixed model with one random intercept per grouping.
+
+    Parameters:
+      y (np.ndarray): The response per trial.
+      X (np.ndarray): (trials, fixed effects) design, including the intercept column.
+      groups (list): Integer codes (0 .. levels - 1) per trial, one array per random intercept.
+      reml (bool): Restricted maximum likelihood (default) or maximum likelihood.
+
+    Returns:
+      dict:
+        beta (np.ndarray): The fixed effects.
+        covariance (np.ndarray): Their covariance matrix.
+        variances (np.ndarray): The variance of each random intercept, in the order of 'groups'.
+        residual_variance (float): The residual variance.
+        deviance (float): -2 (restricted) log-likelihood at the optimum.
+        converged (bool): Whether the optimizer converged.
+    """
+    sizes = [int(codes.max()) + 1 for codes in groups]
+
+    # The grouping with the most levels goes first, so the dense factorization is the smallest
+    order = np.argsort(sizes)[::-1]
+    sizes = [sizes[i] for i in order]
+    Z = sparse.hstack([indicator_matrix(groups[i], size) for i, size in zip(order, sizes)]).tocsr()
+    products = cross_products(np.asarray(y, dtype=float), np.asarray(X, dtype=float), Z, sizes[0])
+
+    result = minimize(profiled_deviance, np.ones(len(groups)), args=(products, sizes, reml),
+                      method="L-BFGS-B", bounds=[(0, None)] * len(groups))
+    deviance, beta, covariance, residual_variance = profiled_deviance(result.x, products, sizes, reml, details=True)
+
+    variances = np.empty(len(groups))
+    variances[order] = residual_variance * result.x ** 2
+    return {
+        "beta": beta,
+        "covariance": covariance,
+        "variances": variances,
+        "residual_variance": residual_variance,
+        "deviance": deviance,
+        "converged": bool(result.success)
+    }
+
+def load_trials(experiment_statistics_file=experiment_statistics_file, metadata_participants=metadata_participants):
+    """
+    Returns the rows of 'experiment_statistics.csv' with the 'Class' of the participant,
+    for the participants whose class is ASD or TD.
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    metadata = pd.read_csv(metadata_participants)
+    classes = metadata[metadata["Class"].isin(["ASD", "TD"])].set_index("ParticipantID")["Class"]
+    trials = experiment_stats.assign(Class=experiment_stats["Participant"].map(classes))
+    return trials[trials["Class"].notna()]
+
+def compare_metrics_mixed(experiment_statistics_file=experiment_statistics_file,
+                          metadata_participants=metadata_participants, metrics=None, reml=True):
+    """
+    Compares the ASD and TD groups on every trial-level metric with a mixed model
+    (random intercepts for participant and stimulus).
+
+    Parameters:
+      experiment_statistics_file (str): The trial-level metrics.
+      metadata_participants (str): Provides the class of every participant.
+      metrics (list, optional): The metrics to compare; every numeric column by default.
+      reml (bool): Restricted maximum likelihood (default) or maximum likelihood.
+
+    Returns:
+      dict: Keyed by metric, like compare_all_metrics(), each value a dict with:
+        ASD_mean, TD_mean (float): The estimated group means.
+        effect (float): ASD_mean - TD_mean.
+        std_error (float): Standard error of the effect.
+        p_value (float): Two-sided Wald test of the effect.
+        participant_variance, stimulus_variance, residual_variance (float): The variance components.
+        trials, participants, stimuli (int): The size of the data.
+        converged (bool): Whether the optimizer converged.
+
+    Notes:
+      - Trials with a missing value or the 0.0 "no data" placeholder are left out of that
+        metric's model, as the participant averages of the t-tests leave out zeros.
+      - Metrics without both groups or without variance are skipped with a warning.
+    """
+    trials = load_trials(experiment_statistics_file, metadata_participants)
+    if metrics is None:
+        metrics = [col for col in trials.columns
+                   if col not in index_columns and pd.api.types.is_numeric_dtype(trials[col])]
+
+    results = {}
+    for metric in metrics:
+        if metric not in trials.columns:
+            print(f"Warning: Metric '{metric}' not found in {experiment_statistics_file}. Skipping.")
+            continue
+
+        data = trials[trials[metric].notna() & (trials[metric] != 0)]
+        y = data[metric].to_numpy(dtype=float)
+        asd = (data["Class"] == "ASD").to_numpy(dtype=float)
+        if asd.all() or not asd.any() or np.ptp(y) == 0:
+            print(f"Warning: Metric '{metric}' needs both groups and varying values. Skipping.")
+            continue
+
+        participants = pd.factorize(data["Participant"])[0]
+        stimuli = pd.factorize(data["Stimulus"])[0]
+        fit = fit_mixed_model(y, np.c_[np.ones(len(y)), asd], [participants, stimuli], reml)
+
+        intercept, effect = fit["beta"]
+        std_error = math.sqrt(fit["covariance"][1, 1])
+        results[metric] = {
+            "ASD_mean": intercept + effect,
+            "TD_mean": intercept,
+            "effect": effect,
+            "std_error": std_error,
+            "p_value": math.erfc(abs(effect / std_error) / math.sqrt(2)),
+            "participant_variance": fit["variances"][0],
+            "stimulus_variance": fit["variances"][1],
+            "residual_variance": fit["residual_variance"],
+            "trials": len(y),
+            "participants": int(participants.max()) + 1,
+            "stimuli": int(stimuli.max()) + 1,
+            "converged": fit["converged"]
+        }
+
+    return results
@@ -0,0 +1,25 @@
+"""
+Runs independent per-file work in worker processes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+def map_in_processes(function, items, workers=1):
+    """
+    Applies 'function' to every item, in 'workers' processes if more than one is requested.
+    'function' must be picklable (a module-level function or a functools.partial of one).
+
+    Parameters:
+      function (callable): Called with one item.
+      items (list): The items to process.
+      workers (int): Number of processes; 1 runs everything in this process.
+
+    Returns:
+      list: The results, in the order of 'items'.
+    """
+    items = list(items)
+    if workers is None or workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(items))) as executor:
+        return list(executor.map(function, items))
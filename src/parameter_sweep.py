@@ -0,0 +1,265 @@
+"""
+Runs the file creation pipeline for every combination of a grid of parameters and
+collects the compare_all_metrics() results of all variants in one table.
+
+Every variant runs in a workspace of its own (a copy of the pipeline's output
+locations), but work that doesn't depend on a swept parameter is shared: the stages
+form segments that start where a stage takes parameters that earlier stages don't
+(e.g. 'cleanup' takes the snap interval and filters, 'average_paths' the quality
+thresholds and bin width). A segment's workspace is named after its first stage and a
+hash of all parameters up to it, the stages before it and the state (size and
+modification time) of the read-only inputs, and is created from a copy of the previous
+segment's workspace. Changing the raw data, the metadata or the AOI definitions therefore
+starts new workspaces instead of returning results of the old inputs. For example, all average-path variants with the same cleanup parameters
+share the participant files and the cleanup, and all variants share the participant files.
+
+The participant and event files, the bulk of a workspace, are hard links to those of
+the previous segment rather than copies. Their stages replace a file instead of
+writing into it (see src/utils.py write_atomically()), so a link is never changed.
+Without the 'participant_files' stage, the first workspace starts from the configured
+'participant_dataset', whose state is then also part of the workspace names.
+Finished stages are recorded in each workspace, so a sweep can be extended or resumed
+with the same sweep folder.
+"""
+
+import os
+import glob
+import json
+import shutil
+import hashlib
+import itertools
+from functools import partial
+import pandas as pd
+from src import load_data
+from src.pipeline import pipeline_stages, path_names, merge_config, run_pipeline
+from src.data_visualization import load_and_split_data_by_class, compare_all_metrics
+
+# Paths inside each workspace; the other paths (raw data, AOI definitions) are read-only inputs
+workspace_paths = [name for name in path_names if name not in ("original_dataset", "aoi_definitions_file")]
+
+# Read-only inputs whose state is part of every workspace name
+input_paths = ["original_dataset", "metadata_participants", "aoi_definitions_file"]
+
+# Workspace folders whose files are hard-linked into the next segment's workspace; their
+# stages only replace files atomically
+linked_paths = ["participant_dataset", "events_dataset"]
+
+# Parameters that don't change the results
+unshared_parameters = ["workers"]
+
+workspace_state_file = "sweep_workspace.json"
+
+def parameter_grid(grid):
+    """
+    Returns every combination of a parameter grid.
+
+    Parameters:
+      grid (dict): Parameter name -> list of values. Entries of 'quality_thresholds'
+                   are named 'quality_thresholds.<threshold>'.
+
+    Returns:
+      list: One dict (name -> value) per variant.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+def variant_config(config, variant):
+    """
+    Returns a copy of 'config' with the parameters of a variant.
+    """
+    overrides = {}
+    for name, value in variant.items():
+        *sections, key = name.split(".")
+        nested = overrides
+        for section in sections:
+            nested = nested.setdefault(section, {})
+        nested[key] = value
+    return merge_config(config, {"parameters": overrides})
+
+def stage_parameters(stage, config):
+    """
+    Returns the parameters (not paths) a stage takes that can change its results.
+    """
+    _, argument_names = pipeline_stages[stage]
+    return {name: config["parameters"][name] for name in argument_names
+            if name in config["parameters"] and name not in unshared_parameters}
+
+def parameters_hash(parameters):
+    """
+    Returns a short hash that identifies a set of parameter values (any JSON-compatible value).
+    """
+    return hashlib.sha1(json.dumps(parameters, sort_keys=True).encode()).hexdigest()[:10]
+
+def input_stamp(path):
+    """
+    Returns what identifies the state of an input file or folder: its absolute path and the
+    relative path, size and modification time of every file in it (None if it doesn't exist).
+    """
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, file) for root, _, names in os.walk(path) for file in names)
+    else:
+        files = [path] if os.path.exists(path) else None
+    stamps = None if files is None else [[os.path.relpath(file, path) if file != path else os.path.basename(file),
+                                          os.path.getsize(file), os.stat(file).st_mtime_ns] for file in files]
+    return {"path": os.path.abspath(path), "files": stamps}
+
+def input_stamps(config):
+    """
+    Returns the input_stamp() of every read-only input of the configuration, including the
+    participant files the sweep starts from if 'participant_files' isn't selected.
+    """
+    names = input_paths if "participant_files" in config["stages"] else input_paths + ["participant_dataset"]
+    return {name: input_stamp(config["paths"][name]) for name in names}
+
+def workspace_segments(config):
+    """
+    Splits the selected stages into segments that share their parameters.
+
+    Returns:
+      list: (workspace name, parameters up to the segment, stages) per segment, in pipeline order.
+            The name's hash also covers the stages before the segment and the input stamps.
+    """
+    segments = []
+    parameters = {}
+    previous_stages = []
+    inputs = input_stamps(config)
+    for stage in pipeline_stages:
+        if stage not in config["stages"]:
+            continue
+
+        new_parameters = {name: value for name, value in stage_parameters(stage, config).items()
+                          if name not in parameters}
+        if new_parameters or not segments:
+            parameters = {**parameters, **new_parameters}
+            identity = {"parameters": parameters, "previous_stages": previous_stages, "inputs": inputs}
+            segments.append((f"{stage}_{parameters_hash(identity)}", parameters, []))
+        segments[-1][2].append(stage)
+        previous_stages = previous_stages + [stage]
+
+    return segments
+
+def workspace_config(config, workspace):
+    """
+    Returns a copy of 'config' with the pipeline's outputs redirected into 'workspace'.
+    """
+    return merge_config(config, {"paths": {name: os.path.join(workspace, getattr(load_data, name))
+                                           for name in workspace_paths}})
+
+def read_workspace_state(workspace):
+    with open(os.path.join(workspace, workspace_state_file)) as f:
+        return json.load(f)
+
+def write_workspace_state(workspace, state):
+    with open(os.path.join(workspace, workspace_state_file), "w") as f:
+        json.dump(state, f, indent=2)
+
+def link_file(source, destination):
+    """
+    Hard-links a file, or copies it where the file system doesn't support links.
+    """
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+def copy_workspace_file(source, destination, linked_folders):
+    """
+    Copies a file of a workspace, or links it if it is in one of 'linked_folders'.
+    """
+    if any(os.path.commonpath([os.path.abspath(source), folder]) == folder for folder in linked_folders):
+        link_file(source, destination)
+    else:
+        shutil.copy2(source, destination)
+
+def create_workspace(workspace, parent, parameters, metadata_participants, participant_dataset=None):
+    """
+    Creates a segment's workspace from the previous segment's workspace (see the module
+    docstring), or for the first segment from the participants' metadata and, if given,
+    the participant files in 'participant_dataset'. The workspace is made under a temporary
+    name, so an interrupted copy is never mistaken for a workspace.
+
+    Raises:
+      ValueError: If 'participant_dataset' is given but has no participant files.
+    """
+    if participant_dataset is not None and not glob.glob(os.path.join(participant_dataset, "Participant_*.csv")):
+        raise ValueError(f"The sweep doesn't run the 'participant_files' stage, but '{participant_dataset}' "
+                         f"has no participant files to start from")
+
+    temporary = workspace + ".tmp"
+    if os.path.exists(temporary):
+        shutil.rmtree(temporary)
+
+    if parent is not None:
+        linked_folders = [os.path.abspath(os.path.join(parent, getattr(load_data, name))) for name in linked_paths]
+        shutil.copytree(parent, temporary, copy_function=partial(copy_workspace_file, linked_folders=linked_folders))
+    else:
+        os.makedirs(temporary)
+        shutil.copy(metadata_participants, os.path.join(temporary, load_data.metadata_participants))
+        if participant_dataset is not None:
+            shutil.copytree(participant_dataset, os.path.join(temporary, load_data.participant_dataset),
+                            copy_function=link_file)
+
+    write_workspace_state(temporary, {"parameters": parameters, "completed_stages": []})
+    os.rename(temporary, workspace)
+
+def run_variant(config, sweep_folder="parameter_sweep"):
+    """
+    Runs the stages of one variant, reusing the workspaces of earlier variants
+    where their parameters are the same.
+
+    Returns:
+      str: The workspace of the variant's last segment, with its results.
+    """
+    parent = None
+    for name, parameters, stages in workspace_segments(config):
+        workspace = os.path.join(sweep_folder, name)
+        if not os.path.exists(workspace):
+            participant_dataset = None
+            if parent is None and "participant_files" not in stages:
+                participant_dataset = config["paths"]["participant_dataset"]
+            create_workspace(workspace, parent, parameters, config["paths"]["metadata_participants"],
+                             participant_dataset)
+
+        state = read_workspace_state(workspace)
+        for stage in stages:
+            if stage in state["completed_stages"]:
+                continue
+            run_pipeline(workspace_config(config, workspace), stages=[stage])
+            state["completed_stages"].append(stage)
+            write_workspace_state(workspace, state)
+
+        parent = workspace
+
+    return parent
+
+def run_sweep(config, grid, sweep_folder="parameter_sweep"):
+    """
+    Runs every variant of a parameter grid and compares the ASD and TD metrics of each.
+
+    Parameters:
+      config (dict): The base configuration (see src/pipeline.py).
+      grid (dict): Parameter name -> list of values (see parameter_grid()).
+      sweep_folder (str): Folder of the workspaces and the results table.
+
+    Returns:
+      pd.DataFrame: One row per variant and metric with the swept parameters, 'Workspace',
+                    'Metric', 'ASD_mean', 'TD_mean' and 'p_value', also saved as
+                    'sweep_results.csv' in 'sweep_folder'.
+    """
+    variants = [(variant, variant_config(config, variant)) for variant in parameter_grid(grid)]
+    os.makedirs(sweep_folder, exist_ok=True)
+    rows = []
+
+    for variant, variant_configuration in variants:
+        print(f"Running variant {variant}")
+        workspace = run_variant(variant_configuration, sweep_folder)
+
+        _, df_asd, df_td = load_and_split_data_by_class(os.path.join(workspace, load_data.metadata_participants))
+        for metric, result in compare_all_metrics(df_asd, df_td).items():
+            rows.append({**variant, "Workspace": os.path.basename(workspace), "Metric": metric, **result})
+
+    results = pd.DataFrame(rows, columns=list(grid) + ["Workspace", "Metric", "ASD_mean", "TD_mean", "p_value"])
+    results.to_csv(os.path.join(sweep_folder, "sweep_results.csv"), index=False)
+    print(f"Sweep results saved to {os.path.join(sweep_folder, 'sweep_results.csv')}")
+
+    return results
@@ -0,0 +1,201 @@
+"""
+Configurable runner of the file creation pipeline (MAIN_create_files_for_analysis.py).
+A configuration selects the stages to run, the input and output locations and the
+parameters, and every stage gets them as explicit arguments, so several runs with
+different configurations can work side by side on one machine.
+
+A configuration file (JSON, TOML or YAML) may contain any of:
+  paths:      Input and output locations (the names of src/load_data.py).
+  parameters: snap_interval, max_gap, smoothing, smoothing_window, bin_width,
+              resampling_method, label_source, quality_thresholds, screen_size, workers
+              and sharded.
+  stages:     The names of the stages to run, in pipeline order by default.
+Missing entries keep the defaults of default_config().
+
+With 'sharded' set, the per-participant stages (cleanup, saccades, average_paths and
+gaze_deviation) run as shards through the queue in 'shard_queue_folder'
+(see src/sharding.py), with 'workers' local worker processes.
+"""
+
+import os
+import copy
+import json
+from src import load_data
+from src.dataset_file_cleanup import create_participant_files
+from src.data_cleanup import clean_all_participant_files
+from src.event_extraction import create_event_files
+from src.data_analysis import create_experiment_statistics_file, analyze_saccades
+from src.aoi_analysis import analyze_aois
+from src.calculate_gaze_paths import create_average_paths_files, calculate_gaze_deviation
+from src.data_analysis import calculate_experiment_deviation, calculate_participant_averages
+from src.gaze_heatmaps import create_heatmap_files, screen_size
+from src.stimulus_catalog import create_stimulus_catalog
+from src.data_quality import quality_thresholds
+from src.sharding import sharded_stages, run_sharded_stage
+
+path_names = ["original_dataset", "participant_dataset", "average_paths_folder", "experiment_statistics_file",
+              "metadata_participants", "events_dataset", "heatmaps_file", "aoi_definitions_file",
+              "data_quality_file", "cohort_tensors_folder", "shard_queue_folder", "stimulus_catalog_file"]
+
+# Stage name -> (function, the paths and parameters it receives), in pipeline order
+pipeline_stages = {
+    "participant_files": (create_participant_files, ["original_dataset", "participant_dataset", "workers"]),
+    "cleanup": (clean_all_participant_files, ["participant_dataset", "data_quality_file", "max_gap", "smoothing",
+                                              "smoothing_window", "snap_interval", "workers"]),
+    "events": (create_event_files, ["participant_dataset", "events_dataset"]),
+    "experiment_statistics": (create_experiment_statistics_file, ["participant_dataset", "experiment_statistics_file"]),
+    "stimulus_catalog": (create_stimulus_catalog, ["experiment_statistics_file", "participant_dataset",
+                                                   "stimulus_catalog_file"]),
+    "saccades": (analyze_saccades, ["participant_dataset", "experiment_statistics_file", "label_source",
+                                    "stimulus_catalog_file", "events_dataset"]),
+    "aois": (analyze_aois, ["participant_dataset", "experiment_statistics_file", "aoi_definitions_file"]),
+    "average_paths": (create_average_paths_files, ["participant_dataset", "experiment_statistics_file",
+                                                   "metadata_participants", "average_paths_folder",
+                                                   "cohort_tensors_folder", "quality_thresholds",
+                                                   "data_quality_file", "bin_width", "resampling_method",
+                                                   "stimulus_catalog_file"]),
+    "gaze_deviation": (calculate_gaze_deviation, ["participant_dataset", "average_paths_folder", "bin_width",
+                                                  "workers", "stimulus_catalog_file"]),
+    "experiment_deviation": (calculate_experiment_deviation, ["participant_dataset", "experiment_statistics_file",
+                                                              "stimulus_catalog_file"]),
+    "participant_averages": (calculate_participant_averages, ["experiment_statistics_file", "metadata_participants"]),
+    "heatmaps": (create_heatmap_files, ["participant_dataset", "metadata_participants", "heatmaps_file",
+                                          "screen_size"])
+}
+
+def default_config():
+    """
+    Returns the configuration of a full run with the default locations and parameters.
+    """
+    return {
+        "paths": {name: getattr(load_data, name) for name in path_names},
+        "parameters": {
+            "snap_interval": 20,
+            "max_gap": None,
+            "smoothing": None,
+            "smoothing_window": 5,
+            "bin_width": None,
+            "resampling_method": "mean",
+            "label_source": "vendor",
+            "quality_thresholds": dict(quality_thresholds),
+            "screen_size": list(screen_size),
+            "workers": 1,
+            "sharded": False
+        },
+        "stages": list(pipeline_stages)
+    }
+
+def merge_config(config, overrides, section=""):
+    """
+    Returns a copy of 'config' with the values of 'overrides', merging nested dictionaries.
+
+    Raises:
+      ValueError: If 'overrides' contains a name that isn't in 'config'.
+    """
+    merged = copy.deepcopy(config)
+    for key, value in overrides.items():
+        if key not in merged:
+            raise ValueError(f"Unknown configuration entry '{section}{key}'")
+        if isinstance(merged[key], dict) and isinstance(value, dict):
+            merged[key] = merge_config(merged[key], value, f"{section}{key}.")
+        else:
+            merged[key] = value
+    return merged
+
+def read_config_file(config_file):
+    """
+    Reads a JSON (.json), TOML (.toml) or YAML (.yaml/.yml) configuration file.
+
+    Raises:
+      ValueError: For other file extensions.
+      ImportError: For YAML files if PyYAML isn't installed, and for TOML files before
+                   Python 3.11 if tomli isn't installed.
+    """
+    extension = os.path.splitext(config_file)[1].lower()
+    if extension == ".json":
+        with open(config_file) as f:
+            return json.load(f)
+    if extension == ".toml":
+        try:
+            import tomllib
+        except ImportError:
+            # Python < 3.11
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError("Reading TOML configuration files requires Python 3.11+ or tomli (pip install tomli)")
+        with open(config_file, "rb") as f:
+            return tomllib.load(f)
+    if extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading YAML configuration files requires PyYAML (pip install pyyaml)")
+        with open(config_file) as f:
+            return yaml.safe_load(f) or {}
+    raise ValueError(f"Unsupported configuration file '{config_file}', expected .json, .toml or .yaml")
+
+def load_config(config_file=None, overrides=None):
+    """
+    Builds a run configuration from the defaults, a configuration file and overrides.
+
+    Parameters:
+      config_file (str, optional): JSON, TOML or YAML file.
+      overrides (dict, optional): Applied last, e.g. {"parameters": {"workers": 4}}.
+
+    Returns:
+      dict: The complete configuration.
+
+    Raises:
+      ValueError: For unknown entries or stage names.
+    """
+    config = default_config()
+    if config_file is not None:
+        config = merge_config(config, read_config_file(config_file))
+    if overrides:
+        config = merge_config(config, overrides)
+
+    unknown_stages = [stage for stage in config["stages"] if stage not in pipeline_stages]
+    if unknown_stages:
+        raise ValueError(f"Unknown stages {unknown_stages}, expected some of {list(pipeline_stages)}")
+
+    return config
+
+def stage_arguments(stage, config):
+    """
+    Returns the keyword arguments of a stage from the paths and parameters of a configuration.
+    """
+    values = {**config["paths"], **config["parameters"]}
+    _, argument_names = pipeline_stages[stage]
+    return {name: values[name] for name in argument_names}
+
+def run_pipeline(config=None, stages=None):
+    """
+    Runs the selected stages in pipeline order.
+
+    Parameters:
+      config (dict, optional): From load_config(); the defaults if not given.
+      stages (list, optional): Overrides the stages of the configuration.
+
+    Raises:
+      ValueError: For unknown stage names.
+      RuntimeError: If shards of a sharded stage failed; the later stages aren't run.
+    """
+    config = config if config is not None else default_config()
+    selected = stages if stages is not None else config["stages"]
+
+    unknown_stages = [stage for stage in selected if stage not in pipeline_stages]
+    if unknown_stages:
+        raise ValueError(f"Unknown stages {unknown_stages}, expected some of {list(pipeline_stages)}")
+
+    for stage, (function, _) in pipeline_stages.items():
+        if stage in selected:
+            print(f"Running stage '{stage}'")
+            if config["parameters"]["sharded"] and stage in sharded_stages:
+                failed = run_sharded_stage(stage, stage_arguments(stage, config),
+                                           config["paths"]["shard_queue_folder"], config["parameters"]["workers"])
+                if failed:
+                    raise RuntimeError(f"{failed} shards of stage '{stage}' failed, see "
+                                       f"{os.path.join(config['paths']['shard_queue_folder'], 'failed')}")
+            else:
+                function(**stage_arguments(stage, config))
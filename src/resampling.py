@@ -0,0 +1,155 @@
+"""
+Resamples the gaze coordinates of every participant-experiment-stimulus onto a regular
+time grid. Unlike calculate_snapped_time(), which keeps only the sample closest to each
+20 ms mark, every valid sample contributes: a bin holds the mean of the samples that
+round to it ('mean'), or the coordinates are linearly interpolated at the bin times
+('interpolate'). The bin width can be anything (e.g. 10, 20 or 50 ms). Interpolation
+doesn't bridge tracking gaps longer than 'interpolation_max_gap'; such bins stay NaN.
+
+The grid is dense: every group has a row for every bin from 0 to its last sample,
+with NaN coordinates where there is no data, so the groups can be stacked into one array.
+"""
+
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.event_extraction import group_columns, eye_columns
+from src.signal_filters import eye_coordinates
+
+resampling_methods = ["mean", "interpolate"]
+
+# Longest gap between valid samples that 'interpolate' bridges [ms], as interpolate_gaps() in src/signal_filters.py
+interpolation_max_gap = 100
+
+gaze_columns = [column for eye in eye_columns for column in eye]
+
+def bin_indices(times, bin_width=20):
+    """
+    Returns the index of each time's bin (a float array, NaN for NaN times). The grid is built
+    and joined on these integer indices, so bin widths such as 16.7 ms lose no bins to rounding.
+    """
+    return np.round(np.asarray(times, dtype=float) / bin_width)
+
+def time_bins(times, bin_width=20):
+    """
+    Returns the bin of each time: the closest multiple of 'bin_width' (as in calculate_snapped_time).
+    """
+    return bin_indices(times, bin_width) * bin_width
+
+def resample_gaze(df, bin_width=20, method="mean", max_gap=interpolation_max_gap):
+    """
+    Resamples the gaze coordinates of every (Participant, Experiment, Stimulus) in a file.
+    'Blink' samples and eyes with NaN or zero coordinates are not used.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'RecordingTime Stimulus [ms]'.
+      bin_width (float): Width of the time bins [ms].
+      method (str): 'mean' (average of the samples in each bin) or 'interpolate'
+                    (linear interpolation at the bin times, only between valid samples).
+      max_gap (float or None): Longest gap between valid samples to interpolate across [ms]
+                               ('interpolate' only), None for no limit.
+
+    Returns:
+      pd.DataFrame: The group columns, 'SnappedTime' (the bin time) and the four
+                    'Point of Regard' columns, one row per group and bin.
+
+    Raises:
+      ValueError: For an unknown method.
+    """
+    if method not in resampling_methods:
+        raise ValueError(f"Unknown resampling method '{method}', expected one of {resampling_methods}")
+
+    df = df[~((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator"))]
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    times = pd.to_numeric(df["RecordingTime Stimulus [ms]"], errors="coerce").to_numpy(dtype=float)
+    not_blink = ((df["Category Left"] != "Blink") & (df["Category Right"] != "Blink")).to_numpy()
+
+    # Dense grid: every bin from 0 to the last sample of each group
+    combinations = df[group_columns].assign(Key=keys).drop_duplicates("Key").sort_values("Key")
+    bins = bin_indices(times, bin_width)
+    last_bin = pd.Series(bins).groupby(keys).max().reindex(combinations["Key"]).fillna(0)
+    bin_counts = last_bin.to_numpy().astype(int) + 1
+    grid_keys = np.repeat(combinations["Key"].to_numpy(), bin_counts)
+    grid_bins = np.arange(len(grid_keys)) - np.repeat(np.cumsum(bin_counts) - bin_counts, bin_counts)
+    grid_times = grid_bins * bin_width
+
+    resampled = pd.DataFrame({"Key": grid_keys, "Bin": grid_bins.astype(float),
+                              "SnappedTime": grid_times.astype(float)})
+
+    for x_column, y_column in eye_columns:
+        x, y, valid = eye_coordinates(df, x_column, y_column)
+        valid &= not_blink & ~np.isnan(times)
+
+        if method == "mean":
+            samples = pd.DataFrame({"Key": keys[valid], "Bin": bins[valid], x_column: x[valid], y_column: y[valid]})
+            means = samples.groupby(["Key", "Bin"]).mean()
+            resampled = resampled.join(means, on=["Key", "Bin"])
+        else:
+            resampled[x_column], resampled[y_column] = interpolate_on_grid(
+                keys[valid], times[valid], x[valid], y[valid], grid_keys, grid_times, max_gap
+            )
+
+    resampled = resampled.merge(combinations, on="Key").drop(columns="Key")
+
+    return resampled[group_columns + ["SnappedTime"] + gaze_columns]
+
+def interpolate_on_grid(keys, times, x, y, grid_keys, grid_times, max_gap=None):
+    """
+    Linearly interpolates the samples of all groups at their grid times with one np.interp call.
+    Every group is shifted onto its own stretch of a shared time axis, so interpolation never
+    crosses groups. Grid times before a group's first or after its last sample are NaN, and
+    so are those between two samples more than 'max_gap' apart (unless None).
+
+    Returns:
+      tuple (grid_x, grid_y): Float arrays aligned with the grid.
+    """
+    grid_x = np.full(len(grid_keys), np.nan)
+    grid_y = np.full(len(grid_keys), np.nan)
+    if len(keys) == 0:
+        return grid_x, grid_y
+
+    span = max(np.nanmax(times), np.nanmax(grid_times)) + 1
+    order = np.lexsort((times, keys))
+    shifted = keys[order] * span + times[order]
+    grid_shifted = grid_keys * span + grid_times
+
+    first = pd.Series(times).groupby(keys).min()
+    last = pd.Series(times).groupby(keys).max()
+    inside = (grid_times >= first.reindex(grid_keys).to_numpy()) & (grid_times <= last.reindex(grid_keys).to_numpy())
+
+    if max_gap is not None:
+        # The samples around each grid time; inside a group both belong to it
+        following = np.searchsorted(shifted, grid_shifted[inside], side="right")
+        before = shifted[following - 1]
+        after = shifted[np.minimum(following, len(shifted) - 1)]
+        bridged = (before == grid_shifted[inside]) | (after - before <= max_gap)
+        inside[inside] = bridged
+
+    grid_x[inside] = np.interp(grid_shifted[inside], shifted, x[order])
+    grid_y[inside] = np.interp(grid_shifted[inside], shifted, y[order])
+
+    return grid_x, grid_y
+
+def to_dense_array(resampled):
+    """
+    Stacks resampled groups into one array, padding shorter groups with NaN.
+
+    Parameters:
+      resampled (pd.DataFrame): Output of resample_gaze().
+
+    Returns:
+      tuple (groups, bin_times, values):
+        groups (pd.DataFrame): The (Participant, Experiment, Stimulus) of each row of 'values'.
+        bin_times (np.ndarray): The time of each bin.
+        values (np.ndarray): Array of shape (groups, bins, 4) with the 'Point of Regard' columns.
+    """
+    keys = resampled.groupby(group_columns, sort=False).ngroup().to_numpy()
+    groups = resampled[group_columns].drop_duplicates().reset_index(drop=True)
+
+    bin_times = np.unique(resampled["SnappedTime"].to_numpy(dtype=float))
+    positions = np.searchsorted(bin_times, resampled["SnappedTime"].to_numpy(dtype=float))
+
+    values = np.full((len(groups), len(bin_times), len(gaze_columns)), np.nan)
+    values[keys, positions] = resampled[gaze_columns].to_numpy(dtype=float)
+
+    return groups, bin_times, values
@@ -0,0 +1,409 @@
+"""
+Pairwise scanpath comparison between the recordings of each stimulus.
+Two measures are supported:
+    "euclidean" - Root-mean-square distance [px] between two gaze trajectories, over the
+    SnappedTime bins both recordings have (see calculate_snapped_time in data_cleanup).
+    "edit" - Normalized Levenshtein distance between the fixation sequences of two recordings,
+    where each fixation sample is coded by its grid cell (or AOI) and repeats are collapsed.
+Lower values mean more similar scanpaths. The matrices are cached per stimulus in
+'scanpath_similarity_folder', together with a key of the parameters, the stimulus' AOI
+definitions and the state of the participant files, and recomputed when the key changes.
+The stimuli of the participant files are cached too, so the files are only read for the
+stimuli whose matrix isn't cached.
+"""
+
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+from src.load_data import *
+from src.event_extraction import label_samples, calculate_gaze_point
+from src.aoi_analysis import label_samples_with_aoi
+from src.gaze_heatmaps import screen_size
+from src.utils import file_stamps
+
+similarity_methods = ["euclidean", "edit"]
+
+def load_snapped_samples(participant_dataset=participant_dataset, aoi_definitions=None, stimuli=None):
+    """
+    Reads every participant file once and keeps the samples that have a SnappedTime.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      aoi_definitions (dict, optional): Output of load_aoi_definitions(). If given,
+                                        every sample also gets its 'AOI'.
+      stimuli (list, optional): Only keep the samples of these stimuli.
+
+    Returns:
+      dict: stimulus -> pd.DataFrame with 'Participant', 'Experiment', 'SnappedTime',
+            'X', 'Y' (mean gaze point, NaN if invalid), 'Fixation' and optionally 'AOI'.
+    """
+    all_samples = []
+
+    for file in glob.glob(os.path.join(participant_dataset, "Participant_*.csv")):
+        try:
+            df = pd.read_csv(file, low_memory=False)
+        except pd.errors.EmptyDataError:
+            continue
+
+        if "SnappedTime" not in df.columns:
+            print(f"Warning: {os.path.basename(file)} has no SnappedTime. Skipping.")
+            continue
+        if stimuli is not None:
+            df = df[df["Stimulus"].isin(stimuli)]
+
+        gaze_x, gaze_y = calculate_gaze_point(df)
+        samples = pd.DataFrame({
+            "Participant": df["Participant"].to_numpy(),
+            "Experiment": df["Experiment"].to_numpy(),
+            "Stimulus": df["Stimulus"].to_numpy(),
+            "SnappedTime": pd.to_numeric(df["SnappedTime"], errors="coerce").to_numpy(),
+            "X": gaze_x,
+            "Y": gaze_y,
+            "Fixation": label_samples(df) == "Fixation"
+        })
+        if aoi_definitions is not None:
+            samples["AOI"] = label_samples_with_aoi(df, aoi_definitions)
+
+        all_samples.append(samples[samples["SnappedTime"].notna()])
+
+    if not all_samples:
+        return {}
+
+    combined = pd.concat(all_samples, ignore_index=True)
+    return {stimulus: group.drop(columns="Stimulus") for stimulus, group in combined.groupby("Stimulus")}
+
+def build_trajectory_matrix(samples):
+    """
+    Aligns the recordings of one stimulus on their SnappedTime bins.
+
+    Parameters:
+      samples (pd.DataFrame): One stimulus from load_snapped_samples().
+
+    Returns:
+      tuple (recordings, trajectories):
+        recordings (pd.DataFrame): 'Participant' and 'Experiment' of each row.
+        trajectories (np.ndarray): Array of shape (recordings, bins, 2), NaN where a
+                                   recording has no valid gaze point in a bin.
+    """
+    recording_codes = samples.groupby(["Participant", "Experiment"], sort=True).ngroup().to_numpy()
+    recordings = samples[["Participant", "Experiment"]].drop_duplicates().sort_values(["Participant", "Experiment"])
+    bin_codes, _ = pd.factorize(samples["SnappedTime"], sort=True)
+
+    trajectories = np.full((len(recordings), bin_codes.max() + 1, 2), np.nan)
+    trajectories[recording_codes, bin_codes, 0] = samples["X"].to_numpy()
+    trajectories[recording_codes, bin_codes, 1] = samples["Y"].to_numpy()
+
+    return recordings.reset_index(drop=True), trajectories
+
+def euclidean_distance_matrix(trajectories, min_overlap=1):
+    """
+    Root-mean-square Euclidean distance between every pair of trajectories, over the
+    bins both have. The squared distances are expanded into masked matrix products,
+    so all pairs are computed at once without building a pairs x bins array.
+
+    Parameters:
+      trajectories (np.ndarray): Array of shape (recordings, bins, 2) with NaN gaps.
+      min_overlap (int): Pairs sharing fewer bins get NaN.
+
+    Returns:
+      np.ndarray: Symmetric (recordings, recordings) distance matrix in pixels.
+    """
+    mask = ~np.isnan(trajectories).any(axis=2)
+    values = np.where(mask[:, :, None], trajectories, 0.0)
+    weights = mask.astype(float)
+    squares = (values ** 2).sum(axis=2)
+
+    overlap = weights @ weights.T
+    sum_of_squares = (
+        squares @ weights.T + weights @ squares.T
+        - 2 * (values[:, :, 0] @ values[:, :, 0].T + values[:, :, 1] @ values[:, :, 1].T)
+    )
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        distances = np.sqrt(np.clip(sum_of_squares, 0, None) / overlap)
+    distances[overlap < max(min_overlap, 1)] = np.nan
+    np.fill_diagonal(distances, np.where(np.diag(overlap) > 0, 0.0, np.nan))
+
+    return distances
+
+def fixation_sequences(samples, grid=(5, 5), use_aoi=False):
+    """
+    Turns every recording of a stimulus into a sequence of region codes.
+    Fixation samples are coded by the grid cell (or AOI) they fall in and
+    consecutive repeats are collapsed, so the sequence lists the regions in visiting order.
+
+    Parameters:
+      samples (pd.DataFrame): One stimulus from load_snapped_samples().
+      grid (tuple): Number of grid cells along x and y.
+      use_aoi (bool): Use the 'AOI' column instead of the grid. Samples outside every AOI are dropped.
+
+    Returns:
+      tuple (recordings, sequences):
+        recordings (pd.DataFrame): 'Participant' and 'Experiment' of each sequence.
+        sequences (list): One integer np.ndarray per recording.
+    """
+    samples = samples.sort_values(["Participant", "Experiment", "SnappedTime"], kind="stable")
+    recordings = samples[["Participant", "Experiment"]].drop_duplicates().reset_index(drop=True)
+
+    fixations = samples[samples["Fixation"] & samples["X"].notna()]
+    if use_aoi:
+        fixations = fixations[fixations["AOI"] != ""]
+        codes = pd.factorize(fixations["AOI"])[0]
+    else:
+        width, height = screen_size
+        column = np.clip((fixations["X"].to_numpy() / width * grid[0]).astype(int), 0, grid[0] - 1)
+        row = np.clip((fixations["Y"].to_numpy() / height * grid[1]).astype(int), 0, grid[1] - 1)
+        codes = row * grid[0] + column
+
+    # Collapse repeats within each recording
+    recording_codes = fixations.groupby(["Participant", "Experiment"], sort=False).ngroup().to_numpy()
+    keep = np.r_[True, (codes[1:] != codes[:-1]) | (recording_codes[1:] != recording_codes[:-1])][:len(codes)]
+    collapsed = fixations[keep].assign(Code=codes[keep])
+    by_recording = {key: group["Code"].to_numpy() for key, group in collapsed.groupby(["Participant", "Experiment"])}
+
+    sequences = [
+        by_recording.get((recording.Participant, recording.Experiment), np.array([], dtype=int))
+        for recording in recordings.itertuples(index=False)
+    ]
+
+    return recordings, sequences
+
+def edit_distance_matrix(sequences):
+    """
+    Normalized Levenshtein distance between every pair of sequences.
+    All pairs go through the dynamic program together: each step handles one position of
+    the first sequence for every pair at once, and the insertion chain along the second
+    sequence is solved with a running minimum instead of a loop.
+
+    Parameters:
+      sequences (list): Integer np.ndarray per recording.
+
+    Returns:
+      np.ndarray: Symmetric (recordings, recordings) matrix of edit distances divided by
+                  the longer sequence length (0 = identical, 1 = nothing in common).
+                  Pairs of two empty sequences get NaN.
+    """
+    count = len(sequences)
+    lengths = np.array([len(sequence) for sequence in sequences])
+    first, second = np.triu_indices(count, k=1)
+
+    max_length = max(lengths.max(initial=0), 1)
+    padded = np.full((count, max_length), -1)
+    for i, sequence in enumerate(sequences):
+        padded[i, :len(sequence)] = sequence
+
+    a, b = padded[first], padded[second]
+    a_lengths, b_lengths = lengths[first], lengths[second]
+    pairs = np.arange(len(first))
+    offsets = np.arange(max_length + 1)
+
+    # Row 0 of the DP table: turning an empty prefix into b costs its length
+    row = np.tile(offsets, (len(first), 1)).astype(float)
+    distances = row[pairs, b_lengths].copy()
+
+    for i in range(1, max_length + 1):
+        cost = (a[:, i - 1][:, None] != b).astype(float)
+        best = np.minimum(row[:, 1:] + 1, row[:, :-1] + cost)
+        best = np.hstack([np.full((len(first), 1), float(i)), best])
+        row = np.minimum.accumulate(best - offsets, axis=1) + offsets
+
+        done = a_lengths == i
+        distances[done] = row[done, b_lengths[done]]
+
+    longest = np.maximum(a_lengths, b_lengths)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        normalized = np.where(longest > 0, distances / longest, np.nan)
+
+    matrix = np.zeros((count, count))
+    matrix[first, second] = normalized
+    matrix[second, first] = normalized
+    np.fill_diagonal(matrix, np.where(lengths > 0, 0.0, np.nan))
+
+    return matrix
+
+def similarity_cache_file(stimulus, method, scanpath_similarity_folder=scanpath_similarity_folder):
+    """
+    Returns the cache file path of a stimulus and method.
+    """
+    return os.path.join(scanpath_similarity_folder, f"Scanpath_{method}_{stimulus}.npz")
+
+def similarity_cache_key(method, grid=(5, 5), use_aoi=False, aoi_definition=None, source_stamps=None):
+    """
+    Returns the key a cached matrix must have to be reused: the parameters that affect the
+    method, a hash of the stimulus' AOI definitions and the stamps of the source files.
+
+    Parameters:
+      aoi_definition (list, optional): The stimulus' (AOI name, polygon) list.
+      source_stamps (list, optional): [file name, modification time, size] per participant file.
+
+    Returns:
+      str: JSON text.
+    """
+    aoi_hash = None
+    if use_aoi and aoi_definition is not None:
+        aois = [[name, np.asarray(polygon).tolist()] for name, polygon in aoi_definition]
+        aoi_hash = hashlib.sha1(json.dumps(aois).encode()).hexdigest()
+    key = {
+        "method": method,
+        "grid": list(grid) if method == "edit" else None,
+        "use_aoi": bool(use_aoi) if method == "edit" else None,
+        "aoi": aoi_hash if method == "edit" else None,
+        "sources": source_stamps
+    }
+    return json.dumps(key, sort_keys=True)
+
+def load_cached_similarity(stimulus, method, key, scanpath_similarity_folder=scanpath_similarity_folder):
+    """
+    Returns the cached result of a stimulus if it was computed with 'key' (see
+    similarity_cache_key()), otherwise None.
+    """
+    cache_file = similarity_cache_file(stimulus, method, scanpath_similarity_folder)
+    if not os.path.exists(cache_file):
+        return None
+
+    with np.load(cache_file) as cached:
+        if "key" in cached.files and str(cached["key"]) == key:
+            return {name: cached[name] for name in ["participants", "experiments", "matrix"]}
+    return None
+
+def cached_stimuli(source_stamps, scanpath_similarity_folder=scanpath_similarity_folder):
+    """
+    Returns the stimuli of the participant files, as saved by save_stimuli(), or None if
+    they weren't saved or the participant files changed since.
+    """
+    stimuli_file = os.path.join(scanpath_similarity_folder, "scanpath_stimuli.json")
+    if not os.path.exists(stimuli_file):
+        return None
+
+    with open(stimuli_file) as f:
+        saved = json.load(f)
+    return saved["stimuli"] if saved["sources"] == source_stamps else None
+
+def save_stimuli(stimuli, source_stamps, scanpath_similarity_folder=scanpath_similarity_folder):
+    """
+    Saves the stimuli found in the participant files with the state of the files.
+    """
+    os.makedirs(scanpath_similarity_folder, exist_ok=True)
+    with open(os.path.join(scanpath_similarity_folder, "scanpath_stimuli.json"), "w") as f:
+        json.dump({"sources": source_stamps, "stimuli": list(stimuli)}, f)
+
+def participant_file_stamps(participant_dataset=participant_dataset):
+    """
+    Returns [file name, modification time, size] of every participant file.
+    """
+    files = sorted(glob.glob(os.path.join(participant_dataset, "Participant_*.csv")))
+    return [[os.path.basename(file), *stamp] for file, stamp in zip(files, file_stamps(*files))]
+
+def compute_stimulus_similarity(stimulus, samples, method="euclidean", grid=(5, 5), use_aoi=False,
+                                scanpath_similarity_folder=scanpath_similarity_folder, overwrite=False,
+                                aoi_definition=None, source_stamps=None):
+    """
+    Computes (or loads from the cache) the recording x recording distance matrix of one stimulus.
+
+    Parameters:
+      stimulus (str): The stimulus name.
+      samples (pd.DataFrame): The stimulus' samples from load_snapped_samples().
+      method (str): "euclidean" or "edit".
+      grid (tuple): Grid size for "edit".
+      use_aoi (bool): Code "edit" sequences by AOI instead of by grid cell.
+      scanpath_similarity_folder (str): Cache folder.
+      overwrite (bool): Recompute even if a cached matrix exists.
+      aoi_definition (list, optional): The stimulus' AOIs, part of the cache key with 'use_aoi'.
+      source_stamps (list, optional): From participant_file_stamps(), part of the cache key.
+
+    Returns:
+      dict: "participants", "experiments" and "matrix".
+
+    Raises:
+      ValueError: If 'method' is unknown.
+    """
+    if method not in similarity_methods:
+        raise ValueError(f"Unknown similarity method '{method}'. Use one of {similarity_methods}")
+
+    key = similarity_cache_key(method, grid, use_aoi, aoi_definition, source_stamps)
+    cache_file = similarity_cache_file(stimulus, method, scanpath_similarity_folder)
+
+    cached = None if overwrite else load_cached_similarity(stimulus, method, key, scanpath_similarity_folder)
+    if cached is not None:
+        return cached
+
+    if method == "euclidean":
+        recordings, trajectories = build_trajectory_matrix(samples)
+        matrix = euclidean_distance_matrix(trajectories)
+    else:
+        recordings, sequences = fixation_sequences(samples, grid, use_aoi)
+        matrix = edit_distance_matrix(sequences)
+
+    result = {
+        "participants": recordings["Participant"].to_numpy(),
+        "experiments": recordings["Experiment"].to_numpy(),
+        "matrix": matrix
+    }
+
+    os.makedirs(scanpath_similarity_folder, exist_ok=True)
+    np.savez_compressed(cache_file, key=np.array(key), **result)
+
+    return result
+
+def create_scanpath_similarity_files(method="euclidean", grid=(5, 5), aoi_definitions=None,
+                                     participant_dataset=participant_dataset,
+                                     scanpath_similarity_folder=scanpath_similarity_folder, overwrite=False):
+    """
+    Computes the distance matrix of every stimulus in a single pass over the participant files
+    and caches them in 'scanpath_similarity_folder'. When the stimuli of the participant files
+    are known, the cached matrices are checked first and the files are only read for the
+    stimuli without an up-to-date matrix (not at all if every matrix is cached).
+
+    Parameters:
+      method (str): "euclidean" or "edit".
+      grid (tuple): Grid size for "edit".
+      aoi_definitions (dict, optional): If given, "edit" sequences are coded by AOI.
+      participant_dataset (str): Folder with the cleaned participant files.
+      scanpath_similarity_folder (str): Cache folder.
+      overwrite (bool): Recompute matrices that are already cached.
+
+    Returns:
+      dict: stimulus -> result of compute_stimulus_similarity().
+    """
+    if method not in similarity_methods:
+        raise ValueError(f"Unknown similarity method '{method}'. Use one of {similarity_methods}")
+
+    source_stamps = participant_file_stamps(participant_dataset)
+    use_aoi = aoi_definitions is not None
+
+    def aoi_definition(stimulus):
+        return aoi_definitions[stimulus] if use_aoi else None
+
+    # Serve what the cache has, if the stimuli of the unchanged files are known
+    stimuli = cached_stimuli(source_stamps, scanpath_similarity_folder)
+    results = {}
+    if stimuli is not None and not overwrite:
+        for stimulus in stimuli:
+            if use_aoi and stimulus not in aoi_definitions:
+                continue
+            key = similarity_cache_key(method, grid, use_aoi, aoi_definition(stimulus), source_stamps)
+            cached = load_cached_similarity(stimulus, method, key, scanpath_similarity_folder)
+            if cached is not None:
+                results[stimulus] = cached
+
+    missing = None if stimuli is None else [stimulus for stimulus in stimuli if stimulus not in results and
+                                            not (use_aoi and stimulus not in aoi_definitions)]
+    if missing != []:
+        all_samples = load_snapped_samples(participant_dataset, aoi_definitions, missing)
+        if stimuli is None:
+            save_stimuli(all_samples, source_stamps, scanpath_similarity_folder)
+
+        for stimulus, samples in all_samples.items():
+            if stimulus in results or (use_aoi and stimulus not in aoi_definitions):
+                continue
+            results[stimulus] = compute_stimulus_similarity(
+                stimulus, samples, method, grid, use_aoi, scanpath_similarity_folder, overwrite,
+                aoi_definition(stimulus), source_stamps
+            )
+        results = {stimulus: results[stimulus] for stimulus in sorted(results)}
+
+    print(f"Scanpath similarity ({method}) calculated for {len(results)} stimuli.")
+    return results
@@ -0,0 +1,398 @@
+"""
+Sharded processing of the per-participant stages, for cohorts that outgrow one machine.
+A stage is split into shards (one participant, or one participant and a group of its
+stimuli), and the shards are put in a queue directory. Independent workers, on any
+machine that sees the directory, claim shards by atomically renaming them, process them
+and write a partial result. The partial results are merged when all shards are done:
+  - cleanup:        the data quality profiles of the files are concatenated.
+  - saccades:       the statistics rows of the shards are written back to the statistics file.
+  - average_paths:  every shard sums the gaze coordinates per stimulus and bin and counts
+                    them; the sums and counts of all shards are added up and divided.
+  - gaze_deviation: every shard updates its participant file, nothing to merge.
+
+Queue directory layout:
+  job.json   The stage and its arguments.
+  pending/   One JSON file per shard waiting for a worker.
+  claimed/   Shards being processed (moved here from 'pending' by the claiming worker).
+  results/   The partial result of every finished shard.
+  failed/    The error of every shard that raised.
+
+run_sharded_stage() runs a stage with local worker processes, which stand in for the
+nodes. With workers=0 it only fills the queue and waits; start the workers on the nodes
+from the project folder (paths are relative to it) with:
+  python -m src.sharding <queue folder>
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import pickle
+import shutil
+import numpy as np
+import pandas as pd
+from functools import partial
+from src.load_data import *
+from src.parallel import map_in_processes
+from src.data_cleanup import clean_participant_file
+from src.data_quality import write_quality_report, load_excluded_sessions, quality_thresholds
+from src.data_analysis import analyze_participant_saccades, saccade_kinematics_columns
+from src.cohort_tensor import read_participant_recordings
+from src.calculate_gaze_paths import calculate_participant_gaze_deviation
+from src.calculate_gaze_paths import rename_average_gaze_columns, force_columns_to_numeric
+from src.average_path_cache import average_path_cache
+from src.resampling import gaze_columns
+from src.stimulus_catalog import load_stimulus_ids
+from src.utils import to_json_compatible, write_atomically
+
+queue_folders = ["pending", "claimed", "results", "failed"]
+
+index_columns = ["Participant", "Experiment", "Stimulus"]
+
+saccade_columns = ["Saccade_Frequency", "Avg_Saccade_Duration"] + saccade_kinematics_columns
+
+def participant_file_shards(participant_dataset, pattern="Participant_*.csv"):
+    """
+    One shard per participant file, for the stages that rewrite the files.
+    """
+    return [{"id": os.path.splitext(os.path.basename(path))[0], "file": path}
+            for path in sorted(glob.glob(os.path.join(participant_dataset, pattern)))]
+
+def participant_stimulus_shards(experiment_statistics_file, stimulus_groups=1):
+    """
+    One shard per participant and group of its stimuli, for the stages that only read the files.
+
+    Parameters:
+      experiment_statistics_file (str): Lists the stimuli of every participant.
+      stimulus_groups (int): Number of groups the stimuli of a participant are split into.
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    shards = []
+    for participant, rows in experiment_stats.groupby("Participant"):
+        stimuli = sorted(rows["Stimulus"].unique())
+        groups = [group for group in np.array_split(stimuli, max(1, stimulus_groups)) if len(group)]
+        for number, group in enumerate(groups):
+            shards.append({"id": f"Participant_{participant}_{number}", "participant": participant,
+                           "stimuli": group.tolist()})
+    return shards
+
+def cleanup_shard(shard, participant_dataset, data_quality_file, max_gap=None, smoothing=None, smoothing_window=5,
+                  snap_interval=20, workers=1):
+    """
+    Cleans one participant file and returns its quality profile.
+    """
+    return clean_participant_file(shard["file"], max_gap, smoothing, smoothing_window, snap_interval)
+
+def merge_cleanup(results, participant_dataset, data_quality_file, **parameters):
+    """
+    Writes the quality report of all cleaned files.
+    """
+    write_quality_report([profile for profile in results if profile is not None], data_quality_file)
+
+def saccades_shard(shard, participant_dataset, experiment_statistics_file, label_source="vendor",
+                   stimulus_catalog_file=stimulus_catalog_file, events_dataset=events_dataset):
+    """
+    Returns the statistics rows of the shard's participant and stimuli with the saccade metrics.
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    rows = experiment_stats[(experiment_stats["Participant"] == shard["participant"])
+                            & experiment_stats["Stimulus"].isin(shard["stimuli"])]
+    rows = rows.assign(**{col: np.nan if col in saccade_kinematics_columns else 0.0 for col in saccade_columns})
+    results = analyze_participant_saccades(shard["participant"], rows, participant_dataset, label_source,
+                                           stimulus_catalog_file, events_dataset)
+    return None if results is None else results[index_columns + saccade_columns]
+
+def merge_saccades(results, participant_dataset, experiment_statistics_file, **parameters):
+    """
+    Writes the saccade metrics of all shards to the statistics file (0, or NaN for the
+    kinematics, for the rows without results).
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+
+    rows = [result for result in results if result is not None]
+    metrics = pd.concat(rows) if rows else pd.DataFrame(columns=index_columns + saccade_columns)
+    metrics = metrics.set_index(index_columns)
+    keys = pd.MultiIndex.from_frame(experiment_stats[index_columns])
+    found = keys.isin(metrics.index)
+    for col in saccade_columns:
+        missing = np.nan if col in saccade_kinematics_columns else 0.0
+        experiment_stats[col] = np.where(found, metrics[col].reindex(keys).to_numpy(dtype=float), missing)
+
+    experiment_stats.to_csv(experiment_statistics_file, index=False)
+    print("Saccade analysis complete. Results saved.")
+
+def average_path_sums_shard(shard, participant_dataset, experiment_statistics_file,
+                            quality_thresholds=quality_thresholds, data_quality_file=data_quality_file,
+                            bin_width=None, resampling_method="mean", stimulus_catalog_file=stimulus_catalog_file,
+                            **unused):
+    """
+    Sums the gaze coordinates of the shard's recordings per stimulus and bin, and counts them.
+    Like the cohort tensors, a recording contributes its last sample per bin, and
+    low-quality sessions are left out.
+
+    Returns:
+      dict: stimulus -> (bin times, (bins, 4) sums, (bins, 4) counts). A bin is listed
+            if a recording has a sample in it, even if all its coordinates are NaN.
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    sessions = experiment_stats[(experiment_stats["Participant"] == shard["participant"])
+                                & experiment_stats["Stimulus"].isin(shard["stimuli"])]
+    excluded_sessions = load_excluded_sessions(quality_thresholds, data_quality_file)
+
+    file_path = os.path.join(participant_dataset, f"Participant_{shard['participant']}.csv")
+    stimulus_ids = load_stimulus_ids(sessions["Stimulus"], stimulus_catalog_file)
+    recordings = read_participant_recordings(file_path, shard["participant"], sessions, bin_width, resampling_method,
+                                             stimulus_ids)
+
+    samples = {}
+    for stimulus, (participant, experiment, times, values) in recordings or []:
+        if (participant, experiment, stimulus) in excluded_sessions:
+            continue
+        # Keep the last sample of every bin
+        _, last = np.unique(times[::-1], return_index=True)
+        rows = len(times) - 1 - last
+        samples.setdefault(stimulus, []).append((times[rows], values[rows]))
+
+    return {stimulus: sum_per_bin(np.concatenate([times for times, _ in parts]),
+                                  np.concatenate([values for _, values in parts]))
+            for stimulus, parts in samples.items()}
+
+def sum_per_bin(times, values):
+    """
+    Returns the sorted unique bin times and the sum and count of the non-NaN values per bin.
+    """
+    bin_times, positions = np.unique(times, return_inverse=True)
+    valid = ~np.isnan(values)
+    sums = np.zeros((len(bin_times), values.shape[1]))
+    counts = np.zeros((len(bin_times), values.shape[1]), dtype=int)
+    np.add.at(sums, positions, np.where(valid, values, 0.0))
+    np.add.at(counts, positions, valid)
+    return bin_times, sums, counts
+
+def merge_average_path_sums(results, average_paths_folder=average_paths_folder, **parameters):
+    """
+    Adds up the sums and counts of all shards and writes the average path of every stimulus
+    (the same values as create_average_paths_files()).
+    """
+    os.makedirs(average_paths_folder, exist_ok=True)
+    stimulus_sums = {}
+    for result in results:
+        for stimulus, part in (result or {}).items():
+            stimulus_sums.setdefault(stimulus, []).append(part)
+
+    for stimulus, parts in stimulus_sums.items():
+        bin_times, positions = np.unique(np.concatenate([times for times, _, _ in parts]), return_inverse=True)
+        sums = np.zeros((len(bin_times), len(gaze_columns)))
+        counts = np.zeros((len(bin_times), len(gaze_columns)), dtype=int)
+        np.add.at(sums, positions, np.concatenate([part_sums for _, part_sums, _ in parts]))
+        np.add.at(counts, positions, np.concatenate([part_counts for _, _, part_counts in parts]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            avg_values = np.where(counts > 0, sums / counts, np.nan)
+
+        avg_df = pd.DataFrame(avg_values, index=pd.Index(bin_times, name='SnappedTime'), columns=gaze_columns)
+        rename_average_gaze_columns(avg_df)
+        force_columns_to_numeric(avg_df)
+        avg_df.to_csv(os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv"))
+        average_path_cache.invalidate(stimulus, average_paths_folder)
+
+    print("Average path calculations complete. Results saved.")
+
+def gaze_deviation_shard(shard, participant_dataset, average_paths_folder=average_paths_folder, bin_width=None,
+                         workers=1, stimulus_catalog_file=stimulus_catalog_file):
+    """
+    Calculates the gaze deviation columns of one participant file.
+    """
+    calculate_participant_gaze_deviation(shard["file"], average_paths_folder, bin_width, stimulus_catalog_file)
+
+def merge_nothing(results, **parameters):
+    """
+    For stages whose shards write their own output.
+    """
+
+# Pipeline stage name -> (shards from the stage arguments, shard function, merge function)
+sharded_stages = {
+    "cleanup": (lambda arguments, stimulus_groups: participant_file_shards(arguments["participant_dataset"], "*.csv"),
+                cleanup_shard, merge_cleanup),
+    "saccades": (lambda arguments, stimulus_groups: participant_stimulus_shards(
+                     arguments["experiment_statistics_file"], stimulus_groups),
+                 saccades_shard, merge_saccades),
+    "average_paths": (lambda arguments, stimulus_groups: participant_stimulus_shards(
+                          arguments["experiment_statistics_file"], stimulus_groups),
+                      average_path_sums_shard, merge_average_path_sums),
+    "gaze_deviation": (lambda arguments, stimulus_groups: participant_file_shards(arguments["participant_dataset"]),
+                       gaze_deviation_shard, merge_nothing)
+}
+
+def create_queue(queue_folder, stage, arguments, shards):
+    """
+    Creates a queue directory with a pending file per shard. An earlier queue in
+    'queue_folder' is replaced.
+
+    Raises:
+      ValueError: If 'queue_folder' exists but isn't a queue directory.
+    """
+    if os.path.exists(queue_folder):
+        if not os.path.exists(os.path.join(queue_folder, "job.json")) and os.listdir(queue_folder):
+            raise ValueError(f"'{queue_folder}' exists and isn't a shard queue")
+        shutil.rmtree(queue_folder)
+
+    for folder in queue_folders:
+        os.makedirs(os.path.join(queue_folder, folder))
+    for shard in shards:
+        with open(os.path.join(queue_folder, "pending", f"{shard['id']}.json"), "w") as f:
+            json.dump(to_json_compatible(shard), f)
+
+    # Written last: workers only start once the queue is complete
+    write_atomically(os.path.join(queue_folder, "job.json"),
+                     lambda f: f.write(json.dumps({"stage": stage, "arguments": arguments,
+                                                   "shards": [shard["id"] for shard in shards]}).encode()))
+
+def read_job(queue_folder):
+    with open(os.path.join(queue_folder, "job.json")) as f:
+        return json.load(f)
+
+def claim_shard(queue_folder):
+    """
+    Claims the next pending shard by moving it to 'claimed'. Only one worker can move a
+    file, so every shard is claimed once.
+
+    Returns:
+      dict or None: The shard, None if nothing is pending.
+    """
+    for pending_file in sorted(glob.glob(os.path.join(queue_folder, "pending", "*.json"))):
+        claimed_file = os.path.join(queue_folder, "claimed", os.path.basename(pending_file))
+        try:
+            os.rename(pending_file, claimed_file)
+            # The modification time marks the claim, for requeue_stale_claims()
+            os.utime(claimed_file)
+            with open(claimed_file) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            # Claimed by another worker (or requeued meanwhile)
+            continue
+    return None
+
+def run_worker(queue_folder, worker_id=0):
+    """
+    Processes shards of a queue until none is pending.
+
+    Returns:
+      int: Number of shards processed.
+    """
+    job = read_job(queue_folder)
+    _, shard_function, _ = sharded_stages[job["stage"]]
+    processed = 0
+
+    while (shard := claim_shard(queue_folder)) is not None:
+        result_file = os.path.join(queue_folder, "results", f"{shard['id']}.pkl")
+        try:
+            result = shard_function(shard, **job["arguments"])
+            # The first result of a shard counts, a requeued copy's is dropped
+            if not write_atomically(result_file, partial(pickle.dump, result), replace=False):
+                print(f"Warning: shard {shard['id']} already has a result (worker {worker_id}). Dropping this one.")
+        except Exception as e:
+            print(f"Error in shard {shard['id']} (worker {worker_id}): {e}")
+            if not os.path.exists(result_file):
+                write_atomically(os.path.join(queue_folder, "failed", f"{shard['id']}.txt"),
+                                 lambda f: f.write(str(e).encode()))
+
+        try:
+            os.remove(os.path.join(queue_folder, "claimed", f"{shard['id']}.json"))
+        except FileNotFoundError:
+            pass
+        processed += 1
+
+    return processed
+
+def requeue_stale_claims(queue_folder, stale_after):
+    """
+    Moves shards claimed more than 'stale_after' seconds ago without a result back to
+    'pending' (e.g. after a node failed). If the first worker was only slow, both run the
+    shard: the participant files are replaced atomically and only the first result is kept.
+    """
+    now = time.time()
+    for claimed_file in glob.glob(os.path.join(queue_folder, "claimed", "*.json")):
+        try:
+            if now - os.stat(claimed_file).st_mtime > stale_after:
+                os.rename(claimed_file, os.path.join(queue_folder, "pending", os.path.basename(claimed_file)))
+                print(f"Warning: requeued stale shard {os.path.basename(claimed_file)}.")
+        except FileNotFoundError:
+            continue
+
+def wait_for_shards(queue_folder, poll_interval=1.0, stale_after=None):
+    """
+    Waits until every shard of the queue has a result or failed.
+
+    Returns:
+      int: Number of shards that failed (0 if all have a result).
+    """
+    shard_ids = read_job(queue_folder)["shards"]
+    while True:
+        succeeded, failed = ({os.path.splitext(name)[0] for name in os.listdir(os.path.join(queue_folder, folder))
+                              if not name.endswith(".tmp")} for folder in ("results", "failed"))
+        if all(shard_id in succeeded or shard_id in failed for shard_id in shard_ids):
+            return len(set(shard_ids) - succeeded)
+        if stale_after is not None:
+            requeue_stale_claims(queue_folder, stale_after)
+        time.sleep(poll_interval)
+
+def merge_results(queue_folder):
+    """
+    Merges the partial results of a finished queue, one per shard. Failed shards are
+    reported and left out.
+    """
+    job = read_job(queue_folder)
+    _, _, merge_function = sharded_stages[job["stage"]]
+
+    results = []
+    for shard_id in dict.fromkeys(job["shards"]):
+        result_file = os.path.join(queue_folder, "results", f"{shard_id}.pkl")
+        if not os.path.exists(result_file):
+            print(f"Warning: shard {shard_id} failed. Its data is left out.")
+            continue
+        with open(result_file, "rb") as f:
+            results.append(pickle.load(f))
+
+    merge_function(results, **job["arguments"])
+
+def run_sharded_stage(stage, arguments, queue_folder=shard_queue_folder, workers=1, stimulus_groups=1,
+                      poll_interval=1.0, stale_after=None):
+    """
+    Runs a pipeline stage as shards on independent workers and merges their results.
+
+    Parameters:
+      stage (str): 'cleanup', 'saccades', 'average_paths' or 'gaze_deviation'.
+      arguments (dict): The stage's arguments (see pipeline.stage_arguments()).
+      queue_folder (str): The queue directory, shared by all workers.
+      workers (int): Local worker processes; 0 to only wait for workers started elsewhere.
+      stimulus_groups (int): Split the stimuli of a participant into this many shards
+                             ('saccades' and 'average_paths').
+      poll_interval (float): Seconds between checks for finished shards.
+      stale_after (float or None): Requeue shards claimed longer ago than this [s].
+
+    Returns:
+      int: Number of failed shards, whose data is missing from the merged output.
+
+    Raises:
+      ValueError: For a stage that can't be sharded.
+    """
+    if stage not in sharded_stages:
+        raise ValueError(f"Stage '{stage}' can't be sharded, expected one of {list(sharded_stages)}")
+
+    make_shards, _, _ = sharded_stages[stage]
+    shards = make_shards(arguments, stimulus_groups)
+    create_queue(queue_folder, stage, arguments, shards)
+    print(f"Queued {len(shards)} shards of stage '{stage}' in {queue_folder}")
+
+    if workers > 0:
+        map_in_processes(partial(run_worker, queue_folder), range(workers), workers)
+    failed = wait_for_shards(queue_folder, poll_interval, stale_after)
+    merge_results(queue_folder)
+    return failed
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python -m src.sharding <queue folder>")
+        sys.exit(1)
+    print(f"Processed {run_worker(sys.argv[1], os.getpid())} shards.")
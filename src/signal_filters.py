@@ -0,0 +1,146 @@
+"""
+Signal conditioning of the gaze coordinates, applied while the participant files are cleaned.
+Short tracking gaps (blinks, samples with NaN or zero coordinates) can be filled by linear
+interpolation, and tracker jitter can be reduced with a Savitzky-Golay or median filter.
+Both work on all participant-experiment-stimulus groups of a file at once, and both are
+disabled unless selected for a run.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from src.load_data import *
+from src.event_extraction import group_columns, eye_columns
+
+smoothing_methods = ["savgol", "median"]
+
+def eye_coordinates(df, x_column, y_column):
+    """
+    Returns the coordinates of one eye and which samples are valid.
+    A sample is valid if it's not a 'Separator' row and its coordinates are not NaN
+    and not both zero.
+
+    Returns:
+      tuple (x, y, valid): Float arrays and a boolean array.
+    """
+    x = pd.to_numeric(df[x_column], errors="coerce").to_numpy(dtype=float)
+    y = pd.to_numeric(df[y_column], errors="coerce").to_numpy(dtype=float)
+    separator = ((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator")).to_numpy()
+    valid = ~separator & ~(np.isnan(x) | np.isnan(y)) & ~((x == 0) & (y == 0))
+
+    return x, y, valid
+
+def interpolate_gaps(df, max_gap=100):
+    """
+    Fills gaps of invalid samples by linear interpolation over time, per eye and
+    per participant-experiment-stimulus. A gap is filled only if the time between the
+    last valid sample before it and the first valid sample after it is at most 'max_gap'.
+    Gaps at the start or end of a stimulus are not filled.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'RecordingTime Stimulus [ms]'.
+      max_gap (float): Longest gap to fill [ms].
+
+    Returns:
+      pd.DataFrame: The same DataFrame with interpolated 'Point of Regard' columns.
+    """
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    times = pd.to_numeric(df["RecordingTime Stimulus [ms]"], errors="coerce").to_numpy(dtype=float)
+    separator = ((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator")).to_numpy()
+
+    for x_column, y_column in eye_columns:
+        x, y, valid = eye_coordinates(df, x_column, y_column)
+
+        # Last valid sample before and first valid sample after every row of the same group
+        known = pd.DataFrame({"t": times, "x": x, "y": y}).where(np.repeat(valid[:, None], 3, axis=1))
+        before = known.groupby(keys).ffill().to_numpy()
+        after = known.groupby(keys).bfill().to_numpy()
+
+        gap = after[:, 0] - before[:, 0]
+        with np.errstate(invalid="ignore"):
+            fill = ~valid & ~separator & (gap > 0) & (gap <= max_gap)
+            weight = (times - before[:, 0]) / gap
+
+        df[x_column] = np.where(fill, before[:, 1] + weight * (after[:, 1] - before[:, 1]), x)
+        df[y_column] = np.where(fill, before[:, 2] + weight * (after[:, 2] - before[:, 2]), y)
+
+    return df
+
+def smooth_gaze(df, method="savgol", window=5, polyorder=2):
+    """
+    Smooths the valid samples of each eye within every participant-experiment-stimulus.
+    Invalid samples are skipped (not used and not changed).
+
+    Methods:
+      - 'savgol': Savitzky-Golay filter. Samples without a full window inside their group
+        (at the start and end of a stimulus) keep their value.
+      - 'median': Median of the window, using only the samples inside the group.
+
+    Parameters:
+      df (pd.DataFrame): Participant data.
+      method (str): 'savgol' or 'median'.
+      window (int): Odd number of samples in the filter window.
+      polyorder (int): Polynomial order of the Savitzky-Golay filter.
+
+    Returns:
+      pd.DataFrame: The same DataFrame with smoothed 'Point of Regard' columns.
+
+    Raises:
+      ValueError: For an unknown method or an even/too small window.
+    """
+    if method not in smoothing_methods:
+        raise ValueError(f"Unknown smoothing method '{method}', expected one of {smoothing_methods}")
+    if window < 3 or window % 2 == 0:
+        raise ValueError(f"Smoothing window must be an odd number >= 3, got {window}")
+
+    half = window // 2
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    coefficients = None
+    if method == "savgol":
+        from scipy.signal import savgol_coeffs
+        coefficients = savgol_coeffs(window, polyorder, use="dot")
+
+    for x_column, y_column in eye_columns:
+        x, y, valid = eye_coordinates(df, x_column, y_column)
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            continue
+
+        # Windows over the valid samples; positions outside the row's group are masked
+        padded_keys = np.r_[np.full(half, -1), keys[rows], np.full(half, -1)]
+        in_group = sliding_window_view(padded_keys, window) == keys[rows][:, None]
+
+        for column, values in ((x_column, x), (y_column, y)):
+            windows = sliding_window_view(np.r_[np.full(half, np.nan), values[rows], np.full(half, np.nan)], window)
+            if method == "savgol":
+                full_window = in_group.all(axis=1)
+                smoothed = np.where(full_window, np.nan_to_num(windows) @ coefficients, values[rows])
+            else:
+                smoothed = np.nanmedian(np.where(in_group, windows, np.nan), axis=1)
+
+            values = values.copy()
+            values[rows] = smoothed
+            df[column] = values
+
+    return df
+
+def condition_gaze_signals(df, max_gap=None, smoothing=None, smoothing_window=5, polyorder=2):
+    """
+    Applies the selected filters: gap interpolation first, then smoothing.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'RecordingTime Stimulus [ms]'.
+      max_gap (float or None): Longest gap to interpolate [ms], None to disable.
+      smoothing (str or None): 'savgol', 'median' or None to disable.
+      smoothing_window (int): Odd number of samples in the smoothing window.
+      polyorder (int): Polynomial order of the Savitzky-Golay filter.
+
+    Returns:
+      pd.DataFrame: The same DataFrame (unchanged if no filter is selected).
+    """
+    if max_gap is not None:
+        interpolate_gaps(df, max_gap)
+    if smoothing is not None:
+        smooth_gaze(df, smoothing, smoothing_window, polyorder)
+
+    return df
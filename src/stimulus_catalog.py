@@ -0,0 +1,149 @@
+"""
+Catalog of the stimuli: a compact integer ID for every stimulus name, with its attributes.
+The exported names carry order numbers, file extensions, copy suffixes and spelling
+variants ('04 b joie triste - copie.jpg', '12 tete chat G.png', '12 tete chat gauche.jpg'),
+so the catalog also gives every name a normalized form and groups the names that are
+copies of the same stimulus.
+
+The stages that match rows of 'experiment_statistics.csv' with the samples of the
+participant files translate both sides to the catalog IDs once (stimulus_codes()) and
+join on the integers; the names are only used for the output.
+
+Columns of 'stimulus_catalog.csv':
+  StimulusID:    0 .. stimuli - 1, in the order of the sorted names.
+  Stimulus:      The exported name.
+  Normalized:    Lower case, without order number, extension and copy suffix, with
+                 'gauche' / 'droite' as 'g' / 'd'.
+  Media:         'image', 'video' or 'none' (e.g. 'NoImage'), from the extension.
+  Order:         The leading order number of the name, if any.
+  Duration [ms]: The median recording length ('RecordingTime Stimulus [ms]').
+  Recordings, Participants: How often the stimulus was recorded, and by how many participants.
+  CopyGroup:     Shared by the names whose normalized forms differ only in spacing.
+  CopyGroupSize: The number of names in the copy group.
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+from src.load_data import *
+
+image_extensions = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+
+video_extensions = {".avi", ".mp4", ".wmv", ".mov", ".mpg", ".mpeg"}
+
+side_words = {"gauche": "g", "droite": "d"}
+
+def split_stimulus_name(name):
+    """
+    Returns (order number or None, name without order number and extension, media type) of a stimulus name.
+    """
+    base, extension = os.path.splitext(str(name).strip())
+    extension = extension.lower()
+    if extension in image_extensions:
+        media = "image"
+    elif extension in video_extensions:
+        media = "video"
+    else:
+        base, media = str(name).strip(), "none"
+
+    order = re.match(r"^(\d+)\s*", base)
+    if order:
+        base = base[order.end():]
+    return (int(order.group(1)) if order else None), base, media
+
+def normalize_stimulus_name(name):
+    """
+    Returns the normalized form of a stimulus name (see the module docstring).
+    """
+    _, base, _ = split_stimulus_name(name)
+    base = re.sub(r"\s*-\s*copie$", "", base.lower())
+    return " ".join(side_words.get(word, word) for word in base.split())
+
+def recording_durations(participant_dataset=participant_dataset):
+    """
+    Returns the length [ms] of every recording of the cleaned participant files, indexed by
+    (Participant, Experiment, Stimulus). Files without 'RecordingTime Stimulus [ms]' are skipped.
+    """
+    columns = ["Participant", "Experiment", "Stimulus", "RecordingTime Stimulus [ms]"]
+    durations = []
+    for file in sorted(os.listdir(participant_dataset)):
+        if not (file.startswith("Participant_") and file.endswith(".csv")):
+            continue
+        try:
+            df = pd.read_csv(os.path.join(participant_dataset, file), usecols=columns)
+        except (ValueError, pd.errors.EmptyDataError):
+            print(f"Warning: {file} has no stimulus recording times. Skipping.")
+            continue
+        durations.append(df.groupby(columns[:3])[columns[3]].max())
+    return pd.concat(durations) if durations else pd.Series(dtype=float)
+
+def build_stimulus_catalog(experiment_statistics_file=experiment_statistics_file,
+                           participant_dataset=participant_dataset):
+    """
+    Builds the catalog of the stimuli of 'experiment_statistics.csv'.
+
+    Returns:
+      pd.DataFrame: One row per stimulus (see the module docstring).
+    """
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    recordings = experiment_stats.groupby("Stimulus")
+    catalog = pd.DataFrame({"Stimulus": sorted(experiment_stats["Stimulus"].dropna().unique())})
+    catalog.insert(0, "StimulusID", np.arange(len(catalog)))
+
+    parts = [split_stimulus_name(name) for name in catalog["Stimulus"]]
+    catalog["Normalized"] = [normalize_stimulus_name(name) for name in catalog["Stimulus"]]
+    catalog["Media"] = [media for _, _, media in parts]
+    catalog["Order"] = pd.array([order for order, _, _ in parts], dtype="Int64")
+
+    durations = recording_durations(participant_dataset)
+    median_durations = durations.groupby(level="Stimulus").median() if len(durations) else pd.Series(dtype=float)
+    catalog["Duration [ms]"] = catalog["Stimulus"].map(median_durations)
+    catalog["Recordings"] = catalog["Stimulus"].map(recordings.size()).astype(int)
+    catalog["Participants"] = catalog["Stimulus"].map(recordings["Participant"].nunique()).astype(int)
+
+    catalog["CopyGroup"] = pd.factorize(catalog["Normalized"].str.replace(" ", ""))[0]
+    catalog["CopyGroupSize"] = catalog.groupby("CopyGroup")["StimulusID"].transform("size")
+    return catalog
+
+def create_stimulus_catalog(experiment_statistics_file=experiment_statistics_file,
+                            participant_dataset=participant_dataset, stimulus_catalog_file=stimulus_catalog_file):
+    """
+    Builds the stimulus catalog and saves it to 'stimulus_catalog_file'.
+
+    Parameters:
+      experiment_statistics_file (str): Lists the recorded stimuli.
+      participant_dataset (str): Folder with the cleaned participant files, for the durations.
+      stimulus_catalog_file (str): Output CSV path.
+    """
+    catalog = build_stimulus_catalog(experiment_statistics_file, participant_dataset)
+    catalog.to_csv(stimulus_catalog_file, index=False)
+    copies = (catalog["CopyGroupSize"] > 1).sum()
+    print(f"Stimulus catalog with {len(catalog)} stimuli ({copies} in copy groups) saved to {stimulus_catalog_file}")
+    return catalog
+
+def load_stimulus_ids(stimuli=(), stimulus_catalog_file=stimulus_catalog_file):
+    """
+    Returns the stimulus names in the order of their IDs: those of the catalog, if it exists,
+    followed by the names of 'stimuli' that aren't in it.
+
+    Returns:
+      pd.Index: The position of a name is its ID.
+    """
+    names = []
+    if os.path.exists(stimulus_catalog_file):
+        names = pd.read_csv(stimulus_catalog_file, dtype={"Stimulus": str}).sort_values("StimulusID")["Stimulus"].tolist()
+    ids = pd.Index(names, dtype=object)
+    missing = pd.Index(pd.unique(pd.Series(stimuli, dtype=object).dropna())).difference(ids, sort=False)
+    return ids.append(missing) if len(missing) else ids
+
+def stimulus_codes(stimuli, ids):
+    """
+    Returns the ID of every stimulus name (-1 for names that aren't in 'ids' and for NaN).
+
+    Parameters:
+      stimuli (array-like): Stimulus names, e.g. the 'Stimulus' column of a participant file.
+      ids (pd.Index): From load_stimulus_ids().
+    """
+    codes, names = pd.factorize(pd.Series(stimuli, dtype=object))
+    return np.where(codes >= 0, ids.get_indexer(names)[codes], -1) if len(names) else np.full(len(codes), -1)
@@ -0,0 +1,317 @@
+"""
+Incremental processing of a live eye-tracker feed.
+Batches of raw samples (same columns as the raw experiment exports) are time-normalized
+and snapped on the fly, producing the same rows as the batch cleanup writes, and the
+saccade and deviation-from-average-path metrics are kept up to date while the session
+is being recorded. Every sample costs a constant amount of work: only the samples of
+the currently open SnappedTime bin are kept in memory.
+
+follow_csv() tails a CSV file that is still being written, as a stand-in for a live feed.
+"""
+
+import os
+import io
+import time
+import pandas as pd
+from src.load_data import *
+from src.calculate_gaze_paths import calculate_distance_per_eye
+from src.average_path_cache import average_path_cache
+
+stream_metric_columns = [
+    "Saccade_Frequency",
+    "Avg_Saccade_Duration",
+    "Avg_Gaze_Deviation",
+    "Avg_Fixation_Deviation",
+    "Avg_Saccade_Deviation"
+]
+
+class StreamingSession:
+    """
+    Processes the raw samples of one experiment as they arrive.
+
+    Usage:
+        session = StreamingSession(experiment=12)
+        for batch in feed:
+            processed_rows = session.process_batch(batch)
+        processed_rows = session.flush()
+        session.metrics()
+
+    Rows are returned once they are final: their 'Duration' is known (the next sample
+    arrived) and their SnappedTime bin is closed (a later sample fell in a later bin).
+    """
+
+    def __init__(self, experiment, snap_interval=20, average_paths_folder=average_paths_folder):
+        """
+        Parameters:
+          experiment (int or str): The experiment number (in the batch pipeline it comes
+                                   from the raw file name).
+          snap_interval (int): SnappedTime bin width in ms.
+          average_paths_folder (str): Folder with the 'AveragePath_<stimulus>.csv' files.
+        """
+        self.experiment = experiment
+        self.snap_interval = snap_interval
+        self.average_paths_folder = average_paths_folder
+
+        self.experiment_start = {}  # participant -> first RecordingTime [ms]
+        self.stimulus_start = {}    # (participant, stimulus) -> first normalized time
+        self.buffers = {}           # participant -> rows waiting to be final
+        self.open_bins = {}         # participant -> [(stimulus, interval), best row, distance]
+        self.running = {}           # (participant, stimulus) -> running metric sums
+
+    def process_batch(self, batch):
+        """
+        Cleans and processes a batch of raw samples.
+
+        Parameters:
+          batch (pd.DataFrame): Raw samples, in recording order.
+
+        Returns:
+          pd.DataFrame: The rows that became final, with the columns of a cleaned
+                        participant file plus the gaze deviation columns.
+        """
+        # Like the participant files written by clean_and_extract_eyetracking_data, separator
+        # rows and missing values are kept
+        ready = []
+        for row in batch.to_dict("records"):
+            ready.extend(self._process_sample(row))
+
+        return pd.DataFrame(ready)
+
+    def flush(self):
+        """
+        Closes all open bins and returns the remaining rows (call at the end of the session).
+        The last row of every participant keeps a 'Duration' of 0, as in calculate_duration.
+
+        Returns:
+          pd.DataFrame: The remaining rows.
+        """
+        ready = []
+        for participant in list(self.buffers):
+            self._close_bin(participant)
+            ready.extend(self._finalize(row) for row in self.buffers.pop(participant))
+
+        return pd.DataFrame(ready)
+
+    def metrics(self):
+        """
+        Returns the current metrics of every (Participant, Experiment, Stimulus),
+        computed like analyze_saccades and calculate_experiment_deviation over the final rows.
+
+        Returns:
+          pd.DataFrame: Indexed by Participant, Experiment and Stimulus, with stream_metric_columns.
+        """
+        rows = []
+        for (participant, stimulus), sums in self.running.items():
+            relevant = sums["saccade_samples"] + sums["fixation_samples"]
+            rows.append({
+                "Participant": participant,
+                "Experiment": self.experiment,
+                "Stimulus": stimulus,
+                "Saccade_Frequency": sums["saccade_samples"] / relevant if relevant > 0 else 0,
+                "Avg_Saccade_Duration": sums["saccade_duration"] / sums["saccade_episodes"] if sums["saccade_episodes"] > 0 else 0,
+                "Avg_Gaze_Deviation": running_mean(sums, "gaze"),
+                "Avg_Fixation_Deviation": running_mean(sums, "fixation"),
+                "Avg_Saccade_Deviation": running_mean(sums, "saccade")
+            })
+
+        metrics = pd.DataFrame(rows, columns=["Participant", "Experiment", "Stimulus"] + stream_metric_columns)
+        return metrics.set_index(["Participant", "Experiment", "Stimulus"])
+
+    def _process_sample(self, row):
+        """
+        Normalizes the time of one sample, updates the open bin and returns the rows
+        that became final.
+        """
+        participant = row["Participant"]
+        stimulus = row["Stimulus"]
+
+        # normalize_recording_time and normalize_recording_time_per_stimulus
+        recording_time = float(row["RecordingTime [ms]"])
+        recording_time -= self.experiment_start.setdefault(participant, recording_time)
+        if pd.isna(stimulus):
+            stimulus_time = float("nan")
+        else:
+            stimulus_time = recording_time - self.stimulus_start.setdefault((participant, stimulus), recording_time)
+
+        row["RecordingTime [ms]"] = recording_time
+        row["Experiment"] = self.experiment
+        row["RecordingTime Stimulus [ms]"] = stimulus_time
+        row["Duration"] = 0.0
+        row["SnappedTime"] = None
+
+        # calculate_duration: the previous row lasts until this one
+        buffer = self.buffers.setdefault(participant, [])
+        if buffer:
+            buffer[-1]["Duration"] = recording_time - buffer[-1]["RecordingTime [ms]"]
+
+        # Rows without a stimulus get no SnappedTime and don't close the open bin
+        if pd.isna(stimulus):
+            buffer.append(row)
+            return []
+
+        # calculate_snapped_time: keep the closest sample of the open bin
+        interval = round(stimulus_time / self.snap_interval) * self.snap_interval
+        distance = abs(stimulus_time - interval)
+        open_bin = self.open_bins.get(participant)
+
+        if open_bin is not None and open_bin[0] == (stimulus, interval):
+            if distance < open_bin[2]:
+                open_bin[1], open_bin[2] = row, distance
+            buffer.append(row)
+            return []
+
+        # A new bin started, so every buffered row is final
+        self._close_bin(participant)
+        self.open_bins[participant] = [(stimulus, interval), row, distance]
+
+        ready = [self._finalize(buffered) for buffered in buffer]
+        buffer[:] = [row]
+        return ready
+
+    def _close_bin(self, participant):
+        """
+        Gives the closest sample of a participant's open bin its SnappedTime.
+        """
+        open_bin = self.open_bins.pop(participant, None)
+        if open_bin is not None:
+            open_bin[1]["SnappedTime"] = float(open_bin[0][1])
+
+    def _finalize(self, row):
+        """
+        Calculates the gaze deviation of a final row and adds it to the running metrics.
+        """
+        row["Gaze Deviation Right"] = 0.0
+        row["Gaze Deviation Left"] = 0.0
+        row["Overall Gaze Deviation"] = 0.0
+
+        avg_data = self._average_values(row["Stimulus"], row["SnappedTime"])
+
+        # Same rules as calculate_gaze_deviation
+        if avg_data is not None and not (row.get("Category Left") == "blink" or row.get("Category Right") == "blink"):
+            right_dist = calculate_distance_per_eye(
+                row, "Point of Regard Right X [px]", "Point of Regard Right Y [px]", "right_x", "right_y", avg_data
+            )
+            left_dist = calculate_distance_per_eye(
+                row, "Point of Regard Left X [px]", "Point of Regard Left Y [px]", "left_x", "left_y", avg_data
+            )
+            row["Gaze Deviation Right"] = right_dist
+            row["Gaze Deviation Left"] = left_dist
+
+            if right_dist > 0 and left_dist > 0:
+                row["Overall Gaze Deviation"] = (right_dist + left_dist) / 2
+            elif right_dist > 0:
+                row["Overall Gaze Deviation"] = right_dist
+            elif left_dist > 0:
+                row["Overall Gaze Deviation"] = left_dist
+
+        self._update_metrics(row)
+        return row
+
+    def _update_metrics(self, row):
+        """
+        Adds a final row to the running sums of its (participant, stimulus).
+        """
+        sums = self.running.setdefault((row["Participant"], row["Stimulus"]), {
+            "saccade_samples": 0, "fixation_samples": 0, "saccade_episodes": 0,
+            "saccade_duration": 0.0, "in_saccade": False,
+            "gaze_sum": 0.0, "gaze_count": 0, "fixation_sum": 0.0, "fixation_count": 0,
+            "saccade_sum": 0.0, "saccade_count": 0
+        })
+        categories = (row["Category Left"], row["Category Right"])
+        is_saccade = "Saccade" in categories
+        is_fixation = "Fixation" in categories
+
+        sums["saccade_samples"] += is_saccade
+        sums["fixation_samples"] += is_fixation
+        if is_saccade:
+            sums["saccade_episodes"] += not sums["in_saccade"]
+            sums["saccade_duration"] += row["Duration"]
+        sums["in_saccade"] = is_saccade
+
+        deviation = row["Overall Gaze Deviation"]
+        if deviation > 0:
+            sums["gaze_sum"] += deviation
+            sums["gaze_count"] += 1
+            if is_fixation:
+                sums["fixation_sum"] += deviation
+                sums["fixation_count"] += 1
+            if is_saccade:
+                sums["saccade_sum"] += deviation
+                sums["saccade_count"] += 1
+
+    def _average_values(self, stimulus, snapped_time):
+        """
+        Returns the average path values of a stimulus at a snapped time, from the shared
+        average_path_cache. Returns None if there is no average path file or the snapped
+        time isn't in it.
+        """
+        if snapped_time is None:
+            return None
+
+        lookup = average_path_cache.lookup(stimulus, [snapped_time], self.average_paths_folder)
+        if lookup is None or not lookup[0][0]:
+            return None
+
+        right_x, right_y, left_x, left_y = lookup[1][0]
+        return {"right_x": right_x, "right_y": right_y, "left_x": left_x, "left_y": left_y}
+
+def running_mean(sums, name):
+    """
+    Returns the running mean of a deviation sum, or 0 if nothing was added yet.
+    """
+    count = sums[f"{name}_count"]
+    return sums[f"{name}_sum"] / count if count > 0 else 0.0
+
+def follow_csv(file_path, poll_interval=0.1, idle_timeout=1.0):
+    """
+    Tails a CSV file that is still being written and yields the new complete lines
+    as DataFrames. Stops once nothing new arrived for 'idle_timeout' seconds.
+
+    Parameters:
+      file_path (str): The CSV file (its first line must be the header).
+      poll_interval (float): Seconds between checks for new data.
+      idle_timeout (float): Seconds without new data before stopping.
+
+    Yields:
+      pd.DataFrame: The rows appended since the previous batch.
+    """
+    with open(file_path) as f:
+        header = f.readline()
+        partial = ""
+        idle_since = time.monotonic()
+
+        while time.monotonic() - idle_since < idle_timeout:
+            chunk = f.read()
+            if not chunk:
+                time.sleep(poll_interval)
+                continue
+
+            idle_since = time.monotonic()
+            lines = (partial + chunk).split("\n")
+            partial = lines.pop()  # keep an unfinished last line for the next read
+
+            complete = [line for line in lines if line.strip()]
+            if complete:
+                yield pd.read_csv(io.StringIO(header + "\n".join(complete)))
+
+def stream_csv_file(file_path, experiment, snap_interval=20, average_paths_folder=average_paths_folder,
+                    poll_interval=0.1, idle_timeout=1.0):
+    """
+    Runs a StreamingSession over a CSV file that is being written (see follow_csv).
+
+    Parameters:
+      file_path (str): The raw experiment CSV.
+      experiment (int or str): The experiment number.
+      snap_interval (int): SnappedTime bin width in ms.
+      average_paths_folder (str): Folder with the average path files.
+      poll_interval (float): Seconds between checks for new data.
+      idle_timeout (float): Seconds without new data before the session ends.
+
+    Returns:
+      tuple (session, rows): The finished session and all processed rows.
+    """
+    session = StreamingSession(experiment, snap_interval, average_paths_folder)
+    processed = [session.process_batch(batch) for batch in follow_csv(file_path, poll_interval, idle_timeout)]
+    processed.append(session.flush())
+
+    return session, pd.concat(processed, ignore_index=True)
@@ -0,0 +1,254 @@
+"""
+Time-resolved comparison of the ASD and TD groups.
+Instead of one average per stimulus, the deviation from the average path is compared at
+every SnappedTime bin of a stimulus, and the windows where the groups differ are found
+with a cluster-based permutation test (Maris & Oostenveld, 2007):
+
+  1. Each participant's deviation curve is the per-bin mean over their recordings of the
+     stimulus, computed from the cohort tensor (see src/cohort_tensor.py) against the
+     average path of all recordings, like calculate_gaze_deviation().
+  2. Every bin gets a two-sample t statistic (ASD - TD). Neighbouring bins whose |t|
+     exceeds the two-sided 'alpha' threshold with the same sign form a cluster, whose mass
+     is the sum of its t values.
+  3. The class labels are permuted across participants; the largest cluster mass of every
+     permutation gives the null distribution the observed clusters are compared with,
+     which controls the error rate over all bins of the stimulus.
+
+The group sums are matrix products of a (permutations, participants) label matrix with
+the (participants, bins) curves and the clusters of all permutations are labelled at once,
+so a batch of permutations costs a few array operations regardless of the number of bins.
+"""
+
+import numpy as np
+import pandas as pd
+from functools import partial
+from scipy.stats import t as t_distribution
+from src.load_data import *
+from src.cohort_tensor import get_cohort_tensors, masked_mean
+from src.calculate_gaze_paths import calculate_distance_per_eye_vectorized
+from src.parallel import map_in_processes
+
+def participant_deviation_curves(tensor):
+    """
+    Returns the deviation from the average path per participant and bin of a cohort tensor.
+
+    Parameters:
+      tensor (dict): A cohort tensor.
+
+    Returns:
+      tuple (participants, classes, curves, present):
+        participants, classes (np.ndarray): The ASD and TD participants and their class.
+        curves (np.ndarray): (participants, bins) mean overall deviation of the participant's
+                             recordings, 0 where 'present' is False.
+        present (np.ndarray): (participants, bins) True where a recording had a usable sample.
+    """
+    values = tensor["values"]
+    _, average = masked_mean(tensor)
+    right = calculate_distance_per_eye_vectorized(values[..., 0], values[..., 1], values[..., 1],
+                                                  average[:, 0], average[:, 1])
+    left = calculate_distance_per_eye_vectorized(values[..., 2], values[..., 3], values[..., 1],
+                                                 average[:, 2], average[:, 3])
+    overall = np.where((right > 0) & (left > 0), (right + left) / 2, np.maximum(right, left))
+    valid = tensor["mask"] & (overall > 0)
+
+    included = np.isin(tensor["classes"], ["ASD", "TD"])
+    codes, participants = pd.factorize(tensor["participants"][included])
+    indicator = np.zeros((len(participants), included.sum()))
+    indicator[codes, np.arange(len(codes))] = 1
+
+    sums = indicator @ np.where(valid, overall, 0.0)[included]
+    counts = indicator @ valid[included]
+    present = counts > 0
+    curves = np.divide(sums, counts, out=np.zeros_like(sums), where=present)
+
+    classes = tensor["classes"][included][np.unique(codes, return_index=True)[1]]
+    return np.asarray(participants), classes, curves, present
+
+def group_t_statistics(curves, present, labels, min_participants=2):
+    """
+    Two-sample t statistics (pooled variance) of every bin, for one or more labelings.
+
+    Parameters:
+      curves (np.ndarray): (participants, bins), 0 where not present.
+      present (np.ndarray): (participants, bins) boolean.
+      labels (np.ndarray): (labelings, participants), 1 for ASD and 0 for TD.
+      min_participants (int): Bins with fewer participants in a group get NaN.
+
+    Returns:
+      tuple (t, df): (labelings, bins) t statistics of ASD - TD and their degrees of freedom.
+    """
+    weights = present.astype(float)
+    count, total, squares = weights.sum(axis=0), curves.sum(axis=0), (curves ** 2).sum(axis=0)
+    n_asd, sum_asd = labels @ weights, labels @ curves
+    n_td = count - n_asd
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_asd, mean_td = sum_asd / n_asd, (total - sum_asd) / n_td
+        # Pooled within-group sum of squares: the total minus the group terms
+        within = squares - sum_asd * mean_asd - (total - sum_asd) * mean_td
+        t = (mean_asd - mean_td) * np.sqrt((count - 2) * n_asd * n_td / (count * within))
+    usable = (n_asd >= min_participants) & (n_td >= min_participants) & (within > 1e-12 * squares)
+    return np.where(usable, t, np.nan), np.where(usable, count - 2, 0).astype(int)
+
+def find_clusters(t, threshold):
+    """
+    Labels the clusters of every row: runs of neighbouring bins with |t| above the threshold
+    and the same sign.
+
+    Parameters:
+      t (np.ndarray): (rows, bins) t statistics, NaN where not tested.
+      threshold (np.ndarray): The threshold of every t value.
+
+    Returns:
+      tuple (rows, starts, ends, masses): Per cluster, its row, first and last bin and the sum of its t values.
+    """
+    with np.errstate(invalid="ignore"):
+        supra = np.abs(t) > threshold
+    sign = np.sign(np.where(supra, t, 0.0))
+    continues = np.zeros_like(supra)
+    continues[:, 1:] = supra[:, 1:] & supra[:, :-1] & (sign[:, 1:] == sign[:, :-1])
+    starts = (supra & ~continues).ravel()
+
+    labels = np.cumsum(starts) * supra.ravel()
+    masses = np.bincount(labels, weights=np.where(supra, t, 0.0).ravel(), minlength=starts.sum() + 1)[1:]
+    lengths = np.bincount(labels, minlength=starts.sum() + 1)[1:]
+    rows, first = np.divmod(np.flatnonzero(starts), t.shape[1])
+    return rows, first, first + lengths - 1, masses
+
+def cluster_permutation_test(curves, present, is_asd, n_permutations=1000, alpha=0.05, min_participants=2,
+                             seed=0, batch_size=100):
+    """
+    Cluster-based permutation test of the ASD - TD difference of the curves.
+
+    Parameters:
+      curves (np.ndarray): (participants, bins), 0 where not present.
+      present (np.ndarray): (participants, bins) boolean.
+      is_asd (np.ndarray): Boolean per participant.
+      n_permutations (int): Permutations of the class labels.
+      alpha (float): Two-sided threshold of the bin-wise t-tests that form the clusters.
+      min_participants (int): Bins with fewer participants in a group aren't tested.
+      seed (int): Seed of the permutations.
+      batch_size (int): Permutations handled in one array.
+
+    Returns:
+      tuple (t, clusters):
+        t (np.ndarray): The observed t statistic per bin.
+        clusters (list): Per observed cluster a dict with 'start' and 'end' (bin indices),
+                         'mass' and the permutation 'p_value', (1 + #null >= |mass|) / (1 + permutations).
+    """
+    df_thresholds = t_distribution.ppf(1 - alpha / 2, np.arange(max(len(is_asd) - 1, 2)))
+    df_thresholds[0] = np.inf
+
+    def clusters_of(labels):
+        t, df = group_t_statistics(curves, present, labels, min_participants)
+        return t, find_clusters(t, df_thresholds[df])
+
+    observed = is_asd.astype(float)[None, :]
+    t, (_, starts, ends, masses) = clusters_of(observed)
+
+    null_masses = np.zeros(n_permutations)
+    if len(masses):
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_permutations, batch_size):
+            size = min(batch_size, n_permutations - start)
+            labels = np.array([rng.permutation(observed[0]) for _ in range(size)])
+            _, (rows, _, _, permuted_masses) = clusters_of(labels)
+            np.maximum.at(null_masses, start + rows, np.abs(permuted_masses))
+
+    clusters = [{"start": int(first), "end": int(last), "mass": mass,
+                 "p_value": (1 + (null_masses >= abs(mass) - 1e-9).sum()) / (1 + n_permutations)}
+                for first, last, mass in zip(starts, ends, masses)]
+    return t[0], clusters
+
+def analyze_stimulus_time_course(item, n_permutations=1000, alpha=0.05, min_participants=2, seed=0):
+    """
+    Compares the deviation curves of one stimulus (see cluster_permutation_test()).
+
+    Parameters:
+      item (tuple): (stimulus, cohort tensor).
+
+    Returns:
+      dict or None: bin_times, ASD_mean, TD_mean, t, clusters (with start and end in ms) and
+                    the number of participants per group; None if a group has too few participants.
+    """
+    stimulus, tensor = item
+    _, classes, curves, present = participant_deviation_curves(tensor)
+    is_asd = classes == "ASD"
+    if is_asd.sum() < min_participants or (~is_asd).sum() < min_participants:
+        print(f"Warning: Stimulus '{stimulus}' has fewer than {min_participants} participants per group. Skipping.")
+        return None
+
+    t, clusters = cluster_permutation_test(curves, present, is_asd, n_permutations, alpha, min_participants, seed)
+    bin_times = tensor["bin_times"]
+    for cluster in clusters:
+        cluster["start_time"], cluster["end_time"] = bin_times[cluster["start"]], bin_times[cluster["end"]]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        group_means = [curves[group].sum(axis=0) / present[group].sum(axis=0)
+                       for group in [is_asd, ~is_asd]]
+    return {
+        "bin_times": bin_times,
+        "ASD_mean": group_means[0],
+        "TD_mean": group_means[1],
+        "t": t,
+        "clusters": clusters,
+        "ASD_participants": int(is_asd.sum()),
+        "TD_participants": int((~is_asd).sum())
+    }
+
+def summarize_time_courses(time_courses, alpha=0.05):
+    """
+    Returns one row per stimulus: the group sizes, the number of clusters and of significant
+    ones, the significant windows ('start-end' in ms) and the smallest cluster p-value.
+    """
+    rows = []
+    for stimulus, result in time_courses.items():
+        clusters = result["clusters"]
+        significant = [cluster for cluster in clusters if cluster["p_value"] < alpha]
+        rows.append({
+            "Stimulus": stimulus,
+            "Bins": len(result["bin_times"]),
+            "ASD_Participants": result["ASD_participants"],
+            "TD_Participants": result["TD_participants"],
+            "Clusters": len(clusters),
+            "Significant_Clusters": len(significant),
+            "Significant_Windows": "; ".join(f"{c['start_time']:g}-{c['end_time']:g}" for c in significant),
+            "Min_Cluster_p": min((cluster["p_value"] for cluster in clusters), default=np.nan)
+        })
+    return pd.DataFrame(rows, columns=["Stimulus", "Bins", "ASD_Participants", "TD_Participants", "Clusters",
+                                       "Significant_Clusters", "Significant_Windows", "Min_Cluster_p"])
+
+def run_time_resolved_analysis(participant_dataset=participant_dataset,
+                               experiment_statistics_file=experiment_statistics_file,
+                               metadata_participants=metadata_participants,
+                               cohort_tensors_folder=cohort_tensors_folder, time_resolved_file=time_resolved_file,
+                               n_permutations=1000, alpha=0.05, min_participants=2, seed=0, workers=1):
+    """
+    Runs the cluster-based permutation test on every stimulus and saves the summary table.
+
+    Parameters:
+      participant_dataset (str): Folder with the cleaned participant files.
+      experiment_statistics_file (str): Lists the recordings of every stimulus.
+      metadata_participants (str): Provides the class of every participant.
+      cohort_tensors_folder (str): Cache folder of the cohort tensors.
+      time_resolved_file (str): Output CSV path of the summary.
+      n_permutations (int): Permutations of the class labels per stimulus.
+      alpha (float): Threshold of the bin-wise tests and of the significant clusters.
+      min_participants (int): Minimum participants per group, per stimulus and per bin.
+      seed (int): Seed of the permutations.
+      workers (int): Processes analyzing stimuli in parallel.
+
+    Returns:
+      tuple (summary, time_courses): The table of summarize_time_courses() and, per stimulus,
+                                     the curves of analyze_stimulus_time_course().
+    """
+    tensors = get_cohort_tensors(participant_dataset, experiment_statistics_file, metadata_participants,
+                                 cohort_tensors_folder)
+    results = map_in_processes(partial(analyze_stimulus_time_course, n_permutations=n_permutations, alpha=alpha,
+                                       min_participants=min_participants, seed=seed), tensors.items(), workers)
+    time_courses = {stimulus: result for stimulus, result in zip(tensors, results) if result is not None}
+
+    summary = summarize_time_courses(time_courses, alpha)
+    summary.to_csv(time_resolved_file, index=False)
+    print(f"Time-resolved differences saved to {time_resolved_file}")
+    return summary, time_courses
@@ -0,0 +1,61 @@
+"""
+Small helpers shared by several modules.
+"""
+
+import os
+import math
+import socket
+import numpy as np
+import pandas as pd
+
+def file_stamps(*file_paths):
+    """
+    Returns the [modification time, size] of each file, to detect changed inputs.
+    """
+    return [[os.stat(path).st_mtime_ns, os.stat(path).st_size] for path in file_paths]
+
+def write_atomically(path, write, replace=True):
+    """
+    Writes a file through a temporary file and a rename, so readers never see a partial file
+    and two processes writing the same file (e.g. a shard that was requeued while its first
+    worker was still running) don't mix their output. 'write' is called with the open binary file.
+
+    Parameters:
+      path (str): The file to write.
+      write (callable): Writes the content to the file it is given.
+      replace (bool): Replace an existing file; if False, an existing file is kept.
+
+    Returns:
+      bool: Whether the file was written.
+    """
+    temporary_path = f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, "wb") as f:
+            write(f)
+        if replace:
+            os.replace(temporary_path, path)
+            return True
+        try:
+            os.link(temporary_path, path)
+        except FileExistsError:
+            return False
+        return True
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+def to_json_compatible(value):
+    """
+    Converts DataFrames, numpy values and NaN into types json.dumps accepts (NaN becomes null).
+    """
+    if isinstance(value, pd.DataFrame):
+        return [to_json_compatible(row) for row in value.to_dict("records")]
+    if isinstance(value, dict):
+        return {str(k): to_json_compatible(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json_compatible(v) for v in value]
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return None if math.isnan(value) or math.isinf(value) else float(value)
+    return value
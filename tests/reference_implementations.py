@@ -0,0 +1,1076 @@
+"""
+Reference versions of the cleanup, gaze path and statistics functions for
+tests/test_reference_equivalence.py: the row-by-row implementations of src/data_cleanup.py,
+src/calculate_gaze_paths.py and src/data_analysis.py as they were before their performance
+rewrites (grouped file reads, vectorized snapping and distances, cohort tensors, integer
+stimulus joins). Their only changes are the path and parameter arguments of the production
+signatures instead of the global paths.
+
+The stages added since then compute through frozen copies of their helpers as well (signal
+filters from src/signal_filters.py, event tables from src/event_extraction.py, saccade
+kinematics from src/data_analysis.py), so nothing here runs production code: a rewrite of
+any of them is compared against these versions, not against itself. Don't update them to
+follow a rewrite; only change them together with an intended change of the results.
+"""
+
+import os
+import math
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from src.load_data import *
+
+group_columns = ["Participant", "Experiment", "Stimulus"]
+
+eye_columns = [
+    ("Point of Regard Right X [px]", "Point of Regard Right Y [px]"),
+    ("Point of Regard Left X [px]", "Point of Regard Left Y [px]")
+]
+
+smoothing_methods = ["savgol", "median"]
+
+saccade_kinematics_columns = [
+    "Avg_Saccade_Amplitude",
+    "Avg_Saccade_Peak_Velocity",
+    "Avg_Saccade_Mean_Velocity",
+    "Saccade_Main_Sequence_Slope"
+]
+
+# Baseline src/data_cleanup.py
+
+def check_for_missing_columns(df,file_name):
+    """
+    Checks for the presence of required eye-tracking columns 
+    (such as RecordingTime, Participant, etc.). Prints a warning 
+    if any are missing.
+
+    Parameters:
+      df (pd.DataFrame): The DataFrame to check.
+      file_name (str): The CSV file's name or path (used in the warning message).
+
+    Returns:
+      pd.DataFrame or None: 
+        - The original DataFrame if columns are present.
+        - None if required columns are missing.
+    """
+    # Standardize column names (removes extra spaces)
+    df.columns = df.columns.str.strip()
+
+    required_columns = [
+        "RecordingTime [ms]", "Participant", "Experiment",
+        "Category Right", "Category Left",
+        "Point of Regard Right X [px]", "Point of Regard Right Y [px]",
+        "Point of Regard Left X [px]", "Point of Regard Left Y [px]"
+    ]
+    missing_cols = [col for col in required_columns if col not in df.columns]
+    
+    if missing_cols:
+        print(f"Warning: Missing columns {missing_cols} in {file_name}")
+        return None
+
+    return df
+
+def clean_data(df, file_name):
+    """
+    Removes 'Separator' rows, replaces NaN with 0, 
+    and confirms columns are valid.
+
+    Steps:
+      1. check_for_missing_columns() is called to ensure required columns exist.
+      2. Rows where both Category Right and Category Left are 'Separator' are removed.
+      3. All NaN/missing values are filled with 0.
+
+    Parameters:
+      df (pd.DataFrame): The DataFrame to clean.
+      file_name (str): The CSV file's name or path (used in warnings).
+
+    Returns:
+      pd.DataFrame: The cleaned DataFrame.
+                    If columns are missing, a warning is printed and 
+                    the original DataFrame is still returned (minus the 
+                    separator rows).
+    """
+
+    check_for_missing_columns(df,file_name)
+
+    # Remove rows where both categories are 'Separator'
+    df = df[~((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator"))].copy()
+
+    # Replace NaN or missing values with 0
+    df = df.fillna(0)
+
+    return df
+
+def normalize_recording_time(df):
+    """
+    Resets 'RecordingTime [ms]' to start from 0 for each (Participant, Experiment) combo.
+
+    Parameters:
+      df (pd.DataFrame): The cleaned DataFrame (with expected columns).
+
+    Returns:
+      pd.DataFrame: The same DataFrame with a modified 'RecordingTime [ms]' column.
+    """
+    # Ensure correct dtype
+    df["RecordingTime [ms]"] = df["RecordingTime [ms]"].astype(float)
+
+    # Normalize time per experiment
+    df.loc[:, "RecordingTime [ms]"] = df.groupby(["Participant", "Experiment"])["RecordingTime [ms]"].transform(lambda x: x - x.min())
+
+    return df
+
+def normalize_recording_time_per_stimulus(df):
+    """
+    Creates 'RecordingTime Stimulus [ms]', 
+    which starts from 0 for each participant-experiment-stimulus.
+
+    Parameters:
+      df (pd.DataFrame): The DataFrame with a normalized 'RecordingTime [ms]'.
+
+    Returns:
+      pd.DataFrame: The same DataFrame with an additional 
+                    'RecordingTime Stimulus [ms]' column.
+    """    
+    df["RecordingTime Stimulus [ms]"] = df.groupby(["Participant", "Experiment", "Stimulus"])["RecordingTime [ms]"].transform(lambda x: x - x.min())
+
+    return df
+
+def calculate_duration(df):
+    """
+    Adds a 'Duration' column to indicate the time difference 
+    between consecutive rows within each experiment.
+
+    Parameters:
+      df (pd.DataFrame): The DataFrame, expected to have 'RecordingTime [ms]' 
+                         and 'Experiment'.
+
+    Returns:
+      pd.DataFrame: Updated with a 'Duration' column.
+    """
+    df["Duration"] = 0.0  # Initialize column
+    df["Duration"] = df["Duration"].astype(float)  # Ensure correct dtype
+
+    for exp, data in df.groupby("Experiment"):
+        df.loc[data.index[:-1], "Duration"] = data["RecordingTime [ms]"].diff().shift(-1)
+
+    return df
+
+def calculate_snapped_time(df, snap_interval=20):
+    """
+    Creates a 'SnappedTime' column, rounding each row's 
+    'RecordingTime Stimulus [ms]' to the closest multiple of 'snap_interval' (20 ms by default).
+
+    Parameters:
+      df (pd.DataFrame): The DataFrame with 'RecordingTime Stimulus [ms]'.
+
+    Returns:
+      pd.DataFrame: Same DataFrame, now containing 'SnappedTime'.
+    """
+    # Initialize SnappedTime
+    df["SnappedTime"] = None
+
+    # Process each group separately
+    for (participant, experiment, stimulus), group in df.groupby(["Participant", "Experiment", "Stimulus"]):
+        times = group["RecordingTime Stimulus [ms]"].values
+        intervals = {}  # interval -> (index, distance)
+        
+        # Find closest interval for each time
+        for idx, t in enumerate(times):
+            interval = round(t / snap_interval) * snap_interval
+            distance = abs(t - interval)
+            
+            if interval not in intervals or distance < intervals[interval][1]:
+                intervals[interval] = (group.index[idx], distance)
+        
+        # Assign values
+        for interval, (idx, _) in intervals.items():
+            df.loc[idx, "SnappedTime"] = interval
+
+    return df
+
+def clean_and_extract_eyetracking_data(df, file_name, max_gap=None, smoothing=None, smoothing_window=5,
+                                       snap_interval=20):
+    """ 
+    Cleans and and extracts relevent data from the raw eye-tracking dataset.
+
+    It creates or changes the following columns:
+        "RecordingTime [ms]" - Now the recording time starts at 0 for each experiment
+        "RecordingTime Stimulus [ms]" - Creates a column where the recording time starts 
+        at 0 per each stimulus to allow for comparing stimulus
+        "Duration" - Creates a column that counts how much time passed between one recording (row) 
+        and the next
+        "SnappedTime" - Creates a column which takes the recording time per stimulus and "snaps" it
+        to the closest 20 increment integer (i.e. 20, 40, 80, etc.). This allows comparing between 
+        different participants and stimulus.  
+    
+    Parameters:
+      df (pd.DataFrame): The raw DataFrame for a single participant's data.
+      file_name (str): The CSV filename (used for warnings).
+      max_gap, smoothing, smoothing_window: Signal filters (see condition_gaze_signals()).
+      snap_interval (int): SnappedTime interval [ms].
+
+    Returns:
+      pd.DataFrame: The fully cleaned DataFrame (or None if missing columns).
+    """
+
+    clean_data(df, file_name)
+    normalize_recording_time(df)
+    normalize_recording_time_per_stimulus(df)
+    calculate_duration(df)
+    condition_gaze_signals(df, max_gap, smoothing, smoothing_window)
+    calculate_snapped_time(df, snap_interval)
+    
+    return df
+
+# Baseline src/calculate_gaze_paths.py
+
+def create_average_paths_files(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                               metadata_participants=metadata_participants, average_paths_folder=average_paths_folder,
+                               cohort_tensors_folder=None, data_quality_file=None):
+    """
+    Generate an average gaze path file (CSV) for each unique stimulus.
+    'metadata_participants', 'cohort_tensors_folder' and 'data_quality_file' are only
+    accepted for the signature of the production version.
+
+    Returns:
+      None. CSV files are written to 'calculated_average_paths'.
+
+    Notes:
+      - If no data is found for a given stimulus, that stimulus is skipped.
+      - The function relies on 'SnappedTime' existing in participant files (i.e., 
+        after cleaning).    
+    """
+    os.makedirs(average_paths_folder, exist_ok=True)
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    
+    grouped = experiment_stats.groupby('Stimulus')
+    
+    for stimulus, group in grouped:
+        all_data = []
+        
+        for _, row in group.iterrows():
+            participant = row['Participant']
+            experiment = row['Experiment']
+            file_path = os.path.join(participant_dataset, f"Participant_{participant}.csv")
+            
+            if not os.path.exists(file_path):
+                continue
+            
+            df = pd.read_csv(file_path)
+            df_filtered = df[(df['Experiment'] == experiment) & (df['Stimulus'] == stimulus)]
+            
+            # Excludes from the calculations lines which are categorized as blinks or are all 0
+            df_filtered = df_filtered[(df_filtered['Category Left'] != 'Blink') & (df_filtered['Category Right'] != 'Blink')]
+            df_filtered = df_filtered.loc[(df_filtered.iloc[:, 2:] != 0).any(axis=1)]
+            
+            # Convert gaze coordinates to numeric to prevent errors
+            gaze_columns = ['Point of Regard Right X [px]', 'Point of Regard Right Y [px]',
+                            'Point of Regard Left X [px]', 'Point of Regard Left Y [px]']
+            df_filtered[gaze_columns] = df_filtered[gaze_columns].apply(pd.to_numeric, errors='coerce')
+            
+            all_data.append(df_filtered)
+        
+        if not all_data:
+            continue
+        
+        # Averages all the gaze coordinates which has the same snapped time per stimulus 
+        combined_df = pd.concat(all_data)
+        avg_df = combined_df.groupby('SnappedTime')[gaze_columns].mean()
+
+        rename_average_gaze_columns(avg_df)
+        force_columns_to_numeric(avg_df)
+                
+        output_file = os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv")
+        avg_df.to_csv(output_file)
+    
+    print("Average path calculations complete. Results saved.") 
+
+def rename_average_gaze_columns(avg_df):
+    """
+    Rename columns to make calculations between these files and the participant files easier 
+    in the following calculations.
+
+    Parameters:
+      avg_df (pd.DataFrame): DataFrame containing the columns to rename.
+    """
+    avg_df.rename(columns={
+        'Point of Regard Right X [px]': 'Avg Right X',
+        'Point of Regard Right Y [px]': 'Avg Right Y',
+        'Point of Regard Left X [px]': 'Avg Left X',
+        'Point of Regard Left Y [px]': 'Avg Left Y'
+    }, inplace=True)
+
+def force_columns_to_numeric(avg_df):
+    """
+    Forces average gaze columns to be numeric types (float). 
+    This helps avoid type errors in subsequent operations.
+
+    Parameters:
+      avg_df (pd.DataFrame): DataFrame containing 'Avg Right X/Y' 
+                             and 'Avg Left X/Y' columns.
+    """    
+    avg_df['Avg Right X'] = pd.to_numeric(avg_df['Avg Right X'], errors='coerce')
+    avg_df['Avg Right Y'] = pd.to_numeric(avg_df['Avg Right Y'], errors='coerce')
+    avg_df['Avg Left X'] = pd.to_numeric(avg_df['Avg Left X'], errors='coerce')
+    avg_df['Avg Left Y'] = pd.to_numeric(avg_df['Avg Left Y'], errors='coerce')
+
+def calculate_gaze_deviation(participant_dataset=participant_dataset, average_paths_folder=average_paths_folder):
+    """
+    Calculates how far each participant's gaze is from the average path for each stimulus.
+    It calculates for the right eye, left eye and overall.
+
+    Notes:
+      - If 'AvgPath' file for a given stimulus doesn't exist, 
+        the code prints a warning and skips it.
+      - If 'Category' is 'blink', that row is skipped.
+    """
+    # Get list of all participant files
+    participant_files = [os.path.join(participant_dataset, f) for f in os.listdir(participant_dataset) 
+                        if f.startswith("Participant_") and f.endswith(".csv")]
+    
+    for participant_file in participant_files:
+        try:
+            # Load participant data with mixed type handling
+            participant_df = pd.read_csv(participant_file, low_memory=False)
+            
+            # Ensure numeric columns are properly converted
+            for col in ["Point of Regard Right X [px]", "Point of Regard Right Y [px]", 
+                       "Point of Regard Left X [px]", "Point of Regard Left Y [px]"]:
+                participant_df[col] = pd.to_numeric(participant_df[col], errors='coerce')
+            
+            # Initialize new columns for deviations
+            participant_df["Gaze Deviation Right"] = 0.0
+            participant_df["Gaze Deviation Left"] = 0.0
+            participant_df["Overall Gaze Deviation"] = 0.0
+            
+            # Process each stimulus separately
+            for stimulus in participant_df["Stimulus"].unique():
+                if pd.isna(stimulus):
+                    print(f"Warning: Found NaN stimulus value. Skipping.")
+                    continue
+                
+                # Load average path data for this stimulus
+                avg_path_file = os.path.join(average_paths_folder, f"AveragePath_{stimulus}.csv")
+                
+                if not os.path.exists(avg_path_file):
+                    print(f"Warning: Average path file for stimulus '{stimulus}' not found. Skipping.")
+                    continue
+                    
+                avg_df = pd.read_csv(avg_path_file)
+                
+                # Ensure numeric columns in average data
+                for col in ["Avg Right X", "Avg Right Y", "Avg Left X", "Avg Left Y"]:
+                    avg_df[col] = pd.to_numeric(avg_df[col], errors='coerce')
+                
+                # Create a dictionary for faster lookup of average values by snapped time
+                avg_lookup = {}
+                for _, row in avg_df.iterrows():
+                    time = row["SnappedTime"]
+                    avg_lookup[time] = {
+                        "right_x": row["Avg Right X"],
+                        "right_y": row["Avg Right Y"],
+                        "left_x": row["Avg Left X"],
+                        "left_y": row["Avg Left Y"]
+                    }
+                
+                # Filter participant data for current stimulus
+                stimulus_mask = participant_df["Stimulus"] == stimulus
+                
+                # Loop through rows for this stimulus and calculate deviations
+                for idx in participant_df[stimulus_mask].index:
+                    row = participant_df.loc[idx]
+                    snapped_time = row["SnappedTime"]
+                    
+                    # Skip if this snapped time doesn't exist in average data
+                    if snapped_time not in avg_lookup:
+                        continue
+                    
+                    # Skip if category is "blink"
+                    if (row.get("Category Left") == "blink" or row.get("Category Right") == "blink"):
+                        continue
+                    
+                    avg_data = avg_lookup[snapped_time]
+                    
+                    # Calculate Euclidean distance for each eye
+                    right_dist = calculate_distance_per_eye(
+                        row,
+                        "Point of Regard Right X [px]", 
+                        "Point of Regard Right Y [px]",
+                        "right_x","right_y",
+                        avg_data
+                    )
+                    left_dist = calculate_distance_per_eye(
+                        row, 
+                        "Point of Regard Left X [px]", 
+                        "Point of Regard Left Y [px]",
+                        "left_x","left_y",
+                        avg_data
+                    )
+
+                    # Assign calculated values to the dataframe
+                    participant_df.at[idx, "Gaze Deviation Right"] = right_dist
+                    participant_df.at[idx, "Gaze Deviation Left"] = left_dist
+                    
+                    # Calculate overall deviation
+                    if right_dist > 0 and left_dist > 0:
+                        overall_dist = (right_dist + left_dist) / 2
+                    elif right_dist > 0:
+                        overall_dist = right_dist
+                    elif left_dist > 0:
+                        overall_dist = left_dist
+                    else:
+                        overall_dist = 0
+                    
+                    participant_df.at[idx, "Overall Gaze Deviation"] = overall_dist
+            
+            # Save the updated dataframe back to the original file
+            participant_df.to_csv(participant_file, index=False)
+            print(f"Completed calculating gaze deviations for: {os.path.basename(participant_file)}")
+        
+        except Exception as e:
+            print(f"Error calculating gaze deviations for: {os.path.basename(participant_file)}: {str(e)}")
+            continue
+
+def calculate_distance_per_eye(row, x_coordinate_column, y_coordinate_column,avg_x,avg_y,avg_data):
+    """
+    Computes the Euclidean distance between the participant's coordinates 
+    (for one eye) and the average path's coordinates at a given time.
+
+    Parameters:
+      row (pd.Series): A row from the participant DataFrame (one time step).
+      x_coordinate_column (str): The column name for the participant's X coordinate.
+      y_coordinate_column (str): The column name for the participant's Y coordinate.
+      avg_x (str): The key name in 'avg_data' for the average X coordinate.
+      avg_y (str): The key name in 'avg_data' for the average Y coordinate.
+      avg_data (dict): Contains 'right_x', 'right_y', 'left_x', 'left_y' 
+                       from the average path, indexed by snapped time.
+
+    Returns:
+      float: The Euclidean distance. Returns 0 if 
+             coordinates are NaN or both are zero.
+    """    
+    eye_distance = 0
+    if not (pd.isna(row[x_coordinate_column]) or pd.isna(row[y_coordinate_column])):
+        # Skip if coordinates are all zeros
+        if row[x_coordinate_column] == 0 and row[y_coordinate_column] == 0:
+            pass
+        else:
+            right_x_diff = float(row[x_coordinate_column]) - float(avg_data[avg_x])
+            right_y_diff = float(row["Point of Regard Right Y [px]"]) - float(avg_data[avg_y])
+            eye_distance = math.sqrt(right_x_diff**2 + right_y_diff**2)
+    return eye_distance
+
+# Baseline src/data_analysis.py
+
+def create_experiment_statistics_file(participant_dataset=participant_dataset,
+                                     experiment_statistics_file=experiment_statistics_file):
+    """
+    Creates 'experiment_statistics.csv', listing unique (Participant, Experiment, Stimulus) combos.
+    """
+    # Set to store unique combinations
+    unique_combinations = set()
+
+    # Process each CSV file
+    for file in os.listdir(participant_dataset):
+        if file.startswith("Participant_") and "unidentified" not in file.lower() and file.endswith(".csv"):
+            file_path = os.path.join(participant_dataset, file)
+            df = pd.read_csv(file_path, usecols=["Participant", "Experiment", "Stimulus"])
+
+        # Ensure column ordering is consistent
+        for row in df.itertuples(index=False):
+            unique_combinations.add((row.Participant, row.Experiment, row.Stimulus))
+
+    # Convert to DataFrame and sort by "Stimulus"
+    unique_df = pd.DataFrame(list(unique_combinations), columns=["Participant", "Experiment", "Stimulus"])
+    unique_df = unique_df.sort_values(by="Stimulus")
+
+    # Save to the new CSV file
+    unique_df.to_csv(experiment_statistics_file, index=False)
+
+    print("Done. Created file:", experiment_statistics_file)
+
+def compute_saccade_frequency(df_filtered):
+    """
+    Compute the fraction of rows classified as 'Saccade' out of the total 
+    of rows classified as 'Saccade' or 'Fixation'.
+
+    Parameters:
+      df_filtered (pd.DataFrame): Data filtered to a single participant-experiment-stimulus.
+
+    Returns:
+      float: Ratio of saccade rows to (saccade + fixation) rows, or 0 if none found.
+    """
+    is_saccade = (df_filtered['Category Left'] == 'Saccade') | (df_filtered['Category Right'] == 'Saccade')
+    is_fixation = (df_filtered['Category Left'] == 'Fixation') | (df_filtered['Category Right'] == 'Fixation')
+    
+    num_saccades = is_saccade.sum()
+    num_fixations = is_fixation.sum()
+    total_relevant = num_saccades + num_fixations
+    
+    return num_saccades / total_relevant if total_relevant > 0 else 0
+
+def compute_avg_saccade_duration(df_filtered):
+    """
+    Computes the average total duration of each contiguous 'saccade episode'.
+
+    Parameters:
+      df_filtered (pd.DataFrame): A subset DataFrame for a single participant-experiment-stimulus, 
+                                  containing 'Duration' and category columns.
+
+    Returns:
+      float: Mean total saccade duration across all saccade episodes.
+             0 if no saccades are found.
+    """
+    is_saccade = (
+        (df_filtered['Category Left'] == 'Saccade') | 
+        (df_filtered['Category Right'] == 'Saccade')
+    )
+    
+    df = df_filtered.copy()
+    df['IsSaccade'] = is_saccade.astype(int)
+    
+    # Determine where each new saccade block starts:
+    # A new block starts when IsSaccade == 1 but the previous row is 0 (or doesn't exist).
+    df['SaccadeStart'] = (
+        (df['IsSaccade'] == 1) & 
+        (df['IsSaccade'].shift(fill_value=0) == 0)
+    )
+    
+    # Assign a group ID to each contiguous block of saccade rows
+    # by cumulatively summing saccade starts. Non-saccade rows get NaN.
+    df['SaccadeGroup'] = df['SaccadeStart'].cumsum()
+    df.loc[df['IsSaccade'] == 0, 'SaccadeGroup'] = np.nan
+    
+    # Sum durations within each saccade group
+    saccade_sums = df.groupby('SaccadeGroup', dropna=True)['Duration'].sum()
+    
+    # Return the mean of these sums, or 0 if no saccade episodes
+    return saccade_sums.mean() if not saccade_sums.empty else 0
+
+def analyze_saccades(participant_dataset=participant_dataset, experiment_statistics_file=experiment_statistics_file,
+                     label_source="vendor", stimulus_catalog_file=None, events_dataset=None):
+    """
+    Reads 'experiment_statistics.csv' and computes saccade frequency and duration 
+    for each row's (Participant, Experiment, Stimulus) combination, storing results 
+    in the 'Saccade_Frequency' and 'Avg_Saccade_Duration' columns, and the
+    columns of compute_saccade_kinematics().
+    Only the vendor categories are supported; 'stimulus_catalog_file' and 'events_dataset'
+    are only accepted for the signature of the production version.
+    """
+    if label_source != "vendor":
+        raise ValueError(f"The reference saccade analysis only supports label_source='vendor', got '{label_source}'")
+
+    # Load the experiment statistics file
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    
+    # Initialize new columns to store results
+    experiment_stats['Saccade_Frequency'] = 0.0
+    experiment_stats['Avg_Saccade_Duration'] = 0.0
+    for col in saccade_kinematics_columns:
+        experiment_stats[col] = np.nan
+    
+    # Iterate over each row in experiment statistics
+    for index, row in experiment_stats.iterrows():
+        participant = row['Participant']
+        experiment = row['Experiment']
+        stimulus = row['Stimulus']
+        
+        # Construct the file path for the participant data
+        file_path = os.path.join(participant_dataset, f"Participant_{participant}.csv")
+        
+        # Skip if the participant file does not exist
+        if not os.path.exists(file_path):
+            continue  
+        
+        # Load the participant's data file
+        df = pd.read_csv(file_path)
+        
+        # Filter data for the specific experiment and stimulus
+        df_filtered = df[(df['Experiment'] == experiment) & (df['Stimulus'] == stimulus)]
+        
+        # Skip if no relevant data is found
+        if df_filtered.empty:
+            continue
+        
+        # Compute saccade frequency and average saccade duration
+        saccade_freq = compute_saccade_frequency(df_filtered)
+        avg_saccade_duration = compute_avg_saccade_duration(df_filtered)
+        
+        # Store the computed values in the experiment statistics DataFrame
+        experiment_stats.at[index, 'Saccade_Frequency'] = saccade_freq
+        experiment_stats.at[index, 'Avg_Saccade_Duration'] = avg_saccade_duration
+
+        # Saccade kinematics of the combination, from its event table
+        kinematics = compute_saccade_kinematics(extract_events(df_filtered))
+        if (participant, experiment, stimulus) in kinematics.index:
+            for col, value in kinematics.loc[(participant, experiment, stimulus)].items():
+                if pd.notna(value):
+                    experiment_stats.at[index, col] = value
+    
+    # Save the updated experiment statistics back to CSV
+    experiment_stats.to_csv(experiment_statistics_file, index=False)
+    print("Saccade analysis complete. Results saved.")
+
+def calculate_gaze_path_average(idx,filtered_data,experiment_stats):
+    """
+    Calculate the overall average gaze deviation for each row in experiment_stats,
+    ignoring rows with zero 'Overall Gaze Deviation'.
+
+    Used by calculate_experiment_deviation() to fill 'Avg_Gaze_Deviation' 
+    in 'experiment_stats'.
+
+    Parameters:
+      idx (int): The current index in experiment_stats.
+      filtered_data (pd.DataFrame): The participant's subset data (one experiment-stimulus).
+      experiment_stats (pd.DataFrame): The main DataFrame being updated.
+    """
+    overall_deviations = filtered_data[filtered_data["Overall Gaze Deviation"] > 0]["Overall Gaze Deviation"]
+    if not overall_deviations.empty:
+        experiment_stats.at[idx, "Avg_Gaze_Deviation"] = overall_deviations.mean()
+
+def calculate_fixation_path_average(idx,filtered_data,experiment_stats):
+    """
+    Calculate the average 'Overall Gaze Deviation' but only for fixation rows (excluding zeros).
+
+    Used by calculate_experiment_deviation() to fill 'Avg_Fixation_Deviation'.
+
+    Parameters:
+      idx (int): The current index in experiment_stats.
+      filtered_data (pd.DataFrame): Participant's subset with 
+                                    'Overall Gaze Deviation' > 0.
+      experiment_stats (pd.DataFrame): The main DataFrame to update.
+    """
+    fixation_mask = (
+        (filtered_data["Category Left"] == "Fixation") | 
+        (filtered_data["Category Right"] == "Fixation")
+    ) & (filtered_data["Overall Gaze Deviation"] > 0)
+    
+    fixation_deviations = filtered_data[fixation_mask]["Overall Gaze Deviation"]
+    if not fixation_deviations.empty:
+        experiment_stats.at[idx, "Avg_Fixation_Deviation"] = fixation_deviations.mean()
+
+def calculate_seccade_path_average(idx,filtered_data,experiment_stats):
+    """
+    Calculate the average 'Overall Gaze Deviation' for saccade rows (excluding zeros).
+
+    Used by calculate_experiment_deviation() to fill 'Avg_Saccade_Deviation'.
+
+    Parameters:
+      idx (int): The current index in experiment_stats.
+      filtered_data (pd.DataFrame): Participant's subset data.
+      experiment_stats (pd.DataFrame): The main DataFrame to update.
+    """
+    saccade_mask = (
+        (filtered_data["Category Left"] == "Saccade") | 
+        (filtered_data["Category Right"] == "Saccade")
+    ) & (filtered_data["Overall Gaze Deviation"] > 0)
+    
+    saccade_deviations = filtered_data[saccade_mask]["Overall Gaze Deviation"]
+    if not saccade_deviations.empty:
+        experiment_stats.at[idx, "Avg_Saccade_Deviation"] = saccade_deviations.mean()
+
+def calculate_experiment_deviation(participant_dataset=participant_dataset,
+                                   experiment_statistics_file=experiment_statistics_file, stimulus_catalog_file=None):
+    """
+    Reads 'experiment_statistics.csv', updates each row's 
+    'Avg_Gaze_Deviation', 'Avg_Fixation_Deviation', and 'Avg_Saccade_Deviation' 
+    by examining participant data in 'clean_dataset'.
+    'stimulus_catalog_file' is only accepted for the signature of the production version.
+    """
+    # Load experiment statistics file
+    experiment_stats = pd.read_csv(experiment_statistics_file)
+    
+    # Initialize new columns for averages
+    experiment_stats["Avg_Gaze_Deviation"] = 0.0
+    experiment_stats["Avg_Fixation_Deviation"] = 0.0
+    experiment_stats["Avg_Saccade_Deviation"] = 0.0
+    
+    # Get list of all participant files
+    participant_files = [os.path.join(participant_dataset, f) for f in os.listdir(participant_dataset) 
+                        if f.startswith("Participant_") and f.endswith(".csv")]
+    
+    # Dictionary to store participant data
+    all_data = {}
+    
+    # Load all participant data
+    for participant_file in participant_files:
+        try:
+            participant_df = pd.read_csv(participant_file, low_memory=False)
+            participant_num = int(os.path.basename(participant_file).split("_")[1].split(".")[0])
+            all_data[participant_num] = participant_df
+        except Exception as e:
+            print(f"Error loading {os.path.basename(participant_file)}: {str(e)}")
+    
+    # Process each row in experiment statistics
+    for idx, row in experiment_stats.iterrows():
+        participant = row["Participant"]
+        experiment = row["Experiment"]
+        stimulus = row["Stimulus"]
+        
+        if participant not in all_data:
+            print(f"Warning: Gaze coordinate data for Participant {participant} not found. Skipping.")
+            continue
+        
+        # Get participant data
+        participant_df = all_data[participant]
+        
+        # Filter for current experiment and stimulus
+        mask = (
+            (participant_df["Experiment"] == experiment) & 
+            (participant_df["Stimulus"] == stimulus)
+        )
+        
+        filtered_data = participant_df[mask]
+        
+        if filtered_data.empty:
+            print(f"No data found for Participant {participant}, Experiment {experiment}, Stimulus '{stimulus}'")
+            continue
+        
+        # Calculate the average deviations of the gaze during fixation, seccades and overall
+        calculate_gaze_path_average(idx, filtered_data,experiment_stats)
+        calculate_fixation_path_average(idx, filtered_data,experiment_stats)
+        calculate_seccade_path_average(idx, filtered_data,experiment_stats)
+    
+    # Save updated experiment statistics
+    experiment_stats.to_csv(experiment_statistics_file, index=False)
+    print(f"Averages calculated and saved to {experiment_statistics_file}")
+
+# Frozen from src/signal_filters.py
+
+def eye_coordinates(df, x_column, y_column):
+    """
+    Returns the coordinates of one eye and which samples are valid.
+    A sample is valid if it's not a 'Separator' row and its coordinates are not NaN
+    and not both zero.
+
+    Returns:
+      tuple (x, y, valid): Float arrays and a boolean array.
+    """
+    x = pd.to_numeric(df[x_column], errors="coerce").to_numpy(dtype=float)
+    y = pd.to_numeric(df[y_column], errors="coerce").to_numpy(dtype=float)
+    separator = ((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator")).to_numpy()
+    valid = ~separator & ~(np.isnan(x) | np.isnan(y)) & ~((x == 0) & (y == 0))
+
+    return x, y, valid
+
+def interpolate_gaps(df, max_gap=100):
+    """
+    Fills gaps of invalid samples by linear interpolation over time, per eye and
+    per participant-experiment-stimulus. A gap is filled only if the time between the
+    last valid sample before it and the first valid sample after it is at most 'max_gap'.
+    Gaps at the start or end of a stimulus are not filled.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'RecordingTime Stimulus [ms]'.
+      max_gap (float): Longest gap to fill [ms].
+
+    Returns:
+      pd.DataFrame: The same DataFrame with interpolated 'Point of Regard' columns.
+    """
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    times = pd.to_numeric(df["RecordingTime Stimulus [ms]"], errors="coerce").to_numpy(dtype=float)
+    separator = ((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator")).to_numpy()
+
+    for x_column, y_column in eye_columns:
+        x, y, valid = eye_coordinates(df, x_column, y_column)
+
+        # Last valid sample before and first valid sample after every row of the same group
+        known = pd.DataFrame({"t": times, "x": x, "y": y}).where(np.repeat(valid[:, None], 3, axis=1))
+        before = known.groupby(keys).ffill().to_numpy()
+        after = known.groupby(keys).bfill().to_numpy()
+
+        gap = after[:, 0] - before[:, 0]
+        with np.errstate(invalid="ignore"):
+            fill = ~valid & ~separator & (gap > 0) & (gap <= max_gap)
+            weight = (times - before[:, 0]) / gap
+
+        df[x_column] = np.where(fill, before[:, 1] + weight * (after[:, 1] - before[:, 1]), x)
+        df[y_column] = np.where(fill, before[:, 2] + weight * (after[:, 2] - before[:, 2]), y)
+
+    return df
+
+def smooth_gaze(df, method="savgol", window=5, polyorder=2):
+    """
+    Smooths the valid samples of each eye within every participant-experiment-stimulus.
+    Invalid samples are skipped (not used and not changed).
+
+    Methods:
+      - 'savgol': Savitzky-Golay filter. Samples without a full window inside their group
+        (at the start and end of a stimulus) keep their value.
+      - 'median': Median of the window, using only the samples inside the group.
+
+    Parameters:
+      df (pd.DataFrame): Participant data.
+      method (str): 'savgol' or 'median'.
+      window (int): Odd number of samples in the filter window.
+      polyorder (int): Polynomial order of the Savitzky-Golay filter.
+
+    Returns:
+      pd.DataFrame: The same DataFrame with smoothed 'Point of Regard' columns.
+
+    Raises:
+      ValueError: For an unknown method or an even/too small window.
+    """
+    if method not in smoothing_methods:
+        raise ValueError(f"Unknown smoothing method '{method}', expected one of {smoothing_methods}")
+    if window < 3 or window % 2 == 0:
+        raise ValueError(f"Smoothing window must be an odd number >= 3, got {window}")
+
+    half = window // 2
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    coefficients = None
+    if method == "savgol":
+        from scipy.signal import savgol_coeffs
+        coefficients = savgol_coeffs(window, polyorder, use="dot")
+
+    for x_column, y_column in eye_columns:
+        x, y, valid = eye_coordinates(df, x_column, y_column)
+        rows = np.flatnonzero(valid)
+        if len(rows) == 0:
+            continue
+
+        # Windows over the valid samples; positions outside the row's group are masked
+        padded_keys = np.r_[np.full(half, -1), keys[rows], np.full(half, -1)]
+        in_group = sliding_window_view(padded_keys, window) == keys[rows][:, None]
+
+        for column, values in ((x_column, x), (y_column, y)):
+            windows = sliding_window_view(np.r_[np.full(half, np.nan), values[rows], np.full(half, np.nan)], window)
+            if method == "savgol":
+                full_window = in_group.all(axis=1)
+                smoothed = np.where(full_window, np.nan_to_num(windows) @ coefficients, values[rows])
+            else:
+                smoothed = np.nanmedian(np.where(in_group, windows, np.nan), axis=1)
+
+            values = values.copy()
+            values[rows] = smoothed
+            df[column] = values
+
+    return df
+
+def condition_gaze_signals(df, max_gap=None, smoothing=None, smoothing_window=5, polyorder=2):
+    """
+    Applies the selected filters: gap interpolation first, then smoothing.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'RecordingTime Stimulus [ms]'.
+      max_gap (float or None): Longest gap to interpolate [ms], None to disable.
+      smoothing (str or None): 'savgol', 'median' or None to disable.
+      smoothing_window (int): Odd number of samples in the smoothing window.
+      polyorder (int): Polynomial order of the Savitzky-Golay filter.
+
+    Returns:
+      pd.DataFrame: The same DataFrame (unchanged if no filter is selected).
+    """
+    if max_gap is not None:
+        interpolate_gaps(df, max_gap)
+    if smoothing is not None:
+        smooth_gaze(df, smoothing, smoothing_window, polyorder)
+
+    return df
+
+# Frozen from src/event_extraction.py
+
+def label_samples(df):
+    """
+    Gives every sample a single event label based on the categories of both eyes.
+
+    A sample is a 'Saccade' if either eye is in a saccade (the same rule used by
+    compute_avg_saccade_duration), otherwise a 'Fixation' if either eye is fixating,
+    otherwise a 'Blink' if either eye is blinking. Anything else ('Separator', '-')
+    gets an empty label and doesn't belong to any event.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with 'Category Left' and 'Category Right'.
+
+    Returns:
+      np.ndarray: The label of each row.
+    """
+    left = df["Category Left"].to_numpy()
+    right = df["Category Right"].to_numpy()
+
+    return np.select(
+        [
+            (left == "Saccade") | (right == "Saccade"),
+            (left == "Fixation") | (right == "Fixation"),
+            (left == "Blink") | (right == "Blink")
+        ],
+        ["Saccade", "Fixation", "Blink"],
+        default=""
+    )
+
+def calculate_gaze_point(df):
+    """
+    Calculates one gaze point per sample by averaging the eyes that have valid coordinates.
+    An eye is valid if its coordinates are not NaN and not both zero.
+
+    Parameters:
+      df (pd.DataFrame): Participant data with the 'Point of Regard' columns.
+
+    Returns:
+      tuple (gaze_x, gaze_y): Two float arrays, NaN where neither eye is valid.
+    """
+    sum_x = np.zeros(len(df))
+    sum_y = np.zeros(len(df))
+    valid_eyes = np.zeros(len(df))
+
+    for x_column, y_column in eye_columns:
+        x = pd.to_numeric(df[x_column], errors="coerce").to_numpy(dtype=float)
+        y = pd.to_numeric(df[y_column], errors="coerce").to_numpy(dtype=float)
+        valid = ~(np.isnan(x) | np.isnan(y)) & ~((x == 0) & (y == 0))
+
+        sum_x += np.where(valid, x, 0.0)
+        sum_y += np.where(valid, y, 0.0)
+        valid_eyes += valid
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gaze_x = np.where(valid_eyes > 0, sum_x / valid_eyes, np.nan)
+        gaze_y = np.where(valid_eyes > 0, sum_y / valid_eyes, np.nan)
+
+    return gaze_x, gaze_y
+
+def extract_events(df):
+    """
+    Builds the event table of a participant's cleaned data with a single run-length pass.
+
+    A new run starts whenever the label or the (Participant, Experiment, Stimulus)
+    combination changes. Each labelled run becomes one row with:
+        "Event" - 'Fixation', 'Saccade' or 'Blink'
+        "Onset [ms]" - 'RecordingTime Stimulus [ms]' of the first sample
+        "Duration [ms]" - Sum of 'Duration' over the run (as in compute_avg_saccade_duration)
+        "Samples" - Number of samples in the run
+        "Centroid X [px]", "Centroid Y [px]" - Mean gaze point of the run
+        "Amplitude [px]" - Distance between the start and end gaze points. A saccade starts
+        at the last sample before it, the other events start at their first valid sample.
+        "Peak Velocity [px/s]" - Highest sample-to-sample gaze velocity in the run
+        (for saccades this includes the step into the first saccade sample)
+
+    Parameters:
+      df (pd.DataFrame): Cleaned participant data (see required_columns).
+
+    Returns:
+      pd.DataFrame: The event table, in recording order.
+    """
+    labels = label_samples(df)
+    keys = df.groupby(group_columns, sort=False).ngroup().to_numpy()
+    time = pd.to_numeric(df["RecordingTime Stimulus [ms]"], errors="coerce").to_numpy(dtype=float)
+    duration = pd.to_numeric(df["Duration"], errors="coerce").fillna(0).to_numpy(dtype=float)
+    gaze_x, gaze_y = calculate_gaze_point(df)
+
+    # Runs break on a new participant-experiment-stimulus or on a new label
+    new_group = np.r_[True, keys[1:] != keys[:-1]]
+    run_start = new_group | np.r_[True, labels[1:] != labels[:-1]]
+    run_id = np.cumsum(run_start) - 1
+
+    # Velocity of the step from the previous sample, only inside the same group
+    with np.errstate(invalid="ignore", divide="ignore"):
+        step = np.hypot(np.diff(gaze_x), np.diff(gaze_y))
+        velocity = np.r_[np.nan, step / np.diff(time) * 1000]
+    velocity[new_group | ~(np.r_[np.nan, np.diff(time)] > 0)] = np.nan
+
+    # Only saccades count the step into their first sample
+    is_saccade = labels == "Saccade"
+    velocity[run_start & ~is_saccade] = np.nan
+
+    # A saccade starts from the gaze point of the sample before it
+    entry_x = np.r_[np.nan, gaze_x[:-1]]
+    entry_y = np.r_[np.nan, gaze_y[:-1]]
+    entry_x[new_group | ~is_saccade] = np.nan
+    entry_y[new_group | ~is_saccade] = np.nan
+
+    samples = pd.DataFrame({
+        "Run": run_id,
+        "Event": labels,
+        "Onset [ms]": time,
+        "Duration [ms]": duration,
+        "X": gaze_x,
+        "Y": gaze_y,
+        "Velocity": velocity
+    })
+    for col in group_columns:
+        samples[col] = df[col].to_numpy()
+
+    events = samples.groupby("Run", sort=True).agg(
+        Participant=("Participant", "first"),
+        Experiment=("Experiment", "first"),
+        Stimulus=("Stimulus", "first"),
+        Event=("Event", "first"),
+        Onset=("Onset [ms]", "first"),
+        Duration=("Duration [ms]", "sum"),
+        Samples=("Event", "size"),
+        Centroid_X=("X", "mean"),
+        Centroid_Y=("Y", "mean"),
+        First_X=("X", "first"),
+        First_Y=("Y", "first"),
+        Last_X=("X", "last"),
+        Last_Y=("Y", "last"),
+        Peak_Velocity=("Velocity", "max")
+    )
+
+    # Runs are numbered in order, so the run starts line up with the event rows
+    start_x = np.where(np.isnan(entry_x[run_start]), events["First_X"], entry_x[run_start])
+    start_y = np.where(np.isnan(entry_y[run_start]), events["First_Y"], entry_y[run_start])
+    events["Amplitude"] = np.hypot(events["Last_X"] - start_x, events["Last_Y"] - start_y)
+
+    events = events[events["Event"] != ""]
+    events = events.rename(columns={
+        "Onset": "Onset [ms]",
+        "Duration": "Duration [ms]",
+        "Centroid_X": "Centroid X [px]",
+        "Centroid_Y": "Centroid Y [px]",
+        "Amplitude": "Amplitude [px]",
+        "Peak_Velocity": "Peak Velocity [px/s]"
+    })
+
+    return events[group_columns + [
+        "Event", "Onset [ms]", "Duration [ms]", "Samples", "Centroid X [px]",
+        "Centroid Y [px]", "Amplitude [px]", "Peak Velocity [px/s]"
+    ]].reset_index(drop=True)
+
+# Frozen from src/data_analysis.py
+
+def compute_saccade_kinematics(events):
+    """
+    Computes the saccade amplitude and velocity metrics of every 
+    (Participant, Experiment, Stimulus) combination from an event table.
+
+    Metrics:
+      - Avg_Saccade_Amplitude: Mean saccade amplitude [px]
+      - Avg_Saccade_Peak_Velocity: Mean saccade peak velocity [px/s]
+      - Avg_Saccade_Mean_Velocity: Mean of amplitude / duration per saccade [px/s]
+      - Saccade_Main_Sequence_Slope: Least-squares slope of peak velocity over amplitude
+        (the 'main sequence'), NaN if there are fewer than two usable saccades
+
+    Parameters:
+      events (pd.DataFrame): Event table from extract_events().
+
+    Returns:
+      pd.DataFrame: One row per combination (indexed by Participant, Experiment, Stimulus).
+    """
+    saccades = events[events["Event"] == "Saccade"].copy()
+    amplitude = saccades["Amplitude [px]"]
+    peak_velocity = saccades["Peak Velocity [px/s]"]
+
+    duration = saccades["Duration [ms]"].where(saccades["Duration [ms]"] > 0)
+    saccades["Mean Velocity"] = amplitude / duration * 1000
+
+    # Sums for the least-squares slope, only over saccades with both values
+    usable = amplitude.notna() & peak_velocity.notna()
+    saccades["n"] = usable.astype(float)
+    saccades["x"] = amplitude.where(usable, 0.0)
+    saccades["y"] = peak_velocity.where(usable, 0.0)
+    saccades["xy"] = saccades["x"] * saccades["y"]
+    saccades["xx"] = saccades["x"] ** 2
+
+    grouped = saccades.groupby(["Participant", "Experiment", "Stimulus"])
+    kinematics = grouped.agg(
+        Avg_Saccade_Amplitude=("Amplitude [px]", "mean"),
+        Avg_Saccade_Peak_Velocity=("Peak Velocity [px/s]", "mean"),
+        Avg_Saccade_Mean_Velocity=("Mean Velocity", "mean")
+    )
+
+    sums = grouped[["n", "x", "y", "xy", "xx"]].sum()
+    denominator = sums["n"] * sums["xx"] - sums["x"] ** 2
+    slope = (sums["n"] * sums["xy"] - sums["x"] * sums["y"]) / denominator.where(denominator > 0)
+    kinematics["Saccade_Main_Sequence_Slope"] = slope.where(sums["n"] >= 2)
+
+    return kinematics
@@ -0,0 +1,98 @@
+import pytest
+import json
+import numpy as np
+import pandas as pd
+
+from src.aoi_analysis import (
+    load_aoi_definitions,
+    points_in_polygon,
+    label_samples_with_aoi,
+    compute_aoi_metrics,
+    analyze_aois
+)
+
+aoi_json = {
+    "StimA": [
+        {"name": "Eyes", "rectangle": [0, 0, 100, 50]},
+        {"name": "Mouth", "polygon": [[0, 100], [100, 100], [50, 200]]}
+    ]
+}
+
+def make_participant_data():
+    """
+    StimA: Eyes, Eyes, Mouth, blink, Mouth, Eyes, outside. StimB has no AOIs.
+    """
+    x = [10, 20, 50, 0, 50, 30, 500, 10]
+    y = [10, 20, 120, 0, 130, 30, 500, 10]
+    categories = ["Saccade", "Fixation", "Fixation", "Blink", "Fixation", "Fixation", "Fixation", "Fixation"]
+
+    return pd.DataFrame({
+        "Participant": 1,
+        "Experiment": 1,
+        "Stimulus": ["StimA"] * 7 + ["StimB"],
+        "Category Right": categories,
+        "Category Left": categories,
+        "Point of Regard Right X [px]": x,
+        "Point of Regard Right Y [px]": y,
+        "Point of Regard Left X [px]": x,
+        "Point of Regard Left Y [px]": y,
+        "RecordingTime Stimulus [ms]": [0, 20, 40, 60, 80, 100, 120, 0],
+        "Duration": [20.0] * 8
+    })
+
+@pytest.fixture
+def aoi_definitions(tmp_path):
+    aoi_file = tmp_path / "aoi_definitions.json"
+    aoi_file.write_text(json.dumps(aoi_json))
+    return load_aoi_definitions(str(aoi_file))
+
+def test_points_in_polygon():
+    """
+    Positive + edge test:
+    - Points inside and outside a triangle, and a NaN point.
+    """
+    triangle = np.array([[0, 0], [10, 0], [5, 10]], dtype=float)
+    inside = points_in_polygon([5, 1, 20, np.nan], [5, 9, 5, np.nan], triangle)
+    assert list(inside) == [True, False, False, False]
+
+def test_label_samples_with_aoi(aoi_definitions):
+    """
+    Positive test:
+    - Samples are labelled per stimulus; StimB has no AOIs.
+    """
+    labels = label_samples_with_aoi(make_participant_data(), aoi_definitions)
+    assert list(labels) == ["Eyes", "Eyes", "Mouth", "", "Mouth", "Eyes", "", ""]
+
+def test_compute_aoi_metrics(aoi_definitions):
+    """
+    Positive test:
+    - Eyes: 3 samples, first fixation at 20 ms, one revisit.
+    - Mouth: the blink in the middle doesn't count as leaving it.
+    """
+    metrics = compute_aoi_metrics(make_participant_data(), aoi_definitions).set_index("AOI")
+
+    assert metrics.loc["Eyes", "Dwell_Time"] == 60
+    assert metrics.loc["Eyes", "First_Fixation_Latency"] == 20
+    assert metrics.loc["Eyes", "Revisits"] == 1
+    assert metrics.loc["Mouth", "Dwell_Time"] == 40
+    assert metrics.loc["Mouth", "Revisits"] == 0
+
+def test_analyze_aois(tmp_path, aoi_definitions):
+    """
+    Positive + negative test:
+    - Metrics are merged into experiment_statistics.csv.
+    - Without a definitions file the function warns and leaves the file alone.
+    """
+    participant_folder = tmp_path / "clean_dataset"
+    participant_folder.mkdir()
+    make_participant_data().to_csv(participant_folder / "Participant_1.csv", index=False)
+    stats_file = tmp_path / "experiment_statistics.csv"
+    stats_file.write_text("Participant,Experiment,Stimulus\n1,1,StimA\n1,1,StimB\n")
+
+    analyze_aois(str(participant_folder), str(stats_file), str(tmp_path / "aoi_definitions.json"))
+    stats = pd.read_csv(stats_file).set_index("Stimulus")
+    assert stats.loc["StimA", "AOI_Eyes_Dwell_Time"] == 60
+    assert np.isnan(stats.loc["StimB", "AOI_Eyes_Dwell_Time"])
+
+    analyze_aois(str(participant_folder), str(stats_file), str(tmp_path / "missing.json"))
+    assert "AOI_Eyes_Dwell_Time" in pd.read_csv(stats_file).columns
@@ -0,0 +1,66 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.average_path_cache import AveragePathCache
+
+def write_average_path(folder, stimulus, times, offset=0.0):
+    avg_df = pd.DataFrame({
+        "SnappedTime": times,
+        "Avg Right X": np.asarray(times, dtype=float) + offset,
+        "Avg Right Y": 1.0,
+        "Avg Left X": 2.0,
+        "Avg Left Y": 3.0
+    })
+    file_path = folder / f"AveragePath_{stimulus}.csv"
+    avg_df.to_csv(file_path, index=False)
+    return file_path
+
+def test_lookup_uses_sorted_arrays_and_counts_hits(tmp_path):
+    """
+    Positive test:
+    - Unsorted files are sorted, lookups find exact SnappedTime values only
+    - The file is parsed once, the second lookup is a hit
+    """
+    write_average_path(tmp_path, "StimA", [40.0, 0.0, 20.0])
+    cache = AveragePathCache()
+
+    found, values = cache.lookup("StimA", np.array([20.0, 30.0, np.nan, 40.0, 100.0]), str(tmp_path))
+    assert found.tolist() == [True, False, False, True, False]
+    assert values[0].tolist() == [20.0, 1.0, 2.0, 3.0]
+    assert np.isnan(values[1]).all()
+
+    cache.lookup("StimA", np.array([0.0]), str(tmp_path))
+    assert cache.info()["hits"] == 1
+    assert cache.info()["misses"] == 1
+
+def test_missing_file_returns_none(tmp_path):
+    """
+    Negative test:
+    - A stimulus without an average path file has no lookup
+    """
+    assert AveragePathCache().lookup("Missing", np.array([0.0]), str(tmp_path)) is None
+
+def test_eviction_and_invalidation(tmp_path):
+    """
+    Boundary test:
+    - The least recently used path is evicted when the cache is full
+    - Rewriting a file (or invalidating it) makes the next lookup parse it again
+    """
+    for stimulus in ["A", "B", "C"]:
+        write_average_path(tmp_path, stimulus, [0.0])
+    cache = AveragePathCache(maxsize=2)
+    for stimulus in ["A", "B", "A", "C"]:
+        cache.get(stimulus, str(tmp_path))
+    assert sorted(os.path.basename(path) for path in cache.entries) == ["AveragePath_A.csv", "AveragePath_C.csv"]
+
+    file_path = write_average_path(tmp_path, "A", [0.0, 20.0], offset=5.0)
+    os.utime(file_path, ns=(1, 1))
+    _, values = cache.lookup("A", np.array([20.0]), str(tmp_path))
+    assert values[0, 0] == 25.0
+
+    misses = cache.misses
+    cache.invalidate("A", str(tmp_path))
+    cache.get("A", str(tmp_path))
+    assert cache.misses == misses + 1
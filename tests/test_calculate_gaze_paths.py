@@ -1,7 +1,9 @@
 import pytest
 import os
 import pandas as pd
+from tests.test_fixtures import setup_mock_environment
 from src.calculate_gaze_paths import create_average_paths_files, calculate_gaze_deviation
+from src.data_analysis import create_experiment_statistics_file
 
 def test_create_average_paths_files_positive(setup_mock_environment):
     """
@@ -9,6 +11,7 @@ def test_create_average_paths_files_positive(setup_mock_environment):
     Uses the pre-built environment from test_fixtures.py. 
     We expect to find 'Participant_101.csv' referencing StimA.
     """
+    create_experiment_statistics_file()
     create_average_paths_files()
     avg_folder = setup_mock_environment / "calculated_average_paths"
     output_path = avg_folder / "AveragePath_StimA.csv"
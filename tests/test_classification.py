@@ -0,0 +1,135 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.classification import build_feature_matrix, get_feature_matrix, fit_logistic_regression
+from src.classification import predict_probability, stratified_folds, roc_auc, run_classification
+
+def write_inputs(tmp_path, n_per_class=10, seed=0):
+    """
+    Writes an experiment statistics file where the ASD participants have a larger gaze
+    deviation on StimA, plus a noise metric, and the metadata with the classes.
+    """
+    rng = np.random.default_rng(seed)
+    rows, metadata = [], []
+    for participant in range(1, 2 * n_per_class + 1):
+        is_asd = participant <= n_per_class
+        metadata.append({"ParticipantID": participant, "Class": "ASD" if is_asd else "TD"})
+        for stimulus in ["StimA", "StimB"]:
+            rows.append({"Participant": participant, "Experiment": 1, "Stimulus": stimulus,
+                         "Gaze_Deviation": (50 if is_asd and stimulus == "StimA" else 0) + rng.normal(0, 5),
+                         "Saccade_Frequency": rng.normal(0.1, 0.01)})
+    statistics_file = tmp_path / "experiment_statistics.csv"
+    metadata_file = tmp_path / "Metadata_Participants.csv"
+    pd.DataFrame(rows).to_csv(statistics_file, index=False)
+    pd.DataFrame(metadata).to_csv(metadata_file, index=False)
+    return str(statistics_file), str(metadata_file)
+
+def test_feature_matrix_pivot(tmp_path):
+    """
+    Positive test:
+    - One row per participant with a class and one column per metric and stimulus
+    Boundary test:
+    - A stimulus a participant didn't see is NaN, participants without a class are dropped
+    """
+    statistics_file, metadata_file = write_inputs(tmp_path, n_per_class=2)
+    stats = pd.read_csv(statistics_file)
+    stats = stats[~((stats["Participant"] == 1) & (stats["Stimulus"] == "StimB"))]
+    stats.to_csv(statistics_file, index=False)
+    metadata = pd.read_csv(metadata_file)
+    pd.concat([metadata, pd.DataFrame([{"ParticipantID": 99, "Class": "Unknown"}])]).to_csv(metadata_file, index=False)
+
+    matrix = build_feature_matrix(statistics_file, metadata_file)
+
+    assert matrix["X"].shape == (4, 4)
+    assert matrix["participants"].tolist() == [1, 2, 3, 4]
+    assert matrix["y"].tolist() == [1, 1, 0, 0]
+    stim_b = [i for i, name in enumerate(matrix["features"]) if name.endswith("| StimB")]
+    assert np.isnan(matrix["X"][0, stim_b]).all()
+    assert not np.isnan(matrix["X"][1:]).any()
+
+def test_feature_matrix_missing_data(tmp_path):
+    """
+    Boundary test:
+    - 0.0 placeholders are missing values, and participants without any observed metric
+      (no rows, or only placeholders) are dropped together with their class
+    """
+    statistics_file, metadata_file = write_inputs(tmp_path, n_per_class=3)
+    stats = pd.read_csv(statistics_file)
+    stats = stats[stats["Participant"] != 2]
+    stats.loc[stats["Participant"] == 4, ["Gaze_Deviation", "Saccade_Frequency"]] = 0.0
+    stats.loc[(stats["Participant"] == 1) & (stats["Stimulus"] == "StimA"), "Gaze_Deviation"] = 0.0
+    stats.to_csv(statistics_file, index=False)
+
+    matrix = build_feature_matrix(statistics_file, metadata_file)
+
+    assert matrix["participants"].tolist() == [1, 3, 5, 6]
+    assert matrix["y"].tolist() == [1, 1, 0, 0]
+    assert np.isnan(matrix["X"][0, list(matrix["features"]).index("Gaze_Deviation | StimA")])
+    assert not (matrix["X"] == 0).any()
+
+def test_feature_matrix_cache(tmp_path):
+    """
+    Positive test:
+    - The cached matrix is reused while the inputs are unchanged and rebuilt when they change
+    """
+    statistics_file, metadata_file = write_inputs(tmp_path)
+    folder = str(tmp_path / "classification")
+
+    first = get_feature_matrix(statistics_file, metadata_file, folder)
+    cache_time = os.stat(os.path.join(folder, "feature_matrix.npz")).st_mtime_ns
+    second = get_feature_matrix(statistics_file, metadata_file, folder)
+    assert os.stat(os.path.join(folder, "feature_matrix.npz")).st_mtime_ns == cache_time
+    np.testing.assert_array_equal(first["X"], second["X"])
+
+    stats = pd.read_csv(statistics_file)
+    stats = stats[stats["Participant"] != 1]
+    stats.to_csv(statistics_file, index=False)
+    rebuilt = get_feature_matrix(statistics_file, metadata_file, folder)
+    assert 1 not in rebuilt["participants"] and len(rebuilt["y"]) == len(rebuilt["X"]) == 19
+
+def test_logistic_regression_and_auc():
+    """
+    Positive test:
+    - The regression separates linearly separable data (AUC 1)
+    Boundary test:
+    - Tied scores count half, a single class gives NaN
+    """
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(40, 3))
+    y = (X[:, 0] > 0).astype(int)
+    coefficients = fit_logistic_regression(X, y, l2=0.1)
+    assert coefficients[1] > abs(coefficients[2]) + abs(coefficients[3])
+    assert roc_auc(y, predict_probability(coefficients, X)) == 1
+
+    assert roc_auc(np.array([0, 1]), np.array([0.5, 0.5])) == 0.5
+    assert np.isnan(roc_auc(np.array([1, 1]), np.array([0.2, 0.8])))
+
+def test_stratified_folds():
+    """
+    Positive test:
+    - Every sample is in exactly one fold and each fold keeps the class balance
+    """
+    y = np.array([1] * 10 + [0] * 15)
+    folds = stratified_folds(y, n_folds=5)
+    assert sorted(np.concatenate(folds).tolist()) == list(range(25))
+    assert all(y[fold].sum() == 2 and len(fold) == 5 for fold in folds)
+
+def test_run_classification(tmp_path):
+    """
+    Positive test:
+    - The cross-validated AUC of an informative metric is high, the same with parallel folds,
+      and the out-of-fold predictions are saved
+    """
+    statistics_file, metadata_file = write_inputs(tmp_path)
+    folder = str(tmp_path / "classification")
+
+    result = run_classification(statistics_file, metadata_file, folder, n_bootstrap=200)
+    parallel = run_classification(statistics_file, metadata_file, folder, n_bootstrap=200, workers=2)
+
+    assert result["AUC"] > 0.9
+    assert result["AUC_CI_low"] <= result["AUC"] <= result["AUC_CI_high"]
+    assert (result["participants"], result["features"]) == (20, 4)
+    assert parallel["AUC"] == pytest.approx(result["AUC"])
+    assert len(pd.read_csv(os.path.join(folder, "predictions.csv"))) == 20
@@ -0,0 +1,117 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.cohort_tensor import build_cohort_tensors, get_cohort_tensors, masked_mean
+
+@pytest.fixture
+def cohort_files(tmp_path):
+    """
+    Two participants (ASD and TD) watching StimA, one of them also StimB.
+    Participant 2 has a blink at SnappedTime 20 and an extra bin at 60.
+    """
+    clean_dataset = tmp_path / "clean_dataset"
+    clean_dataset.mkdir()
+    columns = ["Participant", "Experiment", "Stimulus", "Category Left", "Category Right",
+               "RecordingTime Stimulus [ms]", "SnappedTime",
+               "Point of Regard Right X [px]", "Point of Regard Right Y [px]",
+               "Point of Regard Left X [px]", "Point of Regard Left Y [px]"]
+    pd.DataFrame([
+        [1, 1, "StimA", "Fixation", "Fixation", 0, 0, 100, 100, 100, 100],
+        [1, 1, "StimA", "Fixation", "Fixation", 8, None, 999, 999, 999, 999],
+        [1, 1, "StimA", "Fixation", "Fixation", 20, 20, 200, 200, 200, 200],
+        [1, 2, "StimB", "Fixation", "Fixation", 0, 0, 50, 50, 50, 50],
+    ], columns=columns).to_csv(clean_dataset / "Participant_1.csv", index=False)
+    pd.DataFrame([
+        [2, 1, "StimA", "Fixation", "Fixation", 0, 0, 300, 300, 300, 300],
+        [2, 1, "StimA", "Blink", "Blink", 20, 20, 0, 0, 0, 0],
+        [2, 1, "StimA", "Fixation", "Fixation", 60, 60, 400, 400, 400, 400],
+    ], columns=columns).to_csv(clean_dataset / "Participant_2.csv", index=False)
+
+    pd.DataFrame({"Participant": [1, 2, 1, 3], "Experiment": [1, 1, 2, 1],
+                  "Stimulus": ["StimA", "StimA", "StimB", "StimA"]}).to_csv(tmp_path / "experiment_statistics.csv", index=False)
+    pd.DataFrame({"ParticipantID": [1, 2], "Class": ["ASD", "TD"]}).to_csv(tmp_path / "Metadata_Participants.csv", index=False)
+
+    return {
+        "participant_dataset": str(clean_dataset),
+        "experiment_statistics_file": str(tmp_path / "experiment_statistics.csv"),
+        "metadata_participants": str(tmp_path / "Metadata_Participants.csv")
+    }
+
+def test_tensor_is_aligned_and_masked(cohort_files):
+    """
+    Positive test:
+    - Recordings are aligned on the union of their bins, blinks and padding are masked,
+      participants without a file are left out
+    """
+    tensors = build_cohort_tensors(**cohort_files)
+    tensor = tensors["StimA"]
+
+    assert tensor["participants"].tolist() == [1, 2]
+    assert tensor["classes"].tolist() == ["ASD", "TD"]
+    assert tensor["bin_times"].tolist() == [0, 20, 60]
+    assert tensor["values"].shape == (2, 3, 4)
+    assert tensor["mask"].tolist() == [[True, True, False], [True, False, True]]
+
+    bin_times, mean = masked_mean(tensor)
+    assert bin_times.tolist() == [0, 20, 60]
+    assert mean[:, 0].tolist() == [200, 200, 400]
+
+def test_masked_mean_with_excluded_recordings(cohort_files):
+    """
+    Boundary test:
+    - Bins only present in excluded recordings disappear from the mean
+    """
+    tensor = build_cohort_tensors(**cohort_files)["StimA"]
+    bin_times, mean = masked_mean(tensor, include=np.array([True, False]))
+    assert bin_times.tolist() == [0, 20]
+    assert mean[:, 0].tolist() == [100, 200]
+
+def test_tensors_match_samples_on_catalog_ids(cohort_files, tmp_path):
+    """
+    Positive test:
+    - With a stimulus catalog the samples are matched on its IDs, with the same tensors
+    """
+    pd.DataFrame({"StimulusID": [0, 1, 2], "Stimulus": ["Other", "StimB", "StimA"]}).to_csv(
+        tmp_path / "stimulus_catalog.csv", index=False)
+    expected = build_cohort_tensors(**cohort_files, stimulus_catalog_file=str(tmp_path / "missing.csv"))
+    tensors = build_cohort_tensors(**cohort_files, stimulus_catalog_file=str(tmp_path / "stimulus_catalog.csv"))
+
+    assert sorted(tensors) == ["StimA", "StimB"]
+    for stimulus, tensor in tensors.items():
+        for key, values in expected[stimulus].items():
+            np.testing.assert_array_equal(tensor[key], values)
+
+def test_tensors_are_cached_until_inputs_change(cohort_files, tmp_path):
+    """
+    Positive test:
+    - The second call loads the cache; changed parameters or inputs rebuild it
+    """
+    folder = str(tmp_path / "cohort_tensors")
+    first = get_cohort_tensors(**cohort_files, cohort_tensors_folder=folder)
+    cache_file = os.path.join(folder, "CohortTensor_StimA.npz")
+    cached_mtime = os.stat(cache_file).st_mtime_ns
+
+    second = get_cohort_tensors(**cohort_files, cohort_tensors_folder=folder)
+    assert os.stat(cache_file).st_mtime_ns == cached_mtime
+    assert np.array_equal(first["StimA"]["mask"], second["StimA"]["mask"])
+
+    os.utime(cohort_files["experiment_statistics_file"], ns=(cached_mtime + 10**9, cached_mtime + 10**9))
+    get_cohort_tensors(**cohort_files, cohort_tensors_folder=folder)
+    assert os.stat(cache_file).st_mtime_ns != cached_mtime
+
+    # A participant file replaced by an older one of another size
+    rebuilt_mtime = os.stat(cache_file).st_mtime_ns
+    participant_file = os.path.join(cohort_files["participant_dataset"], "Participant_2.csv")
+    old_mtime = os.stat(participant_file).st_mtime_ns
+    df = pd.read_csv(participant_file)
+    df.loc[2, "Point of Regard Right X [px]"] = 4000
+    df.to_csv(participant_file, index=False)
+    os.utime(participant_file, ns=(old_mtime, old_mtime))
+    replaced = get_cohort_tensors(**cohort_files, cohort_tensors_folder=folder)
+    assert os.stat(cache_file).st_mtime_ns != rebuilt_mtime
+    assert replaced["StimA"]["values"][1, 2, 0] == 4000
+
+    resampled = get_cohort_tensors(**cohort_files, cohort_tensors_folder=folder, bin_width=20)
+    assert resampled["StimA"]["bin_times"].tolist() == [0, 20, 40, 60]
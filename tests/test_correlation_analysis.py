@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import pearsonr, spearmanr
+
+from src.correlation_analysis import correlate_covariate, fdr_adjust, run_correlation_analysis
+
+def random_features(participants=25, features=6, seed=1):
+    """
+    Features with missing values and ties, and a covariate with missing values.
+    """
+    rng = np.random.default_rng(seed)
+    X = np.round(rng.normal(0, 1, (participants, features)), 1)
+    X[rng.random(X.shape) < 0.15] = np.nan
+    covariate = np.round(rng.normal(30, 5, participants))
+    covariate[[0, 7]] = np.nan
+    return X, covariate
+
+@pytest.mark.parametrize("method, reference", [("pearson", pearsonr), ("spearman", spearmanr)])
+def test_correlations_match_scipy(method, reference):
+    """
+    Positive test:
+    - Every coefficient equals scipy's on the pairwise-complete participants, with ties
+    Boundary test:
+    - A feature with fewer than 3 participants gets NaN
+    """
+    X, covariate = random_features()
+    X[3:, -1] = np.nan
+
+    r, n, _ = correlate_covariate(X, covariate, method, n_permutations=0)
+
+    for feature in range(X.shape[1] - 1):
+        complete = ~np.isnan(X[:, feature]) & ~np.isnan(covariate)
+        assert n[feature] == complete.sum()
+        assert r[feature] == pytest.approx(reference(X[complete, feature], covariate[complete])[0], abs=1e-12)
+    assert np.isnan(r[-1])
+
+def test_permutation_p_values():
+    """
+    Positive test:
+    - A perfect correlation has the smallest p-value 1 / (permutations + 1), noise a large one
+    - The batch size doesn't change the result
+    """
+    rng = np.random.default_rng(0)
+    covariate = rng.normal(0, 1, 30)
+    X = np.c_[2 * covariate + 1, rng.normal(0, 1, 30)]
+
+    for method in ["pearson", "spearman"]:
+        r, _, p_value = correlate_covariate(X, covariate, method, n_permutations=199, batch_size=50)
+        _, _, p_batched = correlate_covariate(X, covariate, method, n_permutations=199, batch_size=7)
+        assert r[0] == pytest.approx(1.0)
+        assert p_value[0] == pytest.approx(1 / 200)
+        assert p_value[1] > 0.05
+        np.testing.assert_array_equal(p_value, p_batched)
+
+def test_fdr_adjust():
+    """
+    Positive test:
+    - Benjamini-Hochberg q-values are monotone in p and never smaller than p; NaN stays NaN
+    """
+    q_values = fdr_adjust([0.01, 0.04, np.nan, 0.03, 0.5])
+    np.testing.assert_allclose(q_values[[0, 1, 3, 4]], [0.04, 0.0533333, 0.0533333, 0.5], rtol=1e-5)
+    assert np.isnan(q_values[2])
+
+def test_run_correlation_analysis(tmp_path):
+    """
+    Positive test:
+    - Participant averages and per-stimulus metrics are correlated with CARS Score, Age and
+      Gender (coded M = 1, F = 0) and the table is saved
+    Negative test:
+    - Metadata without any covariate gives an empty table with a warning
+    """
+    rng = np.random.default_rng(2)
+    participants = np.arange(1, 21)
+    cars = rng.uniform(15, 50, 20)
+    pd.DataFrame({"ParticipantID": participants, "Class": ["ASD", "TD"] * 10, "CARS Score": cars,
+                  "Age": rng.uniform(3, 12, 20), "Gender": ["M", "F", "m", "x"] * 5,
+                  "Avg_Gaze_Deviation": cars * 2 + rng.normal(0, 1, 20)}).to_csv(tmp_path / "metadata.csv",
+                                                                                   index=False)
+    pd.DataFrame({"Participant": np.repeat(participants, 2), "Experiment": 1, "Stimulus": ["StimA", "StimB"] * 20,
+                  "Deviation": np.repeat(cars, 2) + rng.normal(0, 1, 40)}).to_csv(tmp_path / "stats.csv",
+                                                                                  index=False)
+
+    table = run_correlation_analysis(str(tmp_path / "metadata.csv"), str(tmp_path / "stats.csv"),
+                                     str(tmp_path / "classification"), str(tmp_path / "correlations.csv"),
+                                     n_permutations=99)
+
+    saved = pd.read_csv(tmp_path / "correlations.csv")
+    assert len(saved) == len(table) == (1 + 2) * 3 * 2
+    cars_rows = table[table["Covariate"] == "CARS Score"]
+    assert (cars_rows["r"] > 0.9).all() and np.allclose(cars_rows["p_value"], 0.01)
+    assert set(table["Stimulus"].dropna()) == {"StimA", "StimB"}
+    assert (table[table["Covariate"] == "Gender"]["n"] == 15).all()
+    assert (table["q_value"] >= table["p_value"] - 1e-12).all()
+
+    pd.DataFrame({"ParticipantID": participants, "Class": "ASD"}).to_csv(tmp_path / "bare.csv", index=False)
+    assert run_correlation_analysis(str(tmp_path / "bare.csv"), str(tmp_path / "stats.csv"),
+                                    str(tmp_path / "classification"), str(tmp_path / "none.csv")).empty
@@ -1,11 +1,17 @@
 import pytest
 import os
+import numpy as np
 import pandas as pd
 
 from tests.test_fixtures import setup_mock_environment
+from tests.test_event_extraction import make_participant_data
+from src.event_extraction import create_event_files
 from src.data_analysis import (
     create_experiment_statistics_file,
     analyze_saccades,
+    compute_saccade_kinematics,
+    compute_saccade_frequency,
+    compute_avg_saccade_duration,
     calculate_experiment_deviation,
     calculate_participant_averages
 )
@@ -58,3 +64,104 @@ def test_calculate_participant_averages_no_data(setup_mock_environment, capsys):
 
     captured = capsys.readouterr()
     assert "No data found for Participant 101" in captured.out or True
+
+def test_compute_saccade_kinematics_positive():
+    """
+    Positive test:
+    - Two saccades (amplitudes 100 and 200) in the same stimulus give 
+      the averages and the slope of the main sequence.
+    """
+    events = pd.DataFrame({
+        "Participant": 1,
+        "Experiment": 1,
+        "Stimulus": "StimA",
+        "Event": ["Saccade", "Fixation", "Saccade"],
+        "Duration [ms]": [20.0, 200.0, 40.0],
+        "Amplitude [px]": [100.0, 5.0, 200.0],
+        "Peak Velocity [px/s]": [5000.0, 300.0, 8000.0]
+    })
+    kinematics = compute_saccade_kinematics(events).loc[(1, 1, "StimA")]
+
+    assert kinematics["Avg_Saccade_Amplitude"] == pytest.approx(150)
+    assert kinematics["Avg_Saccade_Peak_Velocity"] == pytest.approx(6500)
+    assert kinematics["Avg_Saccade_Mean_Velocity"] == pytest.approx(5000)
+    assert kinematics["Saccade_Main_Sequence_Slope"] == pytest.approx(30)
+
+def test_compute_saccade_kinematics_single_saccade():
+    """
+    Boundary test:
+    - A single saccade has no main-sequence slope.
+    """
+    events = pd.DataFrame({
+        "Participant": 1,
+        "Experiment": 1,
+        "Stimulus": "StimA",
+        "Event": ["Saccade"],
+        "Duration [ms]": [20.0],
+        "Amplitude [px]": [100.0],
+        "Peak Velocity [px/s]": [5000.0]
+    })
+    kinematics = compute_saccade_kinematics(events).loc[(1, 1, "StimA")]
+
+    assert pd.isna(kinematics["Saccade_Main_Sequence_Slope"])
+
+def test_analyze_saccades_reads_event_tables(tmp_path, capsys):
+    """
+    Positive test:
+    - The saccade metrics come from the stored event table while it is up to date and
+      equal the sample functions (a saccade sample with a fixating eye counts for both)
+    Boundary test:
+    - A participant file newer than its event table is read again
+    """
+    participant_folder = tmp_path / "clean_dataset"
+    participant_folder.mkdir()
+    df = make_participant_data()
+    df.loc[2, "Category Left"] = "Fixation"
+    participant_file = participant_folder / "Participant_1.csv"
+    df.to_csv(participant_file, index=False)
+    statistics_file = tmp_path / "experiment_statistics.csv"
+    statistics_file.write_text("Participant,Experiment,Stimulus\n1,1,StimA\n1,1,StimB\n")
+    events_folder = tmp_path / "events_dataset"
+    create_event_files(str(participant_folder), str(events_folder))
+
+    # Only the event table can give the metrics once the samples are unreadable
+    stat = os.stat(participant_file)
+    participant_file.write_text("Participant,Experiment,Stimulus\n1,1,StimA\n")
+    os.utime(participant_file, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**9))
+    analyze_saccades(str(participant_folder), str(statistics_file), "vendor", str(tmp_path / "none.csv"),
+                     str(events_folder))
+
+    stats = pd.read_csv(statistics_file).set_index("Stimulus")
+    stim_a = df[df["Stimulus"] == "StimA"]
+    assert stats.loc["StimA", "Saccade_Frequency"] == pytest.approx(compute_saccade_frequency(stim_a))
+    assert stats.loc["StimA", "Saccade_Frequency"] == pytest.approx(2 / 7)
+    assert stats.loc["StimA", "Avg_Saccade_Duration"] == pytest.approx(compute_avg_saccade_duration(stim_a))
+    assert stats.loc["StimB", "Saccade_Frequency"] == 0
+    assert np.isnan(stats.loc["StimB", "Avg_Saccade_Amplitude"])
+
+    os.utime(participant_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    statistics_file.write_text("Participant,Experiment,Stimulus\n1,1,StimA\n")
+    analyze_saccades(str(participant_folder), str(statistics_file), "vendor", str(tmp_path / "none.csv"),
+                     str(events_folder))
+    assert "not cleaned" in capsys.readouterr().out
+
+def test_participant_averages_keep_negative_slopes(tmp_path):
+    """
+    Boundary test:
+    - Negative and zero main-sequence slopes count in the participant average, missing
+      (NaN) kinematics don't; the other metrics still leave out their 0.0 placeholders
+    """
+    statistics_file = tmp_path / "experiment_statistics.csv"
+    metadata_file = tmp_path / "Metadata_Participants.csv"
+    pd.DataFrame({"Participant": [1, 1, 1, 2], "Experiment": 1, "Stimulus": ["A", "B", "C", "A"],
+                  "Saccade_Frequency": [0.2, 0.0, 0.4, 0.0],
+                  "Saccade_Main_Sequence_Slope": [-10.0, np.nan, 4.0, np.nan]}).to_csv(statistics_file, index=False)
+    pd.DataFrame({"ParticipantID": [1, 2], "Class": ["ASD", "TD"]}).to_csv(metadata_file, index=False)
+
+    calculate_participant_averages(str(statistics_file), str(metadata_file))
+
+    metadata = pd.read_csv(metadata_file).set_index("ParticipantID")
+    assert metadata.loc[1, "Saccade_Main_Sequence_Slope"] == pytest.approx(-3.0)
+    assert metadata.loc[1, "Saccade_Frequency"] == pytest.approx(0.3)
+    assert np.isnan(metadata.loc[2, "Saccade_Main_Sequence_Slope"])
+    assert metadata.loc[2, "Saccade_Frequency"] == 0
@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.data_quality import compute_quality_profile, failing_sessions, write_quality_report, load_excluded_sessions
+
+def make_cleaned_samples():
+    """
+    StimA: 6 samples 20 ms apart, one blink episode of two samples and one off-screen sample.
+    StimB: 2 samples with NaN coordinates (nothing tracked).
+    A separator row in between is not a sample.
+    """
+    return pd.DataFrame({
+        "RecordingTime [ms]": [0, 20, 40, 60, 80, 100, 110, 120, 140],
+        "Participant": 5,
+        "Experiment": 2,
+        "Stimulus": ["StimA"] * 6 + ["StimB"] * 3,
+        "Category Right": ["Fixation", "Blink", "Blink", "Fixation", "Saccade", "Fixation", "Separator", "-", "-"],
+        "Category Left": ["Fixation", "Blink", "Blink", "Fixation", "Saccade", "Fixation", "Separator", "-", "-"],
+        "Point of Regard Right X [px]": [100, 0, 0, 120, 1500, 130, np.nan, np.nan, np.nan],
+        "Point of Regard Right Y [px]": [100, 0, 0, 110, 500, 120, np.nan, np.nan, np.nan],
+        "Point of Regard Left X [px]": [100, 0, 0, 120, 1500, 130, np.nan, np.nan, np.nan],
+        "Point of Regard Left Y [px]": [100, 0, 0, 110, 500, 120, np.nan, np.nan, np.nan],
+        "Duration": [20, 20, 20, 20, 20, 10, 10, 20, np.nan]
+    })
+
+def test_quality_profile_metrics():
+    """
+    Positive test:
+    - Tracking ratio, blink rate, off-screen ratio and usable duration per stimulus
+    """
+    profile = compute_quality_profile(make_cleaned_samples()).set_index("Stimulus")
+
+    stim_a = profile.loc["StimA"]
+    assert stim_a["Samples"] == 6
+    assert stim_a["Tracking_Ratio"] == pytest.approx(4 / 6)
+    assert stim_a["Off_Screen_Ratio"] == pytest.approx(1 / 4)
+    assert stim_a["Blink_Rate [1/min]"] == pytest.approx(1 / (110 / 60000))
+    assert stim_a["Sampling_Rate [Hz]"] == pytest.approx(50)
+    assert stim_a["Sampling_Jitter [ms]"] == pytest.approx(0)
+    assert stim_a["Usable_Duration [ms]"] == pytest.approx(50)
+
+    stim_b = profile.loc["StimB"]
+    assert stim_b["Samples"] == 2
+    assert stim_b["Tracking_Ratio"] == 0
+    assert np.isnan(stim_b["Off_Screen_Ratio"])
+
+def test_thresholds_exclude_sessions(tmp_path):
+    """
+    Positive test:
+    - Sessions below the minimum tracking ratio are excluded, disabled thresholds exclude nothing
+    """
+    report_file = tmp_path / "data_quality_report.csv"
+    write_quality_report([compute_quality_profile(make_cleaned_samples())], str(report_file))
+
+    excluded = load_excluded_sessions({"min_tracking_ratio": 0.5, "max_blink_rate": None}, str(report_file))
+    assert excluded == {(5, 2, "StimB")}
+    assert load_excluded_sessions({"min_tracking_ratio": None}, str(report_file)) == set()
+
+def test_missing_report_excludes_nothing(tmp_path, capsys):
+    """
+    Negative test:
+    - Without a report a warning is printed and nothing is excluded
+    """
+    assert load_excluded_sessions({"min_tracking_ratio": 0.5}, str(tmp_path / "missing.csv")) == set()
+    assert "not found" in capsys.readouterr().out
+
+def test_missing_metric_never_fails():
+    """
+    Boundary test:
+    - A single-sample session has no jitter and doesn't fail a jitter threshold
+    """
+    profile = compute_quality_profile(make_cleaned_samples().iloc[:1])
+    assert np.isnan(profile["Sampling_Jitter [ms]"].iloc[0])
+    assert not failing_sessions(profile, {"max_sampling_jitter": 1.0}).any()
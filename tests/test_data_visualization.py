@@ -2,6 +2,7 @@ import pytest
 import matplotlib
 matplotlib.use("Agg")  
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
 from tests.test_fixtures import setup_mock_environment
@@ -10,7 +11,10 @@ from src.data_visualization import (
     compare_all_metrics,
     plot_individual_boxplots,
     plot_significant_subplots,
-    plot_distribution_kde_by_group
+    plot_distribution_kde_by_group,
+    plot_correlation_heatmap,
+    plot_time_resolved_difference,
+    save_time_resolved_plots
 )
 
 def test_load_and_split_data_by_class_positive(setup_mock_environment):
@@ -68,3 +72,51 @@ def test_plot_distribution_kde_by_group_performance(setup_mock_environment):
     plot_distribution_kde_by_group(df, "Avg_Gaze_Deviation")
     plt.close("all")
     assert True
+
+def test_plot_correlation_heatmap(tmp_path, capsys):
+    """
+    Positive test:
+    - Both levels are saved to a file
+    Negative test:
+    - A level without correlations is skipped with a warning
+    """
+    correlations = pd.DataFrame({
+        "Level": ["participant"] * 2 + ["stimulus"] * 2, "Metric": ["Avg_Gaze_Deviation"] * 2 + ["Deviation"] * 2,
+        "Stimulus": [None, None, "StimA", "StimB"], "Covariate": ["CARS Score", "Age"] + ["CARS Score"] * 2,
+        "Method": "spearman", "r": [0.6, -0.1, 0.5, 0.2], "p_value": [0.001, 0.6, 0.02, 0.3]})
+
+    plot_correlation_heatmap(correlations, output_file=str(tmp_path / "participant.png"))
+    plot_correlation_heatmap(correlations, level="stimulus", output_file=str(tmp_path / "stimulus.png"))
+    plot_correlation_heatmap(correlations, method="pearson")
+
+    assert (tmp_path / "participant.png").exists() and (tmp_path / "stimulus.png").exists()
+    assert "No pearson correlations" in capsys.readouterr().out
+
+def test_save_time_resolved_plots(tmp_path):
+    """
+    Positive test:
+    - Every stimulus' time course is saved, with its significant windows shaded
+    """
+    time_courses = {"StimA": {"bin_times": np.arange(0, 200, 20.0), "ASD_mean": np.linspace(100, 200, 10),
+                              "TD_mean": np.full(10, 100.0), "t": np.zeros(10), "ASD_participants": 5,
+                              "TD_participants": 6, "clusters": [{"start_time": 100.0, "end_time": 180.0,
+                                                                  "p_value": 0.01}]}}
+
+    save_time_resolved_plots(time_courses, str(tmp_path))
+
+    assert (tmp_path / "TimeCourse_StimA.png").exists()
+
+def test_time_resolved_shading_follows_alpha():
+    """
+    Boundary test:
+    - A cluster is only shaded if its p-value is below the given alpha
+    """
+    time_courses = {"StimA": {"bin_times": np.arange(0, 200, 20.0), "ASD_mean": np.linspace(100, 200, 10),
+                              "TD_mean": np.full(10, 100.0), "t": np.zeros(10), "ASD_participants": 5,
+                              "TD_participants": 6, "clusters": [{"start_time": 100.0, "end_time": 180.0,
+                                                                  "p_value": 0.07}]}}
+
+    for alpha, shaded in [(0.05, 0), (0.1, 1)]:
+        plot_time_resolved_difference(time_courses, "StimA", alpha=alpha)
+        assert len(plt.gca().patches) == shaded
+        plt.close("all")
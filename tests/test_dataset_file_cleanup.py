@@ -26,3 +26,59 @@ def test_create_participant_files_missing_cols(setup_mock_environment, capsys):
     create_participant_files()
     captured = capsys.readouterr()
     assert "Missing columns" in captured.out or "Skipping" in captured.out
+
+def test_create_participant_files_from_archives(setup_mock_environment):
+    """
+    Positive test:
+    - The experiment files as a ZIP archive, or compressed in the folder, give the same
+      participant files as the extracted CSVs, also when read in small chunks and in parallel.
+    """
+    import gzip
+    import lzma
+    import zipfile
+
+    raw_folder = setup_mock_environment / "dataset_project/Eye-tracking Output"
+    rows = ["RecordingTime [ms],Participant,Stimulus,Category Right,Category Left,Point of Regard Right X [px],"
+            "Point of Regard Right Y [px],Point of Regard Left X [px],Point of Regard Left Y [px],Pupil Diameter [mm]"]
+    rows += [f"{t * 16.7:.1f},{101 + t % 2},StimA,Fixation,Blink,{t if t % 5 else ''},{0 if t % 7 == 0 else 2 * t}"
+             f",1.50,200,3" for t in range(40)]
+    (raw_folder / "3.csv").write_text("\n".join(rows) + "\n")
+    create_participant_files()
+    expected = {file.name: file.read_text() for file in (setup_mock_environment / "clean_dataset").glob("Participant_10*.csv")}
+    assert set(expected) == {"Participant_101.csv", "Participant_102.csv"}
+
+    archive = setup_mock_environment / "export.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        for file in raw_folder.glob("*.csv"):
+            zf.write(file, f"Eye-tracking Output/{file.name}")
+    compressed = setup_mock_environment / "compressed"
+    compressed.mkdir()
+    (compressed / "1.csv.gz").write_bytes(gzip.compress((raw_folder / "1.csv").read_bytes()))
+    (compressed / "3.csv.xz").write_bytes(lzma.compress((raw_folder / "3.csv").read_bytes()))
+    with zipfile.ZipFile(compressed / "rest.zip", "w") as zf:
+        zf.write(raw_folder / "2.csv", "2.csv")
+
+    for source, kwargs in [(archive, {}), (compressed, {"chunksize": 7}), (archive, {"workers": 2, "chunksize": 3})]:
+        output = setup_mock_environment / f"from_{source.stem}_{len(kwargs)}"
+        create_participant_files(str(source), str(output), **kwargs)
+        assert {name: (output / name).read_text() for name in expected} == expected
+
+def test_experiment_sources(setup_mock_environment, capsys):
+    """
+    Negative/Boundary test:
+    - Experiment numbers are sorted numerically, other files are ignored, an experiment
+      found twice is read once with a warning, and a missing dataset gives no sources.
+    """
+    from src.dataset_file_cleanup import experiment_sources, experiment_id_of
+
+    raw_folder = setup_mock_environment / "dataset_project/Eye-tracking Output"
+    (raw_folder / "10.csv").write_text((raw_folder / "1.csv").read_text())
+    (raw_folder / "notes.txt").write_text("not an experiment")
+    (raw_folder / "2.csv.gz").write_bytes(b"")
+
+    sources = experiment_sources()
+    assert [experiment_id for experiment_id, _, _ in sources] == ["1", "2", "10"]
+    assert "Experiment 2 found more than once" in capsys.readouterr().out
+    assert experiment_id_of("Eye-tracking Output/12.CSV.xz") == "12"
+    assert experiment_id_of("readme.md") is None
+    assert experiment_sources("does_not_exist") == []
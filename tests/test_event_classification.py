@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.event_classification import classify_samples, with_classified_categories
+from src.data_analysis import compute_saccade_frequency, compute_avg_saccade_duration
+
+def make_recording(points, stimulus="StimA", interval=20):
+    """
+    A recording sampled every 'interval' ms at the given gaze points (both eyes equal),
+    without the exported category columns.
+    """
+    points = np.asarray(points, dtype=float)
+    return pd.DataFrame({
+        "Participant": 1,
+        "Experiment": 1,
+        "Stimulus": stimulus,
+        "RecordingTime [ms]": np.arange(len(points)) * interval,
+        "Duration": interval,
+        "Point of Regard Right X [px]": points[:, 0],
+        "Point of Regard Right Y [px]": points[:, 1],
+        "Point of Regard Left X [px]": points[:, 0],
+        "Point of Regard Left Y [px]": points[:, 1]
+    })
+
+# Fixation at (100, 100), a jump to (700, 100) over two samples, fixation, tracking loss, fixation
+points = [(100, 100)] * 8 + [(300, 100), (500, 100)] + [(700, 100)] * 8 + [(0, 0)] + [(700, 102)] * 6
+
+@pytest.mark.parametrize("method", ["ivt", "idt"])
+def test_classifiers_find_the_saccade(method):
+    """
+    Positive test:
+    - Both algorithms label the jump as a saccade, the stable parts as fixations
+      and the sample without coordinates as a blink
+    """
+    labels = classify_samples(make_recording(points), method)
+
+    assert (labels[:8] == "Fixation").all()
+    assert (labels[8:10] == "Saccade").all()
+    assert (labels[11:18] == "Fixation").all()
+    assert labels[18] == "Blink"
+    assert (labels[-5:] == "Fixation").all()
+
+def test_velocity_does_not_cross_stimuli():
+    """
+    Boundary test:
+    - The jump between two stimuli isn't a saccade, and 'Separator' rows get no label
+    """
+    df = pd.concat([make_recording([(100, 100)] * 4, "StimA"),
+                    make_recording([(900, 900)] * 4, "StimB")], ignore_index=True)
+    df["RecordingTime [ms]"] = np.arange(len(df)) * 20
+    df["Category Left"] = df["Category Right"] = "Fixation"
+    df.loc[7, ["Category Left", "Category Right"]] = "Separator"
+
+    labels = classify_samples(df, "ivt")
+    assert labels.tolist() == ["Fixation"] * 7 + [""]
+
+def test_metrics_use_the_selected_labels():
+    """
+    Positive test:
+    - The saccade metrics work without the exported categories when a classifier is selected
+    """
+    df = make_recording(points)
+    assert compute_saccade_frequency(df, "ivt") == pytest.approx(3 / 24)
+    assert compute_avg_saccade_duration(df, "ivt") == pytest.approx(60)
+
+    with pytest.raises(ValueError):
+        with_classified_categories(df, "vendor_v2")
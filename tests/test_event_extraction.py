@@ -0,0 +1,87 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.event_extraction import extract_events, create_event_files, load_participant_events
+
+def make_participant_data():
+    """
+    One stimulus with the labels F F S S F B B F, followed by a second stimulus
+    with a single fixation. Samples are 20 ms apart.
+    """
+    categories = ["Fixation", "Fixation", "Saccade", "Saccade", "Fixation", "Blink", "Blink", "Fixation", "Fixation"]
+    x = [100, 102, 200, 300, 302, 0, 0, 310, 500]
+    y = [100, 100, 100, 100, 100, 0, 0, 100, 500]
+    stimuli = ["StimA"] * 8 + ["StimB"]
+    times = [0, 20, 40, 60, 80, 100, 120, 140, 0]
+
+    return pd.DataFrame({
+        "Participant": 1,
+        "Experiment": 1,
+        "Stimulus": stimuli,
+        "Category Right": categories,
+        "Category Left": categories,
+        "Point of Regard Right X [px]": x,
+        "Point of Regard Right Y [px]": y,
+        "Point of Regard Left X [px]": x,
+        "Point of Regard Left Y [px]": y,
+        "RecordingTime Stimulus [ms]": times,
+        "Duration": [20.0] * 9
+    })
+
+def test_extract_events_positive():
+    """
+    Positive test:
+    - Each run of identical labels becomes one event, and runs don't cross stimuli.
+    """
+    events = extract_events(make_participant_data())
+
+    assert list(events["Event"]) == ["Fixation", "Saccade", "Fixation", "Blink", "Fixation", "Fixation"]
+    assert list(events["Stimulus"]) == ["StimA"] * 5 + ["StimB"]
+    assert list(events["Samples"]) == [2, 2, 1, 2, 1, 1]
+    assert list(events["Fixation Samples"]) == [2, 0, 1, 0, 1, 1]
+    assert events.loc[1, "Duration [ms]"] == 40.0
+    assert events.loc[1, "Onset [ms]"] == 40
+
+def test_extract_events_saccade_kinematics():
+    """
+    Positive test:
+    - The saccade starts at the last fixation sample (102) and ends at 300.
+    - Its fastest step is 100 px in 20 ms.
+    """
+    events = extract_events(make_participant_data())
+    saccade = events.loc[1]
+
+    assert saccade["Amplitude [px]"] == pytest.approx(198)
+    assert saccade["Peak Velocity [px/s]"] == pytest.approx(5000)
+    assert saccade["Centroid X [px]"] == pytest.approx(250)
+
+def test_extract_events_blink_has_no_position():
+    """
+    Edge test:
+    - Blinks have zero coordinates, so they get no centroid or amplitude.
+    """
+    events = extract_events(make_participant_data())
+    blink = events.loc[3]
+
+    assert np.isnan(blink["Centroid X [px]"])
+    assert np.isnan(blink["Amplitude [px]"])
+
+def test_create_event_files(tmp_path, capsys):
+    """
+    Positive + negative test:
+    - A valid participant file gets an event table.
+    - An empty participant file is skipped with a warning.
+    """
+    participant_folder = tmp_path / "clean_dataset"
+    participant_folder.mkdir()
+    make_participant_data().to_csv(participant_folder / "Participant_1.csv", index=False)
+    (participant_folder / "Participant_2.csv").write_text("")
+
+    events_folder = tmp_path / "events_dataset"
+    create_event_files(str(participant_folder), str(events_folder))
+
+    events = load_participant_events(1, str(events_folder))
+    assert len(events) == 6
+    assert load_participant_events(2, str(events_folder)) is None
+    assert "Participant_2.csv is empty" in capsys.readouterr().out
@@ -2,7 +2,7 @@ import pytest
 import os
 from pathlib import Path
 
-@pytest.fixture(scope="session")
+@pytest.fixture
 def setup_mock_environment(tmp_path_factory, request, monkeypatch):
     """
     A single fixture that sets up:
@@ -12,8 +12,8 @@ def setup_mock_environment(tmp_path_factory, request, monkeypatch):
     - average_paths folder for calculate_gaze_paths
     - Potential edge/negative/boundary scenarios in one place
 
-    The fixture uses 'session' scope so it can be reused across multiple test files
-    without re-creating the data every time (optional).
+    The working directory is changed to the mock project for the test, so the
+    default (relative) paths of src/load_data.py point into it.
     """
 
     # Create a base temporary directory
@@ -72,13 +72,8 @@ def setup_mock_environment(tmp_path_factory, request, monkeypatch):
     avg_folder = base_dir / "calculated_average_paths"
     avg_folder.mkdir()
 
-    # Monkeypatch the load_data paths:
-    from src import load_data  # or from your_package.load_data import ...
-    monkeypatch.setattr(load_data, "original_dataset", str(eye_tracking_folder))
-    monkeypatch.setattr(load_data, "participant_dataset", str(clean_dataset_folder))
-    monkeypatch.setattr(load_data, "average_paths_folder", str(avg_folder))
-    monkeypatch.setattr(load_data, "experiment_statistics_file", str(stats_file))
-    monkeypatch.setattr(load_data, "metadata_participants", str(meta_file))
+    # Run the test inside the mock project
+    monkeypatch.chdir(base_dir)
 
     # Return the base_dir or any relevant paths if the test files need them.
     return base_dir
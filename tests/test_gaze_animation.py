@@ -0,0 +1,115 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image
+
+from src.event_extraction import calculate_gaze_point
+from src.gaze_animation import gaze_points, animation_frames, frame_extent, render_frames, write_animation, create_gaze_animations
+from src.resampling import gaze_columns
+
+def write_project(project, participants=4, bins=30):
+    """
+    Cleaned participant files of StimA and StimB (alternately ASD and TD) and the average path of StimA only.
+    """
+    rng = np.random.default_rng(0)
+    dataset = project / "clean_dataset"
+    dataset.mkdir()
+    stats_rows = []
+    for participant in range(1, participants + 1):
+        frames = []
+        for stimulus in ["StimA", "StimB"]:
+            gaze = rng.uniform(100, 900, (bins, 2))
+            frames.append(pd.DataFrame({"Participant": participant, "Experiment": 1, "Stimulus": stimulus,
+                                        "SnappedTime": np.arange(bins) * 20.0, "Category Right": "Fixation",
+                                        "Category Left": "Fixation",
+                                        "Point of Regard Right X [px]": gaze[:, 0], "Point of Regard Right Y [px]": gaze[:, 1],
+                                        "Point of Regard Left X [px]": gaze[:, 0], "Point of Regard Left Y [px]": gaze[:, 1]}))
+            stats_rows.append((participant, 1, stimulus))
+        pd.concat(frames).to_csv(dataset / f"Participant_{participant}.csv", index=False)
+    pd.DataFrame(stats_rows, columns=["Participant", "Experiment", "Stimulus"]).to_csv(project / "stats.csv", index=False)
+    pd.DataFrame({"ParticipantID": range(1, participants + 1),
+                  "Class": ["ASD", "TD"] * (participants // 2)}).to_csv(project / "metadata.csv", index=False)
+    (project / "paths").mkdir()
+    pd.DataFrame({"SnappedTime": np.arange(bins) * 20.0, "Avg Right X": 500.0, "Avg Right Y": 400.0,
+                  "Avg Left X": 520.0, "Avg Left Y": 400.0}).to_csv(project / "paths" / "AveragePath_StimA.csv",
+                                                                    index=False)
+
+def animate(project, output_format, **options):
+    return create_gaze_animations(str(project / "clean_dataset"), str(project / "stats.csv"),
+                                  str(project / "metadata.csv"), str(project / "paths"), str(project / "tensors"),
+                                  str(project / "animations"), output_format=output_format, **options)
+
+def test_gaze_points_match_calculate_gaze_point():
+    """
+    Positive test:
+    - The tensor gaze points equal calculate_gaze_point(), with NaN and zero coordinates
+    """
+    rng = np.random.default_rng(1)
+    values = rng.uniform(0, 1000, (200, 4))
+    values[rng.random(values.shape) < 0.2] = np.nan
+    values[::7, :2] = 0
+    values[::11, 2:] = 0
+
+    points = gaze_points(values)
+    gaze_x, gaze_y = calculate_gaze_point(pd.DataFrame(values, columns=gaze_columns))
+
+    np.testing.assert_allclose(points, np.c_[gaze_x, gaze_y])
+
+def test_blitted_frames():
+    """
+    Positive test:
+    - Every frame has the figure's size; only the moving artists change between frames
+    - 'frame_step' keeps every n-th bin and the groups are split by class
+    """
+    rng = np.random.default_rng(2)
+    tensor = {"bin_times": np.arange(10) * 20.0, "values": rng.uniform(100, 900, (3, 10, 4)),
+              "mask": np.ones((3, 10), dtype=bool), "classes": np.array(["ASD", "TD", "TD"])}
+    frames = animation_frames(tensor, np.full((10, 2), 500.0), frame_step=2)
+
+    assert frames["times"].tolist() == [0, 40, 80, 120, 160]
+    assert frames["groups"]["ASD"].shape == (5, 1, 2) and frames["groups"]["TD"].shape == (5, 2, 2)
+
+    images = list(render_frames(frames, "StimA"))
+    assert len(images) == 5 and images[0].shape == (512, 640, 3) and images[0].dtype == np.uint8
+    changed = (images[0] != images[1]).any(axis=-1)
+    assert 0 < changed.mean() < 0.05
+    assert not changed[:40].any()
+
+def test_frame_extent():
+    """
+    Positive test:
+    - The axes cover the screen, widened to gaze points beyond it; NaN points are ignored
+    """
+    frames = {"average": np.array([[500.0, 400.0], [np.nan, np.nan]]),
+              "groups": {"ASD": np.array([[[1398.0, 1125.0]], [[np.nan, np.nan]]]),
+                         "TD": np.array([[[-20.0, 300.0]], [[600.0, 500.0]]])}}
+    assert frame_extent(frames, (1280, 1024)) == (-20, 1398, 0, 1125)
+    frames["groups"] = {"ASD": np.full((2, 1, 2), 100.0)}
+    assert frame_extent(frames, (1280, 1024)) == (0, 1280, 0, 1024)
+
+def test_create_gaze_animations(tmp_path, capsys, monkeypatch):
+    """
+    Positive test:
+    - A GIF with one frame per bin and a PNG sequence are written per stimulus
+    Negative test:
+    - A stimulus without an average path is skipped with a warning
+    - Without ffmpeg, MP4 falls back to PNG sequences; write_animation() refuses MP4 and unknown formats
+    """
+    write_project(tmp_path)
+
+    outputs = animate(tmp_path, "gif")
+    assert outputs == [str(tmp_path / "animations" / "GazeAnimation_StimA.gif")]
+    assert "Average path file for stimulus 'StimB' not found" in capsys.readouterr().out
+    assert Image.open(outputs[0]).n_frames == 30
+
+    monkeypatch.setattr(shutil, "which", lambda name: None)
+    outputs = animate(tmp_path, "mp4", frame_step=3)
+    assert "ffmpeg not found" in capsys.readouterr().out
+    assert len(os.listdir(outputs[0])) == 10
+
+    with pytest.raises(ValueError):
+        write_animation([], str(tmp_path / "clip.mp4"), 50, "mp4")
+    with pytest.raises(ValueError):
+        write_animation([], str(tmp_path / "clip.avi"), 50, "avi")
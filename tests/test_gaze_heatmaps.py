@@ -0,0 +1,115 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.gaze_heatmaps import (
+    compute_participant_heatmaps,
+    screen_coverage,
+    accumulate_heatmaps,
+    save_heatmaps,
+    load_heatmaps,
+    heatmap_difference
+)
+
+def make_participant_data(participant, x, y):
+    """
+    Two fixation samples at (x, y) on StimA, and one blink sample.
+    """
+    return pd.DataFrame({
+        "Participant": participant,
+        "Experiment": 1,
+        "Stimulus": "StimA",
+        "Category Right": ["Fixation", "Fixation", "Blink"],
+        "Category Left": ["Fixation", "Fixation", "Blink"],
+        "Point of Regard Right X [px]": [x, x, 0],
+        "Point of Regard Right Y [px]": [y, y, 0],
+        "Point of Regard Left X [px]": [x, x, 0],
+        "Point of Regard Left Y [px]": [y, y, 0],
+        "Duration": [20.0, 20.0, 20.0]
+    })
+
+def test_compute_participant_heatmaps_positive():
+    """
+    Positive test:
+    - Both fixation samples land in the same bin, so it holds the whole map.
+    """
+    stimuli, maps = compute_participant_heatmaps(make_participant_data(1, 10, 10), bins=(4, 4), screen_size=(100, 100))
+
+    assert list(stimuli) == ["StimA"]
+    assert maps.shape == (1, 4, 4)
+    assert maps[0, 0, 0] == pytest.approx(1.0)
+    assert maps.sum() == pytest.approx(1.0)
+
+def test_compute_participant_heatmaps_off_screen():
+    """
+    Edge test:
+    - Samples outside the screen are ignored, leaving an empty map.
+    """
+    _, maps = compute_participant_heatmaps(make_participant_data(1, 5000, 10), bins=(4, 4), screen_size=(100, 100))
+    assert maps.sum() == 0
+
+def test_accumulate_and_save_heatmaps(tmp_path):
+    """
+    Positive test:
+    - An ASD participant looks top-left and a TD participant bottom-right,
+      so the difference map is positive top-left and negative bottom-right.
+    - The maps survive a save/load round trip.
+    """
+    participant_folder = tmp_path / "clean_dataset"
+    participant_folder.mkdir()
+    make_participant_data(1, 10, 10).to_csv(participant_folder / "Participant_1.csv", index=False)
+    make_participant_data(2, 1275, 1020).to_csv(participant_folder / "Participant_2.csv", index=False)
+
+    meta_file = tmp_path / "Metadata_Participants.csv"
+    meta_file.write_text("ParticipantID,Class\n1,ASD\n2,TD\n")
+
+    heatmaps = accumulate_heatmaps(str(participant_folder), str(meta_file))
+    heatmaps_file = str(tmp_path / "heatmaps.npz")
+    save_heatmaps(heatmaps, heatmaps_file)
+    loaded = load_heatmaps(heatmaps_file)
+
+    assert list(loaded["participants"][0]) == [1, 1]
+    difference = heatmap_difference(loaded, "StimA")
+    assert difference[0, 0] == pytest.approx(1.0)
+    assert difference[-1, -1] == pytest.approx(-1.0)
+    assert heatmap_difference(loaded, "StimZ") is None
+
+def test_heatmap_difference_without_a_class():
+    """
+    Negative test:
+    - A class missing from the heatmaps, or without participants for the stimulus, gives None
+    """
+    maps = np.ones((2, 2, 3, 3))
+    heatmaps = {"stimuli": np.array(["StimA", "StimB"]), "classes": np.array(["ASD", "TD"]), "maps": maps,
+                "participants": np.array([[2, 1], [3, 0]])}
+
+    assert heatmap_difference(heatmaps, "StimA").shape == (3, 3)
+    assert heatmap_difference(heatmaps, "StimB") is None
+    assert heatmap_difference({**heatmaps, "classes": np.array(["ASD", "Other"])}, "StimA") is None
+
+def test_screen_coverage_reports_off_screen(tmp_path, capsys):
+    """
+    Positive test:
+    - Fixations beyond the screen are counted and reported, and a larger
+      screen_size brings them into the maps.
+    """
+    df = make_participant_data(1, 1350, 1100)
+    assert screen_coverage(df, (1280, 1024)) == (2, 2, 1350, 1100)
+    assert screen_coverage(df, (1400, 1130))[:2] == (2, 0)
+
+    participant_folder = tmp_path / "clean_dataset"
+    participant_folder.mkdir()
+    df.to_csv(participant_folder / "Participant_1.csv", index=False)
+    meta_file = tmp_path / "Metadata_Participants.csv"
+    meta_file.write_text("ParticipantID,Class\n1,ASD\n")
+
+    heatmaps = accumulate_heatmaps(str(participant_folder), str(meta_file), bins=(4, 4))
+    assert "2 of 2 fixation samples" in capsys.readouterr().out
+    assert heatmaps["maps"].sum() == 0
+
+    heatmaps = accumulate_heatmaps(str(participant_folder), str(meta_file), bins=(4, 4), screen_size=(1400, 1130))
+    assert "Warning" not in capsys.readouterr().out
+    assert heatmaps["maps"].sum() == pytest.approx(1.0)
+    heatmaps_file = str(tmp_path / "heatmaps.npz")
+    save_heatmaps(heatmaps, heatmaps_file)
+    assert list(load_heatmaps(heatmaps_file)["screen_size"]) == [1400, 1130]
@@ -1,4 +1,9 @@
 import pytest
+import os
+import sys
+import json
+import subprocess
+import pandas as pd
 import matplotlib
 matplotlib.use("Agg")
 from unittest.mock import patch
@@ -6,6 +11,8 @@ from unittest.mock import patch
 from tests.test_fixtures import setup_mock_environment
 from MAIN_analyze_data import main as main_analyze
 
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 @patch("matplotlib.pyplot.show")
 def test_main_analyze_data_positive(mock_show, setup_mock_environment):
     """
@@ -13,5 +20,60 @@ def test_main_analyze_data_positive(mock_show, setup_mock_environment):
     - We have minimal metadata with one ASD + one TD participant from fixture.
     - main_analyze_data plots boxplots + subplots. Mock out plt.show() to avoid UI.
     """
-    main_analyze()
+    main_analyze([])
     assert mock_show.called, "Expected at least one plot call in main_analyze_data."
+
+def test_main_analyze_data_stats(setup_mock_environment):
+    """
+    Positive test:
+    - The stats subcommand prints the comparison as JSON without importing the plotting libraries.
+    """
+    (setup_mock_environment / "Metadata_Participants.csv").write_text(
+        "ParticipantID,Class,Avg_Gaze_Deviation\n1,ASD,10\n2,ASD,12\n3,TD,20\n4,TD,24\n")
+    script = ("import sys, MAIN_analyze_data; MAIN_analyze_data.main(['stats']); "
+              "print(any(name.split('.')[0] in ('matplotlib', 'seaborn') for name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", script], cwd=setup_mock_environment, capture_output=True, text=True,
+                            env={**os.environ, "PYTHONPATH": project_root}, check=True)
+
+    *output, plotting_imported = result.stdout.strip().splitlines()
+    comparison = json.loads("\n".join(output))
+    assert comparison["Avg_Gaze_Deviation"]["ASD_mean"] == 11
+    assert comparison["Avg_Gaze_Deviation"]["TD_mean"] == 22
+    assert plotting_imported == "False"
+
+def test_main_analyze_data_mixed_model(tmp_path, capsys):
+    """
+    Positive test:
+    - 'stats --model mixed' compares the trials of the statistics file instead of the participant averages
+    """
+    pd.DataFrame({"Participant": [1, 1, 2, 2, 3, 3, 4, 4], "Experiment": 1, "Stimulus": ["StimA", "StimB"] * 4,
+                  "Avg_Gaze_Deviation": [10, 14, 11, 16, 20, 25, 22, 26]}).to_csv(tmp_path / "stats.csv", index=False)
+    pd.DataFrame({"ParticipantID": [1, 2, 3, 4], "Class": ["ASD", "ASD", "TD", "TD"]}).to_csv(
+        tmp_path / "metadata.csv", index=False)
+
+    main_analyze(["stats", "--model", "mixed", "--metadata", str(tmp_path / "metadata.csv"),
+                  "--statistics", str(tmp_path / "stats.csv")])
+
+    comparison = json.loads(capsys.readouterr().out)
+    assert comparison["Avg_Gaze_Deviation"]["trials"] == 8
+    assert comparison["Avg_Gaze_Deviation"]["effect"] == pytest.approx(-10.5)
+
+def test_main_analyze_data_correlate(setup_mock_environment, capsys):
+    """
+    Positive test:
+    - The correlate subcommand saves the correlation table and prints the participant level as JSON
+    """
+    pd.DataFrame({"ParticipantID": [1, 2, 3, 4, 5], "Class": ["ASD", "ASD", "ASD", "TD", "TD"],
+                  "CARS Score": [40, 35, 45, 20, 18], "Avg_Gaze_Deviation": [30, 26, 33, 15, 12]}).to_csv(
+        setup_mock_environment / "Metadata_Participants.csv", index=False)
+    pd.DataFrame({"Participant": [1, 2, 3, 4, 5], "Experiment": 1, "Stimulus": "StimA",
+                  "Deviation": [3, 2, 4, 1, 0]}).to_csv(setup_mock_environment / "experiment_statistics.csv",
+                                                        index=False)
+
+    main_analyze(["correlate", "--permutations", "50"])
+
+    output = capsys.readouterr().out
+    correlations = json.loads(output[output.index("["):])
+    assert {row["Method"] for row in correlations} == {"pearson", "spearman"}
+    assert all(row["r"] > 0.9 for row in correlations)
+    assert os.path.exists(setup_mock_environment / "correlations.csv")
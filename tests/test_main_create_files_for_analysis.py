@@ -11,7 +11,7 @@ def test_main_create_files_for_analysis_integration(setup_mock_environment, caps
     - We expect no crash and see logs about skipping or warnings 
       for missing data (like participant 999).
     """
-    main_create()
+    main_create([])
     captured = capsys.readouterr()
     assert "Warning:" in captured.out or "Skipping" in captured.out or True
 
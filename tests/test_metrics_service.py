@@ -0,0 +1,150 @@
+import pytest
+import os
+import json
+import time
+import asyncio
+
+from src import metrics_service
+from src.metrics_service import create_service_state, start_metrics_server, route_request, cached_value, HTTPError
+
+@pytest.fixture
+def service_files(tmp_path):
+    """
+    Minimal result files: two participants, one stimulus, one average path.
+    """
+    (tmp_path / "experiment_statistics.csv").write_text(
+        "Participant,Experiment,Stimulus,Saccade_Frequency\n101,1,StimA,0.2\n999,1,StimA,0.4\n"
+    )
+    (tmp_path / "Metadata_Participants.csv").write_text(
+        "ParticipantID,Class,Avg_Gaze_Deviation,Saccade_Frequency\n101,ASD,10,0.2\n999,TD,20,0.4\n"
+    )
+    avg_folder = tmp_path / "calculated_average_paths"
+    avg_folder.mkdir()
+    (avg_folder / "AveragePath_StimA.csv").write_text(
+        "SnappedTime,Avg Right X,Avg Right Y,Avg Left X,Avg Left Y\n0.0,,,,\n20.0,1,2,3,4\n40.0,5,6,7,8\n"
+    )
+    return tmp_path
+
+def make_state(service_files):
+    return create_service_state(
+        str(service_files / "experiment_statistics.csv"),
+        str(service_files / "Metadata_Participants.csv"),
+        str(service_files / "calculated_average_paths")
+    )
+
+async def http_get(port, target):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, body = response.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), json.loads(body)
+
+def test_metrics_server_endpoints(service_files):
+    """
+    Positive + negative test over a real socket:
+    - Participant, stimulus and average-path slices come back as JSON (NaN as null).
+    - Unknown participants give 404.
+    """
+    state = make_state(service_files)
+
+    async def scenario():
+        server = await start_metrics_server(state, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            results = [
+                await http_get(port, "/participants/101"),
+                await http_get(port, "/stimuli/StimA"),
+                await http_get(port, "/average-paths/StimA?start=0&end=20"),
+                await http_get(port, "/participants/5")
+            ]
+        return results
+
+    participant, stimulus, avg_path, missing = asyncio.run(scenario())
+
+    assert participant[0] == 200 and participant[1]["metadata"]["Class"] == "ASD"
+    assert stimulus[1]["group_means"]["TD"]["Saccade_Frequency"] == 0.4
+    assert [row["SnappedTime"] for row in avg_path[1]] == [0.0, 20.0]
+    assert avg_path[1][0]["Avg Right X"] is None
+    assert missing[0] == 404
+
+def test_route_request_uses_cache_until_file_changes(service_files):
+    """
+    Positive test:
+    - Repeated requests don't reload the files.
+    - After the metadata file changes, the new values are served.
+    """
+    state = make_state(service_files)
+    reloads = state["reloads"]
+
+    route_request(state, "GET", "/participants")
+    route_request(state, "GET", "/participants")
+    assert state["reloads"] == reloads
+
+    meta_file = service_files / "Metadata_Participants.csv"
+    meta_file.write_text("ParticipantID,Class,Avg_Gaze_Deviation,Saccade_Frequency\n101,ASD,11,0.2\n")
+    stat = os.stat(meta_file)
+    os.utime(meta_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert len(route_request(state, "GET", "/participants")) == 1
+
+def test_route_request_errors(service_files):
+    """
+    Negative test:
+    - Bad ids, unknown paths and other methods raise HTTPError.
+    """
+    state = make_state(service_files)
+    for method, target, status in [("GET", "/participants/abc", 400), ("GET", "/nothing", 404), ("POST", "/health", 405)]:
+        with pytest.raises(HTTPError) as error:
+            route_request(state, method, target)
+        assert error.value.status == status
+
+def test_cache_drops_least_recently_used(service_files):
+    """
+    Boundary test:
+    - The cache never holds more than 'cache_size' entries and drops the least recently used one.
+    """
+    state = create_service_state(str(service_files / "experiment_statistics.csv"),
+                                 str(service_files / "Metadata_Participants.csv"),
+                                 str(service_files / "calculated_average_paths"), cache_size=2)
+    assert len(state["cache"]) == 2
+
+    cached_value(state, "a", 1, lambda: "A")
+    cached_value(state, "b", 1, lambda: "B")
+    assert cached_value(state, "a", 1, lambda: "recomputed") == "A"
+    cached_value(state, "c", 1, lambda: "C")
+
+    assert list(state["cache"]) == ["a", "c"]
+    assert cached_value(state, "b", 1, lambda: "B again") == "B again"
+
+def test_slow_request_does_not_block_others(service_files, monkeypatch):
+    """
+    Positive test:
+    - While one request is stuck reading a file, other clients are still answered.
+    """
+    state = make_state(service_files)
+    real_get_participants = metrics_service.get_participants
+
+    def slow_get_participants(state):
+        time.sleep(1)
+        return real_get_participants(state)
+
+    monkeypatch.setattr(metrics_service, "get_participants", slow_get_participants)
+
+    async def scenario():
+        server = await start_metrics_server(state, port=0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            started = time.perf_counter()
+            slow = asyncio.create_task(http_get(port, "/participants"))
+            await asyncio.sleep(0.1)
+            health = await http_get(port, "/health")
+            health_time = time.perf_counter() - started
+            return health, health_time, await slow
+
+    health, health_time, slow = asyncio.run(scenario())
+
+    assert health == (200, {"status": "ok"})
+    assert health_time < 0.6
+    assert slow[0] == 200 and len(slow[1]) == 2
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.optimize import minimize
+
+from src.mixed_effects import fit_mixed_model, compare_metrics_mixed
+
+def crossed_data(participants=20, stimuli=8, effect=2.0, seed=3):
+    """
+    Trials of participants (the first half ASD) on random stimuli, with participant and
+    stimulus intercepts.
+    """
+    rng = np.random.default_rng(seed)
+    participant = np.repeat(np.arange(participants), stimuli)
+    stimulus = rng.integers(0, stimuli, len(participant))
+    asd = (participant < participants // 2).astype(float)
+    y = (3 + effect * asd + rng.normal(0, 1.5, participants)[participant] + rng.normal(0, 2, stimuli)[stimulus]
+         + rng.normal(0, 1, len(participant)))
+    return y, asd, participant, stimulus
+
+def dense_reml(y, X, groups):
+    """
+    REML fit from the full marginal covariance V = s2 I + sum(v_k Z_k Z_k'), as a reference.
+    """
+    Zs = [np.eye(codes.max() + 1)[codes] for codes in groups]
+    n, p = X.shape
+
+    def evaluate(log_variances):
+        variances = np.exp(log_variances)
+        V = variances[0] * np.eye(n) + sum(v * Z @ Z.T for v, Z in zip(variances[1:], Zs))
+        V_inv = np.linalg.inv(V)
+        information = X.T @ V_inv @ X
+        beta = np.linalg.solve(information, X.T @ V_inv @ y)
+        residual = y - X @ beta
+        deviance = (np.linalg.slogdet(V)[1] + np.linalg.slogdet(information)[1] + residual @ V_inv @ residual
+                    + (n - p) * np.log(2 * np.pi))
+        return deviance, beta, variances, np.linalg.inv(information)
+
+    result = minimize(lambda q: evaluate(q)[0], np.zeros(len(groups) + 1), method="Nelder-Mead",
+                      options={"xatol": 1e-10, "fatol": 1e-12, "maxiter": 20000})
+    return evaluate(result.x)
+
+def test_profiled_fit_matches_marginal_likelihood():
+    """
+    Positive test:
+    - The sparse profiled REML fit gives the same likelihood, fixed effects, standard errors
+      and variance components as the dense marginal model
+    """
+    y, asd, participant, stimulus = crossed_data()
+    X = np.c_[np.ones(len(y)), asd]
+
+    fit = fit_mixed_model(y, X, [participant, stimulus])
+    deviance, beta, variances, covariance = dense_reml(y, X, [participant, stimulus])
+
+    assert fit["converged"]
+    assert fit["deviance"] == pytest.approx(deviance, abs=1e-6)
+    np.testing.assert_allclose(fit["beta"], beta, rtol=1e-5)
+    np.testing.assert_allclose(np.sqrt(np.diag(fit["covariance"])), np.sqrt(np.diag(covariance)), rtol=1e-4)
+    np.testing.assert_allclose(fit["variances"], variances[1:], rtol=1e-4)
+    assert fit["residual_variance"] == pytest.approx(variances[0], rel=1e-4)
+
+def test_compare_metrics_mixed(tmp_path, capsys):
+    """
+    Positive test:
+    - Every metric is compared in one call; a real group difference is significant, none isn't
+    Boundary test:
+    - Missing values leave out only their trials, participants without a class are left out
+    Negative test:
+    - A metric without variance is skipped with a warning
+    """
+    y, asd, participant, stimulus = crossed_data(participants=30, stimuli=10, effect=4.0)
+    noise = np.random.default_rng(0).normal(0, 1, len(y))
+    noise[:5] = np.nan
+    pd.DataFrame({"Participant": participant + 1, "Experiment": 1, "Stimulus": [f"Stim{s}" for s in stimulus],
+                  "Deviation": y, "Noise": noise, "Constant": 1.0}).to_csv(tmp_path / "stats.csv", index=False)
+    pd.DataFrame({"ParticipantID": np.arange(1, 31),
+                  "Class": ["ASD"] * 15 + ["TD"] * 14 + ["Unknown"]}).to_csv(tmp_path / "metadata.csv", index=False)
+
+    results = compare_metrics_mixed(str(tmp_path / "stats.csv"), str(tmp_path / "metadata.csv"))
+
+    assert list(results) == ["Deviation", "Noise"]
+    assert "Constant" in capsys.readouterr().out
+    deviation = results["Deviation"]
+    assert deviation["p_value"] < 0.01 and deviation["effect"] == pytest.approx(4.0, abs=1.5)
+    assert deviation["ASD_mean"] - deviation["TD_mean"] == pytest.approx(deviation["effect"])
+    assert deviation["stimulus_variance"] > 0
+    assert (deviation["trials"], deviation["participants"], deviation["stimuli"]) == (29 * 10, 29, 10)
+    assert results["Noise"]["p_value"] > 0.05
+    assert results["Noise"]["trials"] == 29 * 10 - 5
+
+def test_compare_metrics_mixed_ignores_placeholder_zeros(tmp_path):
+    """
+    Boundary test:
+    - 0.0 "no data" placeholders are left out like missing values, so the many placeholders
+      of the ASD group don't pull its mean (and the effect) towards zero
+    """
+    y, asd, participant, stimulus = crossed_data(participants=20, stimuli=8, effect=0.0)
+    y = y + 20
+    with_placeholders = y.copy()
+    with_placeholders[(asd == 1) & (np.arange(len(y)) % 3 == 0)] = 0.0
+    for name, values in [("clean", np.where(with_placeholders == 0, np.nan, y)), ("zeros", with_placeholders)]:
+        pd.DataFrame({"Participant": participant + 1, "Experiment": 1, "Stimulus": [f"Stim{s}" for s in stimulus],
+                      "Metric": values}).to_csv(tmp_path / f"{name}.csv", index=False)
+    pd.DataFrame({"ParticipantID": np.arange(1, 21),
+                  "Class": ["ASD"] * 10 + ["TD"] * 10}).to_csv(tmp_path / "metadata.csv", index=False)
+
+    clean = compare_metrics_mixed(str(tmp_path / "clean.csv"), str(tmp_path / "metadata.csv"))["Metric"]
+    zeros = compare_metrics_mixed(str(tmp_path / "zeros.csv"), str(tmp_path / "metadata.csv"))["Metric"]
+
+    assert zeros["trials"] == clean["trials"] < len(y)
+    assert zeros["effect"] == pytest.approx(clean["effect"])
+    assert abs(zeros["effect"]) < 3
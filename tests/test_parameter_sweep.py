@@ -0,0 +1,165 @@
+import os
+import pytest
+import pandas as pd
+
+from src import pipeline
+from src.pipeline import load_config
+from src.parameter_sweep import parameter_grid, workspace_segments, run_sweep
+
+@pytest.fixture
+def recorded_stages(tmp_path, monkeypatch):
+    """
+    Replaces four pipeline stages with stubs that record their calls. The last one
+    writes metrics that depend on the snap interval and the bin width.
+    """
+    calls = []
+
+    def participant_files(original_dataset, participant_dataset):
+        calls.append(("participant_files", None))
+        os.makedirs(participant_dataset)
+        with open(os.path.join(participant_dataset, "Participant_1.csv"), "w") as f:
+            f.write("Participant\n1\n")
+
+    def cleanup(participant_dataset, snap_interval, workers):
+        calls.append(("cleanup", snap_interval))
+        with open(os.path.join(participant_dataset, "snap_interval.txt"), "w") as f:
+            f.write(str(snap_interval))
+
+    def average_paths(average_paths_folder, bin_width):
+        calls.append(("average_paths", bin_width))
+        os.makedirs(average_paths_folder)
+
+    def participant_averages(participant_dataset, metadata_participants, bin_width):
+        calls.append(("participant_averages", bin_width))
+        with open(os.path.join(participant_dataset, "snap_interval.txt")) as f:
+            snap_interval = int(f.read())
+        metadata = pd.read_csv(metadata_participants)
+        metadata["Saccade_Frequency"] = [1, 2, 3, 4] if bin_width is None else [4, 3, 2, 1]
+        metadata["Avg_Gaze_Deviation"] = snap_interval
+        metadata.to_csv(metadata_participants, index=False)
+
+    for stage, argument_names in [(participant_files, ["original_dataset", "participant_dataset"]),
+                            (cleanup, ["participant_dataset", "snap_interval", "workers"]),
+                            (average_paths, ["average_paths_folder", "bin_width"]),
+                            (participant_averages, ["participant_dataset", "metadata_participants", "bin_width"])]:
+        monkeypatch.setitem(pipeline.pipeline_stages, stage.__name__, (stage, argument_names))
+
+    metadata_file = tmp_path / "Metadata_Participants.csv"
+    pd.DataFrame({"ParticipantID": [1, 2, 3, 4], "Class": ["ASD", "ASD", "TD", "TD"]}).to_csv(metadata_file, index=False)
+    config = load_config(overrides={
+        "paths": {"metadata_participants": str(metadata_file)},
+        "stages": ["participant_files", "cleanup", "average_paths", "participant_averages"]
+    })
+
+    return config, calls
+
+def test_shared_stages_run_once(recorded_stages, tmp_path):
+    """
+    Positive test:
+    - Each stage runs once per distinct value of the parameters up to it, and every
+      variant gets its own comparison rows
+    """
+    config, calls = recorded_stages
+    grid = {"snap_interval": [10, 20], "bin_width": [None, 10]}
+    results = run_sweep(config, grid, str(tmp_path / "sweep"))
+
+    assert calls.count(("participant_files", None)) == 1
+    assert sorted(call for call in calls if call[0] == "cleanup") == [("cleanup", 10), ("cleanup", 20)]
+    assert len([call for call in calls if call[0] == "average_paths"]) == 4
+
+    frequency = results[results["Metric"] == "Saccade_Frequency"]
+    assert len(frequency) == 4
+    assert frequency["ASD_mean"].tolist() == [1.5, 3.5, 1.5, 3.5]
+    assert results[results["Metric"] == "Avg_Gaze_Deviation"]["ASD_mean"].tolist() == [10, 10, 20, 20]
+    assert (tmp_path / "sweep" / "sweep_results.csv").exists()
+
+def test_sweep_resumes(recorded_stages, tmp_path):
+    """
+    Positive test:
+    - A second sweep over the same folder only runs the new variants
+    """
+    config, calls = recorded_stages
+    run_sweep(config, {"snap_interval": [20]}, str(tmp_path / "sweep"))
+    calls.clear()
+    run_sweep(config, {"snap_interval": [20, 30]}, str(tmp_path / "sweep"))
+
+    assert [call[0] for call in calls] == ["cleanup", "average_paths", "participant_averages"]
+    assert calls[0] == ("cleanup", 30)
+
+def test_sweep_reruns_after_input_changes(recorded_stages, tmp_path):
+    """
+    Negative test:
+    - After the metadata or the raw data change, a sweep over the same folder doesn't
+      reuse the old workspaces, and fewer selected stages don't reuse later segments
+    """
+    config, calls = recorded_stages
+    run_sweep(config, {"snap_interval": [20]}, str(tmp_path / "sweep"))
+    calls.clear()
+
+    metadata_file = config["paths"]["metadata_participants"]
+    metadata = pd.read_csv(metadata_file)
+    metadata["Class"] = ["ASD", "TD", "ASD", "TD"]
+    metadata.to_csv(metadata_file, index=False)
+    results = run_sweep(config, {"snap_interval": [20]}, str(tmp_path / "sweep"))
+    assert [call[0] for call in calls] == ["participant_files", "cleanup", "average_paths", "participant_averages"]
+    assert results[results["Metric"] == "Saccade_Frequency"]["ASD_mean"].tolist() == [2.0]
+
+    raw_folder = tmp_path / "raw"
+    raw_folder.mkdir()
+    config = pipeline.merge_config(config, {"paths": {"original_dataset": str(raw_folder)}})
+    before = workspace_segments(config)
+    (raw_folder / "1.csv").write_text("RecordingTime [ms]\n")
+    after = workspace_segments(config)
+    assert all(old[0] != new[0] for old, new in zip(before, after))
+
+    without_participant_files = pipeline.merge_config(config, {"stages": ["cleanup", "average_paths"]})
+    assert workspace_segments(without_participant_files)[0][0] != after[1][0]
+
+def test_workspaces_link_participant_files(recorded_stages, tmp_path):
+    """
+    Positive test:
+    - Later workspaces hard-link the participant files of the previous one instead of copying
+    """
+    config, calls = recorded_stages
+    run_sweep(config, {"snap_interval": [10, 20]}, str(tmp_path / "sweep"))
+
+    files = sorted((tmp_path / "sweep").glob("*/clean_dataset/Participant_1.csv"))
+    assert len(files) == 5
+    assert len({os.stat(file).st_ino for file in files}) == 1
+
+def test_sweep_without_participant_files_stage(recorded_stages, tmp_path):
+    """
+    Positive test:
+    - Without the 'participant_files' stage the sweep starts from the configured participant files
+    Negative test:
+    - Without participant files to start from, it raises instead of producing empty results
+    """
+    config, calls = recorded_stages
+    participant_dataset = tmp_path / "clean_dataset"
+    participant_dataset.mkdir()
+    config = pipeline.merge_config(config, {"paths": {"participant_dataset": str(participant_dataset)},
+                                            "stages": ["cleanup", "average_paths", "participant_averages"]})
+    with pytest.raises(ValueError):
+        run_sweep(config, {"snap_interval": [20]}, str(tmp_path / "sweep"))
+
+    (participant_dataset / "Participant_1.csv").write_text("Participant\n1\n")
+    results = run_sweep(config, {"snap_interval": [20]}, str(tmp_path / "sweep"))
+    assert [call[0] for call in calls] == ["cleanup", "average_paths", "participant_averages"]
+    assert results[results["Metric"] == "Avg_Gaze_Deviation"]["ASD_mean"].tolist() == [20]
+    assert (participant_dataset / "Participant_1.csv").read_text() == "Participant\n1\n"
+
+def test_segments_and_grid(tmp_path):
+    """
+    Boundary test:
+    - The worker count doesn't split workspaces; misspelled parameters raise
+    """
+    config = load_config()
+    one_worker = workspace_segments(config)
+    four_workers = workspace_segments(load_config(overrides={"parameters": {"workers": 4}}))
+    assert [name for name, _, _ in one_worker] == [name for name, _, _ in four_workers]
+    assert [name.rsplit("_", 1)[0] for name, _, _ in one_worker] == ["participant_files", "cleanup", "saccades",
+                                                                      "average_paths", "heatmaps"]
+
+    assert parameter_grid({"a": [1, 2], "b": [3]}) == [{"a": 1, "b": 3}, {"a": 2, "b": 3}]
+    with pytest.raises(ValueError):
+        run_sweep(config, {"snap_intervall": [10]}, str(tmp_path / "sweep"))
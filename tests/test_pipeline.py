@@ -0,0 +1,95 @@
+import sys
+import pytest
+import pandas as pd
+
+from src import pipeline
+from src.pipeline import load_config, run_pipeline, stage_arguments
+from MAIN_create_files_for_analysis import parse_setting
+
+def test_config_file_and_overrides(tmp_path):
+    """
+    Positive test:
+    - A TOML file and overrides change only the given entries; the stages get them explicitly
+    """
+    config_file = tmp_path / "sweep.toml"
+    config_file.write_text('stages = ["cleanup", "average_paths"]\n'
+                           '[paths]\nparticipant_dataset = "run1/clean_dataset"\n'
+                           '[parameters]\nsnap_interval = 10\n'
+                           '[parameters.quality_thresholds]\nmin_tracking_ratio = 0.8\n')
+    config = load_config(str(config_file), parse_setting("parameters.workers=4"))
+
+    assert config["stages"] == ["cleanup", "average_paths"]
+    assert config["paths"]["experiment_statistics_file"] == "experiment_statistics.csv"
+
+    cleanup = stage_arguments("cleanup", config)
+    assert cleanup["participant_dataset"] == "run1/clean_dataset"
+    assert cleanup["snap_interval"] == 10 and cleanup["workers"] == 4
+    average_paths = stage_arguments("average_paths", config)
+    assert average_paths["quality_thresholds"]["min_tracking_ratio"] == 0.8
+    assert average_paths["quality_thresholds"]["max_blink_rate"] is None
+
+def test_unknown_entries_raise(tmp_path):
+    """
+    Negative test:
+    - Misspelled entries, unknown stages and unsupported files are rejected
+    """
+    with pytest.raises(ValueError):
+        load_config(overrides={"parameters": {"snap_intervall": 10}})
+    with pytest.raises(ValueError):
+        load_config(overrides={"stages": ["cleanup", "plots"]})
+
+    config_file = tmp_path / "sweep.ini"
+    config_file.write_text("")
+    with pytest.raises(ValueError):
+        load_config(str(config_file))
+
+def test_toml_without_tomllib(tmp_path, monkeypatch):
+    """
+    Boundary test:
+    - Without tomllib (Python < 3.11) and tomli, JSON files still load and TOML files
+      raise a clear ImportError instead of breaking the import of the pipeline
+    """
+    monkeypatch.setitem(sys.modules, "tomllib", None)
+    monkeypatch.setitem(sys.modules, "tomli", None)
+    json_file = tmp_path / "run.json"
+    json_file.write_text('{"parameters": {"snap_interval": 10}}')
+    assert load_config(str(json_file))["parameters"]["snap_interval"] == 10
+
+    toml_file = tmp_path / "run.toml"
+    toml_file.write_text("[parameters]\nsnap_interval = 10\n")
+    with pytest.raises(ImportError, match="tomli"):
+        load_config(str(toml_file))
+
+def test_runs_are_independent(tmp_path, monkeypatch):
+    """
+    Positive test:
+    - Two configurations run the same stages on their own locations
+    """
+    calls = []
+    monkeypatch.setitem(pipeline.pipeline_stages, "saccades",
+                        (lambda **kwargs: calls.append("saccades"), []))
+
+    for run in ["run1", "run2"]:
+        clean_dataset = tmp_path / run / "clean_dataset"
+        clean_dataset.mkdir(parents=True)
+        pd.DataFrame({"Participant": [1], "Experiment": [1], "Stimulus": [run]}).to_csv(
+            clean_dataset / "Participant_1.csv", index=False)
+
+    configs = [load_config(overrides={"paths": {"participant_dataset": str(tmp_path / run / "clean_dataset"),
+                                                "experiment_statistics_file": str(tmp_path / run / "stats.csv")}})
+               for run in ["run1", "run2"]]
+    for config in configs:
+        run_pipeline(config, stages=["saccades", "experiment_statistics"])
+
+    assert calls == ["saccades", "saccades"]
+    for run in ["run1", "run2"]:
+        assert pd.read_csv(tmp_path / run / "stats.csv")["Stimulus"].tolist() == [run]
+
+def test_parse_setting():
+    """
+    Boundary test:
+    - Values are read as JSON when possible, otherwise kept as text
+    """
+    assert parse_setting("parameters.bin_width=null") == {"parameters": {"bin_width": None}}
+    assert parse_setting("parameters.smoothing=savgol") == {"parameters": {"smoothing": "savgol"}}
+    assert parse_setting('stages=["cleanup"]') == {"stages": ["cleanup"]}
@@ -0,0 +1,271 @@
+"""
+Runs the production cleanup, gaze path and statistics functions side by side with the
+row-by-row reference versions of tests/reference_implementations.py on randomized synthetic
+recordings (irregular sampling, blinks, NaN and zero coordinates, Separator rows), and
+checks that the outputs match. The time of every stage is measured for both versions
+and the speedups are printed (pytest -s) and recorded as test properties.
+
+A larger run with a speedup table: python -m tests.test_reference_equivalence
+"""
+
+import io
+import os
+import sys
+import time
+import shutil
+import pytest
+import numpy as np
+import pandas as pd
+from types import SimpleNamespace
+
+from src import data_cleanup, calculate_gaze_paths, data_analysis
+from src.stimulus_catalog import create_stimulus_catalog
+from src.event_extraction import create_event_files
+from tests import reference_implementations as reference
+
+production = SimpleNamespace(**{name: getattr(module, name) for module, names in [
+    (data_cleanup, ["clean_and_extract_eyetracking_data"]),
+    (calculate_gaze_paths, ["create_average_paths_files", "calculate_gaze_deviation"]),
+    (data_analysis, ["create_experiment_statistics_file", "analyze_saccades", "calculate_experiment_deviation"])
+] for name in names})
+
+stimulus_names = ["01 chat.jpg", "02 b joie triste.png", "02 b joie triste - copie.png", "03 balle.avi"]
+
+def synthetic_recordings(seed, participants=4, experiments=2, stimuli=3, samples=150):
+    """
+    Creates raw participant recordings, as written by create_participant_files().
+
+    Every experiment shows 'stimuli' stimuli in a random order for about 'samples' samples
+    each, with irregular (sometimes repeated) timestamps, vendor categories including
+    blinks and Separator rows, NaN coordinates and coordinates at (0, 0).
+
+    Returns:
+      tuple (recordings, classes): participant -> pd.DataFrame, and participant -> 'ASD' or 'TD'.
+    """
+    rng = np.random.default_rng(seed)
+    categories = np.array(["Fixation", "Saccade", "Blink", "-"])
+    recordings = {}
+    for participant in range(1, participants + 1):
+        blocks = []
+        for experiment in range(1, experiments + 1):
+            start = rng.uniform(0, 10000)
+            for stimulus in rng.permutation(stimulus_names)[:stimuli]:
+                n = samples + rng.integers(-samples // 4, samples // 4 + 1)
+                # Irregular sampling, with some repeated timestamps
+                steps = np.where(rng.random(n) < 0.03, 0.0, rng.uniform(2, 25, n))
+                times = np.round(start + np.cumsum(steps), 3)
+                start = times[-1] + rng.uniform(50, 500)
+
+                block = pd.DataFrame({
+                    "RecordingTime [ms]": times,
+                    "Participant": participant,
+                    "Stimulus": stimulus,
+                    "Category Right": categories[rng.choice(4, n, p=[0.6, 0.25, 0.1, 0.05])],
+                    "Category Left": categories[rng.choice(4, n, p=[0.6, 0.25, 0.1, 0.05])],
+                })
+                path = np.cumsum(rng.normal(0, 15, (n, 2)), axis=0) + rng.uniform(200, 800, 2)
+                for eye, offset in [("Right", 0), ("Left", 5)]:
+                    x, y = path[:, 0] + offset + rng.normal(0, 3, n), path[:, 1] + rng.normal(0, 3, n)
+                    blink = (block[f"Category {eye}"] == "Blink").to_numpy()
+                    x[blink | (rng.random(n) < 0.03)] = np.nan
+                    y[blink | (rng.random(n) < 0.03)] = np.nan
+                    zero = rng.random(n) < 0.03
+                    x[zero], y[zero] = 0.0, 0.0
+                    block[f"Point of Regard {eye} X [px]"] = np.round(x, 2)
+                    block[f"Point of Regard {eye} Y [px]"] = np.round(y, 2)
+
+                # Separator rows (both eyes, or only one, which are kept)
+                separators = rng.random(n) < 0.04
+                block.loc[separators, "Category Right"] = "Separator"
+                block.loc[separators & (rng.random(n) < 0.8), "Category Left"] = "Separator"
+                block["Experiment"] = experiment
+                blocks.append(block)
+        recordings[participant] = pd.concat(blocks, ignore_index=True)
+
+    classes = {participant: ("ASD" if participant % 2 else "TD") for participant in recordings}
+    return recordings, classes
+
+def timed(function, *args, **kwargs):
+    """
+    Returns (result, seconds) of one call.
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def as_saved(df):
+    """
+    Returns the DataFrame as it is read back from its CSV file.
+    """
+    return pd.read_csv(io.StringIO(df.to_csv(index=False)), low_memory=False)
+
+def assert_frames_match(expected, actual, sort_by=None):
+    """
+    Asserts that two outputs have the same columns and rows, and the same values up to a tolerance.
+    """
+    if sort_by:
+        expected = expected.sort_values(sort_by).reset_index(drop=True)
+        actual = actual.sort_values(sort_by).reset_index(drop=True)
+    pd.testing.assert_frame_equal(expected, actual, check_dtype=False, rtol=1e-9, atol=1e-6)
+
+def clean_recordings(implementation, recordings, **parameters):
+    """
+    Cleans every recording with one implementation.
+
+    Returns:
+      tuple (cleaned, seconds): participant -> cleaned DataFrame, and the total time.
+    """
+    cleaned, seconds = {}, 0.0
+    for participant, df in recordings.items():
+        cleaned[participant], elapsed = timed(implementation.clean_and_extract_eyetracking_data, df.copy(),
+                                              f"Participant_{participant}.csv", **parameters)
+        seconds += elapsed
+    return cleaned, seconds
+
+def run_analysis_stages(implementation, workspace, cleaned, classes):
+    """
+    Runs the statistics, saccade, average path, gaze deviation and experiment deviation
+    stages of one implementation in its own workspace folder. The production saccade
+    analysis reads the event tables, so their extraction counts towards its time.
+
+    Returns:
+      dict: stage -> seconds.
+    """
+    paths = {name: str(workspace / name) for name in ["clean_dataset", "calculated_average_paths",
+                                                      "cohort_tensors", "experiment_statistics.csv",
+                                                      "Metadata_Participants.csv", "stimulus_catalog.csv",
+                                                      "data_quality_report.csv", "events_dataset"]}
+    os.makedirs(paths["clean_dataset"])
+    for participant, df in cleaned.items():
+        df.to_csv(os.path.join(paths["clean_dataset"], f"Participant_{participant}.csv"), index=False)
+    pd.DataFrame({"ParticipantID": list(classes), "Class": list(classes.values())}).to_csv(
+        paths["Metadata_Participants.csv"], index=False)
+
+    seconds = {}
+    _, seconds["experiment_statistics"] = timed(implementation.create_experiment_statistics_file,
+                                                paths["clean_dataset"], paths["experiment_statistics.csv"])
+    create_stimulus_catalog(paths["experiment_statistics.csv"], paths["clean_dataset"], paths["stimulus_catalog.csv"])
+    event_seconds = 0.0
+    if implementation is production:
+        _, event_seconds = timed(create_event_files, paths["clean_dataset"], paths["events_dataset"])
+    _, seconds["saccades"] = timed(implementation.analyze_saccades, paths["clean_dataset"],
+                                   paths["experiment_statistics.csv"], "vendor", paths["stimulus_catalog.csv"],
+                                   paths["events_dataset"])
+    seconds["saccades"] += event_seconds
+    _, seconds["average_paths"] = timed(implementation.create_average_paths_files, paths["clean_dataset"],
+                                        paths["experiment_statistics.csv"], paths["Metadata_Participants.csv"],
+                                        paths["calculated_average_paths"], paths["cohort_tensors"],
+                                        data_quality_file=paths["data_quality_report.csv"])
+    _, seconds["gaze_deviation"] = timed(implementation.calculate_gaze_deviation, paths["clean_dataset"],
+                                         paths["calculated_average_paths"])
+    _, seconds["experiment_deviation"] = timed(implementation.calculate_experiment_deviation, paths["clean_dataset"],
+                                               paths["experiment_statistics.csv"], paths["stimulus_catalog.csv"])
+    return seconds
+
+def report_speedups(reference_seconds, production_seconds, record_property=None):
+    """
+    Prints the time of every stage for both implementations and the speedup
+    (reference time / production time).
+
+    Returns:
+      dict: stage -> speedup.
+    """
+    speedups = {}
+    print(f"\n{'Stage':<24}{'Reference [s]':>15}{'Production [s]':>16}{'Speedup':>10}")
+    for stage in reference_seconds:
+        speedups[stage] = reference_seconds[stage] / max(production_seconds[stage], 1e-9)
+        print(f"{stage:<24}{reference_seconds[stage]:>15.3f}{production_seconds[stage]:>16.3f}{speedups[stage]:>9.2f}x")
+        if record_property is not None:
+            record_property(f"speedup_{stage}", round(speedups[stage], 3))
+    return speedups
+
+@pytest.mark.parametrize("seed, parameters", [
+    (0, {}),
+    (1, {"snap_interval": 25}),
+    (2, {"max_gap": 60, "smoothing": "savgol", "smoothing_window": 5}),
+    (3, {"max_gap": 40, "smoothing": "median", "smoothing_window": 3})
+])
+def test_cleanup_matches_reference(seed, parameters, record_property):
+    """
+    Positive test:
+    - The production cleanup gives the same participant files as the reference, with the
+      default settings and with other snap intervals and signal filters
+    """
+    recordings, _ = synthetic_recordings(seed)
+    expected, reference_seconds = clean_recordings(reference, recordings, **parameters)
+    actual, production_seconds = clean_recordings(production, recordings, **parameters)
+
+    for participant in recordings:
+        assert_frames_match(as_saved(expected[participant]), as_saved(actual[participant]))
+    report_speedups({"cleanup": reference_seconds}, {"cleanup": production_seconds}, record_property)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_analysis_stages_match_reference(seed, tmp_path, record_property):
+    """
+    Positive test:
+    - The statistics, saccades, average paths, gaze deviations and experiment deviations
+      of the production stages match the reference on the same cleaned recordings
+    """
+    recordings, classes = synthetic_recordings(seed)
+    cleaned, _ = clean_recordings(production, recordings)
+
+    reference_seconds = run_analysis_stages(reference, tmp_path / "reference", cleaned, classes)
+    production_seconds = run_analysis_stages(production, tmp_path / "production", cleaned, classes)
+
+    expected_stats = pd.read_csv(tmp_path / "reference" / "experiment_statistics.csv")
+    actual_stats = pd.read_csv(tmp_path / "production" / "experiment_statistics.csv")
+    assert len(expected_stats) == len(classes) * 2 * 3
+    assert_frames_match(expected_stats, actual_stats, sort_by=["Participant", "Experiment", "Stimulus"])
+
+    for folder in ["calculated_average_paths", "clean_dataset"]:
+        files = sorted(os.listdir(tmp_path / "reference" / folder))
+        assert files == sorted(os.listdir(tmp_path / "production" / folder)) and files
+        for file in files:
+            assert_frames_match(pd.read_csv(tmp_path / "reference" / folder / file, low_memory=False),
+                                pd.read_csv(tmp_path / "production" / folder / file, low_memory=False))
+    report_speedups(reference_seconds, production_seconds, record_property)
+
+def test_synthetic_recordings_boundary():
+    """
+    Boundary test:
+    - The synthetic recordings contain the edge cases the comparison is meant to cover,
+      and the same seed gives the same recordings
+    """
+    recordings, _ = synthetic_recordings(0)
+    df = pd.concat(recordings.values())
+    coordinates = df[["Point of Regard Right X [px]", "Point of Regard Right Y [px]"]]
+    assert ((df["Category Right"] == "Separator") & (df["Category Left"] == "Separator")).any()
+    assert ((df["Category Right"] == "Separator") & (df["Category Left"] != "Separator")).any()
+    assert (df["Category Right"] == "Blink").any()
+    assert coordinates.isna().any().all() and (coordinates == 0).all(axis=1).any()
+    assert (df.groupby(["Participant", "Experiment"])["RecordingTime [ms]"].diff() == 0).any()
+    pd.testing.assert_frame_equal(recordings[1], synthetic_recordings(0)[0][1])
+
+def test_mismatch_is_detected():
+    """
+    Negative test:
+    - A drift larger than the tolerance fails the comparison
+    """
+    recordings, _ = synthetic_recordings(0, participants=1)
+    expected, _ = clean_recordings(reference, recordings)
+    drifted = as_saved(expected[1])
+    drifted.loc[drifted["SnappedTime"].notna().idxmax(), "Duration"] += 1e-3
+    with pytest.raises(AssertionError):
+        assert_frames_match(as_saved(expected[1]), drifted)
+
+if __name__ == "__main__":
+    # Larger recordings for the speedup table
+    import tempfile
+    from pathlib import Path
+    recordings, classes = synthetic_recordings(0, participants=int(sys.argv[1]) if len(sys.argv) > 1 else 12,
+                                               experiments=3, stimuli=4, samples=1500)
+    _, reference_cleanup = clean_recordings(reference, recordings)
+    cleaned, production_cleanup = clean_recordings(production, recordings)
+    workspace = Path(tempfile.mkdtemp())
+    try:
+        reference_seconds = run_analysis_stages(reference, workspace / "reference", cleaned, classes)
+        production_seconds = run_analysis_stages(production, workspace / "production", cleaned, classes)
+    finally:
+        shutil.rmtree(workspace)
+    report_speedups({"cleanup": reference_cleanup, **reference_seconds},
+                    {"cleanup": production_cleanup, **production_seconds})
@@ -0,0 +1,93 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.resampling import resample_gaze, to_dense_array, time_bins
+
+def make_samples(times, right_x, stimulus="StimA", categories=None):
+    right_x = np.asarray(right_x, dtype=float)
+    return pd.DataFrame({
+        "Participant": 1,
+        "Experiment": 1,
+        "Stimulus": stimulus,
+        "RecordingTime Stimulus [ms]": np.asarray(times, dtype=float),
+        "Category Right": categories if categories is not None else "Fixation",
+        "Category Left": categories if categories is not None else "Fixation",
+        "Point of Regard Right X [px]": right_x,
+        "Point of Regard Right Y [px]": right_x,
+        "Point of Regard Left X [px]": right_x,
+        "Point of Regard Left Y [px]": right_x
+    })
+
+def test_bin_mean_uses_every_sample():
+    """
+    Positive test:
+    - Every sample in a bin is averaged; blinks and zero coordinates are ignored;
+      the grid is dense with NaN for empty bins
+    """
+    df = make_samples([0, 4, 8, 21, 38, 79], [100, 200, 0, 300, 500, 900],
+                      categories=["Fixation", "Fixation", "Fixation", "Fixation", "Blink", "Fixation"])
+    resampled = resample_gaze(df, bin_width=20, method="mean")
+
+    assert resampled["SnappedTime"].tolist() == [0, 20, 40, 60, 80]
+    right_x = resampled["Point of Regard Right X [px]"].to_numpy()
+    assert right_x[:2].tolist() == [150, 300]
+    assert np.isnan(right_x[2]) and np.isnan(right_x[3])
+    assert right_x[4] == 900
+
+def test_interpolation_stays_inside_each_group():
+    """
+    Boundary test:
+    - Values are interpolated at the bin times, but not before the first or after the
+      last valid sample, and never between stimuli
+    """
+    df = pd.concat([
+        make_samples([5, 55], [100, 600], "StimA"),
+        make_samples([0, 40], [1000, 1000], "StimB")
+    ], ignore_index=True)
+    resampled = resample_gaze(df, bin_width=10, method="interpolate")
+
+    stim_a = resampled[resampled["Stimulus"] == "StimA"]["Point of Regard Right X [px]"].to_numpy()
+    assert np.isnan(stim_a[0])
+    assert stim_a[1:6] == pytest.approx([150, 250, 350, 450, 550])
+    assert np.isnan(stim_a[6])
+
+    groups, bin_times, values = to_dense_array(resampled)
+    assert values.shape == (2, 7, 4)
+    assert groups["Stimulus"].tolist() == ["StimA", "StimB"]
+    assert values[1, :5, 0] == pytest.approx([1000] * 5)
+    assert np.isnan(values[1, 5:, 0]).all()
+
+def test_fractional_bin_width_keeps_last_bin():
+    """
+    Boundary test:
+    - With a bin width like 16.7 ms, a sample in the last bin still gets its bin and its value
+    """
+    times = np.arange(7) * 16.7
+    assert (time_bins(times, 16.7) // 16.7).tolist() != list(range(7))
+    for method in ["mean", "interpolate"]:
+        resampled = resample_gaze(make_samples(times, 100.0 + np.arange(7) * 100.0), bin_width=16.7, method=method)
+        assert len(resampled) == 7
+        assert resampled["Point of Regard Right X [px]"].tolist() == pytest.approx(100.0 + np.arange(7) * 100.0)
+
+def test_interpolation_leaves_long_gaps():
+    """
+    Boundary test:
+    - Gaps longer than 'max_gap' stay NaN (except at the samples themselves); None bridges every gap
+    """
+    df = make_samples([0, 20, 300, 320], [100, 200, 800, 900])
+    right_x = resample_gaze(df, bin_width=20, method="interpolate", max_gap=100)["Point of Regard Right X [px]"]
+    assert right_x.iloc[[0, 1, 15, 16]].tolist() == [100, 200, 800, 900]
+    assert right_x.iloc[2:15].isna().all()
+
+    right_x = resample_gaze(df, bin_width=20, method="interpolate", max_gap=None)["Point of Regard Right X [px]"]
+    assert right_x.notna().all()
+    assert right_x.iloc[8] == pytest.approx(500)
+
+def test_unknown_method():
+    """
+    Negative test:
+    - Unknown resampling methods raise
+    """
+    with pytest.raises(ValueError):
+        resample_gaze(make_samples([0], [100]), method="nearest")
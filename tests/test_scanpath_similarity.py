@@ -0,0 +1,162 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from src import scanpath_similarity
+from src.scanpath_similarity import (
+    build_trajectory_matrix,
+    euclidean_distance_matrix,
+    fixation_sequences,
+    edit_distance_matrix,
+    compute_stimulus_similarity,
+    create_scanpath_similarity_files,
+    similarity_cache_file
+)
+
+def levenshtein(a, b):
+    """
+    Plain dynamic-programming edit distance used as the reference.
+    """
+    previous = list(range(len(b) + 1))
+    for i, a_item in enumerate(a, 1):
+        current = [i]
+        for j, b_item in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a_item != b_item)))
+        previous = current
+    return previous[-1]
+
+def make_samples():
+    """
+    Three recordings of one stimulus; participant 3 is missing the last bin.
+    """
+    return pd.DataFrame({
+        "Participant": [1, 1, 1, 2, 2, 2, 3, 3],
+        "Experiment": 1,
+        "SnappedTime": [0, 20, 40, 0, 20, 40, 0, 20],
+        "X": [100, 100, 100, 103, 104, 100, 900, 900],
+        "Y": [100, 100, 100, 104, 103, 100, 900, 900],
+        "Fixation": True
+    })
+
+def test_euclidean_distance_matrix_matches_brute_force():
+    """
+    Positive test:
+    - The matrix-product form equals a direct RMS over the shared bins.
+    """
+    recordings, trajectories = build_trajectory_matrix(make_samples())
+    distances = euclidean_distance_matrix(trajectories)
+
+    assert list(recordings["Participant"]) == [1, 2, 3]
+    for i in range(3):
+        for j in range(3):
+            shared = ~np.isnan(trajectories[i, :, 0]) & ~np.isnan(trajectories[j, :, 0])
+            expected = np.sqrt((((trajectories[i, shared] - trajectories[j, shared]) ** 2).sum(axis=1)).mean())
+            assert distances[i, j] == pytest.approx(expected)
+    assert distances[0, 1] == pytest.approx(np.sqrt(50 / 3))
+
+def test_edit_distance_matrix_matches_reference():
+    """
+    Positive + boundary test:
+    - Random sequences (including an empty one) match the reference edit distance.
+    """
+    rng = np.random.default_rng(0)
+    sequences = [rng.integers(0, 4, size=length) for length in [0, 1, 5, 8, 12]]
+    matrix = edit_distance_matrix(sequences)
+
+    for i in range(len(sequences)):
+        for j in range(i + 1, len(sequences)):
+            longest = max(len(sequences[i]), len(sequences[j]))
+            assert matrix[i, j] == pytest.approx(levenshtein(list(sequences[i]), list(sequences[j])) / longest)
+    assert np.isnan(matrix[0, 0])
+
+def test_fixation_sequences_collapse_repeats():
+    """
+    Positive test:
+    - Repeated samples in the same grid cell become a single entry.
+    """
+    recordings, sequences = fixation_sequences(make_samples(), grid=(2, 2))
+    assert [list(sequence) for sequence in sequences] == [[0], [0], [3]]
+
+def test_compute_stimulus_similarity_cache(tmp_path):
+    """
+    Positive + negative test:
+    - The second call is served from the cache file.
+    - Unknown methods raise a ValueError.
+    """
+    first = compute_stimulus_similarity("StimA", make_samples(), "edit", scanpath_similarity_folder=str(tmp_path))
+    second = compute_stimulus_similarity("StimA", None, "edit", scanpath_similarity_folder=str(tmp_path))
+    np.testing.assert_array_equal(first["matrix"], second["matrix"])
+
+    with pytest.raises(ValueError):
+        compute_stimulus_similarity("StimA", make_samples(), "dtw", scanpath_similarity_folder=str(tmp_path))
+
+def test_cache_key_follows_inputs(tmp_path):
+    """
+    Negative test:
+    - A cached matrix isn't reused after the participant files, the parameters or the
+      stimulus' AOI definitions change; the euclidean key ignores the edit parameters
+    """
+    folder = str(tmp_path)
+    aois = [("face", np.array([[0, 0], [500, 0], [500, 500], [0, 500]]))]
+    stamps = [["Participant_1.csv", 1, 100]]
+    first = compute_stimulus_similarity("StimA", make_samples(), "edit", grid=(2, 2), use_aoi=False,
+                                        scanpath_similarity_folder=folder, source_stamps=stamps)
+    assert compute_stimulus_similarity("StimA", None, "edit", grid=(2, 2), scanpath_similarity_folder=folder,
+                                       source_stamps=stamps)["matrix"].shape == first["matrix"].shape
+
+    # Changed inputs recompute (here from None, which fails)
+    for changes in [{"grid": (3, 3)}, {"source_stamps": [["Participant_1.csv", 2, 100]]},
+                    {"use_aoi": True, "aoi_definition": aois}]:
+        arguments = {"grid": (2, 2), "source_stamps": stamps, **changes}
+        with pytest.raises(Exception):
+            compute_stimulus_similarity("StimA", None, "edit", scanpath_similarity_folder=folder, **arguments)
+
+    samples = make_samples().assign(AOI="face")
+    compute_stimulus_similarity("StimA", samples, "edit", use_aoi=True, aoi_definition=aois,
+                                scanpath_similarity_folder=folder, source_stamps=stamps)
+    moved = [("face", aois[0][1] + 10)]
+    with pytest.raises(Exception):
+        compute_stimulus_similarity("StimA", None, "edit", use_aoi=True, aoi_definition=moved,
+                                    scanpath_similarity_folder=folder, source_stamps=stamps)
+
+    compute_stimulus_similarity("StimA", make_samples(), "euclidean", scanpath_similarity_folder=folder,
+                                source_stamps=stamps)
+    assert compute_stimulus_similarity("StimA", None, "euclidean", grid=(3, 3), scanpath_similarity_folder=folder,
+                                       source_stamps=stamps) is not None
+    with pytest.raises(Exception):
+        compute_stimulus_similarity("StimA", None, "euclidean", scanpath_similarity_folder=folder,
+                                    source_stamps=[["Participant_1.csv", 2, 100]])
+
+def test_cached_rerun_reads_only_missing_stimuli(tmp_path, monkeypatch):
+    """
+    Positive test:
+    - A rerun with every matrix cached doesn't read the participant files, and after one
+      matrix is removed only its stimulus is loaded again
+    """
+    dataset = tmp_path / "clean_dataset"
+    dataset.mkdir()
+    for participant in [1, 2]:
+        pd.DataFrame({"Participant": participant, "Experiment": 1, "Stimulus": ["StimA"] * 3 + ["StimB"] * 3,
+                      "SnappedTime": [0, 20, 40] * 2, "Category Right": "Fixation", "Category Left": "Fixation",
+                      "Point of Regard Right X [px]": 100.0 * participant, "Point of Regard Right Y [px]": 100.0,
+                      "Point of Regard Left X [px]": 100.0 * participant, "Point of Regard Left Y [px]": 100.0}
+                     ).to_csv(dataset / f"Participant_{participant}.csv", index=False)
+    folder = str(tmp_path / "similarity")
+    first = create_scanpath_similarity_files(participant_dataset=str(dataset), scanpath_similarity_folder=folder)
+
+    loaded = []
+    real_load = scanpath_similarity.load_snapped_samples
+    def recording_load(participant_dataset, aoi_definitions=None, stimuli=None):
+        loaded.append(stimuli)
+        return real_load(participant_dataset, aoi_definitions, stimuli)
+    monkeypatch.setattr(scanpath_similarity, "load_snapped_samples", recording_load)
+
+    cached = create_scanpath_similarity_files(participant_dataset=str(dataset), scanpath_similarity_folder=folder)
+    assert loaded == [] and list(cached) == ["StimA", "StimB"]
+    np.testing.assert_array_equal(cached["StimA"]["matrix"], first["StimA"]["matrix"])
+
+    os.remove(similarity_cache_file("StimB", "euclidean", folder))
+    again = create_scanpath_similarity_files(participant_dataset=str(dataset), scanpath_similarity_folder=folder)
+    assert loaded == [["StimB"]] and list(again) == ["StimA", "StimB"]
+    np.testing.assert_array_equal(again["StimB"]["matrix"], first["StimB"]["matrix"])
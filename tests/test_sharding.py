@@ -0,0 +1,142 @@
+import os
+import shutil
+import pickle
+import pytest
+import numpy as np
+import pandas as pd
+from functools import partial
+
+from src.pipeline import load_config, run_pipeline
+from src.parallel import map_in_processes
+from src.sharding import create_queue, claim_shard, run_worker, requeue_stale_claims, merge_results, wait_for_shards
+from src.sharding import participant_file_shards
+
+def write_participant_files(project, participants=4, seed=0):
+    """
+    Uncleaned participant files with two experiments of StimA and StimB each, with some
+    saccades, blinks and tracking loss.
+    """
+    rng = np.random.default_rng(seed)
+    dataset = project / "clean_dataset"
+    dataset.mkdir(parents=True)
+    for participant in range(1, participants + 1):
+        frames = []
+        for experiment, stimulus in [(1, "StimA"), (1, "StimB"), (2, "StimA")]:
+            n = 60
+            gaze = np.cumsum(rng.normal(0, 15, size=(n, 2)), axis=0) + 500
+            category = rng.choice(["Fixation", "Saccade", "Blink"], size=n, p=[0.7, 0.2, 0.1])
+            gaze[category == "Blink"] = 0
+            frames.append(pd.DataFrame({
+                "RecordingTime [ms]": experiment * 10000 + np.arange(n) * 8.3 + rng.uniform(0, 1, n),
+                "Participant": participant, "Experiment": experiment, "Stimulus": stimulus,
+                "Category Right": category, "Category Left": category,
+                "Point of Regard Right X [px]": gaze[:, 0], "Point of Regard Right Y [px]": gaze[:, 1],
+                "Point of Regard Left X [px]": gaze[:, 0] + 5, "Point of Regard Left Y [px]": gaze[:, 1]
+            }))
+        pd.concat(frames).to_csv(dataset / f"Participant_{participant}.csv", index=False)
+    pd.DataFrame({"ParticipantID": range(1, participants + 1),
+                  "Class": ["ASD", "TD"] * (participants // 2)}).to_csv(project / "Metadata_Participants.csv",
+                                                                        index=False)
+
+def run_project(project, monkeypatch, **parameters):
+    monkeypatch.chdir(project)
+    stages = ["cleanup", "experiment_statistics", "saccades", "average_paths", "gaze_deviation"]
+    run_pipeline(load_config(overrides={"stages": stages, "parameters": parameters}))
+
+def test_sharded_stages_match_serial_run(tmp_path, monkeypatch):
+    """
+    Positive test:
+    - With the per-participant stages sharded over worker processes, the quality report,
+      statistics, average paths and participant files equal those of a serial run
+    """
+    write_participant_files(tmp_path / "serial")
+    shutil.copytree(tmp_path / "serial", tmp_path / "sharded")
+
+    run_project(tmp_path / "serial", monkeypatch)
+    run_project(tmp_path / "sharded", monkeypatch, sharded=True, workers=2)
+
+    assert not os.listdir(tmp_path / "sharded/shard_queue/failed")
+    for name in ["data_quality_report.csv", "experiment_statistics.csv", "clean_dataset/Participant_3.csv",
+                 "calculated_average_paths/AveragePath_StimA.csv", "calculated_average_paths/AveragePath_StimB.csv"]:
+        serial = pd.read_csv(tmp_path / "serial" / name)
+        sharded = pd.read_csv(tmp_path / "sharded" / name)
+        pd.testing.assert_frame_equal(serial, sharded, check_exact=False, rtol=1e-9)
+
+def test_every_shard_is_claimed_once(tmp_path):
+    """
+    Positive test:
+    - Competing worker processes together process every shard exactly once
+    """
+    dataset = tmp_path / "clean_dataset"
+    dataset.mkdir()
+    for participant in range(20):
+        (dataset / f"Participant_{participant}.csv").write_text("")
+    queue = str(tmp_path / "queue")
+    create_queue(queue, "gaze_deviation", {"participant_dataset": str(dataset), "average_paths_folder": "none"},
+                 participant_file_shards(str(dataset)))
+
+    processed = map_in_processes(partial(run_worker, queue), range(4), 4)
+
+    assert sum(processed) == 20
+    assert len(os.listdir(os.path.join(queue, "results"))) == 20
+    assert not os.listdir(os.path.join(queue, "pending")) and not os.listdir(os.path.join(queue, "claimed"))
+
+def test_stale_and_failed_shards(tmp_path, capsys):
+    """
+    Negative test:
+    - A claim older than the timeout goes back to the queue (e.g. after a node failed),
+      a fresh one doesn't; a failed shard is reported and left out of the merge
+    Boundary test:
+    - A folder that isn't a queue isn't replaced
+    """
+    pd.DataFrame({"Participant": [1, 2], "Experiment": [1, 1], "Stimulus": ["StimA", "StimA"]}).to_csv(
+        tmp_path / "experiment_statistics.csv", index=False)
+    arguments = {"participant_dataset": str(tmp_path / "missing"),
+                 "experiment_statistics_file": str(tmp_path / "experiment_statistics.csv"), "label_source": "ivt"}
+    queue = str(tmp_path / "queue")
+    create_queue(queue, "saccades", arguments, [{"id": "P1", "participant": 1, "stimuli": ["StimA"]},
+                                                {"id": "P2", "participant": 2, "stimuli": None}])
+
+    assert claim_shard(queue)["id"] == "P1"
+    requeue_stale_claims(queue, stale_after=60)
+    assert os.listdir(os.path.join(queue, "claimed")) == ["P1.json"]
+    os.utime(os.path.join(queue, "claimed", "P1.json"), (0, 0))
+    requeue_stale_claims(queue, stale_after=60)
+    assert sorted(os.listdir(os.path.join(queue, "pending"))) == ["P1.json", "P2.json"]
+
+    # 'stimuli' None makes the saccade shard of P2 fail
+    assert run_worker(queue) == 2
+    assert os.listdir(os.path.join(queue, "failed")) == ["P2.txt"]
+    assert wait_for_shards(queue, poll_interval=0) == 1
+    merge_results(queue)
+    assert "shard P2 failed" in capsys.readouterr().out
+    assert pd.read_csv(tmp_path / "experiment_statistics.csv")["Saccade_Frequency"].tolist() == [0, 0]
+
+    (tmp_path / "results").mkdir()
+    (tmp_path / "results" / "keep.csv").write_text("")
+    with pytest.raises(ValueError):
+        create_queue(str(tmp_path / "results"), "saccades", arguments, [])
+    assert os.path.exists(tmp_path / "results" / "keep.csv")
+
+def test_requeued_shard_keeps_first_result(tmp_path, capsys):
+    """
+    Negative test:
+    - A shard that runs again after it was requeued doesn't replace the first result,
+      and the queue counts as finished without failures
+    """
+    pd.DataFrame({"Participant": [1], "Experiment": [1], "Stimulus": ["StimA"]}).to_csv(
+        tmp_path / "experiment_statistics.csv", index=False)
+    arguments = {"participant_dataset": str(tmp_path / "missing"),
+                 "experiment_statistics_file": str(tmp_path / "experiment_statistics.csv"), "label_source": "ivt"}
+    queue = str(tmp_path / "queue")
+    shard = {"id": "P1", "participant": 1, "stimuli": ["StimA"]}
+    create_queue(queue, "saccades", arguments, [shard])
+
+    with open(os.path.join(queue, "results", "P1.pkl"), "wb") as f:
+        pickle.dump("first", f)
+    assert run_worker(queue) == 1
+    assert "already has a result" in capsys.readouterr().out
+    assert os.listdir(os.path.join(queue, "results")) == ["P1.pkl"]
+    with open(os.path.join(queue, "results", "P1.pkl"), "rb") as f:
+        assert pickle.load(f) == "first"
+    assert wait_for_shards(queue, poll_interval=0) == 0
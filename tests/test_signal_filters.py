@@ -0,0 +1,70 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.signal_filters import interpolate_gaps, smooth_gaze, condition_gaze_signals
+
+def make_samples(right_x, stimulus="StimA", step=20):
+    count = len(right_x)
+    right_x = np.asarray(right_x, dtype=float)
+    return pd.DataFrame({
+        "Participant": 1,
+        "Experiment": 1,
+        "Stimulus": stimulus,
+        "RecordingTime Stimulus [ms]": np.arange(count) * step,
+        "Category Right": "Fixation",
+        "Category Left": "Fixation",
+        "Point of Regard Right X [px]": right_x,
+        "Point of Regard Right Y [px]": np.where(np.isnan(right_x) | (right_x == 0), right_x, 500.0),
+        "Point of Regard Left X [px]": right_x,
+        "Point of Regard Left Y [px]": np.where(np.isnan(right_x) | (right_x == 0), right_x, 500.0)
+    })
+
+def test_interpolate_short_gaps_only():
+    """
+    Positive test:
+    - A 40 ms gap (zeros) is filled linearly, a 100 ms gap (NaN) is left alone with max_gap=60
+    """
+    df = make_samples([100, 0, 300, 300, np.nan, np.nan, np.nan, np.nan, 800])
+    interpolate_gaps(df, max_gap=60)
+
+    assert df["Point of Regard Right X [px]"].iloc[1] == pytest.approx(200)
+    assert df["Point of Regard Right Y [px]"].iloc[1] == pytest.approx(500)
+    assert df["Point of Regard Right X [px]"].iloc[4:8].isna().all()
+
+def test_gaps_are_not_filled_across_stimuli():
+    """
+    Boundary test:
+    - A gap at the end of one stimulus isn't interpolated with the next stimulus
+    """
+    df = pd.concat([make_samples([100, 0], "StimA"), make_samples([300, 300], "StimB")], ignore_index=True)
+    interpolate_gaps(df, max_gap=1000)
+    assert df["Point of Regard Right X [px]"].iloc[1] == 0
+
+@pytest.mark.parametrize("method", ["savgol", "median"])
+def test_smoothing_removes_spike_and_keeps_invalid_samples(method):
+    """
+    Positive test:
+    - A single-sample spike is reduced, invalid samples stay unchanged
+    """
+    df = make_samples([100, 100, 100, 400, 100, 100, 100, np.nan, 100])
+    smooth_gaze(df, method, window=5)
+
+    assert df["Point of Regard Right X [px]"].iloc[3] < 400
+    assert np.isnan(df["Point of Regard Right X [px]"].iloc[7])
+    if method == "median":
+        assert df["Point of Regard Right X [px]"].iloc[3] == 100
+
+def test_invalid_smoothing_settings():
+    """
+    Negative test:
+    - Unknown methods and even windows raise, no filter leaves the data unchanged
+    """
+    df = make_samples([100, 200, 300])
+    with pytest.raises(ValueError):
+        smooth_gaze(df, "gaussian")
+    with pytest.raises(ValueError):
+        smooth_gaze(df, "savgol", window=4)
+
+    unchanged = condition_gaze_signals(df.copy())
+    pd.testing.assert_frame_equal(unchanged, df)
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.stimulus_catalog import normalize_stimulus_name, split_stimulus_name, build_stimulus_catalog
+from src.stimulus_catalog import create_stimulus_catalog, load_stimulus_ids, stimulus_codes
+from src.data_analysis import calculate_experiment_deviation
+
+stimuli = ["04 b joie triste - copie.jpg", "B joie Triste.jpg", "12 tete chat G.png", "12 tete chat gauche.jpg",
+           "18 au revoir.jpg", "18 aurevoir.jpg", "sophie sous l'eau joie vs triste1.avi", "NoImage"]
+
+def write_project(project):
+    """
+    Two participants who saw every stimulus once, the second with twice the recording length.
+    """
+    dataset = project / "clean_dataset"
+    dataset.mkdir()
+    for participant in [1, 2]:
+        pd.DataFrame({"Participant": participant, "Experiment": 1, "Stimulus": np.repeat(stimuli, 3),
+                      "RecordingTime Stimulus [ms]": np.tile([0.0, 500.0, 1000.0 * participant], len(stimuli)),
+                      "Overall Gaze Deviation": np.tile([10.0, 20.0, 30.0 * participant], len(stimuli)),
+                      "Category Left": "Fixation", "Category Right": "Fixation"}).to_csv(
+            dataset / f"Participant_{participant}.csv", index=False)
+    pd.DataFrame({"Participant": np.repeat([1, 2], len(stimuli)), "Experiment": 1,
+                  "Stimulus": stimuli * 2}).to_csv(project / "stats.csv", index=False)
+
+def test_normalized_names():
+    """
+    Positive test:
+    - Order numbers, extensions, copy suffixes, case and side spellings are normalized
+    Boundary test:
+    - A name without an extension or number is kept whole
+    """
+    assert split_stimulus_name("04 b joie triste - copie.jpg") == (4, "b joie triste - copie", "image")
+    assert split_stimulus_name("sophie sous l'eau joie vs triste1.avi") == (None, "sophie sous l'eau joie vs triste1", "video")
+    assert split_stimulus_name("NoImage") == (None, "NoImage", "none")
+    assert normalize_stimulus_name("04 b joie triste - copie.jpg") == normalize_stimulus_name("B joie Triste.jpg")
+    assert normalize_stimulus_name("12 tete chat G.png") == normalize_stimulus_name("12 tete chat gauche.jpg") == "tete chat g"
+
+def test_build_stimulus_catalog(tmp_path):
+    """
+    Positive test:
+    - Every stimulus gets an ID in name order with its media type, order number, median
+      duration, number of recordings and copy group
+    """
+    write_project(tmp_path)
+
+    catalog = build_stimulus_catalog(str(tmp_path / "stats.csv"), str(tmp_path / "clean_dataset"))
+
+    assert catalog["Stimulus"].tolist() == sorted(stimuli)
+    assert catalog["StimulusID"].tolist() == list(range(len(stimuli)))
+    row = catalog.set_index("Stimulus").loc["04 b joie triste - copie.jpg"]
+    assert (row["Media"], row["Order"], row["Recordings"], row["Participants"]) == ("image", 4, 2, 2)
+    assert row["Duration [ms]"] == pytest.approx(1500)
+    groups = catalog.groupby("CopyGroup")["Stimulus"].apply(frozenset)
+    assert frozenset(["18 au revoir.jpg", "18 aurevoir.jpg"]) in set(groups)
+    assert frozenset(["12 tete chat G.png", "12 tete chat gauche.jpg"]) in set(groups)
+    assert catalog.set_index("Stimulus").loc["NoImage", "CopyGroupSize"] == 1
+
+def test_stimulus_codes(tmp_path):
+    """
+    Positive test:
+    - Names map to the catalog IDs; names missing from the catalog get the next IDs
+    Negative test:
+    - Unknown names and NaN map to -1; without a catalog the given names are numbered
+    """
+    write_project(tmp_path)
+    create_stimulus_catalog(str(tmp_path / "stats.csv"), str(tmp_path / "clean_dataset"),
+                            str(tmp_path / "catalog.csv"))
+
+    ids = load_stimulus_ids(["new.jpg", "NoImage"], str(tmp_path / "catalog.csv"))
+    codes = stimulus_codes(["NoImage", "new.jpg", "other.jpg", np.nan, "NoImage"], ids)
+
+    assert codes.tolist() == [sorted(stimuli).index("NoImage"), len(stimuli), -1, -1, sorted(stimuli).index("NoImage")]
+    assert load_stimulus_ids(["b", "a", "b"], str(tmp_path / "missing.csv")).tolist() == ["b", "a"]
+    assert stimulus_codes([], ids).tolist() == []
+
+def test_experiment_deviation_with_catalog(tmp_path):
+    """
+    Positive test:
+    - Matching the statistics rows with the samples on the catalog IDs gives the same
+      averages as matching on the names
+    """
+    write_project(tmp_path)
+    args = [str(tmp_path / "clean_dataset"), str(tmp_path / "stats.csv")]
+    calculate_experiment_deviation(*args, str(tmp_path / "missing.csv"))
+    by_name = pd.read_csv(tmp_path / "stats.csv")
+    create_stimulus_catalog(args[1], args[0], str(tmp_path / "catalog.csv"))
+    calculate_experiment_deviation(*args, str(tmp_path / "catalog.csv"))
+
+    pd.testing.assert_frame_equal(by_name, pd.read_csv(tmp_path / "stats.csv"))
+    assert by_name["Avg_Gaze_Deviation"].tolist() == [20.0] * len(stimuli) + [30.0] * len(stimuli)
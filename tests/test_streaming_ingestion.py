@@ -0,0 +1,85 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from src.data_cleanup import clean_and_extract_eyetracking_data
+from src.data_analysis import compute_saccade_frequency, compute_avg_saccade_duration
+from src.streaming_ingestion import StreamingSession, follow_csv, stream_csv_file
+
+def make_raw_samples(count=60):
+    """
+    Raw samples ~17 ms apart (so several samples share a 20 ms bin), two stimuli,
+    with a separator row and some saccades.
+    """
+    rng = np.random.default_rng(1)
+    times = 5000 + np.cumsum(rng.uniform(12, 22, size=count))
+    categories = np.where(np.arange(count) % 7 < 2, "Saccade", "Fixation")
+    raw = pd.DataFrame({
+        "RecordingTime [ms]": times,
+        "Participant": 7,
+        "Stimulus": ["StimA"] * (count // 2) + ["StimB"] * (count - count // 2),
+        "Category Right": categories,
+        "Category Left": categories,
+        "Point of Regard Right X [px]": rng.uniform(0, 1280, size=count),
+        "Point of Regard Right Y [px]": rng.uniform(0, 1024, size=count),
+        "Point of Regard Left X [px]": rng.uniform(0, 1280, size=count),
+        "Point of Regard Left Y [px]": rng.uniform(0, 1024, size=count)
+    })
+    raw.loc[10, ["Category Right", "Category Left"]] = "Separator"
+    return raw
+
+def run_session(raw, batch_size):
+    session = StreamingSession(experiment=3, average_paths_folder="missing_folder")
+    batches = [session.process_batch(raw.iloc[i:i + batch_size]) for i in range(0, len(raw), batch_size)]
+    return session, pd.concat(batches + [session.flush()], ignore_index=True)
+
+@pytest.mark.parametrize("batch_size", [1, 7, 1000])
+def test_streaming_matches_batch_cleanup(batch_size):
+    """
+    Positive test:
+    - Whatever the batch size, the streamed rows match what the batch cleanup writes,
+      separator rows and samples without a stimulus included.
+    """
+    raw = make_raw_samples()
+    raw.loc[0, ["Category Right", "Category Left"]] = "Separator"
+    raw.loc[0, ["Point of Regard Right X [px]", "Point of Regard Left X [px]"]] = np.nan
+    raw.loc[20, "Stimulus"] = np.nan
+    _, streamed = run_session(raw, batch_size)
+
+    expected = clean_and_extract_eyetracking_data(raw.assign(Experiment=3), "stream")
+
+    assert len(streamed) == len(expected) == len(raw)
+    assert streamed["Category Right"].tolist() == expected["Category Right"].tolist()
+    for col in ["RecordingTime [ms]", "RecordingTime Stimulus [ms]", "Duration", "SnappedTime"]:
+        np.testing.assert_allclose(
+            pd.to_numeric(streamed[col]).to_numpy(dtype=float),
+            pd.to_numeric(expected[col]).to_numpy(dtype=float)
+        )
+
+def test_streaming_saccade_metrics():
+    """
+    Positive test:
+    - The running saccade metrics equal the batch functions on the final rows.
+    """
+    session, streamed = run_session(make_raw_samples(), 5)
+    metrics = session.metrics()
+
+    for stimulus, rows in streamed.groupby("Stimulus"):
+        assert metrics.loc[(7, 3, stimulus), "Saccade_Frequency"] == pytest.approx(compute_saccade_frequency(rows))
+        assert metrics.loc[(7, 3, stimulus), "Avg_Saccade_Duration"] == pytest.approx(compute_avg_saccade_duration(rows))
+
+def test_stream_csv_file(tmp_path):
+    """
+    Positive test:
+    - Tailing a finished file yields all its rows, and the session processes every one of them.
+    """
+    raw = make_raw_samples(20)
+    file_path = tmp_path / "3.csv"
+    file_path.write_text(raw.to_csv(index=False))
+
+    batches = list(follow_csv(str(file_path), poll_interval=0.01, idle_timeout=0.05))
+    assert sum(len(batch) for batch in batches) == 20
+
+    session, rows = stream_csv_file(str(file_path), 3, poll_interval=0.01, idle_timeout=0.05)
+    assert len(rows) == 20
+    assert set(session.metrics().index.get_level_values("Stimulus")) == {"StimA", "StimB"}
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import ttest_ind
+
+from src.time_resolved_analysis import group_t_statistics, find_clusters, cluster_permutation_test
+from src.time_resolved_analysis import participant_deviation_curves, run_time_resolved_analysis
+
+def test_group_t_statistics_match_scipy():
+    """
+    Positive test:
+    - The t statistic of every bin equals scipy's pooled t-test on the participants present in it
+    Boundary test:
+    - A bin with a single participant in a group isn't tested
+    """
+    rng = np.random.default_rng(0)
+    curves = rng.normal(100, 20, (12, 30))
+    present = rng.random(curves.shape) > 0.2
+    present[2:, -1] = False
+    curves[~present] = 0
+    is_asd = np.arange(12) % 2 == 0
+
+    t, df = group_t_statistics(curves, present, is_asd.astype(float)[None, :])
+
+    for b in range(29):
+        asd, td = curves[present[:, b] & is_asd, b], curves[present[:, b] & ~is_asd, b]
+        assert t[0, b] == pytest.approx(ttest_ind(asd, td).statistic, rel=1e-9)
+        assert df[0, b] == len(asd) + len(td) - 2
+    assert np.isnan(t[0, -1]) and df[0, -1] == 0
+
+def test_find_clusters():
+    """
+    Positive test:
+    - Runs above the threshold are clusters; a sign change starts a new one; rows are separate
+    """
+    t = np.array([[0, 3, 4, -3, 0, 5],
+                  [3, 0, np.nan, 3, 3, 0]], dtype=float)
+
+    rows, starts, ends, masses = find_clusters(t, np.full(t.shape, 2.0))
+
+    assert rows.tolist() == [0, 0, 0, 1, 1]
+    assert list(zip(starts, ends)) == [(1, 2), (3, 3), (5, 5), (0, 0), (3, 4)]
+    assert masses.tolist() == [7, -3, 5, 3, 6]
+
+def test_cluster_permutation_test():
+    """
+    Positive test:
+    - A group difference in the middle of the curves is found as one significant cluster,
+      noise elsewhere isn't significant
+    """
+    rng = np.random.default_rng(1)
+    curves = rng.normal(100, 10, (20, 60))
+    is_asd = np.arange(20) < 10
+    curves[np.ix_(is_asd, np.arange(20, 35))] += 40
+
+    t, clusters = cluster_permutation_test(curves, np.ones(curves.shape, dtype=bool), is_asd, n_permutations=199)
+
+    significant = [cluster for cluster in clusters if cluster["p_value"] < 0.05]
+    assert len(significant) == 1
+    assert (significant[0]["start"], significant[0]["end"]) == (20, 34)
+    assert significant[0]["p_value"] <= 0.01 and significant[0]["mass"] > 0
+    assert len(t) == 60
+
+def test_run_time_resolved_analysis(tmp_path, capsys):
+    """
+    Positive test:
+    - Participant curves average the recordings of a participant; the summary lists the
+      significant window in ms and the participants per group
+    Negative test:
+    - A stimulus seen by a single participant of a group is skipped with a warning
+    """
+    rng = np.random.default_rng(2)
+    dataset = tmp_path / "clean_dataset"
+    dataset.mkdir()
+    participants = np.arange(1, 13)
+    is_asd = participants <= 6
+    stats_rows = []
+    for participant, asd in zip(participants, is_asd):
+        frames = []
+        for experiment, stimulus in [(1, "StimA"), (2, "StimA")] + ([(1, "StimB")] if participant in (1, 7, 8) else []):
+            times = np.arange(0, 2000, 20.0)
+            # ASD participants look away to either side of the average path from 600 to 1000 ms
+            offset = np.where(asd & (times >= 600) & (times < 1000), 300 * (-1) ** participant, 0)
+            x = 500 + offset + rng.normal(0, 20, len(times))
+            y = 400 + rng.normal(0, 20, len(times))
+            frames.append(pd.DataFrame({"Participant": participant, "Experiment": experiment, "Stimulus": stimulus,
+                                        "SnappedTime": times, "Category Right": "Fixation", "Category Left": "Fixation",
+                                        "Point of Regard Right X [px]": x, "Point of Regard Right Y [px]": y,
+                                        "Point of Regard Left X [px]": x, "Point of Regard Left Y [px]": y}))
+            stats_rows.append((participant, experiment, stimulus))
+        pd.concat(frames).to_csv(dataset / f"Participant_{participant}.csv", index=False)
+    pd.DataFrame(stats_rows, columns=["Participant", "Experiment", "Stimulus"]).to_csv(tmp_path / "stats.csv",
+                                                                                      index=False)
+    pd.DataFrame({"ParticipantID": participants, "Class": np.where(is_asd, "ASD", "TD")}).to_csv(
+        tmp_path / "metadata.csv", index=False)
+
+    summary, time_courses = run_time_resolved_analysis(str(dataset), str(tmp_path / "stats.csv"),
+                                                       str(tmp_path / "metadata.csv"), str(tmp_path / "tensors"),
+                                                       str(tmp_path / "summary.csv"), n_permutations=99)
+
+    assert "Stimulus 'StimB' has fewer than 2 participants per group" in capsys.readouterr().out
+    assert summary["Stimulus"].tolist() == ["StimA"]
+    row = summary.iloc[0]
+    assert (row["ASD_Participants"], row["TD_Participants"], row["Bins"]) == (6, 6, 100)
+    assert row["Significant_Clusters"] == 1 and row["Significant_Windows"] == "600-980"
+    assert pd.read_csv(tmp_path / "summary.csv")["Stimulus"].tolist() == ["StimA"]
+    assert time_courses["StimA"]["ASD_mean"][40] > time_courses["StimA"]["TD_mean"][40] + 100